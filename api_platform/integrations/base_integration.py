@@ -1,26 +1,60 @@
 """
 Base Integration Class for Commission Intelligence Platform
 All integrations inherit from this base class
+
+Integrations describe how to fetch one page of policies (fetch_page) and
+how to map one source record (map_policy); iter_pages() does the paging,
+fetching numbered pages concurrently over one shared HTTP session.
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional
 import aiohttp
 import asyncio
+import random
 from datetime import datetime
 import json
 import os
 import sys
-sys.path.append('../..')
-from commission_app import get_supabase_client
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from database_utils import LazySupabaseClient
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class SyncPage:
+    """One page of source records.
+    
+    next_cursor: opaque cursor for the following page (cursor pagination),
+    None on the last page. total_pages: set on the first page of numbered
+    pagination, so the remaining pages can be fetched concurrently.
+    """
+    records: List[Dict[str, Any]]
+    next_cursor: Any = None
+    total_pages: Optional[int] = None
+
 
 class BaseIntegration(ABC):
     """Abstract base class for all integrations."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self, user_email: str, config: Dict[str, Any]):
         self.user_email = user_email
         self.config = config
-        self.supabase = get_supabase_client()
         self.name = self.__class__.__name__
+        self.max_connections = int(config.get('max_connections', 4))
+        self.max_retries = int(config.get('max_retries', 4))
+        self.backoff_seconds = float(config.get('backoff_seconds', 0.5))
+        self.request_timeout = float(config.get('request_timeout', 30))
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
         
     @abstractmethod
     async def test_connection(self) -> Dict[str, Any]:
@@ -28,8 +62,18 @@ class BaseIntegration(ABC):
         pass
     
     @abstractmethod
-    async def sync_policies(self, since_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Sync policies from the external system."""
+    async def fetch_page(self, since_date: Optional[datetime], cursor: Any = None) -> SyncPage:
+        """Fetch one page of policies modified since since_date (cursor None for the first page)."""
+        pass
+    
+    @abstractmethod
+    def map_policy(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Map one source record to our policy format; None to skip it."""
+        pass
+    
+    @abstractmethod
+    def modified_at(self, record: Dict[str, Any]) -> Optional[str]:
+        """When the source record last changed (ISO 8601), used as the sync watermark."""
         pass
     
     @abstractmethod
@@ -37,6 +81,73 @@ class BaseIntegration(ABC):
         """Push commission data to the external system."""
         pass
     
+    async def sync_policies(self, since_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Sync policies from the external system (all pages, mapped, as a list).
+        
+        For large accounts use integrations.sync_engine.SyncEngine, which
+        streams the same pages straight into the policies table.
+        """
+        policies = []
+        try:
+            async for page in self.iter_pages(since_date):
+                for record in page.records:
+                    policy = self.map_policy(record)
+                    if policy:
+                        policies.append(policy)
+            await self.log_activity("sync_policies", "success", {"count": len(policies)})
+        except Exception as e:
+            await self.log_activity("sync_policies", "error", {"error": str(e)})
+            raise
+        return policies
+    
+    async def iter_pages(self, since_date: Optional[datetime] = None,
+                         concurrency: Optional[int] = None) -> AsyncIterator[SyncPage]:
+        """Yield pages as they arrive.
+        
+        Numbered pages (first page reports total_pages) are fetched with up
+        to `concurrency` requests in flight and may arrive out of order;
+        cursor pages are fetched one after another, the next request going
+        out while the caller handles the current page.
+        """
+        concurrency = concurrency or self.max_connections
+        first = await self.fetch_page(since_date)
+        
+        if first.total_pages:
+            yield first
+            numbers = iter(range(2, first.total_pages + 1))
+            pending = set()
+            while True:
+                while len(pending) < concurrency:
+                    number = next(numbers, None)
+                    if number is None:
+                        break
+                    pending.add(asyncio.ensure_future(self.fetch_page(since_date, number)))
+                if not pending:
+                    return
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                try:
+                    for task in done:
+                        yield task.result()
+                except BaseException:
+                    for task in pending:
+                        task.cancel()
+                    raise
+        
+        page = first
+        while True:
+            upcoming = None
+            if page.next_cursor is not None:
+                upcoming = asyncio.ensure_future(self.fetch_page(since_date, page.next_cursor))
+            try:
+                yield page
+            except BaseException:
+                if upcoming:
+                    upcoming.cancel()
+                raise
+            if upcoming is None:
+                return
+            page = await upcoming
+    
     async def log_activity(self, action: str, status: str, details: Dict[str, Any] = None):
         """Log integration activity."""
         log_data = {
@@ -59,15 +170,55 @@ class BaseIntegration(ABC):
                 mapped_data[dest_field] = source_data[source_field]
         return mapped_data
     
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session (keep-alive connections, at most max_connections)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Exponential backoff with jitter; a Retry-After header wins."""
+        if retry_after:
+            try:
+                return max(float(retry_after), 0.0)
+            except ValueError:
+                pass
+        return self.backoff_seconds * (2 ** attempt) * random.uniform(0.5, 1.0)
+    
     async def make_request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
-        """Make HTTP request with error handling."""
-        async with aiohttp.ClientSession() as session:
+        """Make HTTP request with error handling.
+        
+        Rate limits (429), server errors and connection failures are retried
+        up to max_retries times with backoff; other 4xx errors fail at once.
+        """
+        session = await self.get_session()
+        attempt = 0
+        while True:
             try:
                 async with session.request(method, url, **kwargs) as response:
-                    data = await response.json()
-                    if response.status >= 400:
-                        raise Exception(f"API Error: {response.status} - {data}")
-                    return data
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                    else:
+                        data = await response.json(content_type=None)
+                        if response.status >= 400:
+                            raise Exception(f"API Error: {response.status} - {data}")
+                        return data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    await self.log_activity(f"{method} {url}", "error", {"error": str(e)})
+                    raise
+                delay = self._retry_delay(attempt)
             except Exception as e:
                 await self.log_activity(f"{method} {url}", "error", {"error": str(e)})
-                raise
\ No newline at end of file
+                raise
+            attempt += 1
+            await asyncio.sleep(delay)
\ No newline at end of file
@@ -5,17 +5,30 @@ Handles policy sync and commission data exchange with EZLynx
 from typing import Dict, Any, List, Optional
 from datetime import datetime, timedelta
 import base64
-from .base_integration import BaseIntegration
+from .base_integration import BaseIntegration, SyncPage
+
+# EZLynx fields to our format
+FIELD_MAPPING = {
+    "policyNumber": "policy_number",
+    "insuredName": "customer",
+    "effectiveDate": "effective_date",
+    "expirationDate": "expiration_date",
+    "premium": "premium",
+    "lineOfBusiness": "policy_type",
+    "carrierName": "carrier",
+    "agentCode": "agent_id"
+}
 
 class EZLynxIntegration(BaseIntegration):
     """EZLynx API integration."""
     
     def __init__(self, user_email: str, config: Dict[str, Any]):
         super().__init__(user_email, config)
-        self.base_url = "https://api.ezlynx.com/v2"
+        self.base_url = config.get('base_url', "https://api.ezlynx.com/v2")
         self.api_key = config.get('api_key')
         self.username = config.get('username')
         self.password = config.get('password')
+        self.page_size = int(config.get('page_size', 100))
         
     def _get_auth_headers(self) -> Dict[str, str]:
         """Get authentication headers for EZLynx API."""
@@ -47,66 +60,51 @@ class EZLynxIntegration(BaseIntegration):
             await self.log_activity("test_connection", "error", {"error": str(e)})
             return {"success": False, "error": str(e)}
     
-    async def sync_policies(self, since_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Sync policies from EZLynx."""
+    async def fetch_page(self, since_date: Optional[datetime], cursor: Any = None) -> SyncPage:
+        """Fetch one numbered page of policies modified since since_date."""
         if not since_date:
             since_date = datetime.now() - timedelta(days=30)
+        page_number = cursor or 1
         
-        policies = []
+        # EZLynx policies endpoint
+        response = await self.make_request(
+            "GET",
+            f"{self.base_url}/policies",
+            headers=self._get_auth_headers(),
+            params={
+                "modifiedSince": since_date.isoformat(),
+                "includeDetails": "true",
+                "pageSize": self.page_size,
+                "pageNumber": page_number
+            }
+        )
         
-        try:
-            # EZLynx policies endpoint
-            response = await self.make_request(
-                "GET",
-                f"{self.base_url}/policies",
-                headers=self._get_auth_headers(),
-                params={
-                    "modifiedSince": since_date.isoformat(),
-                    "includeDetails": "true",
-                    "pageSize": 100
-                }
+        total_pages = response.get("totalPages")
+        if total_pages is None and response.get("totalCount") is not None:
+            total_pages = -(-int(response["totalCount"]) // self.page_size)
+        return SyncPage(records=response.get("policies", []), total_pages=total_pages)
+    
+    def map_policy(self, ezlynx_policy: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Map an EZLynx policy to our format."""
+        # Map basic fields
+        policy = self.map_fields(ezlynx_policy, FIELD_MAPPING)
+        
+        # Add calculated fields
+        policy["external_id"] = f"ezlynx_{ezlynx_policy.get('id')}"
+        policy["api_source"] = "ezlynx"
+        
+        # Calculate commission if rate available
+        if "commissionRate" in ezlynx_policy:
+            policy["commission_rate"] = ezlynx_policy["commissionRate"]
+            policy["commission"] = (
+                float(policy.get("premium") or 0) * float(ezlynx_policy["commissionRate"]) / 100
             )
             
-            # Map EZLynx fields to our format
-            field_mapping = {
-                "policyNumber": "policy_number",
-                "insuredName": "customer",
-                "effectiveDate": "effective_date",
-                "expirationDate": "expiration_date",
-                "premium": "premium",
-                "lineOfBusiness": "policy_type",
-                "carrierName": "carrier",
-                "agentCode": "agent_id"
-            }
-            
-            for ezlynx_policy in response.get("policies", []):
-                # Map basic fields
-                policy = self.map_fields(ezlynx_policy, field_mapping)
-                
-                # Add calculated fields
-                policy["external_id"] = f"ezlynx_{ezlynx_policy.get('id')}"
-                policy["api_source"] = "ezlynx"
-                
-                # Calculate commission if rate available
-                if "commissionRate" in ezlynx_policy:
-                    policy["commission_rate"] = ezlynx_policy["commissionRate"]
-                    policy["commission"] = (
-                        float(policy["premium"]) * float(ezlynx_policy["commissionRate"]) / 100
-                    )
-                
-                policies.append(policy)
-            
-            await self.log_activity(
-                "sync_policies", 
-                "success", 
-                {"count": len(policies), "since": since_date.isoformat()}
-            )
+        return policy
             
-        except Exception as e:
-            await self.log_activity("sync_policies", "error", {"error": str(e)})
-            raise
-        
-        return policies
+    def modified_at(self, ezlynx_policy: Dict[str, Any]) -> Optional[str]:
+        """EZLynx last modification time."""
+        return ezlynx_policy.get("modifiedDate")
     
     async def push_commission(self, commission_data: Dict[str, Any]) -> Dict[str, Any]:
         """Push commission data to EZLynx."""
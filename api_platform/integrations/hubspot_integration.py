@@ -4,15 +4,26 @@ Syncs client data and renewal opportunities with HubSpot CRM
 """
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from .base_integration import BaseIntegration
+from .base_integration import BaseIntegration, SyncPage
+
+CONTACT_PROPERTIES = [
+    "firstname", "lastname", "email",
+    "insurance_policy_number", "insurance_carrier",
+    "insurance_premium", "insurance_effective_date",
+    "insurance_expiration_date", "lastmodifieddate"
+]
 
 class HubSpotIntegration(BaseIntegration):
     """HubSpot CRM integration."""
     
+    # CRM search returns at most this many results per query
+    SEARCH_RESULT_LIMIT = 10000
+    
     def __init__(self, user_email: str, config: Dict[str, Any]):
         super().__init__(user_email, config)
-        self.base_url = "https://api.hubapi.com"
+        self.base_url = config.get('base_url', "https://api.hubapi.com")
         self.api_key = config.get('api_key')
+        self.page_size = int(config.get('page_size', 100))
         
     def _get_auth_headers(self) -> Dict[str, str]:
         """Get authentication headers for HubSpot API."""
@@ -40,61 +51,74 @@ class HubSpotIntegration(BaseIntegration):
             await self.log_activity("test_connection", "error", {"error": str(e)})
             return {"success": False, "error": str(e)}
     
-    async def sync_policies(self, since_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Sync contacts from HubSpot as potential policies."""
-        policies = []
+    async def fetch_page(self, since_date: Optional[datetime], cursor: Any = None) -> SyncPage:
+        """Fetch one page of contacts with a policy number, oldest change first.
         
-        try:
-            # Search for contacts with insurance-related properties
-            response = await self.make_request(
-                "POST",
-                f"{self.base_url}/crm/v3/objects/contacts/search",
-                headers=self._get_auth_headers(),
-                json={
-                    "filterGroups": [{
-                        "filters": [
-                            {
-                                "propertyName": "insurance_policy_number",
-                                "operator": "HAS_PROPERTY"
-                            }
-                        ]
-                    }],
-                    "properties": [
-                        "firstname", "lastname", "email",
-                        "insurance_policy_number", "insurance_carrier",
-                        "insurance_premium", "insurance_effective_date",
-                        "insurance_expiration_date"
-                    ],
-                    "limit": 100
-                }
-            )
+        Search paging stops at SEARCH_RESULT_LIMIT results, so past that the
+        cursor restarts the search from the last modification time seen.
+        """
+        cursor = cursor or {"after": None, "since": since_date}
+        filters = [
+            {
+                "propertyName": "insurance_policy_number",
+                "operator": "HAS_PROPERTY"
+            }
+        ]
+        if cursor["since"]:
+            filters.append({
+                "propertyName": "lastmodifieddate",
+                "operator": "GTE",
+                "value": str(int(cursor["since"].timestamp() * 1000))
+            })
             
-            # Map HubSpot contacts to policy format
-            for contact in response.get("results", []):
-                properties = contact.get("properties", {})
+        body = {
+            "filterGroups": [{"filters": filters}],
+            "sorts": [{"propertyName": "lastmodifieddate", "direction": "ASCENDING"}],
+            "properties": CONTACT_PROPERTIES,
+            "limit": self.page_size
+        }
+        if cursor["after"]:
+            body["after"] = cursor["after"]
                 
-                policy = {
-                    "policy_number": properties.get("insurance_policy_number"),
-                    "customer": f"{properties.get('firstname', '')} {properties.get('lastname', '')}".strip(),
-                    "email": properties.get("email"),
-                    "carrier": properties.get("insurance_carrier"),
-                    "premium": float(properties.get("insurance_premium", 0)),
-                    "effective_date": properties.get("insurance_effective_date"),
-                    "expiration_date": properties.get("insurance_expiration_date"),
-                    "external_id": f"hubspot_{contact.get('id')}",
-                    "api_source": "hubspot"
-                }
+        response = await self.make_request(
+            "POST",
+            f"{self.base_url}/crm/v3/objects/contacts/search",
+            headers=self._get_auth_headers(),
+            json=body
+        )
                 
-                if policy["policy_number"]:  # Only include if has policy number
-                    policies.append(policy)
+        results = response.get("results", [])
+        after = response.get("paging", {}).get("next", {}).get("after")
+        next_cursor = None
+        if after and int(after) + self.page_size > self.SEARCH_RESULT_LIMIT:
+            last_modified = self.modified_at(results[-1]) if results else None
+            if last_modified:
+                next_cursor = {"after": None, "since": datetime.fromisoformat(last_modified)}
+        elif after:
+            next_cursor = {"after": after, "since": cursor["since"]}
+        return SyncPage(records=results, next_cursor=next_cursor)
             
-            await self.log_activity("sync_policies", "success", {"count": len(policies)})
+    def map_policy(self, contact: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Map a HubSpot contact to policy format (None without a policy number)."""
+        properties = contact.get("properties", {})
+        if not properties.get("insurance_policy_number"):
+            return None
             
-        except Exception as e:
-            await self.log_activity("sync_policies", "error", {"error": str(e)})
-            raise
+        return {
+            "policy_number": properties.get("insurance_policy_number"),
+            "customer": f"{properties.get('firstname') or ''} {properties.get('lastname') or ''}".strip(),
+            "email": properties.get("email"),
+            "carrier": properties.get("insurance_carrier"),
+            "premium": float(properties.get("insurance_premium") or 0),
+            "effective_date": properties.get("insurance_effective_date"),
+            "expiration_date": properties.get("insurance_expiration_date"),
+            "external_id": f"hubspot_{contact.get('id')}",
+            "api_source": "hubspot"
+        }
         
-        return policies
+    def modified_at(self, contact: Dict[str, Any]) -> Optional[str]:
+        """HubSpot last modification time."""
+        return contact.get("properties", {}).get("lastmodifieddate") or contact.get("updatedAt")
     
     async def push_commission(self, commission_data: Dict[str, Any]) -> Dict[str, Any]:
         """Update HubSpot contact with commission data."""
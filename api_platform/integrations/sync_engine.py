@@ -0,0 +1,336 @@
+"""
+Incremental CRM Sync Engine for Commission Intelligence Platform
+Streams policies from an integration into the policies table
+
+- incremental: each successful run stores a watermark (the newest source
+  modification time it saw) in integration_sync_history; the next run
+  only asks the source for records changed since then. Pages are numbered
+  by offset and fetched concurrently, so a record changing mid-run shifts
+  the others between pages and one can be missed. The watermark therefore
+  never passes the run's start, and a run that fetched anything modified
+  after it started keeps the previous watermark so the next run re-reads
+  that window (the upsert makes the repeats harmless)
+- fetching: pages come from BaseIntegration.iter_pages (numbered pages
+  concurrently, cursor pages with the next one prefetched) over one
+  shared HTTP session with retry/backoff
+- streaming: records are mapped page by page and written in batches, so
+  memory holds one batch, not the whole account
+- writing: bulk upsert keyed by (user_email, external_id); the next batch
+  is mapped while the previous one is written. Rows carry the owner's
+  user_id (load_policies_data filters on it); policies seen for the first
+  time get a Transaction ID and Transaction Type NEW, existing ones keep
+  theirs
+- metrics: rows, pages, rows per second and lag (longest time a changed
+  record took to land in policies) go to integration_sync_history
+"""
+import asyncio
+import os
+import random
+import string
+import sys
+import time
+from contextlib import aclosing
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .base_integration import BaseIntegration
+from .ezlynx_integration import EZLynxIntegration
+from .hubspot_integration import HubSpotIntegration
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from utils.bulk_renewal import reserve_transaction_ids
+
+HISTORY_TABLE = 'integration_sync_history'
+POLICIES_TABLE = 'policies'
+UPSERT_CONFLICT = 'user_email,external_id'
+
+STATUS_SUCCESS = 'success'
+STATUS_FAILED = 'failed'
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_TRANSACTION_TYPE = 'NEW'
+
+INTEGRATIONS = {
+    'EZLynx': EZLynxIntegration,
+    'HubSpot': HubSpotIntegration,
+}
+
+# Mapped policy fields -> policies columns (as in api_server.create_policy);
+# anything else the integration maps goes to integration_metadata
+POLICY_COLUMNS = {
+    'policy_number': 'Policy Number',
+    'customer': 'Customer',
+    'effective_date': 'Effective Date',
+    'expiration_date': 'X-Date',
+    'premium': 'Premium Sold',
+    'policy_type': 'Policy Type',
+    'carrier': 'MGA/Carrier',
+    'commission': 'Agent Estimated Comm $',
+    'external_id': 'external_id',
+    'api_source': 'api_source',
+}
+
+
+def _parse_time(value: Any) -> Optional[datetime]:
+    """ISO 8601 string (or datetime) as an aware UTC datetime; None if unparseable."""
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value))
+        except (TypeError, ValueError):
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def generate_transaction_id() -> str:
+    """Transaction ID in the app's format (commission_app.generate_transaction_id):
+    3 letters, 3 digits and one of either, shuffled."""
+    chars = [random.choice(string.ascii_uppercase) for _ in range(3)]
+    chars += [random.choice(string.digits) for _ in range(3)]
+    chars.append(random.choice(random.choice([string.ascii_uppercase, string.digits])))
+    random.shuffle(chars)
+    return ''.join(chars)
+
+
+def to_policy_row(policy: Dict[str, Any], user_email: str, synced_at: str,
+                  user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Policies table row for a mapped policy."""
+    row = {'user_email': user_email, 'last_api_sync': synced_at}
+    if user_id:
+        row['user_id'] = user_id
+    metadata = {}
+    for key, value in policy.items():
+        column = POLICY_COLUMNS.get(key)
+        if column:
+            row[column] = value
+        else:
+            metadata[key] = value
+    row['integration_metadata'] = metadata
+    return row
+
+
+class SyncEngine:
+    """Runs one incremental sync of an integration into policies."""
+
+    def __init__(
+        self,
+        integration: BaseIntegration,
+        integration_name: Optional[str] = None,
+        agency_id: Optional[str] = None,
+        supabase=None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        concurrency: Optional[int] = None,
+        user_id: Optional[str] = None,
+        generate_id: Callable[[], str] = generate_transaction_id
+    ):
+        self.integration = integration
+        self.user_id = user_id
+        self.generate_id = generate_id
+        self.integration_name = integration_name or integration.name
+        self.agency_id = agency_id
+        self.supabase = supabase if supabase is not None else integration.supabase
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+
+    def last_watermark(self) -> Optional[datetime]:
+        """Watermark of the last successful sync, None if there is none."""
+        try:
+            result = self.supabase.table(HISTORY_TABLE)\
+                .select('watermark')\
+                .eq('user_email', self.integration.user_email)\
+                .eq('integration_name', self.integration_name)\
+                .eq('status', STATUS_SUCCESS)\
+                .order('sync_timestamp', desc=True)\
+                .limit(1)\
+                .execute()
+            if result.data and result.data[0].get('watermark'):
+                return _parse_time(result.data[0]['watermark'])
+        except Exception as e:
+            print(f"[SyncEngine] Could not read last watermark: {e}")
+        return None
+
+    def _existing_external_ids(self, external_ids: List[str]) -> Set[str]:
+        """Which of these external_ids the user already has in policies."""
+        result = self.supabase.table(POLICIES_TABLE)\
+            .select('external_id')\
+            .eq('user_email', self.integration.user_email)\
+            .in_('external_id', external_ids)\
+            .execute()
+        return {row['external_id'] for row in result.data or []}
+
+    def _upsert(self, rows: List[Dict[str, Any]]) -> int:
+        """Upsert a batch. New policies get a Transaction ID and type; rows
+        already in policies are upserted without them, so theirs are kept."""
+        existing = self._existing_external_ids([row['external_id'] for row in rows])
+        new_rows = [row for row in rows if row['external_id'] not in existing]
+        transaction_ids = reserve_transaction_ids(self.supabase, len(new_rows), self.generate_id)
+        for row, transaction_id in zip(new_rows, transaction_ids):
+            row['Transaction ID'] = transaction_id
+            row.setdefault('Transaction Type', DEFAULT_TRANSACTION_TYPE)
+
+        # One statement per set of columns: a bulk upsert names the union of
+        # its rows' keys and writes NULL where a row lacks one (default_to_null),
+        # so a source record without e.g. a commission rate would wipe the
+        # stored value. New rows differ from existing ones by Transaction ID/Type.
+        groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(frozenset(row), []).append(row)
+
+        written = 0
+        for group in groups.values():
+            result = self.supabase.table(POLICIES_TABLE)\
+                .upsert(group, on_conflict=UPSERT_CONFLICT)\
+                .execute()
+            written += len(result.data) if result.data else len(group)
+        return written
+
+    async def _write(self, batch: Dict[str, Dict[str, Any]], modified: List[datetime],
+                     stats: Dict[str, Any]):
+        """Upsert one batch (deduplicated by external_id) and update the lag."""
+        if not batch:
+            return
+        stats['rows_upserted'] += await asyncio.to_thread(self._upsert, list(batch.values()))
+        stats['batches'] += 1
+        landed = datetime.now(timezone.utc)
+        if modified:
+            lag = (landed - min(modified)).total_seconds()
+            stats['lag_seconds'] = max(stats['lag_seconds'] or 0.0, lag)
+
+    async def run(self, full: bool = False, since_date: Optional[datetime] = None) -> Dict[str, Any]:
+        """Sync everything changed since the last watermark.
+
+        full=True ignores the watermark and pulls the integration's default
+        window (EZLynx: 30 days, HubSpot: all contacts).
+
+        A failed run, or one that saw records modified after it started,
+        stores no new watermark, so the next run repeats it; the upsert makes
+        the repeated rows harmless.
+        """
+        previous = None if full else (since_date or self.last_watermark())
+        started = time.perf_counter()
+        run_started = datetime.now(timezone.utc)
+        synced_at = run_started.isoformat()
+        stats = {
+            'rows_fetched': 0, 'rows_skipped': 0, 'rows_upserted': 0,
+            'pages': 0, 'batches': 0, 'lag_seconds': None, 'rows_changed_during_sync': 0,
+        }
+        watermark = previous
+        error = None
+
+        batch: Dict[str, Dict[str, Any]] = {}
+        batch_modified: List[datetime] = []
+        writing = None
+        try:
+            async with aclosing(self.integration.iter_pages(previous, self.concurrency)) as pages:
+                async for page in pages:
+                    stats['pages'] += 1
+                    for record in page.records:
+                        stats['rows_fetched'] += 1
+                        modified = _parse_time(self.integration.modified_at(record))
+                        if modified and modified > run_started:
+                            stats['rows_changed_during_sync'] += 1
+                        elif modified and (watermark is None or modified > watermark):
+                            watermark = modified
+                        policy = self.integration.map_policy(record)
+                        if not policy or not policy.get('external_id'):
+                            stats['rows_skipped'] += 1
+                            continue
+                        # A record changed mid-sync can arrive twice; one upsert
+                        # statement can't touch the same row twice
+                        batch[policy['external_id']] = to_policy_row(
+                            policy, self.integration.user_email, synced_at, self.user_id
+                        )
+                        if modified:
+                            batch_modified.append(modified)
+
+                        if len(batch) >= self.batch_size:
+                            if writing:
+                                await writing
+                            writing = asyncio.ensure_future(self._write(batch, batch_modified, stats))
+                            batch, batch_modified = {}, []
+            if writing:
+                await writing
+                writing = None
+            await self._write(batch, batch_modified, stats)
+        except Exception as e:
+            error = str(e)
+            if writing and not writing.done():
+                writing.cancel()
+            await self.integration.log_activity("sync_engine", "error", {"error": error})
+        finally:
+            await self.integration.close()
+
+        duration = time.perf_counter() - started
+        # Pages may have shifted under a record changed mid-run: keep the old
+        # watermark so the next run reads the window again
+        stored_watermark = previous if error or stats['rows_changed_during_sync'] else watermark
+        stats.update({
+            'status': STATUS_FAILED if error else STATUS_SUCCESS,
+            'error': error,
+            'duration_seconds': round(duration, 3),
+            'rows_per_second': round(stats['rows_upserted'] / duration, 1) if duration > 0 else None,
+            'since': previous.isoformat() if previous else None,
+            'watermark': stored_watermark.isoformat() if stored_watermark else None,
+        })
+        self._record_history(stats)
+        if not error:
+            await self.integration.log_activity("sync_engine", "success", {
+                "rows": stats['rows_upserted'], "rows_per_second": stats['rows_per_second']
+            })
+        return stats
+
+    def _record_history(self, stats: Dict[str, Any]):
+        """Write the run to integration_sync_history."""
+        try:
+            self.supabase.table(HISTORY_TABLE).insert({
+                'agency_id': self.agency_id,
+                'user_email': self.integration.user_email,
+                'integration_name': self.integration_name,
+                'sync_timestamp': datetime.now(timezone.utc).isoformat(),
+                'status': stats['status'],
+                'records_synced': stats['rows_upserted'],
+                'records_fetched': stats['rows_fetched'],
+                'records_skipped': stats['rows_skipped'],
+                'pages': stats['pages'],
+                'duration_seconds': stats['duration_seconds'],
+                'rows_per_second': stats['rows_per_second'],
+                'lag_seconds': stats['lag_seconds'],
+                'since': stats['since'],
+                'watermark': stats['watermark'],
+                'error_message': stats['error'],
+            }).execute()
+        except Exception as e:
+            print(f"[SyncEngine] Could not record sync history: {e}")
+
+
+def create_integration(integration_name: str, user_email: str, config: Dict[str, Any]) -> Optional[BaseIntegration]:
+    """Integration instance for a name from agency_integrations, None if there is no connector."""
+    integration_class = INTEGRATIONS.get(integration_name)
+    if integration_class is None:
+        return None
+    return integration_class(user_email, config)
+
+
+async def run_sync(
+    integration_name: str,
+    user_email: str,
+    config: Dict[str, Any],
+    agency_id: Optional[str] = None,
+    full: bool = False,
+    supabase=None,
+    user_id: Optional[str] = None
+) -> Tuple[bool, Dict[str, Any]]:
+    """Run one sync for a connected integration. Returns (success, stats).
+
+    user_id is the owner's users.id, written on every synced row.
+    """
+    integration = create_integration(integration_name, user_email, config)
+    if integration is None:
+        return False, {'error': f"No sync connector for {integration_name}"}
+    engine = SyncEngine(integration, integration_name, agency_id=agency_id, supabase=supabase,
+                        batch_size=int(config.get('batch_size', DEFAULT_BATCH_SIZE)), user_id=user_id)
+    stats = await engine.run(full=full)
+    return stats['status'] == STATUS_SUCCESS, stats
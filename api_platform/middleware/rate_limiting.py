@@ -1,33 +1,154 @@
 """
 Advanced rate limiting middleware with multiple strategies
 Supports sliding window, distributed rate limiting, and plan-based limits
+
+RateLimitMiddleware checks the concurrency slot and the hourly, daily and
+endpoint sliding windows in one Lua script (one round trip, atomic - two
+concurrent requests can't both take the last slot) on redis.asyncio, so
+the event loop never blocks on Redis. Plans are cached in-process.
 """
 import time
 import json
 import os
+import secrets
+import threading
+from collections import OrderedDict
 from typing import Dict, Tuple, Optional
 from fastapi import Request, HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 import redis
+import redis.asyncio
 from datetime import datetime, timedelta
 import asyncio
 from functools import wraps
 
-# Redis connection for rate limiting
-redis_client = redis.Redis(
+REDIS_SETTINGS = dict(
     host=os.getenv("REDIS_HOST", "localhost"),
     port=int(os.getenv("REDIS_PORT", 6379)),
     decode_responses=True,
     password=os.getenv("REDIS_PASSWORD")
 )
 
+# Redis connection for rate limiting
+redis_client = redis.Redis(**REDIS_SETTINGS)
+
+# Async connection for the middleware (connects on first use, in the server's event loop)
+async_redis_client = redis.asyncio.Redis(**REDIS_SETTINGS)
+
+PLAN_CACHE_TTL = 300  # seconds
+PLAN_CACHE_SIZE = 10000
+DEFAULT_PLAN = "starter"
+
+CONCURRENT_SLOT_TTL = 60  # seconds; slots of crashed requests expire
+
+# Which check a denied request failed (second value returned by the script)
+LIMIT_NAMES = {1: "concurrent", 2: "hourly", 3: "daily", 4: "endpoint"}
+
+# KEYS: concurrent, hour window, day window[, endpoint window]
+# ARGV: now, member, concurrent limit, slot ttl, hour limit, day limit[, endpoint limit, endpoint window]
+# Returns {allowed, failed check (0 = none), limit, remaining, reset, retry_after}
+RATE_LIMIT_SCRIPT = """
+local now = tonumber(ARGV[1])
+local member = ARGV[2]
+local concurrent_limit = tonumber(ARGV[3])
+
+if tonumber(redis.call('GET', KEYS[1]) or '0') >= concurrent_limit then
+    return {0, 1, concurrent_limit, 0, math.ceil(now) + 1, 1}
+end
+
+local windows = {{KEYS[2], tonumber(ARGV[5]), 3600}, {KEYS[3], tonumber(ARGV[6]), 86400}}
+if KEYS[4] then
+    windows[3] = {KEYS[4], tonumber(ARGV[7]), tonumber(ARGV[8])}
+end
+
+-- Check every window before recording the request in any of them
+local hour_count, hour_reset
+for i, w in ipairs(windows) do
+    local key, limit, window = w[1], w[2], w[3]
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    local count = redis.call('ZCARD', key)
+    local reset = now + window
+    if count > 0 then
+        reset = tonumber(redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')[2]) + window
+    end
+    if count >= limit then
+        return {0, i + 1, limit, 0, math.floor(reset), math.max(1, math.ceil(reset - now))}
+    end
+    if i == 1 then
+        hour_count, hour_reset = count, reset
+    end
+end
+
+for _, w in ipairs(windows) do
+    redis.call('ZADD', w[1], now, member)
+    redis.call('EXPIRE', w[1], w[3] + 1)
+end
+redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+
+local hour_limit = tonumber(ARGV[5])
+return {1, 0, hour_limit, hour_limit - hour_count - 1, math.floor(hour_reset), 0}
+"""
+
+# KEYS: concurrent
+# A request can outlive the slot's TTL; a plain DECR would then create the key
+# at -1 and give the client an extra slot, so only a held slot is released
+RELEASE_SLOT_SCRIPT = """
+if tonumber(redis.call('GET', KEYS[1]) or '0') > 0 then
+    return redis.call('DECR', KEYS[1])
+end
+return 0
+"""
+
+
+class PlanCache:
+    """In-process LRU + TTL cache of API key -> plan, so most requests skip the Redis lookup."""
+
+    def __init__(self, ttl_seconds: float = PLAN_CACHE_TTL, max_entries: int = PLAN_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, api_key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is None or time.monotonic() >= entry[1]:
+                self._entries.pop(api_key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(api_key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, api_key: str, plan: str):
+        with self._lock:
+            self._entries[api_key] = (plan, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, api_key: str = None):
+        """Forget one key's plan (e.g. after an upgrade), or every plan."""
+        with self._lock:
+            if api_key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(api_key, None)
+
+
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """Advanced rate limiting with multiple strategies."""
     
-    def __init__(self, app, redis_client: redis.Redis = None):
+    def __init__(self, app, redis_client: redis.asyncio.Redis = None, plan_cache: PlanCache = None):
         super().__init__(app)
-        self.redis = redis_client or globals()['redis_client']
+        self.redis = redis_client or async_redis_client
+        # EVALSHA, falling back to EVAL when Redis doesn't have the script yet
+        self._limit_script = self.redis.register_script(RATE_LIMIT_SCRIPT)
+        self._release_script = self.redis.register_script(RELEASE_SLOT_SCRIPT)
+        self.plan_cache = plan_cache or PlanCache()
         
         # Rate limit configurations by plan
         self.rate_limits = {
@@ -74,34 +195,32 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # Get user plan from cache or database
         plan = await self._get_user_plan(api_key)
         
-        # Check concurrent request limit
-        concurrent_ok = await self._check_concurrent_limit(api_key, plan)
-        if not concurrent_ok:
-            raise HTTPException(
-                status_code=429,
-                detail="Too many concurrent requests",
-                headers={"Retry-After": "1"}
-            )
+        # Concurrency slot and every rate limit, checked atomically in one round trip
+        rate_limit_result = await self._check_rate_limits(api_key, plan, request.url.path)
         
-        try:
-            # Check rate limits
-            rate_limit_result = await self._check_rate_limits(api_key, plan, request.url.path)
-            
-            if not rate_limit_result["allowed"]:
-                # Build rate limit headers
-                headers = {
-                    "X-RateLimit-Limit": str(rate_limit_result["limit"]),
-                    "X-RateLimit-Remaining": "0",
-                    "X-RateLimit-Reset": str(rate_limit_result["reset"]),
-                    "Retry-After": str(rate_limit_result["retry_after"])
-                }
-                
+        if not rate_limit_result["allowed"]:
+            if rate_limit_result["failed"] == "concurrent":
                 raise HTTPException(
                     status_code=429,
-                    detail=rate_limit_result.get("message", "Rate limit exceeded"),
-                    headers=headers
+                    detail="Too many concurrent requests",
+                    headers={"Retry-After": "1"}
                 )
             
+            # Build rate limit headers
+            headers = {
+                "X-RateLimit-Limit": str(rate_limit_result["limit"]),
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(rate_limit_result["reset"]),
+                "Retry-After": str(rate_limit_result["retry_after"])
+            }
+            
+            raise HTTPException(
+                status_code=429,
+                detail=rate_limit_result.get("message", "Rate limit exceeded"),
+                headers=headers
+            )
+        
+        try:
             # Process request and add rate limit headers
             response = await call_next(request)
             
@@ -123,164 +242,85 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         return None
     
     async def _get_user_plan(self, api_key: str) -> str:
-        """Get user plan from cache or database."""
-        # Check cache first
-        cache_key = f"user_plan:{api_key}"
-        cached_plan = self.redis.get(cache_key)
-        if cached_plan:
-            return cached_plan
+        """Get user plan from the in-process cache, then Redis, then the database."""
+        plan = self.plan_cache.get(api_key)
+        if plan:
+            return plan
         
-        # TODO: Fetch from database
-        # For now, return default plan
-        plan = "starter"
+        # Shared cache across API servers
+        cache_key = f"user_plan:{api_key}"
+        plan = await self.redis.get(cache_key)
+        if not plan:
+            # TODO: Fetch from database
+            # For now, return default plan
+            plan = DEFAULT_PLAN
+            
+            # Cache for 5 minutes
+            await self.redis.set(cache_key, plan, ex=PLAN_CACHE_TTL)
         
-        # Cache for 5 minutes
-        self.redis.setex(cache_key, 300, plan)
+        if plan not in self.rate_limits:
+            plan = DEFAULT_PLAN
+        self.plan_cache.put(api_key, plan)
         return plan
     
-    async def _check_concurrent_limit(self, api_key: str, plan: str) -> bool:
-        """Check and acquire concurrent request slot."""
-        limit = self.rate_limits[plan]["concurrent_requests"]
-        key = f"concurrent:{api_key}"
-        
-        # Use Redis INCR with pipeline for atomicity
-        pipe = self.redis.pipeline()
-        pipe.incr(key)
-        pipe.expire(key, 60)  # Auto-cleanup after 1 minute
-        results = pipe.execute()
-        
-        current_count = results[0]
-        
-        if current_count > limit:
-            # Release the slot we just took
-            self.redis.decr(key)
-            return False
-        
-        return True
+    @staticmethod
+    def _keys(api_key: str) -> Dict[str, str]:
+        # {api_key} is a hash tag: all of a key's counters share a Redis Cluster slot, as the script needs
+        return {
+            "concurrent": f"concurrent:{{{api_key}}}",
+            "hour": f"rate_hour:{{{api_key}}}",
+            "day": f"rate_day:{{{api_key}}}",
+        }
+    
+    def _endpoint_limit(self, endpoint: str) -> Optional[Tuple[int, int]]:
+        """(limit, window seconds) for an endpoint with its own limit."""
+        endpoint_limit = self.endpoint_limits.get(endpoint)
+        if not endpoint_limit:
+            return None
+        if "requests_per_minute" in endpoint_limit:
+            return endpoint_limit["requests_per_minute"], 60
+        return endpoint_limit["requests_per_hour"], 3600
     
     async def _release_concurrent_slot(self, api_key: str):
         """Release concurrent request slot."""
-        key = f"concurrent:{api_key}"
-        self.redis.decr(key)
+        await self._release_script(keys=[self._keys(api_key)["concurrent"]])
     
     async def _check_rate_limits(self, api_key: str, plan: str, endpoint: str) -> Dict:
-        """Check multiple rate limits and return detailed result."""
+        """Check the concurrency slot and every rate limit; on success the slot and windows are taken."""
         plan_limits = self.rate_limits[plan]
         now = time.time()
+        keys = self._keys(api_key)
         
-        # Check hourly limit
-        hourly_result = await self._check_sliding_window(
-            f"rate_hour:{api_key}",
-            plan_limits["requests_per_hour"],
-            3600,
-            now
-        )
-        
-        if not hourly_result["allowed"]:
-            return {
-                "allowed": False,
-                "limit": plan_limits["requests_per_hour"],
-                "reset": hourly_result["reset"],
-                "retry_after": hourly_result["retry_after"],
-                "message": "Hourly rate limit exceeded",
-                "headers": self._build_headers(hourly_result, plan_limits["requests_per_hour"])
-            }
-        
-        # Check daily limit
-        daily_result = await self._check_sliding_window(
-            f"rate_day:{api_key}",
-            plan_limits["requests_per_day"],
-            86400,
-            now
-        )
-        
-        if not daily_result["allowed"]:
-            return {
-                "allowed": False,
-                "limit": plan_limits["requests_per_day"],
-                "reset": daily_result["reset"],
-                "retry_after": daily_result["retry_after"],
-                "message": "Daily rate limit exceeded",
-                "headers": self._build_headers(daily_result, plan_limits["requests_per_day"])
-            }
-        
-        # Check endpoint-specific limits
-        endpoint_limit = self.endpoint_limits.get(endpoint)
+        script_keys = [keys["concurrent"], keys["hour"], keys["day"]]
+        args = [now, f"{now}:{secrets.token_hex(4)}", plan_limits["concurrent_requests"], CONCURRENT_SLOT_TTL,
+                plan_limits["requests_per_hour"], plan_limits["requests_per_day"]]
+        endpoint_limit = self._endpoint_limit(endpoint)
         if endpoint_limit:
-            endpoint_result = await self._check_sliding_window(
-                f"rate_endpoint:{api_key}:{endpoint}",
-                endpoint_limit.get("requests_per_minute", float('inf')),
-                60,
-                now
-            )
-            
-            if not endpoint_result["allowed"]:
-                return {
-                    "allowed": False,
-                    "limit": endpoint_limit["requests_per_minute"],
-                    "reset": endpoint_result["reset"],
-                    "retry_after": endpoint_result["retry_after"],
-                    "message": f"Endpoint rate limit exceeded for {endpoint}",
-                    "headers": self._build_headers(endpoint_result, endpoint_limit["requests_per_minute"])
-                }
-        
-        # All checks passed - return the most restrictive remaining limit
-        return {
-            "allowed": True,
-            "headers": self._build_headers(hourly_result, plan_limits["requests_per_hour"])
+            script_keys.append(f"rate_endpoint:{{{api_key}}}:{endpoint}")
+            args.extend(endpoint_limit)
+        
+        allowed, failed, limit, remaining, reset, retry_after = await self._limit_script(keys=script_keys, args=args)
+        result = {"remaining": int(remaining), "reset": int(reset), "retry_after": int(retry_after)}
+        
+        if allowed:
+            # The hourly window is reported in the headers
+            return {"allowed": True, "headers": self._build_headers(result, int(limit))}
+        
+        failed = LIMIT_NAMES[int(failed)]
+        messages = {
+            "concurrent": "Too many concurrent requests",
+            "hourly": "Hourly rate limit exceeded",
+            "daily": "Daily rate limit exceeded",
+            "endpoint": f"Endpoint rate limit exceeded for {endpoint}",
         }
-    
-    async def _check_sliding_window(self, key: str, limit: int, window: int, 
-                                  now: float) -> Dict:
-        """Check rate limit using sliding window algorithm."""
-        # Use Redis sorted set for sliding window
-        pipe = self.redis.pipeline()
-        
-        # Remove old entries outside the window
-        pipe.zremrangebyscore(key, 0, now - window)
-        
-        # Count requests in current window
-        pipe.zcard(key)
-        
-        # Get oldest request timestamp for retry-after calculation
-        pipe.zrange(key, 0, 0, withscores=True)
-        
-        results = pipe.execute()
-        current_count = results[1]
-        oldest_request = results[2]
-        
-        if current_count >= limit:
-            # Calculate retry-after based on oldest request
-            if oldest_request:
-                oldest_timestamp = oldest_request[0][1]
-                retry_after = int(oldest_timestamp + window - now)
-                reset_time = int(oldest_timestamp + window)
-            else:
-                retry_after = window
-                reset_time = int(now + window)
-            
-            return {
-                "allowed": False,
-                "remaining": 0,
-                "reset": reset_time,
-                "retry_after": max(1, retry_after)
-            }
-        
-        # Add current request
-        self.redis.zadd(key, {str(now): now})
-        self.redis.expire(key, window + 1)
-        
-        # Calculate reset time
-        if oldest_request:
-            reset_time = int(oldest_request[0][1] + window)
-        else:
-            reset_time = int(now + window)
-        
         return {
-            "allowed": True,
-            "remaining": limit - current_count - 1,
-            "reset": reset_time,
-            "retry_after": 0
+            "allowed": False,
+            "failed": failed,
+            "limit": int(limit),
+            "reset": result["reset"],
+            "retry_after": result["retry_after"],
+            "message": messages[failed],
+            "headers": self._build_headers(result, int(limit))
         }
     
     def _build_headers(self, result: Dict, limit: int) -> Dict[str, str]:
@@ -337,8 +377,8 @@ class DistributedRateLimiter:
         return {1, limit - current_count - 1, reset_time}
         """
         
-        # Load script into Redis
-        self.script_sha = self.redis.script_load(self.lua_script)
+        # Loaded into Redis on first use (EVALSHA, falling back to EVAL after a flush)
+        self._script = self.redis.register_script(self.lua_script)
     
     def check_limit(self, key: str, limit: int, window: int) -> Tuple[bool, int, int]:
         """
@@ -350,23 +390,8 @@ class DistributedRateLimiter:
         current_time = time.time()
         identifier = f"{current_time}:{os.getpid()}:{id(self)}"
         
-        try:
-            result = self.redis.evalsha(
-                self.script_sha,
-                1,
-                key,
-                limit,
-                window,
-                current_time,
-                identifier
-            )
-            
-            return bool(result[0]), int(result[1]), int(result[2])
-            
-        except redis.NoScriptError:
-            # Script was flushed, reload it
-            self.script_sha = self.redis.script_load(self.lua_script)
-            return self.check_limit(key, limit, window)
+        result = self._script(keys=[key], args=[limit, window, current_time, identifier])
+        return bool(result[0]), int(result[1]), int(result[2])
 
 # Token bucket rate limiter for burst handling
 class TokenBucketRateLimiter:
@@ -404,7 +429,7 @@ class TokenBucketRateLimiter:
         end
         """
         
-        self.script_sha = self.redis.script_load(self.lua_script)
+        self._script = self.redis.register_script(self.lua_script)
     
     def consume_tokens(self, key: str, capacity: int, refill_rate: float, 
                       tokens_requested: int = 1) -> Tuple[bool, float]:
@@ -420,22 +445,8 @@ class TokenBucketRateLimiter:
         Returns:
             tuple: (allowed, remaining_tokens)
         """
-        try:
-            result = self.redis.evalsha(
-                self.script_sha,
-                1,
-                key,
-                capacity,
-                refill_rate,
-                time.time(),
-                tokens_requested
-            )
-            
-            return bool(result[0]), float(result[1])
-            
-        except redis.NoScriptError:
-            self.script_sha = self.redis.script_load(self.lua_script)
-            return self.consume_tokens(key, capacity, refill_rate, tokens_requested)
+        result = self._script(keys=[key], args=[capacity, refill_rate, time.time(), tokens_requested])
+        return bool(result[0]), float(result[1])
 
 # Rate limit decorator for specific endpoints
 def rate_limit(requests_per_minute: int = 60):
@@ -452,7 +463,7 @@ def rate_limit(requests_per_minute: int = 60):
             
             if request:
                 # Apply rate limiting logic
-                limiter = DistributedRateLimiter(redis_client)
+                limiter = distributed_limiter
                 
                 # Get API key or IP for rate limiting
                 api_key = request.headers.get("Authorization", "").replace("Bearer ", "")
@@ -485,4 +496,4 @@ def rate_limit(requests_per_minute: int = 60):
 
 # Initialize global instances
 distributed_limiter = DistributedRateLimiter(redis_client)
-token_bucket_limiter = TokenBucketRateLimiter(redis_client)
\ No newline at end of file
+token_bucket_limiter = TokenBucketRateLimiter(redis_client)
\ No newline at end of file
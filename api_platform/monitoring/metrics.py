@@ -1,6 +1,10 @@
 """
 Comprehensive monitoring and observability for Commission Intelligence Platform
 Includes Prometheus metrics, OpenTelemetry tracing, and structured logging
+
+API request metrics go through request_metrics.RequestMetrics: route
+template labels, in-process latency histograms read at scrape time,
+sampled logs and a bounded export queue for OTel records and log lines.
 """
 import os
 import time
@@ -18,11 +22,17 @@ from opentelemetry.sdk.resources import Resource
 from opentelemetry.semconv.resource import ResourceAttributes
 import structlog
 from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
 import redis
 import asyncio
 import aiohttp
 
+from .request_metrics import (
+    SLOW_REQUEST,
+    RequestMetrics,
+    RequestMetricsCollector,
+    route_template,
+)
+
 # Configure structured logging
 structlog.configure(
     processors=[
@@ -46,21 +56,10 @@ logger = structlog.get_logger()
 # Create custom registry for Prometheus metrics
 registry = CollectorRegistry()
 
-# API Metrics
-api_requests_total = Counter(
-    'api_requests_total',
-    'Total API requests',
-    ['method', 'endpoint', 'status', 'plan'],
-    registry=registry
-)
-
-api_request_duration = Histogram(
-    'api_request_duration_seconds',
-    'API request duration in seconds',
-    ['method', 'endpoint'],
-    buckets=[0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0],
-    registry=registry
-)
+# API Metrics - api_requests_total and api_request_duration_seconds are
+# collected from the in-process histograms at scrape time
+request_metrics = RequestMetrics()
+registry.register(RequestMetricsCollector(request_metrics))
 
 active_connections = Gauge(
     'active_api_connections',
@@ -192,50 +191,47 @@ class MonitoringService:
             name="active_users",
             description="Number of active users"
         )
+        
+        # OTel records and log lines are written off the request path
+        self.request_metrics = request_metrics
+        self.request_metrics.start_export({
+            "latency": self._export_latency,
+            "log": self._export_request_log,
+        })
     
     def track_api_request(self, method: str, endpoint: str, status: int, 
                          duration: float, user_id: Optional[str] = None,
                          plan: str = "unknown"):
-        """Track API request metrics."""
-        # Prometheus metrics
-        api_requests_total.labels(
-            method=method, 
-            endpoint=endpoint, 
-            status=status,
-            plan=plan
-        ).inc()
-        
-        api_request_duration.labels(
-            method=method, 
-            endpoint=endpoint
-        ).observe(duration)
-        
-        # Structured logging
+        """Track API request metrics (endpoint should be the route template, not the raw path)."""
+        self.request_metrics.record(method, endpoint, status, duration, user_id=user_id, plan=plan)
+    
+    def _export_latency(self, request: Dict[str, Any]):
+        self.api_latency.record(
+            request["duration"] * 1000,
+            {"method": request["method"], "endpoint": request["endpoint"], "status": str(request["status"])}
+        )
+    
+    def _export_request_log(self, request: Dict[str, Any]):
+        # Structured logging (fast 2xx requests are sampled)
         logger.info(
             "api_request",
-            method=method,
-            endpoint=endpoint,
-            status=status,
-            duration_ms=duration * 1000,
-            user_id=user_id,
-            plan=plan,
+            method=request["method"],
+            endpoint=request["endpoint"],
+            status=request["status"],
+            duration_ms=request["duration"] * 1000,
+            user_id=request["user_id"],
+            plan=request["plan"],
             timestamp=datetime.utcnow().isoformat()
         )
         
-        # OpenTelemetry metrics
-        self.api_latency.record(
-            duration * 1000,
-            {"method": method, "endpoint": endpoint, "status": str(status)}
-        )
-        
         # Track slow requests
-        if duration > 1.0:
+        if request["duration"] > SLOW_REQUEST:
             logger.warning(
                 "slow_api_request",
-                method=method,
-                endpoint=endpoint,
-                duration_ms=duration * 1000,
-                user_id=user_id
+                method=request["method"],
+                endpoint=request["endpoint"],
+                duration_ms=request["duration"] * 1000,
+                user_id=request["user_id"]
             )
     
     def track_commission_calculation(self, policy_type: str, transaction_type: str,
@@ -351,85 +347,94 @@ class MonitoringService:
             limit_type=limit_type
         )
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    """Middleware to automatically track request metrics."""
+class MetricsMiddleware:
+    """
+    Middleware to automatically track request metrics.
+    
+    Plain ASGI rather than BaseHTTPMiddleware, which costs a task and a
+    response stream per request; metrics are labelled with the matched
+    route template, known once the router has run.
+    """
     
     def __init__(self, app, monitoring_service: MonitoringService):
-        super().__init__(app)
+        self.app = app
         self.monitoring = monitoring_service
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope, receive, send):
         """Track metrics for each request."""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         # Track active connections
         active_connections.inc()
         
         # Start timing
-        start_time = time.time()
+        start_time = time.perf_counter()
+        method = scope["method"]
+        status = 500
         
-        # Create span for distributed tracing
-        with self.monitoring.tracer.start_as_current_span(
-            f"{request.method} {request.url.path}"
-        ) as span:
-            span.set_attribute("http.method", request.method)
-            span.set_attribute("http.url", str(request.url))
-            span.set_attribute("http.scheme", request.url.scheme)
+        # Create span for distributed tracing (renamed to the route template below)
+        with self.monitoring.tracer.start_as_current_span(f"{method} {scope['path']}") as span:
+            span.set_attribute("http.method", method)
+            span.set_attribute("http.target", scope["path"])
+            span.set_attribute("http.scheme", scope.get("scheme", "http"))
+            
+            async def send_with_headers(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    duration = time.perf_counter() - start_time
+                    # Add response headers
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-request-id",
+                                    span.get_span_context().trace_id.to_bytes(16, 'big').hex().encode()))
+                    headers.append((b"x-response-time", f"{duration * 1000:.2f}ms".encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
             
             try:
                 # Process request
-                response = await call_next(request)
-                
-                # Calculate duration
-                duration = time.time() - start_time
-                
-                # Extract user info if available
-                user_id = request.state.__dict__.get("user_id")
-                plan = request.state.__dict__.get("plan", "unknown")
-                
-                # Track metrics
-                self.monitoring.track_api_request(
-                    method=request.method,
-                    endpoint=request.url.path,
-                    status=response.status_code,
-                    duration=duration,
-                    user_id=user_id,
-                    plan=plan
-                )
-                
-                # Add response headers
-                response.headers["X-Request-ID"] = span.get_span_context().trace_id.to_bytes(16, 'big').hex()
-                response.headers["X-Response-Time"] = f"{duration * 1000:.2f}ms"
-                
-                # Update span
-                span.set_attribute("http.status_code", response.status_code)
-                
-                return response
+                await self.app(scope, receive, send_with_headers)
                 
             except Exception as e:
-                duration = time.time() - start_time
-                
-                # Track error
-                self.monitoring.track_api_request(
-                    method=request.method,
-                    endpoint=request.url.path,
-                    status=500,
-                    duration=duration
-                )
+                status = 500
                 
                 # Update span
                 span.record_exception(e)
-                span.set_attribute("http.status_code", 500)
                 
                 logger.error(
                     "request_error",
-                    method=request.method,
-                    endpoint=request.url.path,
+                    method=method,
+                    endpoint=route_template(scope),
                     error=str(e),
-                    duration_ms=duration * 1000
+                    duration_ms=(time.perf_counter() - start_time) * 1000
                 )
                 
                 raise
                 
             finally:
+                duration = time.perf_counter() - start_time
+                route = route_template(scope)
+                
+                # Extract user info if available
+                state = scope.get("state") or {}
+                
+                # Track metrics
+                self.monitoring.track_api_request(
+                    method=method,
+                    endpoint=route,
+                    status=status,
+                    duration=duration,
+                    user_id=state.get("user_id"),
+                    plan=state.get("plan", "unknown")
+                )
+                
+                # Update span
+                span.update_name(f"{method} {route}")
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.status_code", status)
+                
                 # Decrement active connections
                 active_connections.dec()
 
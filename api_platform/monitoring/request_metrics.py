@@ -0,0 +1,218 @@
+"""
+Request metrics pipeline with a fixed per-request cost
+- labels: the matched route template (/v1/policies/{policy_id}), never the
+  raw path, and at most max_series label sets; anything past that is
+  counted under "other"
+- latency: pre-bucketed histograms kept in-process; Prometheus reads them
+  at scrape time (RequestMetricsCollector), so a request only bumps two
+  integers and a float
+- logs: errors, non-2xx and slow requests are always logged, fast 2xx
+  requests only at log_sample_rate
+- export: OTel records and log lines go through a bounded queue drained
+  by a background thread; when the queue is full the event is dropped
+  and counted, so peak load can't grow the request-path cost. Prometheus
+  data is never dropped.
+
+Standard library only; prometheus_client is needed just for the collector.
+"""
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+UNMATCHED_ROUTE = "unmatched"  # 404s and requests no route handled
+OTHER = "other"
+
+LOG_SAMPLE_RATE = float(os.getenv("API_LOG_SAMPLE_RATE", "0.01"))
+LOG_ALWAYS_ABOVE = 0.25  # seconds; slower 2xx requests are always logged
+SLOW_REQUEST = 1.0  # seconds; logged as slow_api_request
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """The matched route's path template, once the router has run."""
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if path:
+        return scope.get("root_path", "") + path
+    return UNMATCHED_ROUTE
+
+
+class LatencyHistograms:
+    """Per label set: request count, latency sum and bucket counts."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, max_series: int = 2000):
+        self.buckets = tuple(sorted(buckets))
+        self.max_series = max_series
+        self._series: Dict[Tuple, List] = {}
+        self._lock = threading.Lock()
+        self.overflowed = 0
+
+    def observe(self, labels: Tuple, seconds: float):
+        index = bisect_left(self.buckets, seconds)  # le semantics: a value on a bound falls in that bucket
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                if len(self._series) >= self.max_series:
+                    self.overflowed += 1
+                    labels = (OTHER,) * len(labels)
+                    series = self._series.get(labels)
+                if series is None:
+                    series = self._series[labels] = [0, 0.0, [0] * (len(self.buckets) + 1)]
+            series[0] += 1
+            series[1] += seconds
+            series[2][index] += 1
+
+    def snapshot(self) -> Dict[Tuple, Tuple[int, float, List[int]]]:
+        with self._lock:
+            return {labels: (count, total, list(counts)) for labels, (count, total, counts) in self._series.items()}
+
+    def __len__(self):
+        return len(self._series)
+
+
+class ExportQueue:
+    """Bounded FIFO of export events; put() never blocks, it drops when full."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._events = deque()
+        self.stats = {"queued": 0, "dropped": 0, "exported": 0, "export_errors": 0}
+
+    def put(self, event) -> bool:
+        if len(self._events) >= self.maxsize:
+            self.stats["dropped"] += 1
+            return False
+        self._events.append(event)
+        self.stats["queued"] += 1
+        return True
+
+    def drain(self, max_items: int) -> List:
+        events = []
+        try:
+            for _ in range(max_items):
+                events.append(self._events.popleft())
+        except IndexError:
+            pass
+        return events
+
+    def __len__(self):
+        return len(self._events)
+
+
+class ExportWorker(threading.Thread):
+    """Background thread handing queued events to the sinks, at most max_batch per interval."""
+
+    def __init__(self, queue: ExportQueue, sinks: Dict[str, Callable[[Dict], None]],
+                 interval: float = 0.5, max_batch: int = 5000):
+        super().__init__(name="request-metrics-export", daemon=True)
+        self.queue = queue
+        self.sinks = sinks
+        self.interval = interval
+        self.max_batch = max_batch
+        self._stop_event = threading.Event()
+
+    def export_pending(self) -> int:
+        events = self.queue.drain(self.max_batch)
+        for kind, fields in events:
+            sink = self.sinks.get(kind)
+            if sink is None:
+                continue
+            try:
+                sink(fields)
+                self.queue.stats["exported"] += 1
+            except Exception:
+                self.queue.stats["export_errors"] += 1
+        return len(events)
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.export_pending()
+        self.export_pending()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+class RequestMetrics:
+    """What the middleware calls once per request."""
+
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS, max_series: int = 2000,
+                 queue_size: int = 10000, log_sample_rate: float = LOG_SAMPLE_RATE,
+                 random_fn: Callable[[], float] = random.random):
+        self.histograms = LatencyHistograms(buckets, max_series)
+        self.queue = ExportQueue(queue_size)
+        self.log_sample_rate = log_sample_rate
+        self._random = random_fn
+        self.worker: Optional[ExportWorker] = None
+
+    def record(self, method: str, route: str, status: int, duration: float,
+               user_id: Optional[str] = None, plan: str = "unknown"):
+        method = method if method in METHODS else OTHER
+        self.histograms.observe((method, route, str(status), plan), duration)
+
+        fields = {"method": method, "endpoint": route, "status": status, "duration": duration,
+                  "user_id": user_id, "plan": plan}
+        self.queue.put(("latency", fields))
+        if status >= 300 or duration >= LOG_ALWAYS_ABOVE or self._random() < self.log_sample_rate:
+            self.queue.put(("log", fields))
+
+    def start_export(self, sinks: Dict[str, Callable[[Dict], None]], **worker_options) -> ExportWorker:
+        """Start the background exporter ('latency' and 'log' events go to the matching sink)."""
+        if self.worker is None or not self.worker.is_alive():
+            self.worker = ExportWorker(self.queue, sinks, **worker_options)
+            self.worker.start()
+        return self.worker
+
+    def stop_export(self):
+        if self.worker is not None:
+            self.worker.stop()
+
+
+class RequestMetricsCollector:
+    """Prometheus collector reading RequestMetrics at scrape time."""
+
+    def __init__(self, request_metrics: RequestMetrics):
+        self.metrics = request_metrics
+
+    def collect(self):
+        from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+        snapshot = self.metrics.histograms.snapshot()
+        buckets = self.metrics.histograms.buckets
+
+        requests = CounterMetricFamily('api_requests_total', 'Total API requests',
+                                       labels=['method', 'endpoint', 'status', 'plan'])
+        durations: Dict[Tuple[str, str], List] = {}
+        for (method, endpoint, status, plan), (count, total, counts) in snapshot.items():
+            requests.add_metric([method, endpoint, status, plan], count)
+            merged = durations.setdefault((method, endpoint), [0.0, [0] * len(counts)])
+            merged[0] += total
+            merged[1] = [a + b for a, b in zip(merged[1], counts)]
+        yield requests
+
+        duration = HistogramMetricFamily('api_request_duration_seconds', 'API request duration in seconds',
+                                         labels=['method', 'endpoint'])
+        for (method, endpoint), (total, counts) in durations.items():
+            cumulative, running = [], 0
+            for bound, count in zip(list(buckets) + [float('inf')], counts):
+                running += count
+                cumulative.append(('+Inf' if bound == float('inf') else str(bound), running))
+            duration.add_metric([method, endpoint], cumulative, total)
+        yield duration
+
+        dropped = CounterMetricFamily('api_metrics_export_dropped_total',
+                                      'Request events dropped because the export queue was full')
+        dropped.add_metric([], self.metrics.queue.stats['dropped'])
+        yield dropped
+
+        queued = GaugeMetricFamily('api_metrics_export_queue_size', 'Request events waiting for export')
+        queued.add_metric([], len(self.metrics.queue))
+        yield queued
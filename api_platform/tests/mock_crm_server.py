@@ -0,0 +1,136 @@
+"""
+Local mock CRM server for the sync engine tests.
+
+Serves the parts of the EZLynx (/v2/policies, numbered pages) and HubSpot
+(/crm/v3/objects/contacts/search, cursor pages) APIs the integrations use,
+from in-memory records. It records every request, the highest number of
+requests in flight and the client connections seen, and can answer the
+next requests with an error status to exercise retries.
+
+Run standalone: python mock_crm_server.py [--records 5000] [--port 8765]
+and point an integration at it with config base_url
+(http://127.0.0.1:8765/v2 for EZLynx, http://127.0.0.1:8765 for HubSpot).
+"""
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _iso(moment: datetime) -> str:
+    return moment.isoformat().replace("+00:00", "Z")
+
+
+def _parse(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class MockCRM:
+    """In-memory EZLynx policies and HubSpot contacts behind one aiohttp app."""
+
+    def __init__(self, records: int = 0, search_limit: int = 10000, latency: float = 0.0):
+        self.policies = {}
+        self.contacts = {}
+        self.search_limit = search_limit
+        self.latency = latency
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.peers = set()
+        self.fail_next = []  # statuses to answer the next requests with
+        for i in range(records):
+            self.add_record(i, START + timedelta(minutes=i))
+
+    def add_record(self, i: int, modified: datetime, policy_number: str = None):
+        """One EZLynx policy and one HubSpot contact with the same id."""
+        policy_number = policy_number or f"POL-{i:06d}"
+        self.policies[str(i)] = {
+            "id": str(i), "policyNumber": policy_number, "insuredName": f"Insured {i}",
+            "effectiveDate": "2026-01-01", "expirationDate": "2027-01-01",
+            "premium": 1000 + i, "lineOfBusiness": "AUTO", "carrierName": "Carrier",
+            "agentCode": "A1", "commissionRate": 10, "modifiedDate": _iso(modified),
+        }
+        self.contacts[str(i)] = {
+            "id": str(i), "updatedAt": _iso(modified),
+            "properties": {
+                "firstname": "Insured", "lastname": str(i), "email": f"insured{i}@example.com",
+                "insurance_policy_number": policy_number, "insurance_carrier": "Carrier",
+                "insurance_premium": str(1000 + i), "insurance_effective_date": "2026-01-01",
+                "insurance_expiration_date": "2027-01-01", "lastmodifieddate": _iso(modified),
+            },
+        }
+
+    def touch(self, ids, modified: datetime):
+        """Mark records as changed at `modified`."""
+        for i in ids:
+            self.policies[str(i)]["modifiedDate"] = _iso(modified)
+            self.policies[str(i)]["premium"] += 1
+            self.contacts[str(i)]["properties"]["lastmodifieddate"] = _iso(modified)
+
+    @web.middleware
+    async def _track(self, request, handler):
+        self.requests.append((request.method, request.path, dict(request.query)))
+        self.peers.add(request.transport.get_extra_info("peername") if request.transport else None)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.fail_next:
+                status = self.fail_next.pop(0)
+                return web.json_response({"message": "mock failure"}, status=status,
+                                         headers={"Retry-After": "0"} if status == 429 else None)
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    async def ezlynx_policies(self, request):
+        since = _parse(request.query["modifiedSince"])
+        page_size = int(request.query.get("pageSize", 100))
+        page_number = int(request.query.get("pageNumber", 1))
+        matching = sorted((p for p in self.policies.values() if _parse(p["modifiedDate"]) >= since),
+                          key=lambda p: int(p["id"]))
+        start = (page_number - 1) * page_size
+        return web.json_response({"policies": matching[start:start + page_size], "totalCount": len(matching)})
+
+    async def hubspot_search(self, request):
+        body = await request.json()
+        filters = body["filterGroups"][0]["filters"]
+        since = next((datetime.fromtimestamp(int(f["value"]) / 1000, timezone.utc)
+                      for f in filters if f["propertyName"] == "lastmodifieddate"), None)
+        matching = sorted(
+            (c for c in self.contacts.values()
+             if c["properties"].get("insurance_policy_number")
+             and (since is None or _parse(c["properties"]["lastmodifieddate"]) >= since)),
+            key=lambda c: (c["properties"]["lastmodifieddate"], int(c["id"])))
+        after = int(body.get("after") or 0)
+        limit = body.get("limit", 10)
+        if after + limit > self.search_limit:
+            return web.json_response({"message": "search result limit reached"}, status=400)
+        response = {"total": len(matching), "results": matching[after:after + limit]}
+        if after + limit < len(matching):
+            response["paging"] = {"next": {"after": str(after + limit)}}
+        return web.json_response(response)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._track])
+        app.router.add_get("/v2/policies", self.ezlynx_policies)
+        app.router.add_post("/crm/v3/objects/contacts/search", self.hubspot_search)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve mock EZLynx and HubSpot APIs")
+    parser.add_argument("--records", type=int, default=5000, help="Policies/contacts to serve")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds added to every response")
+    args = parser.parse_args()
+    web.run_app(MockCRM(args.records, latency=args.latency).app(), host="127.0.0.1", port=args.port)
+
+
+if __name__ == "__main__":
+    main()
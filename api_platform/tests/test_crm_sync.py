@@ -0,0 +1,198 @@
+"""
+Tests for the incremental CRM sync engine against a local mock CRM server
+(mock_crm_server.py): paging, incremental watermarks, retries and the
+bulk upsert into policies.
+
+Run with: pytest test_crm_sync.py
+"""
+import asyncio
+import os
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, os.path.dirname(os.path.dirname(TESTS_DIR)))
+from fake_supabase import FakeSupabase  # noqa: E402
+from integrations.ezlynx_integration import EZLynxIntegration  # noqa: E402
+from integrations.hubspot_integration import HubSpotIntegration  # noqa: E402
+from integrations.sync_engine import HISTORY_TABLE, SyncEngine  # noqa: E402
+from mock_crm_server import START, MockCRM  # noqa: E402
+
+USER = "agent@example.com"
+USER_ID = "user-1"
+CREDENTIALS = {"api_key": "test-key", "username": "agent", "password": "secret"}
+
+
+def run_sync(crm, integration_class, supabase, base_path="", full=False, since_date=None, **config):
+    async def sync():
+        async with TestServer(crm.app()) as server:
+            config.setdefault("backoff_seconds", 0)
+            base_url = f"{server.make_url('')}{base_path}".rstrip("/")
+            integration = integration_class(USER, {**CREDENTIALS, "base_url": base_url, **config})
+            engine = SyncEngine(integration, supabase=supabase, batch_size=config.get("batch_size", 500),
+                                user_id=USER_ID)
+            return await engine.run(full=full, since_date=since_date)
+    return asyncio.run(sync())
+
+
+def sync_ezlynx(crm, supabase, **config):
+    config.setdefault("page_size", 100)
+    return run_sync(crm, EZLynxIntegration, supabase, base_path="/v2", **config)
+
+
+def test_ezlynx_pages_fetched_concurrently_over_one_session():
+    crm = MockCRM(records=1050, latency=0.01)
+    supabase = FakeSupabase()
+    stats = sync_ezlynx(crm, supabase, since_date=START, max_connections=4, batch_size=200)
+
+    assert stats["status"] == "success"
+    assert (stats["pages"], stats["rows_fetched"], stats["rows_upserted"]) == (11, 1050, 1050)
+    assert 1 < crm.max_in_flight <= 4
+    assert len(crm.peers) <= 4  # keep-alive connections reused across pages
+    assert len(supabase.calls_to("policies", "upsert")) == 6  # batches of 200
+
+    policy = next(p for p in supabase.tables["policies"] if p["external_id"] == "ezlynx_7")
+    assert (policy["Policy Number"], policy["Premium Sold"], policy["user_email"]) == ("POL-000007", 1007, USER)
+    assert policy["user_id"] == USER_ID  # load_policies_data filters on user_id
+    assert policy["Agent Estimated Comm $"] == pytest.approx(100.7)
+    assert policy["integration_metadata"]["agent_id"] == "A1"
+
+
+def test_incremental_sync_pulls_only_changes_since_watermark():
+    crm = MockCRM(records=300)
+    supabase = FakeSupabase()
+    first = sync_ezlynx(crm, supabase, since_date=START)
+    assert first["watermark"] == (START + timedelta(minutes=299)).isoformat()
+
+    changed_at = START + timedelta(days=1)
+    crm.touch([3, 150], changed_at)
+    crm.requests.clear()
+    second = sync_ezlynx(crm, supabase)
+
+    assert crm.requests[0][2]["modifiedSince"] == first["watermark"]
+    assert (second["rows_fetched"], second["rows_upserted"]) == (3, 3)  # the old newest record + 2 changes
+    assert second["watermark"] == changed_at.isoformat()
+    assert len(supabase.tables["policies"]) == 300  # updated in place
+    assert next(p for p in supabase.tables["policies"] if p["external_id"] == "ezlynx_3")["Premium Sold"] == 1004
+
+    history = supabase.tables[HISTORY_TABLE]
+    assert [h["status"] for h in history] == ["success", "success"]
+    assert history[-1]["since"] == first["watermark"]
+    assert history[-1]["rows_per_second"] > 0 and history[-1]["lag_seconds"] > 0
+
+
+def test_records_changed_during_the_run_keep_the_previous_watermark():
+    crm = MockCRM(records=50)
+    supabase = FakeSupabase()
+    first = sync_ezlynx(crm, supabase, since_date=START)
+
+    crm.touch([7], START + timedelta(days=1))
+    crm.touch([20], datetime.now(timezone.utc) + timedelta(hours=1))  # modified after the run started
+    second = sync_ezlynx(crm, supabase)
+    assert second["rows_changed_during_sync"] == 1
+    assert second["watermark"] == first["watermark"]  # pages may have shifted: re-read the window
+
+    crm.requests.clear()
+    sync_ezlynx(crm, supabase)
+    assert crm.requests[0][2]["modifiedSince"] == first["watermark"]
+
+
+def test_rate_limits_are_retried_and_client_errors_fail_the_run():
+    crm = MockCRM(records=150)
+    supabase = FakeSupabase()
+    crm.fail_next = [429, 503]
+    stats = sync_ezlynx(crm, supabase, since_date=START)
+    assert (stats["status"], stats["rows_upserted"]) == ("success", 150)
+    assert len(crm.requests) == 4  # 2 retried + 2 pages
+
+    crm.touch([1], START + timedelta(days=2))
+    crm.fail_next = [401]
+    failed = sync_ezlynx(crm, supabase)
+    assert failed["status"] == "failed" and "401" in failed["error"]
+    assert failed["watermark"] == stats["watermark"]  # the next run repeats this window
+    assert supabase.tables[HISTORY_TABLE][-1]["error_message"] == failed["error"]
+
+
+def test_new_policies_get_transaction_id_and_type_existing_keep_theirs():
+    crm = MockCRM(records=120)
+    supabase = FakeSupabase()
+    sync_ezlynx(crm, supabase, since_date=START)
+
+    policies = supabase.tables["policies"]
+    transaction_ids = {p["external_id"]: p["Transaction ID"] for p in policies}
+    assert len(set(transaction_ids.values())) == 120
+    assert all(re.fullmatch(r"[A-Z0-9]{7}", t) for t in transaction_ids.values())
+    assert {p["Transaction Type"] for p in policies} == {"NEW"}
+
+    edited = next(p for p in policies if p["external_id"] == "ezlynx_4")
+    edited["Transaction Type"] = "RWL"
+    crm.touch([4], START + timedelta(days=1))
+    crm.add_record(500, START + timedelta(days=1))
+    supabase.calls.clear()
+    stats = sync_ezlynx(crm, supabase)
+
+    assert stats["rows_upserted"] == 3  # the old newest record, the change and the new policy
+    assert len(supabase.calls_to("policies", "upsert")) == 2  # existing and new rows apart
+    assert {p["external_id"]: p["Transaction ID"] for p in policies if p["external_id"] != "ezlynx_500"} == transaction_ids
+    assert (edited["Transaction Type"], edited["Premium Sold"]) == ("RWL", 1005)
+    added = next(p for p in policies if p["external_id"] == "ezlynx_500")
+    assert added["Transaction Type"] == "NEW" and added["Transaction ID"] not in transaction_ids.values()
+
+
+def test_records_missing_a_field_keep_the_stored_value():
+    crm = MockCRM(records=2)
+    supabase = FakeSupabase()
+    sync_ezlynx(crm, supabase, since_date=START)
+    stored = {p["external_id"]: p for p in supabase.tables["policies"]}
+    assert stored["ezlynx_1"]["Agent Estimated Comm $"] == pytest.approx(100.1)
+
+    del crm.policies["1"]["commissionRate"]  # no rate - no commission field mapped
+    crm.touch([0, 1], START + timedelta(days=1))
+    supabase.calls.clear()
+    stats = sync_ezlynx(crm, supabase)
+
+    assert stats["rows_upserted"] == 2
+    assert len(supabase.calls_to("policies", "upsert")) == 2  # one statement per set of columns
+    assert stored["ezlynx_1"]["Premium Sold"] == 1002
+    assert stored["ezlynx_1"]["Agent Estimated Comm $"] == pytest.approx(100.1)
+    assert stored["ezlynx_0"]["Agent Estimated Comm $"] == pytest.approx(100.1)
+
+
+class SmallSearchHubSpot(HubSpotIntegration):
+    SEARCH_RESULT_LIMIT = 100
+
+
+def test_hubspot_cursor_paging_restarts_at_the_search_limit():
+    crm = MockCRM(records=250, search_limit=SmallSearchHubSpot.SEARCH_RESULT_LIMIT)
+    crm.add_record(999, START, policy_number="")  # no policy number - filtered by the search
+    crm.contacts["999"]["properties"]["insurance_policy_number"] = None
+    supabase = FakeSupabase()
+    stats = run_sync(crm, SmallSearchHubSpot, supabase, full=True, page_size=40)
+
+    assert stats["status"] == "success"
+    assert len({p["external_id"] for p in supabase.tables["policies"]}) == 250
+    searches = [r for r in crm.requests if r[1].endswith("/search")]
+    assert len(searches) > 250 // 40
+    contact = next(p for p in supabase.tables["policies"] if p["external_id"] == "hubspot_5")
+    assert (contact["Customer"], contact["Premium Sold"]) == ("Insured 5", 1005.0)
+    assert contact["integration_metadata"]["email"] == "insured5@example.com"
+
+
+def test_sync_policies_still_returns_mapped_list():
+    crm = MockCRM(records=120)
+
+    async def sync():
+        async with TestServer(crm.app()) as server:
+            async with EZLynxIntegration(USER, {**CREDENTIALS, "base_url": str(server.make_url("/v2"))}) as integration:
+                return await integration.sync_policies(START)
+
+    policies = asyncio.run(sync())
+    assert sorted(p["external_id"] for p in policies)[:2] == ["ezlynx_0", "ezlynx_1"]
+    assert len(policies) == 120
@@ -0,0 +1,146 @@
+"""
+Tests for the rate limiting middleware: the single-script limit check
+against a fake Redis (fakeredis with Lua support).
+
+Requires: pip install fakeredis[lua]
+Run with: pytest test_rate_limiting.py
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from middleware.rate_limiting import PlanCache, RateLimitMiddleware  # noqa: E402
+
+
+class CountingRedis(fakeredis.FakeAsyncRedis):
+    """Fake async Redis that counts commands sent (one per round trip here - no pipelines)."""
+
+    commands = 0
+
+    async def execute_command(self, *args, **options):
+        type(self).commands += 1
+        return await super().execute_command(*args, **options)
+
+
+@pytest.fixture
+def limiter():
+    CountingRedis.commands = 0
+    middleware = RateLimitMiddleware(FastAPI(), redis_client=CountingRedis(decode_responses=True))
+    middleware.rate_limits["free"].update(requests_per_hour=5, concurrent_requests=3)
+    return middleware
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_concurrent_requests_never_exceed_the_limit(limiter):
+    async def burst():
+        results = await asyncio.gather(*[limiter._check_rate_limits("key", "free", "/v1/policies")
+                                         for _ in range(10)])
+        return [result["allowed"] for result in results]
+
+    allowed = run(burst())
+    assert allowed.count(True) == 3  # concurrency slots
+    assert run(limiter.redis.get("concurrent:{key}")) == "3"
+
+
+def test_windows_are_checked_before_any_is_recorded(limiter):
+    async def requests(n, endpoint="/v1/policies"):
+        results = []
+        for _ in range(n):
+            result = await limiter._check_rate_limits("key", "free", endpoint)
+            if result["allowed"]:
+                await limiter._release_concurrent_slot("key")
+            results.append(result)
+        return results
+
+    results = run(requests(6))
+    assert [r["allowed"] for r in results] == [True] * 5 + [False]
+    assert [r["headers"]["X-RateLimit-Remaining"] for r in results[:5]] == ["4", "3", "2", "1", "0"]
+    denied = results[-1]
+    assert (denied["failed"], denied["limit"], denied["message"]) == ("hourly", 5, "Hourly rate limit exceeded")
+    assert 1 <= denied["retry_after"] <= 3600
+    # The denied request left no trace in the day window
+    assert run(limiter.redis.zcard("rate_day:{key}")) == 5
+
+
+def test_endpoint_limits_use_their_own_window(limiter):
+    limiter.endpoint_limits["/v1/policies/batch"] = {"requests_per_minute": 2}
+    limiter.endpoint_limits["/v1/webhooks"] = {"requests_per_hour": 1}
+
+    async def check(endpoint):
+        result = await limiter._check_rate_limits("key", "professional", endpoint)
+        if result["allowed"]:
+            await limiter._release_concurrent_slot("key")
+        return result
+
+    batch = [run(check("/v1/policies/batch")) for _ in range(3)]
+    assert [r["allowed"] for r in batch] == [True, True, False]
+    assert batch[-1]["failed"] == "endpoint"
+    assert batch[-1]["retry_after"] <= 60
+    webhooks = [run(check("/v1/webhooks"))["allowed"] for _ in range(2)]
+    assert webhooks == [True, False]
+    assert run(limiter.redis.ttl("rate_endpoint:{key}:/v1/webhooks")) > 60
+
+
+def test_release_after_the_slot_expired_does_not_go_negative(limiter):
+    async def request_outliving_its_slot():
+        await limiter._check_rate_limits("key", "free", "/v1/policies")
+        await limiter.redis.delete("concurrent:{key}")  # slot TTL ran out mid-request
+        await limiter._release_concurrent_slot("key")
+
+    run(request_outliving_its_slot())
+    assert run(limiter.redis.get("concurrent:{key}")) is None
+
+    async def burst():
+        results = await asyncio.gather(*[limiter._check_rate_limits("key", "free", "/v1/policies")
+                                         for _ in range(5)])
+        return [result["allowed"] for result in results]
+
+    assert run(burst()).count(True) == 3  # still the plan's limit, not one more
+
+
+def test_plan_lookup_is_cached_in_process(limiter):
+    run(limiter.redis.set("user_plan:key", "professional"))
+    CountingRedis.commands = 0
+    plans = [run(limiter._get_user_plan("key")) for _ in range(5)]
+    assert plans == ["professional"] * 5
+    assert CountingRedis.commands == 1
+    assert limiter.plan_cache.stats == {"hits": 4, "misses": 1}
+
+    cache = PlanCache(ttl_seconds=0)
+    cache.put("key", "free")
+    assert cache.get("key") is None
+
+
+def test_one_round_trip_per_check(limiter):
+    run(limiter._check_rate_limits("key", "free", "/v1/commissions/calculate"))
+    commands = CountingRedis.commands
+    run(limiter._check_rate_limits("key", "free", "/v1/commissions/calculate"))
+    assert CountingRedis.commands - commands == 1  # EVALSHA
+
+
+def test_middleware_sets_headers_and_releases_slot():
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, redis_client=redis)
+
+    @app.get("/v1/policies")
+    async def policies():
+        return []
+
+    with TestClient(app) as client:
+        response = client.get("/v1/policies", headers={"Authorization": "Bearer key"})
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Limit"] == "1000"
+        assert response.headers["X-RateLimit-Remaining"] == "999"
+        assert client.portal.call(redis.get, "concurrent:{key}") == "0"
@@ -0,0 +1,125 @@
+"""
+Tests for the request metrics pipeline: route template labels, in-process
+histograms, log sampling and the bounded export queue.
+
+Run with: pytest test_request_metrics.py
+"""
+import os
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from monitoring.request_metrics import (  # noqa: E402
+    OTHER,
+    UNMATCHED_ROUTE,
+    ExportWorker,
+    LatencyHistograms,
+    RequestMetrics,
+    RequestMetricsCollector,
+    route_template,
+)
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/v1/policies/{policy_id}")
+    async def policy(policy_id: str):
+        return {"policy_id": policy_id}
+
+    return app
+
+
+def test_route_template_labels_instead_of_raw_paths():
+    routes = []
+    app = build_app()
+
+    async def record_route(scope, receive, send):
+        await app(scope, receive, send)
+        if scope["type"] == "http":
+            routes.append(route_template(scope))
+
+    with TestClient(record_route) as client:
+        for policy_id in ("P-1", "P-2", "P-3"):
+            client.get(f"/v1/policies/{policy_id}")
+        client.get("/v1/nothing-here")
+    assert routes == ["/v1/policies/{policy_id}"] * 3 + [UNMATCHED_ROUTE]
+
+
+def test_histogram_buckets_and_series_bound():
+    histograms = LatencyHistograms(buckets=(0.1, 1.0), max_series=2)
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        histograms.observe(("GET", "/a", "200", "free"), seconds)
+    histograms.observe(("GET", "/b", "200", "free"), 0.2)
+    histograms.observe(("GET", "/c", "200", "free"), 0.2)  # past max_series
+    snapshot = histograms.snapshot()
+    count, total, counts = snapshot[("GET", "/a", "200", "free")]
+    assert (count, round(total, 2), counts) == (4, 3.65, [2, 1, 1])
+    assert snapshot[(OTHER,) * 4][0] == 1
+    assert histograms.overflowed == 1
+
+
+def test_fast_2xx_logs_are_sampled():
+    metrics = RequestMetrics(log_sample_rate=0.5, random_fn=iter([0.9, 0.1]).__next__)
+    metrics.record("GET", "/v1/policies/{policy_id}", 200, 0.01)  # 0.9 - not sampled
+    metrics.record("GET", "/v1/policies/{policy_id}", 200, 0.01)  # 0.1 - sampled
+    metrics.record("GET", "/v1/policies/{policy_id}", 404, 0.01)  # always logged
+    metrics.record("GET", "/v1/policies/{policy_id}", 200, 2.0)  # slow - always logged
+    kinds = [kind for kind, _ in metrics.queue.drain(100)]
+    assert kinds.count("latency") == 4
+    assert kinds.count("log") == 3
+
+
+def test_full_export_queue_drops_instead_of_growing():
+    metrics = RequestMetrics(queue_size=3, log_sample_rate=0)
+    for _ in range(5):
+        metrics.record("GET", "/x", 200, 0.01)
+    assert (len(metrics.queue), metrics.queue.stats["dropped"]) == (3, 2)
+    # Histograms still saw every request
+    assert metrics.histograms.snapshot()[("GET", "/x", "200", "unknown")][0] == 5
+
+    exported = []
+    worker = ExportWorker(metrics.queue, {"latency": exported.append}, max_batch=2)
+    assert worker.export_pending() == 2
+    assert worker.export_pending() == 1
+    assert len(exported) == 3 and metrics.queue.stats["exported"] == 3
+
+
+def test_prometheus_collector_reads_histograms():
+    prometheus_client = pytest.importorskip("prometheus_client")
+    registry = prometheus_client.CollectorRegistry()
+    metrics = RequestMetrics(buckets=(0.1, 1.0))
+    registry.register(RequestMetricsCollector(metrics))
+    metrics.record("GET", "/v1/policies/{policy_id}", 200, 0.05, plan="free")
+    metrics.record("GET", "/v1/policies/{policy_id}", 500, 0.5, plan="free")
+    metrics.record("BREW", "/v1/policies/{policy_id}", 200, 0.05)
+
+    value = registry.get_sample_value
+    assert value("api_requests_total", {"method": "GET", "endpoint": "/v1/policies/{policy_id}",
+                                        "status": "500", "plan": "free"}) == 1
+    labels = {"method": "GET", "endpoint": "/v1/policies/{policy_id}"}
+    assert value("api_request_duration_seconds_bucket", {**labels, "le": "0.1"}) == 1
+    assert value("api_request_duration_seconds_bucket", {**labels, "le": "+Inf"}) == 2
+    assert value("api_request_duration_seconds_count", {"method": OTHER, "endpoint": "/v1/policies/{policy_id}"}) == 1
+    assert value("api_metrics_export_dropped_total") == 0
+
+
+def test_metrics_middleware_labels_by_route():
+    metrics_module = pytest.importorskip("monitoring.metrics", exc_type=ImportError)
+    app = build_app()
+    recorded = []
+
+    class Monitoring:
+        tracer = metrics_module.trace.get_tracer("test")
+
+        def track_api_request(self, **request):
+            recorded.append(request)
+
+    app.add_middleware(metrics_module.MetricsMiddleware, monitoring_service=Monitoring())
+    with TestClient(app) as client:
+        response = client.get("/v1/policies/P-9")
+    assert response.headers["x-response-time"].endswith("ms")
+    assert [(r["endpoint"], r["status"]) for r in recorded] == [("/v1/policies/{policy_id}", 200)]
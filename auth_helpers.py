@@ -7,6 +7,7 @@ import secrets
 import string
 import time
 from config import SUBSCRIPTION_OFFER, SUPPORT_CONTACT, is_feature_enabled
+from utils.settings_store import prefetch_user_settings
 
 def check_subscription_status(email: str, supabase: Client) -> dict:
     """Check if user has active subscription."""
@@ -284,6 +285,8 @@ def show_login_form():
                                             st.session_state["password_correct"] = True
                                             st.session_state["user_email"] = correct_email  # Use correct case from DB
                                             st.session_state["user_id"] = user.get('id')  # Store user_id for proper filtering!
+                                            # Load all of the user's settings tables in one batch
+                                            prefetch_user_settings(supabase, user.get('id'), correct_email)
                                             # Debug logging for mobile issue
                                             print(f"DEBUG auth_helpers: Login successful for {email}, stored as {correct_email}")
                                             print(f"DEBUG auth_helpers: User ID: {user.get('id')}")
@@ -980,6 +983,7 @@ def show_password_setup_form(setup_token: str):
                                     st.session_state["is_new_user"] = True
                                     if uid:
                                         st.session_state["user_id"] = uid
+                                    prefetch_user_settings(supabase, uid, email)
 
                                     st.success("✅ Password set successfully! Logging you in...")
                                     st.balloons()
@@ -0,0 +1,90 @@
+"""
+CLV Benchmark
+Compares the per-client CLV loop (groupby + calculate_clv) against the
+columnar CLVCalculator.calculate_clv_for_all_clients() engine.
+
+Run: python benchmarks/bench_clv.py [--sizes 1000 10000 100000] [--skip-loop-above 10000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ml_models import CLVCalculator  # noqa: E402
+
+
+def build_policies(n_clients: int, policies_per_client: float = 2.5, seed: int = 42) -> pd.DataFrame:
+    """Build a synthetic agency book with roughly n_clients distinct insureds."""
+    rng = np.random.default_rng(seed)
+    n_rows = int(n_clients * policies_per_client)
+
+    # Every client gets at least one policy, the rest are spread randomly
+    client_idx = np.concatenate([
+        np.arange(n_clients),
+        rng.integers(0, n_clients, max(n_rows - n_clients, 0))
+    ])
+    effective = np.datetime64('today') - rng.integers(0, 365 * 15, len(client_idx)).astype('timedelta64[D]')
+
+    return pd.DataFrame({
+        'insured_name': np.char.add('Client ', client_idx.astype(str)),
+        'premium': rng.lognormal(7.3, 0.6, len(client_idx)).round(2),
+        'effective_date': effective.astype(str),
+        'renewed': rng.random(len(client_idx)) < 0.8
+    })
+
+
+def run_loop(calculator: CLVCalculator, policies: pd.DataFrame) -> int:
+    results = []
+    for client_name, client_policies in policies.groupby('insured_name'):
+        clv_data = calculator.calculate_clv(client_policies)
+        clv_data['client_id'] = client_name
+        results.append(clv_data)
+    return len(results)
+
+
+def run_vectorized(calculator: CLVCalculator, policies: pd.DataFrame) -> int:
+    return len(calculator.calculate_clv_for_all_clients(policies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLV calculation across all clients")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="Client counts to benchmark")
+    parser.add_argument('--skip-loop-above', type=int, default=10000,
+                        help="Skip the per-client loop for books larger than this many clients")
+    args = parser.parse_args()
+
+    calculator = CLVCalculator()
+
+    print(f"{'clients':>10} {'rows':>10} {'loop (s)':>10} {'vectorized (s)':>15} {'speedup':>9}")
+    print("-" * 58)
+
+    for n_clients in args.sizes:
+        policies = build_policies(n_clients)
+
+        start = time.perf_counter()
+        clients = run_vectorized(calculator, policies)
+        vectorized_time = time.perf_counter() - start
+        assert clients == n_clients
+
+        if n_clients <= args.skip_loop_above:
+            start = time.perf_counter()
+            run_loop(calculator, policies)
+            loop_time = time.perf_counter() - start
+            loop_str = f"{loop_time:.3f}"
+            speedup_str = f"{loop_time / vectorized_time:.0f}x"
+        else:
+            loop_str = "skipped"
+            speedup_str = "-"
+
+        print(f"{n_clients:>10,} {len(policies):>10,} {loop_str:>10} {vectorized_time:>15.3f} {speedup_str:>9}")
+
+
+if __name__ == "__main__":
+    main()
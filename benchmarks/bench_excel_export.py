@@ -0,0 +1,99 @@
+"""
+Excel Export Benchmark
+Compares the previous export path (pandas.to_excel with openpyxl, then a
+per-cell width and currency-format pass) against the streaming
+utils.excel_export.write_excel_workbook() engine, reporting time and
+peak Python memory (tracemalloc, with --memory).
+
+Run: python benchmarks/bench_excel_export.py [--sizes 10000 100000] [--skip-legacy-above 20000] [--memory]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from openpyxl.utils import get_column_letter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.excel_export import write_excel_workbook  # noqa: E402
+from utils.synthetic_ledger import generate_ledger  # noqa: E402
+
+CURRENCY_COLUMNS = ['Premium Sold', 'Agency Estimated Comm/Revenue (CRM)', 'Total Agent Comm']
+
+
+def build_ledger(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Synthetic PRL export (full policies ledger) with text, currency and date columns."""
+    return generate_ledger(n_rows, seed)
+
+
+def run_legacy(data: pd.DataFrame) -> int:
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        data.to_excel(writer, sheet_name='Data', index=False)
+        worksheet = writer.sheets['Data']
+        for column in worksheet.columns:
+            max_length = max(len(str(cell.value)) for cell in column)
+            worksheet.column_dimensions[column[0].column_letter].width = max(min(max_length + 2, 30), 10)
+        for col_num, col_name in enumerate(data.columns, 1):
+            if col_name in CURRENCY_COLUMNS:
+                letter = get_column_letter(col_num)
+                for row_num in range(2, len(data) + 2):
+                    worksheet[f"{letter}{row_num}"].number_format = '"$"#,##0.00'
+    return len(buffer.getvalue())
+
+
+def run_streaming(data: pd.DataFrame) -> int:
+    buffer = write_excel_workbook([{'name': 'Data', 'data': data, 'currency_columns': CURRENCY_COLUMNS}])
+    return len(buffer.getvalue())
+
+
+def measure(func, data, trace_memory):
+    start = time.perf_counter()
+    func(data)
+    elapsed = time.perf_counter() - start
+    if not trace_memory:
+        return elapsed, float('nan')
+
+    # Separate traced run - tracemalloc slows allocation-heavy code considerably
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Excel exports")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help="Row counts to benchmark")
+    parser.add_argument('--skip-legacy-above', type=int, default=20000,
+                        help="Skip the openpyxl path for exports larger than this many rows")
+    parser.add_argument('--memory', action='store_true',
+                        help="Also measure peak Python memory (runs each export twice)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy (s)':>11} {'legacy MB':>10} {'stream (s)':>11} {'stream MB':>10} {'speedup':>8}")
+    print("-" * 66)
+
+    for n_rows in args.sizes:
+        data = build_ledger(n_rows)
+        stream_time, stream_mb = measure(run_streaming, data, args.memory)
+
+        if n_rows <= args.skip_legacy_above:
+            legacy_time, legacy_mb = measure(run_legacy, data, args.memory)
+            legacy = f"{legacy_time:>11.2f} {legacy_mb:>10.1f}"
+            speedup = f"{legacy_time / stream_time:.1f}x"
+        else:
+            legacy = f"{'skipped':>11} {'-':>10}"
+            speedup = "-"
+
+        print(f"{n_rows:>10,} {legacy} {stream_time:>11.2f} {stream_mb:>10.1f} {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
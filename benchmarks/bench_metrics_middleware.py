@@ -0,0 +1,138 @@
+"""
+Metrics Middleware Benchmark
+Per-request overhead of MetricsMiddleware (pure ASGI, route template
+labels, in-process histograms, sampled logs through the export queue)
+against the previous BaseHTTPMiddleware version it replaced (prometheus
+Counter/Histogram labelled by raw path, a log line per request), both
+around the same FastAPI app and compared with the bare app. Requests are
+driven straight through the ASGI interface so no network or client cost
+is included.
+
+Requires: pip install fastapi prometheus_client structlog opentelemetry-sdk
+
+Run: python benchmarks/bench_metrics_middleware.py [--requests 5000] [--ids 1000]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+from fastapi import FastAPI
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest
+from starlette.middleware.base import BaseHTTPMiddleware
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_platform'))
+
+from monitoring.metrics import MetricsMiddleware, trace  # noqa: E402
+from monitoring.request_metrics import RequestMetrics, RequestMetricsCollector  # noqa: E402
+
+log = logging.getLogger("bench_metrics_middleware")
+log.addHandler(logging.FileHandler(os.devnull))
+log.setLevel(logging.INFO)
+log.propagate = False
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/v1/policies/{policy_id}")
+    async def policy(policy_id: str):
+        return {"policy_id": policy_id}
+
+    return app
+
+
+def legacy_app(registry):
+    """The previous middleware: raw path labels and a log line for every request."""
+    requests_total = Counter('api_requests_total', 'Total API requests',
+                             ['method', 'endpoint', 'status', 'plan'], registry=registry)
+    duration = Histogram('api_request_duration_seconds', 'API request duration in seconds',
+                         ['method', 'endpoint'], registry=registry)
+    tracer = trace.get_tracer("bench")
+
+    class LegacyMetricsMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            start_time = time.time()
+            with tracer.start_as_current_span(f"{request.method} {request.url.path}"):
+                response = await call_next(request)
+                elapsed = time.time() - start_time
+                requests_total.labels(request.method, request.url.path, str(response.status_code), "unknown").inc()
+                duration.labels(request.method, request.url.path).observe(elapsed)
+                log.info("api_request method=%s endpoint=%s status=%s duration=%s",
+                         request.method, request.url.path, response.status_code, elapsed)
+                response.headers["X-Response-Time"] = f"{elapsed * 1000:.2f}ms"
+                return response
+
+    app = build_app()
+    app.add_middleware(LegacyMetricsMiddleware)
+    return app
+
+
+class BenchMonitoring:
+    """Just what MetricsMiddleware uses from MonitoringService, without the exporters."""
+
+    def __init__(self, registry):
+        self.tracer = trace.get_tracer("bench")
+        self.request_metrics = RequestMetrics()
+        registry.register(RequestMetricsCollector(self.request_metrics))
+
+    def track_api_request(self, method, endpoint, status, duration, user_id=None, plan="unknown"):
+        self.request_metrics.record(method, endpoint, status, duration, user_id, plan)
+
+
+def current_app(registry):
+    app = build_app()
+    app.add_middleware(MetricsMiddleware, monitoring_service=BenchMonitoring(registry))
+    return app
+
+
+async def call(app, path: str):
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+             "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+             "query_string": b"", "headers": [(b"host", b"bench")], "client": ("127.0.0.1", 1),
+             "server": ("bench", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def measure(label: str, app, registry, n_requests: int, n_ids: int):
+    await call(app, "/v1/policies/warmup")
+    start = time.perf_counter()
+    for i in range(n_requests):
+        await call(app, f"/v1/policies/P-{i % n_ids}")
+    elapsed = time.perf_counter() - start
+    scrape = generate_latest(registry) if registry is not None else b""
+    series = scrape.count(b"\napi_requests_total{")
+    print(f"{label:<24} {elapsed / n_requests * 1e6:>12.1f} {series:>14,} {len(scrape) / 1024:>12.1f}")
+
+
+async def main_async(args):
+    print(f"{args.requests:,} requests over {args.ids:,} policy ids")
+    print(f"{'':<24} {'us / request':>12} {'count series':>14} {'scrape KiB':>12}")
+    print("-" * 65)
+    await measure("no middleware", build_app(), None, args.requests, args.ids)
+    registry = CollectorRegistry()
+    await measure("BaseHTTPMiddleware", legacy_app(registry), registry, args.requests, args.ids)
+    registry = CollectorRegistry()
+    await measure("pure ASGI, templates", current_app(registry), registry, args.requests, args.ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the metrics middleware's per-request overhead")
+    parser.add_argument('--requests', type=int, default=5000, help="Requests to time per variant")
+    parser.add_argument('--ids', type=int, default=1000, help="Distinct policy ids in the request paths")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Rate Limiter Benchmark
+Per-request overhead of RateLimitMiddleware's limit check (plan lookup,
+one Lua script for the concurrency slot and every window, slot release)
+against the previous command-by-command flow it replaced, both on
+fakeredis so only client/command overhead is measured. Round trips are
+what dominate against a real Redis: each one adds the network latency.
+
+Requires: pip install fakeredis[lua] fastapi
+
+Run: python benchmarks/bench_rate_limiter.py [--requests 5000] [--endpoint /v1/commissions/calculate]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import fakeredis
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api_platform'))
+
+from middleware.rate_limiting import RateLimitMiddleware  # noqa: E402
+
+
+class CountingRedis(fakeredis.FakeAsyncRedis):
+    """Counts round trips: one per command, one per pipeline."""
+
+    round_trips = 0
+
+    async def execute_command(self, *args, **options):
+        type(self).round_trips += 1
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        type(self).round_trips += 1
+        pipe = super().pipeline(transaction, shard_hint)
+        pipe.execute_command = pipe.pipeline_execute_command  # don't count queued commands
+        return pipe
+
+
+async def legacy_request(redis, api_key: str, endpoint: str, limits: dict):
+    """The previous flow: plan GET, INCR pipeline, then per window a 3-command pipeline plus ZADD and EXPIRE."""
+    await redis.get(f"user_plan:{api_key}")
+    pipe = redis.pipeline()
+    pipe.incr(f"concurrent:{api_key}")
+    pipe.expire(f"concurrent:{api_key}", 60)
+    await pipe.execute()
+
+    now = time.time()
+    windows = [(f"rate_hour:{api_key}", 3600), (f"rate_day:{api_key}", 86400)]
+    if endpoint in limits:
+        windows.append((f"rate_endpoint:{api_key}:{endpoint}", 60))
+    for key, window in windows:
+        pipe = redis.pipeline()
+        pipe.zremrangebyscore(key, 0, now - window)
+        pipe.zcard(key)
+        pipe.zrange(key, 0, 0, withscores=True)
+        await pipe.execute()
+        await redis.zadd(key, {str(now): now})
+        await redis.expire(key, window + 1)
+    await redis.decr(f"concurrent:{api_key}")
+
+
+async def script_request(limiter: RateLimitMiddleware, api_key: str, endpoint: str):
+    plan = await limiter._get_user_plan(api_key)
+    result = await limiter._check_rate_limits(api_key, plan, endpoint)
+    if result["allowed"]:
+        await limiter._release_concurrent_slot(api_key)
+
+
+async def measure(label: str, request, n_requests: int):
+    CountingRedis.round_trips = 0
+    await request(0)  # warm up: script load, plan cache
+    CountingRedis.round_trips = 0
+    start = time.perf_counter()
+    for i in range(n_requests):
+        await request(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<24} {elapsed / n_requests * 1e6:>12.1f} {CountingRedis.round_trips / n_requests:>18.1f}")
+
+
+async def main_async(args):
+    # High limits so every request takes the full allowed path
+    limiter = RateLimitMiddleware(FastAPI(), redis_client=CountingRedis(decode_responses=True))
+    limiter.rate_limits["enterprise"].update(requests_per_hour=10 ** 9, requests_per_day=10 ** 9)
+    limiter.endpoint_limits[args.endpoint] = {"requests_per_minute": 10 ** 9}
+    await limiter.redis.set("user_plan:bench", "enterprise")
+    legacy_redis = CountingRedis(decode_responses=True)
+
+    print(f"{args.requests:,} requests to {args.endpoint}")
+    print(f"{'':<24} {'us / request':>12} {'round trips / req':>18}")
+    print("-" * 56)
+    await measure("command by command", lambda i: legacy_request(
+        legacy_redis, "bench", args.endpoint, limiter.endpoint_limits), args.requests)
+    await measure("single Lua script", lambda i: script_request(limiter, "bench", args.endpoint), args.requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the rate limiter's per-request overhead")
+    parser.add_argument('--requests', type=int, default=5000, help="Requests to time per variant")
+    parser.add_argument('--endpoint', default='/v1/commissions/calculate',
+                        help="Request path (endpoints with their own limit check one more window)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmark Datasets
+Writes synthetic agency books (utils.synthetic_ledger) for benchmarks and
+load tests: policies_<rows>_seed<seed>.<fmt> (the ledger) and
+statements_<rows>_seed<seed>.<fmt> (matching carrier statements).
+
+Run: python benchmarks/generate_datasets.py [--sizes 1000 10000 100000 1000000] [--seed 42] [--format parquet|csv] [--out benchmarks/data]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.synthetic_ledger import DEFAULT_DATA_DIR, generate_book, write_book  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic ledgers and carrier statements")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help="Ledger row counts to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed")
+    parser.add_argument('--format', choices=['parquet', 'csv'], default='parquet', help="Output format")
+    parser.add_argument('--out', default=DEFAULT_DATA_DIR, help="Output directory")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'statements':>11} {'reconciled':>11} {'generate (s)':>13} {'write (s)':>10}")
+    print("-" * 60)
+
+    for n_rows in args.sizes:
+        start = time.perf_counter()
+        book = generate_book(n_rows, args.seed)
+        generate_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        write_book(book, n_rows, args.seed, args.out, args.format)
+        write_time = time.perf_counter() - start
+
+        reconciled = int(book['policies']['is_reconciliation_entry'].sum())
+        print(f"{n_rows:>10,} {len(book['statements']):>11,} {reconciled:>11,} {generate_time:>13.2f} {write_time:>10.2f}")
+
+    print(f"\nWritten to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
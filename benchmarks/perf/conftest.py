@@ -0,0 +1,61 @@
+"""
+Fixtures for the hot-path benchmark suite: a headless commission_app and
+synthetic books (utils/synthetic_ledger) at increasing sizes.
+
+Book sizes come from PERF_SIZES (ledger rows, comma separated; default
+1000,3000). Books are dated to today so the 18-month reconciliation
+window and the renewal window contain data.
+"""
+
+import os
+import zlib
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from headless import load_commission_app, use_headless_streamlit
+from utils.synthetic_ledger import generate_book
+
+SIZES = [int(size) for size in os.environ.get('PERF_SIZES', '1000,3000').split(',') if size.strip()]
+STATEMENT_MONTHS = 3
+AGENTS = ['agent-1', 'agent-2', 'agent-3', 'agent-4', 'agent-5']
+AGENCY_ID = 'agency-bench'
+
+
+def pytest_addoption(parser):
+    parser.addoption('--perf-rounds', type=int, default=3,
+                     help="Timed rounds per benchmark (the functions are too slow for auto-calibration)")
+
+
+@pytest.fixture(scope='session')
+def app():
+    namespace = load_commission_app()
+    use_headless_streamlit(namespace)
+    return namespace
+
+
+@pytest.fixture(scope='session')
+def rounds(request):
+    return request.config.getoption('--perf-rounds')
+
+
+@pytest.fixture(scope='session', params=SIZES, ids=lambda size: f"{size}rows")
+def book(request):
+    """Ledger ('policies') plus carrier statement lines for the last few statement months."""
+    generated = generate_book(request.param, as_of=date.today().isoformat())
+    statements = generated['statements']
+    months = sorted(statements['Statement Date'].unique())[-STATEMENT_MONTHS:]
+    generated['statement'] = statements[statements['Statement Date'].isin(months)].reset_index(drop=True)
+    return generated
+
+
+def agent_for(client_id) -> str:
+    """Stable agent assignment per client."""
+    return AGENTS[zlib.crc32(str(client_id).encode('utf-8')) % len(AGENTS)]
+
+
+def agency_policies(ledger: pd.DataFrame) -> list:
+    """Ledger rows as load_agency_policies_for_matching returns them."""
+    policies = ledger.assign(agency_id=AGENCY_ID, agent_id=ledger['Client ID'].map(agent_for))
+    return policies.to_dict('records')
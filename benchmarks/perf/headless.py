@@ -0,0 +1,124 @@
+"""
+Headless commission_app for benchmarks.
+
+commission_app.py is a Streamlit script: importing it renders the whole
+app. load_commission_app() executes only its imports, function and class
+definitions and plain constants, with the database client swapped for a
+FakeSupabase. use_headless_streamlit() then points every loaded module's
+`st` at HeadlessStreamlit, so UI calls made inside the benchmarked
+functions (expanders, st.dataframe, warnings) cost nothing and need no
+running server.
+"""
+
+import ast
+import os
+import sys
+import types
+
+import streamlit
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import database_utils  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+
+
+class _Element:
+    """Any Streamlit element or container: every call, attribute and `with` is a no-op."""
+
+    def __call__(self, *args, **kwargs):
+        return self
+
+    def __getattr__(self, name):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def __bool__(self):
+        # Buttons and checkboxes read as "not clicked"
+        return False
+
+    def __iter__(self):
+        return iter(())
+
+
+class SessionState(dict):
+    """st.session_state: a dict with attribute access."""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+    def __delattr__(self, name):
+        self.pop(name, None)
+
+
+class HeadlessStreamlit(types.SimpleNamespace):
+    """Drop-in for the streamlit module inside benchmarked code."""
+
+    def __init__(self):
+        super().__init__(session_state=SessionState())
+        self._element = _Element()
+
+    def __getattr__(self, name):
+        return self._element
+
+    def columns(self, spec, **kwargs):
+        count = spec if isinstance(spec, int) else len(spec)
+        return [self._element] * count
+
+    def tabs(self, labels):
+        return [self._element] * len(labels)
+
+    @staticmethod
+    def cache_data(func=None, **kwargs):
+        return func if func is not None else (lambda f: f)
+
+    cache_resource = cache_data
+
+
+def load_commission_app(supabase=None) -> types.SimpleNamespace:
+    """commission_app's functions and constants, without running the app."""
+    supabase = supabase if supabase is not None else FakeSupabase()
+    database_utils.get_supabase_client = lambda: supabase
+
+    path = os.path.join(REPO_ROOT, 'commission_app.py')
+    with open(path, encoding='utf-8') as f:
+        source = f.read()
+    tree = ast.parse(source)
+    keep = []
+    for node in tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom, ast.FunctionDef, ast.ClassDef)):
+            keep.append(node)
+        elif isinstance(node, ast.Assign) and 'st.' not in ast.get_source_segment(source, node):
+            keep.append(node)
+
+    namespace = {'__name__': 'commission_app', '__file__': path}
+    exec(compile(ast.Module(body=keep, type_ignores=[]), path, 'exec'), namespace)
+    namespace['get_supabase_client'] = lambda: supabase
+    return types.SimpleNamespace(**namespace)
+
+
+def use_headless_streamlit(*namespaces) -> HeadlessStreamlit:
+    """Replace `st` in every loaded module (and the given namespaces) with one HeadlessStreamlit."""
+    headless = HeadlessStreamlit()
+    for module in list(sys.modules.values()):
+        if getattr(module, 'st', None) is streamlit:
+            module.st = headless
+    for namespace in namespaces:
+        namespace.st = headless
+        for value in vars(namespace).values():
+            if isinstance(value, types.FunctionType) and value.__globals__.get('st') is streamlit:
+                value.__globals__['st'] = headless
+    return headless
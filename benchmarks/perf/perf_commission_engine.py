@@ -0,0 +1,108 @@
+"""
+Hot-path benchmarks for the commission engine on synthetic books.
+
+Run: python benchmarks/run_perf_suite.py   (see there for baselines and thresholds)
+"""
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from conftest import AGENCY_ID, agency_policies, agent_for  # noqa: E402
+from utils import agency_statement_matcher  # noqa: E402
+from utils.commission_reconciliation import CommissionReconciler  # noqa: E402
+from utils.renewal_pipeline import invalidate_renewal_pipeline  # noqa: E402
+
+STATEMENT_MAPPING = {
+    'Customer': 'Insured Name',
+    'Policy Number': 'Policy Number',
+    'Effective Date': 'Eff Date',
+    'Agent Paid Amount (STMT)': 'Agent Payment',
+    'Transaction Type': 'Transaction Type',
+    'Carrier Name': 'Carrier',
+    'Premium Sold': 'Premium',
+}
+
+
+def _run(benchmark, rounds, func, *args, setup=None, **kwargs):
+    if setup is None:
+        return benchmark.pedantic(func, args=args, kwargs=kwargs, rounds=rounds, iterations=1)
+
+    def prepared():
+        setup()
+        return args, kwargs
+
+    return benchmark.pedantic(func, setup=prepared, rounds=rounds)
+
+
+def bench_calculate_transaction_balances(benchmark, rounds, app, book):
+    balances = _run(benchmark, rounds, app.calculate_transaction_balances,
+                    book['policies'], show_all_for_reconciliation=True)
+    assert len(balances) > 0
+
+
+def bench_calculate_dashboard_metrics(benchmark, rounds, app, book):
+    metrics = _run(benchmark, rounds, app.calculate_dashboard_metrics, book['policies'])
+    assert metrics['total_transactions'] == len(book['policies'])
+
+
+def bench_get_pending_renewals(benchmark, rounds, app, book):
+    # Cold path: the renewal pipeline cache would otherwise answer every round after the first
+    renewals = _run(benchmark, rounds, app.get_pending_renewals, book['policies'],
+                    setup=invalidate_renewal_pipeline)
+    assert len(renewals) > 0
+
+
+def bench_apply_formula_display(benchmark, rounds, app, book):
+    display = _run(benchmark, rounds, app.apply_formula_display, book['policies'])
+    assert len(display) == len(book['policies'])
+
+
+def bench_find_potential_customer_matches(benchmark, rounds, app, book):
+    customers = book['policies']['Customer'].dropna().unique().tolist()
+    names = book['statement']['Insured Name'].head(25).tolist()
+
+    def match_names():
+        return [app.find_potential_customer_matches(name, customers) for name in names]
+
+    matches = _run(benchmark, rounds, match_names)
+    assert any(matches)
+
+
+def bench_match_statement_transactions(benchmark, rounds, app, book):
+    statement = book['statement']
+    statement_date = pd.Timestamp(statement['Statement Date'].max())
+    matched, unmatched, to_create = _run(benchmark, rounds, app.match_statement_transactions,
+                                         statement, STATEMENT_MAPPING, book['policies'], statement_date)
+    assert len(matched) + len(unmatched) + len(to_create) > 0
+
+
+def bench_reconciler_match_transactions(benchmark, rounds, book):
+    ledger, statement = book['policies'], book['statement']
+    originals = ledger[ledger['Transaction ID'].isin(statement['expected_transaction_id'])]
+    expected = pd.DataFrame({
+        'policy_number': originals['Policy Number'],
+        'client_name': originals['Customer'],
+        'agent_name': originals['Client ID'].map(agent_for),
+        'effective_date': pd.to_datetime(originals['Effective Date']),
+        'expected_commission': originals['Agency Estimated Comm/Revenue (CRM)'],
+    }).reset_index(drop=True)
+    carrier = pd.DataFrame({
+        'policy_number': statement['Policy Number'],
+        'client_name': statement['Insured Name'].str.strip().str.title(),
+        'effective_date': pd.to_datetime(statement['Eff Date']),
+        'commission_amount': statement['Gross Comm'],
+    })
+
+    results = _run(benchmark, rounds, CommissionReconciler().match_transactions, carrier, expected)
+    assert len(results['matched']) > 0
+
+
+def bench_process_statement_with_agent_attribution(benchmark, rounds, book, monkeypatch):
+    policies = agency_policies(book['policies'])
+    monkeypatch.setattr(agency_statement_matcher, 'load_agency_policies_for_matching', lambda agency_id: policies)
+
+    matched, unmatched, _ = _run(benchmark, rounds, agency_statement_matcher.process_statement_with_agent_attribution,
+                                 book['statement'], STATEMENT_MAPPING, AGENCY_ID, 'auto_assign')
+    assert len(matched) > 0
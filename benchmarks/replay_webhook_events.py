@@ -0,0 +1,178 @@
+"""
+Stripe Webhook Replay
+Fires recorded (or synthetic) Stripe events at the webhook dispatcher and
+worker pool from webhook_server.py, reporting acknowledgement latency,
+end-to-end throughput and per-customer ordering. Runs fully locally: the
+database is a FakeSupabase with optional simulated latency, Stripe API
+calls and emails are disabled.
+
+Recorded events: one Stripe event JSON object per line (e.g. payloads
+captured from the stripe_webhook_events table or `stripe events list`).
+
+Run: python benchmarks/replay_webhook_events.py [--events events.jsonl | --synthetic 2000 --customers 200]
+     [--workers 0 4 8] [--latency-ms 5] [--duplicates 0.1]
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import email_utils  # noqa: E402
+import webhook_server  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+from webhook_events import (  # noqa: E402
+    InMemoryEventStore,
+    OrderedEventWorkerPool,
+    WebhookDispatcher,
+    event_customer_key,
+)
+
+LIFECYCLE = ['checkout.session.completed', 'customer.subscription.updated', 'invoice.payment_failed',
+             'invoice.payment_succeeded', 'customer.subscription.deleted']
+
+
+class SlowSupabase:
+    """FakeSupabase whose every request takes latency seconds (one network round trip)."""
+
+    def __init__(self, client, latency):
+        self.client = client
+        self.latency = latency
+
+    def table(self, name):
+        query = self.client.table(name)
+        execute = query.execute
+
+        def slow_execute():
+            time.sleep(self.latency)
+            return execute()
+
+        query.execute = slow_execute
+        return query
+
+
+def synthetic_events(n_events: int, n_customers: int, seed: int = 42):
+    """Subscription lifecycles for n_customers, interleaved in random order."""
+    rng = random.Random(seed)
+    per_customer = {c: 0 for c in range(n_customers)}
+    events = []
+    for i in range(n_events):
+        customer = rng.randrange(n_customers)
+        event_type = LIFECYCLE[per_customer[customer] % len(LIFECYCLE)]
+        per_customer[customer] += 1
+        obj = {'customer': f"cus_{customer:05d}", 'subscription': f"sub_{customer:05d}", 'attempt_count': 1}
+        if event_type == 'checkout.session.completed':
+            obj['customer_details'] = {'email': f"customer{customer}@example.com"}
+            obj['metadata'] = {'accepted_terms': 'true'}
+        if event_type == 'customer.subscription.updated':
+            obj['status'] = 'active'
+        events.append({'id': f"evt_{i:07d}", 'type': event_type, 'created': 1700000000 + i,
+                       'data': {'object': obj}})
+    return events
+
+
+def load_events(path: str):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def replay(events, workers: int, latency: float, duplicates: float, seed: int = 42):
+    client = FakeSupabase({'users': [], 'password_reset_tokens': []})
+    webhook_server.get_supabase_client = lambda: SlowSupabase(client, latency) if latency else client
+
+    processed_order = {}
+    lock = threading.Lock()
+
+    def handler(event):
+        result = webhook_server.process_stripe_event(event)
+        with lock:
+            processed_order.setdefault(event_customer_key(event), []).append(event['id'])
+        return result
+
+    store = InMemoryEventStore()
+    pool = OrderedEventWorkerPool(handler, store, workers=workers, retry_delay=0.01).start()
+    dispatcher = WebhookDispatcher(store, pool)
+
+    # Stripe redelivers some events (timeouts, retries) - those must be acknowledged, not reprocessed
+    rng = random.Random(seed)
+    deliveries = []
+    for event in events:
+        deliveries.append(event)
+        if rng.random() < duplicates:
+            deliveries.append(event)
+
+    ack_times = []
+    outcomes = {}
+    start = time.perf_counter()
+    for event in deliveries:
+        t0 = time.perf_counter()
+        outcome = dispatcher.accept(event)
+        ack_times.append(time.perf_counter() - t0)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    acked = time.perf_counter() - start
+    pool.join()
+    elapsed = time.perf_counter() - start
+    pool.stop()
+
+    expected = {}
+    for event in events:
+        expected.setdefault(event_customer_key(event), []).append(event['id'])
+    violations = sum(1 for key, ids in expected.items() if processed_order.get(key) != ids)
+
+    ack_ms = np.array(ack_times) * 1000
+    return {
+        'deliveries': len(deliveries),
+        'outcomes': outcomes,
+        'ack_p50': float(np.percentile(ack_ms, 50)),
+        'ack_p95': float(np.percentile(ack_ms, 95)),
+        'acked_s': acked,
+        'elapsed_s': elapsed,
+        'events_per_s': len(events) / elapsed if elapsed else float('inf'),
+        'processed': pool.stats['processed'],
+        'failed': pool.stats['failed'],
+        'order_violations': violations,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay Stripe webhook events against the worker pool")
+    parser.add_argument('--events', help="JSONL file of recorded Stripe events")
+    parser.add_argument('--synthetic', type=int, default=2000, help="Synthetic events when --events is not given")
+    parser.add_argument('--customers', type=int, default=200, help="Distinct customers in synthetic events")
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 4, 8],
+                        help="Worker counts to compare (0 = inline, the old synchronous endpoint)")
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="Simulated database round trip")
+    parser.add_argument('--duplicates', type=float, default=0.1, help="Fraction of events delivered twice")
+    args = parser.parse_args()
+
+    # Local replay: no Stripe API calls, no emails
+    webhook_server.stripe.api_key = None
+    webhook_server.send_welcome_email = lambda *a, **k: True
+    email_utils.send_password_setup_email = lambda *a, **k: True
+
+    events = load_events(args.events) if args.events else synthetic_events(args.synthetic, args.customers)
+    print(f"{len(events):,} events, {len({event_customer_key(e) for e in events}):,} customers, "
+          f"{args.latency_ms:g} ms per database call")
+    print(f"{'workers':>8} {'ack p50 ms':>11} {'ack p95 ms':>11} {'total (s)':>10} {'events/s':>9} "
+          f"{'dupes':>6} {'failed':>7} {'order err':>10}")
+    print("-" * 79)
+
+    for workers in args.workers:
+        # The handlers log every event - keep the table readable
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = replay(events, workers, args.latency_ms / 1000, args.duplicates)
+        print(f"{workers:>8} {result['ack_p50']:>11.2f} {result['ack_p95']:>11.2f} {result['elapsed_s']:>10.2f} "
+              f"{result['events_per_s']:>9.0f} {result['outcomes'].get('duplicate', 0):>6} "
+              f"{result['failed']:>7} {result['order_violations']:>10}")
+
+
+if __name__ == "__main__":
+    main()
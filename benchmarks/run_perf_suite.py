@@ -0,0 +1,71 @@
+"""
+Hot-path Benchmark Suite
+Runs benchmarks/perf (pytest-benchmark) over the commission engine's hot
+paths - transaction balances, dashboard metrics, statement matching,
+pending renewals, formula display, customer matching, the carrier
+reconciler and agency statement attribution - on synthetic books of
+increasing size, headless (Streamlit stubbed, FakeSupabase database).
+
+Baselines are stored per machine under benchmarks/perf/.baselines (not
+committed - timings only compare on the same hardware). Save one on the
+commit you trust, then compare later runs against it; the run fails when
+any benchmark's mean is more than --threshold percent slower.
+
+Requires: pip install pytest-benchmark
+
+Run: python benchmarks/run_perf_suite.py --save-baseline       # record the baseline
+     python benchmarks/run_perf_suite.py [--threshold 20]      # compare, fail on regressions
+     python benchmarks/run_perf_suite.py --sizes 1000 10000 100000 --rounds 1 -k dashboard
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+PERF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf')
+STORAGE = os.path.join(PERF_DIR, '.baselines')
+BASELINE_NAME = 'baseline'
+
+
+def has_baseline() -> bool:
+    for _, _, files in os.walk(STORAGE):
+        if any(name.endswith(f"_{BASELINE_NAME}.json") for name in files):
+            return True
+    return False
+
+
+def build_command(args, extra) -> list:
+    command = [sys.executable, '-m', 'pytest', PERF_DIR, '-q',
+               f"--benchmark-storage=file://{STORAGE}",
+               f"--perf-rounds={args.rounds}",
+               '--benchmark-columns=min,mean,max,stddev,rounds',
+               '--benchmark-sort=fullname']
+    if args.k:
+        command += ['-k', args.k]
+    if args.save_baseline:
+        command.append(f"--benchmark-save={BASELINE_NAME}")
+    elif has_baseline():
+        command += [f"--benchmark-compare=*_{BASELINE_NAME}",
+                    f"--benchmark-compare-fail=mean:{args.threshold}%"]
+    else:
+        print(f"No baseline in {STORAGE} yet - run with --save-baseline first. Timing only.")
+    return command + extra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Commission engine hot-path benchmarks")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--threshold', type=int, default=20,
+                        help="Fail when a benchmark's mean regresses by more than this percent")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 3000], help="Ledger rows per book")
+    parser.add_argument('--rounds', type=int, default=3, help="Timed rounds per benchmark")
+    parser.add_argument('-k', help="pytest -k expression selecting benchmarks")
+    args, extra = parser.parse_known_args()
+
+    env = dict(os.environ, PERF_SIZES=','.join(str(size) for size in args.sizes))
+    return subprocess.call(build_command(args, extra), cwd=PERF_DIR, env=env)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,6 @@
+from utils import startup_profiler
+startup_profiler.start()  # No-op unless AMS_PROFILE_STARTUP=1
+
 import streamlit as st
 import datetime  # Import the full datetime module
 from datetime import datetime as dt
@@ -11,12 +14,7 @@ st.set_page_config(
     initial_sidebar_state="collapsed"  # Start collapsed on mobile
 )
 
-# Show a simple loading message immediately
-if 'imports_loaded' not in st.session_state:
-    st.info("🔄 Loading Commission Tracker... This may take up to 20 seconds on first startup.")
-    st.session_state.imports_loaded = True
-
-# Show loading screen during initial app load
+# Show loading screen during initial app load; it is cleared once the app renders
 # Check if this is the first load (no session state initialized yet)
 if 'app_initialized' not in st.session_state:
     loading_placeholder = st.empty()
@@ -72,8 +70,6 @@ if 'app_initialized' not in st.session_state:
     
     # Mark app as initialized so loading screen won't show on reruns
     st.session_state.app_initialized = True
-    # Force a rerun to clear the loading screen and show the app
-    st.rerun()
 else:
     # Create empty placeholder for consistency
     loading_placeholder = st.empty()
@@ -137,7 +133,6 @@ from supabase import create_client, Client
 from dotenv import load_dotenv
 import hashlib
 import re
-import plotly.express as px
 from data_validation_utils import (
     check_data_availability, show_empty_state, safe_column_access,
     safe_filter_contains, safe_groupby, validate_commission_data
@@ -155,19 +150,15 @@ load_dotenv()
 # datetime and json already imported at top
 import time
 import io
-import streamlit_sortables
 import os
-import pdfplumber
 import shutil
 import uuid
-import pytz
 from pathlib import Path
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
+# plotly, streamlit_sortables and stripe are imported where they're used - together they
+# cost about a second at startup and most sessions never reach those features
 from user_column_mapping_db import (
     user_column_mapper as column_mapper, get_mapped_column, 
-    get_reverse_mapping, save_column_mapping,
+    get_reverse_mapping, save_column_mapping, get_mapping_version,
     get_ui_field_name, is_calculated_field, safe_column_reference
 )
 from user_preferences_db import user_preferences, get_color_theme, set_color_theme
@@ -178,11 +169,30 @@ from user_mappings_db import user_mappings
 from user_prl_templates_db import user_prl_templates
 # from utils.styling_minimal import apply_css  # Temporarily disabled for mobile testing
 from database_utils import get_supabase_client
-import stripe
+from utils.editor_changes import diff_editor_frames, save_editor_changes
+from utils.excel_export import write_excel_workbook, coerce_currency_strings, prl_row_styles
+from utils.policy_terms import PolicyTermIndex, term_subtotals, is_reconciliation_id
+from utils.prl_aggregation import get_aggregated_policies, invalidate_aggregated_policies
+from utils.bulk_renewal import (
+    RENEWAL_CLEARED_FIELDS, bulk_renew_policies, duplicate_for_renewal as duplicate_renewal_terms
+)
+from utils.renewal_pipeline import bucket_counts, invalidate_renewal_pipeline
+from utils.statement_cache import load_statement
+from utils import render_profiler
+from utils.render_profiler import profiled
+from commission_core import (
+    Diagnostics, apply_formula_display, count_total_rows, find_potential_customer_matches, normalize_business_name,
+    total_row_mask,
+    calculate_commission as core_calculate_commission,
+    calculate_dashboard_metrics as core_dashboard_metrics,
+    calculate_transaction_balances as core_transaction_balances,
+    get_pending_renewals as core_pending_renewals,
+    match_statement_transactions as core_match_statement
+)
+startup_profiler.checkpoint('imports done')
 
-# Configure Stripe (only for production environment)
+# Stripe settings (only for production environment); the API key is set where stripe is imported
 if os.getenv("APP_ENVIRONMENT") == "PRODUCTION":
-    stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
     STRIPE_PRICE_ID = os.getenv("STRIPE_PRICE_ID")  # Your Agent Commission Tracker price ID
     RENDER_APP_URL = "https://commission-tracker-app.onrender.com"  # Your Render app URL
 
@@ -633,6 +643,7 @@ def ensure_user_id():
             print(f"Error ensuring user_id: {e}")
             # Don't crash the app if user_id lookup fails
 
+@profiled('data load')
 def load_policies_data():
     """Load policies data from Supabase - filtered by current user. NO CACHING to prevent data leaks."""
     try:
@@ -709,9 +720,11 @@ def load_policies_data():
         return pd.DataFrame()
 
 def clear_policies_cache():
-    """Clear the policies data cache - no longer needed since we removed caching."""
+    """Clear the policies data cache, the cached renewal pipelines and PRL aggregations."""
     if 'policies_data' in st.session_state:
         del st.session_state['policies_data']
+    invalidate_renewal_pipeline()
+    invalidate_aggregated_policies()
 
 def format_date_value(date_value, format='%m/%d/%Y'):
     """Safely format a date value to MM/DD/YYYY string format.
@@ -797,203 +810,12 @@ def style_special_transactions(df):
     else:
         return df
 
+@profiled('transform')
 def calculate_dashboard_metrics(df):
-    """Calculate dashboard metrics with reconciled vs unreconciled YTD 2025 focus."""
-    # Initialize default metrics
-    metrics = {
-        # Transaction metrics
-        'total_transactions': 0,
-        'transactions_this_month': 0,
-        'stmt_transactions': 0,
-        
-        # Policy metrics (unique policy numbers)
-        'unique_policies': 0,
-        'active_policies': 0,
-        'cancelled_policies': 0,
-        
-        # Financial totals (all time, not just YTD)
-        'premium_sold_total': 0.0,
-        'agent_comm_paid_total': 0.0,
-        'agent_comm_due_total': 0.0
-    }
-    
-    # Return default metrics if no data
-    if df is None or df.empty:
-        return metrics
-    
-    # Update total transactions
-    metrics['total_transactions'] = len(df)
-    
-    if df.empty:
-        return metrics
-    
-    # Transaction counts
-    metrics['total_transactions'] = len(df)
-    
-    # Current month transactions
-    if 'Effective Date' in df.columns:
-        try:
-            df['Effective Date'] = pd.to_datetime(df['Effective Date'], errors='coerce')
-            current_month = datetime.datetime.now().month
-            current_year = datetime.datetime.now().year
-            metrics['transactions_this_month'] = len(df[(df['Effective Date'].dt.month == current_month) & 
-                                                       (df['Effective Date'].dt.year == current_year)])
-        except:
-            pass
-    
-    # STMT transactions
-    if 'Transaction Type' in df.columns:
-        metrics['stmt_transactions'] = len(df[df['Transaction Type'].str.startswith('-', na=False)])
-    
-    # Unique policy count
-    if 'Policy Number' in df.columns:
-        metrics['unique_policies'] = df['Policy Number'].nunique()
-        
-        # Calculate active vs cancelled policies
-        if not df.empty and 'Transaction Type' in df.columns:
-            # Strip whitespace from Policy Number to avoid duplicate policy counts
-            if 'Policy Number' in df.columns:
-                df['Policy Number'] = df['Policy Number'].astype(str).str.strip()
-            # Get latest transaction for each policy
-            latest_trans = df.sort_values('Effective Date').groupby('Policy Number').last()
-            metrics['active_policies'] = len(latest_trans[~latest_trans['Transaction Type'].isin(['CAN', 'XCL'])])
-            metrics['cancelled_policies'] = len(latest_trans[latest_trans['Transaction Type'].isin(['CAN', 'XCL'])])
-    
-    # Financial totals (all time, not restricted to any year)
-    # Calculate total premium sold from all original transactions
-    original_mask = pd.Series(True, index=df.index)
-    if 'Transaction ID' in df.columns:
-        # Exclude reconciliation entries
-        original_mask = ~df['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False, regex=True)
-    
-    df_originals = df[original_mask]
-    if 'Premium Sold' in df_originals.columns:
-        metrics['premium_sold_total'] = df_originals['Premium Sold'].sum()
-    
-    # Calculate total agent commission paid (from all -STMT- entries)
-    stmt_mask = pd.Series(False, index=df.index)
-    if 'Transaction ID' in df.columns:
-        stmt_mask = df['Transaction ID'].str.contains('-STMT-', na=False)
-    
-    df_stmt = df[stmt_mask]
-    if 'Agent Paid Amount (STMT)' in df_stmt.columns:
-        metrics['agent_comm_paid_total'] = df_stmt['Agent Paid Amount (STMT)'].sum()
-    
-    # Calculate total commission due using balance approach
-    try:
-        # Get all transactions with their balances
-        trans_with_balance = calculate_transaction_balances(df)
-        
-        # Sum all positive balances (what's still owed)
-        if '_balance' in trans_with_balance.columns:
-            unpaid_balances = trans_with_balance[trans_with_balance['_balance'] > 0]
-            metrics['agent_comm_due_total'] = unpaid_balances['_balance'].sum()
-        else:
-            # If _balance column doesn't exist, use fallback
-            raise Exception("_balance column not found")
-    except Exception as e:
-        # Fallback calculation if balance function fails
-        # Simple calculation: Total earned - Total paid
-        total_earned = 0
-        total_paid = 0
-        
-        # Calculate total earned from original transactions
-        if 'Total Agent Comm' in df_originals.columns:
-            total_earned = df_originals['Total Agent Comm'].sum()
-        elif 'Agent Estimated Comm $' in df_originals.columns:
-            # Fallback if Total Agent Comm doesn't exist
-            total_earned = df_originals['Agent Estimated Comm $'].sum()
-            if 'Broker Fee Agent Comm' in df_originals.columns:
-                total_earned += df_originals['Broker Fee Agent Comm'].sum()
-        
-        # Total paid is already calculated
-        total_paid = metrics['agent_comm_paid_total']
-        
-        # Commission due is earned minus paid
-        metrics['agent_comm_due_total'] = max(0, total_earned - total_paid)
-    
-    # Keep the existing date-based calculations below for other uses
-    if 'Effective Date' in df.columns:
-        try:
-            df['Effective Date'] = pd.to_datetime(df['Effective Date'], errors='coerce')
-            
-            # For reconciled metrics, we need -STMT- entries from 2025 and their matching originals (which could be from any year)
-            # First, get all -STMT- entries from 2025 for commission paid amounts
-            stmt_mask = pd.Series(False, index=df.index)
-            if 'Transaction ID' in df.columns:
-                stmt_mask = df['Transaction ID'].str.contains('-STMT-', na=False)
-            
-            # Filter -STMT- entries to only 2025 (based on statement date)
-            df_stmt_all = df[stmt_mask]
-            df_stmt_2025 = df_stmt_all[df_stmt_all['Effective Date'].dt.year == 2025]
-            
-            # Get ALL original transactions (from any year, exclude -STMT-, -VOID-, -ADJ-)
-            original_mask = pd.Series(True, index=df.index)
-            if 'Transaction ID' in df.columns:
-                original_mask = ~df['Transaction ID'].str.contains('-STMT-|-VOID-|-ADJ-', na=False)
-            
-            df_originals = df[original_mask]
-            
-            # Now filter originals to only 2025 for unreconciled calculations
-            df_originals_2025 = df_originals[df_originals['Effective Date'].dt.year == 2025]
-            
-            # The issue: -STMT- entries from 2025 might be paying for policies from any year
-            # So we need to track which transactions (from any year) have been paid in 2025
-            
-            # Step 1: Get all -STMT- entries from 2025 (payments made in 2025)
-            # These use STMT DATE for when payment was made
-            df_stmt_2025_by_stmt_date = pd.DataFrame()
-            if 'STMT DATE' in df_stmt_all.columns:
-                df_stmt_all['STMT DATE'] = pd.to_datetime(df_stmt_all['STMT DATE'], errors='coerce', format='mixed')
-                df_stmt_2025_by_stmt_date = df_stmt_all[df_stmt_all['STMT DATE'].dt.year == 2025]
-            
-            # If no STMT DATE column, fall back to Effective Date
-            if df_stmt_2025_by_stmt_date.empty:
-                df_stmt_2025_by_stmt_date = df_stmt_2025
-            
-            # Step 2: Find which original transactions these -STMT- entries paid for
-            reconciled_in_2025 = set()
-            if not df_stmt_2025_by_stmt_date.empty and all(col in df_stmt_2025_by_stmt_date.columns for col in ['Policy Number', 'Effective Date']):
-                for _, stmt_row in df_stmt_2025_by_stmt_date.iterrows():
-                    policy = stmt_row.get('Policy Number', '')
-                    eff_date = pd.to_datetime(stmt_row.get('Effective Date'), errors='coerce')
-                    if policy and pd.notna(eff_date):
-                        reconciled_in_2025.add((policy, eff_date))
-            
-            # Step 3: Find original transactions that were paid in 2025
-            paid_in_2025_mask = pd.Series(False, index=df_originals.index)
-            if reconciled_in_2025 and all(col in df_originals.columns for col in ['Policy Number', 'Effective Date']):
-                for idx, row in df_originals.iterrows():
-                    policy = row.get('Policy Number', '')
-                    eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
-                    if (policy, eff_date) in reconciled_in_2025:
-                        paid_in_2025_mask.loc[idx] = True
-            
-            # Step 4: Calculate metrics
-            df_originals_paid_in_2025 = df_originals[paid_in_2025_mask]
-            df_originals_2025_unpaid = df_originals_2025[~df_originals_2025.index.isin(df_originals_paid_in_2025.index)]
-            
-            # Premium from transactions paid in 2025 (regardless of their effective date)
-            if 'Premium Sold' in df_originals_paid_in_2025.columns:
-                metrics['premium_reconciled_ytd'] = df_originals_paid_in_2025['Premium Sold'].sum()
-            
-            # Agent commission actually paid in 2025
-            if 'Agent Paid Amount (STMT)' in df_stmt_2025_by_stmt_date.columns:
-                metrics['agent_comm_paid_ytd'] = df_stmt_2025_by_stmt_date['Agent Paid Amount (STMT)'].sum()
-            
-            # Unreconciled = 2025 originals that haven't been paid yet
-            if 'Premium Sold' in df_originals_2025_unpaid.columns:
-                metrics['premium_unreconciled_ytd'] = df_originals_2025_unpaid['Premium Sold'].sum()
-            # Use Total Agent Comm to include broker fees
-            if 'Total Agent Comm' in df_originals_2025_unpaid.columns:
-                metrics['agent_comm_estimated_ytd'] = df_originals_2025_unpaid['Total Agent Comm'].sum()
-            elif 'Agent Estimated Comm $' in df_originals_2025_unpaid.columns:
-                # Fallback to Agent Estimated Comm $ if Total Agent Comm doesn't exist
-                metrics['agent_comm_estimated_ytd'] = df_originals_2025_unpaid['Agent Estimated Comm $'].sum()
-        except Exception as e:
-            # If date parsing fails, fall back to zero
-            pass
-    
+    """Calculate dashboard metrics with reconciled vs unreconciled YTD 2025 focus (commission_core.metrics)."""
+    diagnostics = new_diagnostics()
+    metrics = core_dashboard_metrics(df, diagnostics=diagnostics)
+    render_diagnostics(diagnostics)
     return metrics
 
 def log_debug(message, level="INFO", error_obj=None):
@@ -1023,6 +845,72 @@ def clear_debug_logs():
     """Clear all debug logs."""
     st.session_state.debug_logs = []
 
+def is_debug_mode():
+    """Calculation diagnostics are on (Admin Panel > Debug Logs toggle, or COMMISSION_DEBUG=1)."""
+    return bool(st.session_state.get('debug_mode', False)) or os.getenv('COMMISSION_DEBUG') == '1'
+
+def new_diagnostics():
+    """Diagnostics collector for a commission_core call, detailed only in debug mode."""
+    return Diagnostics(enabled=is_debug_mode())
+
+def render_diagnostics(diagnostics):
+    """Show commission_core notices, plus the debug sections when they were collected."""
+    for notice in diagnostics.notices:
+        getattr(st, notice.level)(notice.message)
+
+    for section in diagnostics.sections:
+        with st.expander(section.title, expanded=False):
+            for item in section.items:
+                if item.kind == 'markdown':
+                    st.markdown(item.value)
+                elif item.kind == 'text':
+                    st.text(item.value)
+                elif item.kind == 'table':
+                    st.dataframe(item.value)
+                elif item.kind == 'json':
+                    st.json(item.value)
+                else:
+                    getattr(st, item.kind)(item.value)
+
+def data_editor(data, **kwargs):
+    """st.data_editor, timed as an 'editor' span when render profiling is on."""
+    with render_profiler.span(f"st.data_editor {kwargs.get('key', '')}".strip(), 'editor'):
+        return st.data_editor(data, **kwargs)
+
+def show_render_profile_panel(page):
+    """Sidebar breakdown of the page's last profiled render, plus rolling per-page stats."""
+    history = render_profiler.page_history(st.session_state, page)
+    with st.sidebar.expander("⏱️ Render profile", expanded=False):
+        if not history:
+            st.caption("No profiled render of this page yet - interact with it to record one.")
+            return
+        last = history[-1]
+        st.caption(f"Last render: {last['total_ms']:.0f} ms, {last['supabase_calls']} Supabase calls, "
+                   f"{last['supabase_bytes'] / 1024:.1f} KB"
+                   + ("" if last['completed'] else " (cut short by st.rerun / st.stop)"))
+        flame = render_profiler.flame_rows(last)
+        try:
+            import plotly.graph_objects as go
+            fig = go.Figure(go.Icicle(
+                ids=flame['ids'], labels=flame['labels'], parents=flame['parents'],
+                values=flame['values'], branchvalues='total', tiling={'orientation': 'v'},
+                hovertext=flame['categories'],
+            ))
+            fig.update_layout(margin=dict(t=0, l=0, r=0, b=0), height=320)
+            st.plotly_chart(fig, use_container_width=True)
+        except Exception as e:
+            print(f"Render profile chart error: {e}")
+        st.dataframe(pd.DataFrame([{
+            'Block': '  ' * span['depth'] + span['name'],
+            'Kind': span['category'],
+            'ms': span['ms'],
+            'Supabase calls': span['supabase_calls'],
+            'KB': round(span['supabase_bytes'] / 1024, 1),
+        } for span in last['spans']]), hide_index=True, use_container_width=True)
+        st.markdown("**All pages (rolling)**")
+        st.dataframe(pd.DataFrame(render_profiler.summarize_history(st.session_state)),
+                     hide_index=True, use_container_width=True)
+
 def is_reconciliation_transaction(transaction_id):
     """
     Check if transaction is a reconciliation entry that should be locked.
@@ -1219,135 +1107,6 @@ def get_transaction_type_codes():
         # Return default types on error
         return ["NEW", "RWL", "END", "CAN", "PMT", "XCL", "XLC"]
 
-def apply_formula_display(df, show_formulas=True):
-    """
-    Apply formula calculations to existing columns with indicators.
-    Optionally shows formulas or actual values based on toggle.
-    """
-    if df.empty:
-        return df
-    
-    df = df.copy()
-    
-    # Store original values for comparison
-    df['_original_agency'] = df['Agency Estimated Comm/Revenue (CRM)'].copy()
-    df['_original_agent'] = df['Agent Estimated Comm $'].copy()
-    
-    if show_formulas:
-        # Calculate Commissionable Premium (Premium Sold - Policy Taxes & Fees)
-        df['Commissionable Premium'] = df.apply(
-            lambda row: (
-                float(row.get('Premium Sold', 0) or 0) - float(row.get('Policy Taxes & Fees', 0) or 0)
-            ),
-            axis=1
-        )
-        
-        # Calculate formula values using Commissionable Premium
-        df['_formula_agency'] = df.apply(
-            lambda row: (
-                0.0 if pd.isna(row.get('Commissionable Premium', 0)) or pd.isna(row.get('Policy Gross Comm %', 0))
-                else float(row.get('Commissionable Premium', 0) or 0) * float(row.get('Policy Gross Comm %', 0) or 0) / 100
-            ),
-            axis=1
-        )
-        
-        # Get agent commission rate based on transaction type
-        def get_agent_rate(row):
-            trans_type = row.get('Transaction Type', '')
-            if trans_type in ['NEW', 'NBS', 'STL', 'BoR']:
-                return 50.0
-            elif trans_type in ['RWL', 'REWRITE']:
-                return 25.0
-            elif trans_type in ['CAN', 'XCL']:
-                return 0.0
-            elif trans_type in ['END', 'PCH']:
-                # Check if new business or renewal based on dates
-                if row.get('Policy Origination Date') == row.get('Effective Date'):
-                    return 50.0
-                else:
-                    return 25.0
-            else:
-                # Default to agent comm rate if available
-                agent_rate = row.get('Agent Comm %', 0)
-                if agent_rate and agent_rate < 1:
-                    return agent_rate * 100  # Convert decimal to percentage
-                return agent_rate or 0
-        
-        # Calculate Agent formula
-        df['_formula_agent'] = df.apply(
-            lambda row: (
-                row['_formula_agency'] * get_agent_rate(row) / 100
-            ),
-            axis=1
-        )
-        
-        # Calculate Broker Fee Agent Commission (always 50%)
-        df['Broker Fee Agent Comm'] = df.apply(
-            lambda row: (
-                float(row.get('Broker Fee', 0) or 0) * 0.50
-            ),
-            axis=1
-        )
-        
-        # Calculate Total Agent Commission
-        df['Total Agent Comm'] = df.apply(
-            lambda row: round(
-                row['_formula_agent'] + row['Broker Fee Agent Comm'], 2
-            ),
-            axis=1
-        )
-        
-        # Apply formulas to display columns
-        df['Agency Estimated Comm/Revenue (CRM)'] = df['_formula_agency'].round(2)
-        df['Agent Estimated Comm $'] = df['_formula_agent'].round(2)
-        
-        # Add indicators based on variance
-        df['_agency_indicator'] = df.apply(
-            lambda row: (
-                '🔒' if row.get('Transaction ID', '').find('-STMT-') >= 0 or 
-                       row.get('Transaction ID', '').find('-VOID-') >= 0 or
-                       row.get('Transaction ID', '').find('-ADJ-') >= 0
-                else '⚠️' if pd.isna(row.get('Premium Sold')) or pd.isna(row.get('Policy Gross Comm %')) or
-                             row.get('Premium Sold', 0) == 0 or row.get('Policy Gross Comm %', 0) == 0
-                else '✏️' if abs(float(row.get('_original_agency', 0) or 0) - row['_formula_agency']) > 0.01
-                else '✓'
-            ),
-            axis=1
-        )
-        
-        df['_agent_indicator'] = df.apply(
-            lambda row: (
-                '🔒' if row.get('Transaction ID', '').find('-STMT-') >= 0 or 
-                       row.get('Transaction ID', '').find('-VOID-') >= 0 or
-                       row.get('Transaction ID', '').find('-ADJ-') >= 0
-                else '⚠️' if pd.isna(row.get('Premium Sold')) or pd.isna(row.get('Policy Gross Comm %')) or
-                             row.get('Premium Sold', 0) == 0 or row.get('Policy Gross Comm %', 0) == 0
-                else '✏️' if abs(float(row.get('_original_agent', 0) or 0) - row['_formula_agent']) > 0.01
-                else '✓'
-            ),
-            axis=1
-        )
-        
-        # Format display with indicators
-        df['Agency Estimated Comm/Revenue (CRM)'] = df.apply(
-            lambda row: f"${row['Agency Estimated Comm/Revenue (CRM)']:.2f} {row['_agency_indicator']}",
-            axis=1
-        )
-        
-        df['Agent Estimated Comm $'] = df.apply(
-            lambda row: f"${row['Agent Estimated Comm $']:.2f} {row['_agent_indicator']}",
-            axis=1
-        )
-    
-    # Clean up temporary columns
-    temp_cols = ['_original_agency', '_original_agent', '_formula_agency', '_formula_agent', 
-                 '_agency_indicator', '_agent_indicator']
-    for col in temp_cols:
-        if col in df.columns:
-            df = df.drop(columns=[col])
-    
-    return df
-
 @st.cache_data
 def get_custom_css():
     """Get cached CSS for better performance."""
@@ -2135,6 +1894,7 @@ def load_mgas_for_carrier(carrier_id):
         return []
 
 # --- Excel Utility Functions ---
+@profiled('export')
 def create_formatted_excel_file(data, sheet_name="Data", filename_prefix="export"):
     """
     Create a formatted Excel file from DataFrame with professional styling.
@@ -2153,68 +1913,24 @@ def create_formatted_excel_file(data, sheet_name="Data", filename_prefix="export
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{filename_prefix}_{timestamp}.xlsx"
         
-        # Create Excel buffer
-        excel_buffer = io.BytesIO()
+        # Currency columns get a column-level number format
+        currency_columns = ['Commission_Paid', 'Agency_Commission_Received', 'Balance_Due', 
+                          'Agency Estimated Comm/Revenue (CRM)', 'Premium_Amount']
         
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            # Write data to Excel
-            data.to_excel(writer, sheet_name=sheet_name, index=False)
-            
-            # Get workbook and worksheet for formatting
-            workbook = writer.book
-            worksheet = writer.sheets[sheet_name]
-            
-            # Define styles
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            header_alignment = Alignment(horizontal="center", vertical="center")
-            
-            # Format headers
-            for cell in worksheet[1]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = header_alignment
-            
-            # Auto-adjust column widths
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                
-                # Set column width with reasonable limits
-                adjusted_width = min(max_length + 2, 30)
-                worksheet.column_dimensions[column_letter].width = max(adjusted_width, 10)
-            
-            # Format currency columns
-            currency_columns = ['Commission_Paid', 'Agency_Commission_Received', 'Balance_Due', 
-                              'Agency Estimated Comm/Revenue (CRM)', 'Premium_Amount']
-            
-            for col_name in currency_columns:
-                if col_name in data.columns:
-                    col_letter = None
-                    for col_num, column_name in enumerate(data.columns, 1):
-                        if column_name == col_name:
-                            col_letter = openpyxl.utils.get_column_letter(col_num)
-                            break
-                    
-                    if col_letter:
-                        for row_num in range(2, len(data) + 2):  # Start from row 2 (after header)
-                            cell = worksheet[f"{col_letter}{row_num}"]
-                            cell.number_format = '"$"#,##0.00'
+        # Stream rows with constant memory; widths are estimated from a sample
+        excel_buffer = write_excel_workbook([{
+            'name': sheet_name,
+            'data': data,
+            'currency_columns': currency_columns,
+        }])
         
-        excel_buffer.seek(0)
         return excel_buffer, filename
         
     except Exception as e:
         st.error(f"Error creating Excel file: {e}")
         return None, None
 
+@profiled('export')
 def create_multi_sheet_excel(data_dict, filename_prefix="multi_sheet_export"):
     """
     Create Excel file with multiple sheets and metadata.
@@ -2231,73 +1947,47 @@ def create_multi_sheet_excel(data_dict, filename_prefix="multi_sheet_export"):
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"{filename_prefix}_{timestamp}.xlsx"
         
-        excel_buffer = io.BytesIO()
-        
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            # Create metadata sheet first
-            metadata = pd.DataFrame([
-                ['Export Date', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
-                ['Application', 'Commission Management System'],
-                ['Export Type', 'Multi-Sheet Report'],
-                ['Total Sheets', len(data_dict)],
-                ['Sheet Names', ', '.join(data_dict.keys())]
-            ], columns=['Parameter', 'Value'])
-            
-            metadata.to_excel(writer, sheet_name='Export Info', index=False)
-            
-            # Format metadata sheet
-            workbook = writer.book
-            metadata_sheet = writer.sheets['Export Info']
-            
-            # Style metadata headers
-            header_font = Font(bold=True, color="FFFFFF")
-            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-            
-            for cell in metadata_sheet[1]:
-                cell.font = header_font
-                cell.fill = header_fill
-                cell.alignment = Alignment(horizontal="center")
-            
-            # Auto-adjust metadata columns
-            metadata_sheet.column_dimensions['A'].width = 25
-            metadata_sheet.column_dimensions['B'].width = 50
-            
-            # Add data sheets
-            for sheet_name, data in data_dict.items():
-                if not data.empty:
-                    data.to_excel(writer, sheet_name=sheet_name, index=False)
-                    
-                    # Format data sheet
-                    worksheet = writer.sheets[sheet_name]
-                    
-                    # Format headers
-                    for cell in worksheet[1]:
-                        cell.font = header_font
-                        cell.fill = header_fill
-                        cell.alignment = Alignment(horizontal="center")
-                    
-                    # Auto-adjust columns
-                    for column in worksheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        
-                        adjusted_width = min(max_length + 2, 30)
-                        worksheet.column_dimensions[column_letter].width = max(adjusted_width, 10)
+        # Create metadata sheet first
+        metadata = pd.DataFrame([
+            ['Export Date', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+            ['Application', 'Commission Management System'],
+            ['Export Type', 'Multi-Sheet Report'],
+            ['Total Sheets', str(len(data_dict))],
+            ['Sheet Names', ', '.join(data_dict.keys())]
+        ], columns=['Parameter', 'Value'])
+        
+        sheets = [{'name': 'Export Info', 'data': metadata, 'widths': [25, 50]}]
+        
+        # Add data sheets
+        for sheet_name, data in data_dict.items():
+            if not data.empty:
+                sheets.append({'name': sheet_name, 'data': data})
+        
+        excel_buffer = write_excel_workbook(sheets)
         
-        excel_buffer.seek(0)
         return excel_buffer, filename
         
     except Exception as e:
         st.error(f"Error creating multi-sheet Excel file: {e}")
         return None, None
 
+@profiled('data load')
+def load_uploaded_statement(uploaded_file, state_key):
+    """
+    Parsed statement for an uploaded file. The frame is kept in session state
+    for the upload (reruns don't parse again) and in the on-disk statement
+    cache (re-uploading the same file doesn't either).
+    """
+    upload_id = getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    parsed = st.session_state.get(state_key)
+    if parsed is not None and parsed[0] == upload_id:
+        return parsed[1].copy()
+
+    df = load_statement(uploaded_file.getvalue(), uploaded_file.name)
+    st.session_state[state_key] = (upload_id, df)
+    return df.copy()
+
+
 def validate_excel_import(uploaded_file):
     """
     Validate uploaded Excel file and return DataFrame with validation results.
@@ -2404,141 +2094,25 @@ def validate_excel_import(uploaded_file):
 
 # --- Commission calculation function ---
 def calculate_commission(row):
-    try:
-        agency_revenue_col = get_mapped_column("Agency Estimated Comm/Revenue (CRM)")
-        revenue = float(row[agency_revenue_col]) if agency_revenue_col and row[agency_revenue_col] is not None else 0.0
-    except (ValueError, TypeError, KeyError):
-        revenue = 0.0
-    
-    transaction_type_col = get_mapped_column("Transaction Type")
-    policy_orig_col = get_mapped_column("Policy Origination Date") 
-    effective_date_col = get_mapped_column("Effective Date")
-    
-    try:
-        transaction_type = row.get(transaction_type_col, "") if transaction_type_col else ""
-        if transaction_type in ["NEW", "NBS", "STL", "BoR"]:
-            return revenue * 0.50
-        elif transaction_type in ["END", "PCH"]:
-            policy_orig = row.get(policy_orig_col, "") if policy_orig_col else ""
-            effective_date = row.get(effective_date_col, "") if effective_date_col else ""
-            return revenue * 0.50 if policy_orig == effective_date else revenue * 0.25
-        elif transaction_type in ["RWL", "REWRITE"]:
-            return revenue * 0.25
-        elif transaction_type in ["CAN", "XCL"]:
-            return 0
-        else:
-            return revenue * 0.25
-    except (KeyError, TypeError):
-        return revenue * 0.25
+    """Agent commission for a row, through the user's column mapping (commission_core.formulas)."""
+    return core_calculate_commission(row, get_mapped_column)
 
+@profiled('transform')
 def get_pending_renewals(df: pd.DataFrame, debug=False) -> pd.DataFrame:
     """
     Identifies and generates a DataFrame of policies pending renewal.
-    Excludes policies that have already been renewed (appear in Prior Policy Number of another policy).
-    Shows ALL past-due renewals (no lower limit) and future renewals up to 90 days.
+    Excludes policies that have already been renewed (appear in Prior Policy Number of another policy)
+    or cancelled. Shows ALL past-due renewals (no lower limit) and future renewals up to 365 days.
+
+    The latest-term-per-policy table comes from the shared renewal pipeline
+    engine and is cached per user until the ledger changes.
     """
-    debug_info = {}
-    
-    # Filter for relevant transaction types
-    all_policies = df[df[get_mapped_column("Transaction Type")].isin(["NEW", "RWL", "REWRITE"])]
-    
-    # IMPORTANT: Exclude STMT, VOID, and ADJ transactions BEFORE deduplication
-    # These are not real policy transactions and should never be considered for renewals
-    if 'Transaction ID' in all_policies.columns:
-        all_policies = all_policies[
-            ~all_policies['Transaction ID'].astype(str).str.contains('-STMT-|-VOID-|-ADJ-', case=False, na=False)
-        ]
-    
-    renewal_candidates = all_policies.copy()
-    
-    if debug:
-        debug_info['total_new_rwl_rewrite'] = len(all_policies)
-        # Check for Gratia Coffee specifically
-        gratia_policies = all_policies[all_policies['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_total'] = len(gratia_policies)
-        if not gratia_policies.empty:
-            debug_info['gratia_policies'] = gratia_policies[['Transaction ID', 'Policy Number', 'Transaction Type', 'X-DATE']].to_dict('records')
-    
-    # Convert date columns to datetime objects
-    renewal_candidates['expiration_date'] = pd.to_datetime(renewal_candidates[get_mapped_column("X-DATE")], errors='coerce')
-    
-    # Sort by policy number and expiration date to find the latest transaction
-    renewal_candidates = renewal_candidates.sort_values(by=["Policy Number", "expiration_date"], ascending=[True, False])
-    
-    # Get the most recent transaction for each policy
-    latest_renewals = renewal_candidates.drop_duplicates(subset="Policy Number", keep="first")
-    
-    if debug:
-        debug_info['after_dedup'] = len(latest_renewals)
-        gratia_after_dedup = latest_renewals[latest_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_after_dedup'] = len(gratia_after_dedup)
-    
-    # Calculate days until expiration for each policy
-    today = pd.to_datetime(datetime.date.today())
-    latest_renewals['Days Until Expiration'] = (latest_renewals['expiration_date'] - today).dt.days
-    
-    # Filter for policies expiring within 365 days OR already expired (no lower limit on past due)
-    # This will show ALL past-due renewals and future renewals up to 1 year
-    # Changed from 90 to 365 days to show more pending renewals
-    pending_renewals = latest_renewals[latest_renewals['Days Until Expiration'] <= 365].copy()
-    
-    if debug:
-        debug_info['after_date_filter'] = len(pending_renewals)
-        gratia_after_date = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_after_date_filter'] = len(gratia_after_date)
-    
-    # Optional: Add a safeguard for very old policies (e.g., more than 1 year past due)
-    # Uncomment if needed: pending_renewals = pending_renewals[pending_renewals['Days Until Expiration'] > -365]
-    
-    # Get list of policy numbers that have been renewed (appear in Prior Policy Number field)
-    prior_policy_col = get_mapped_column("Prior Policy Number")
-    if prior_policy_col and prior_policy_col in df.columns:
-        # Get all policy numbers that appear as prior policies (meaning they've been renewed)
-        renewed_policies = df[df[prior_policy_col].notna()][prior_policy_col].unique()
-        if debug:
-            debug_info['renewed_policies'] = list(renewed_policies)[:10]  # Show first 10
-            # Check if Gratia policies are in renewed list
-            gratia_policy_nums = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]['Policy Number'].unique()
-            debug_info['gratia_in_renewed'] = [p for p in gratia_policy_nums if p in renewed_policies]
-        # Exclude these from pending renewals
-        pending_renewals = pending_renewals[~pending_renewals["Policy Number"].isin(renewed_policies)]
-        if debug:
-            debug_info['after_renewed_filter'] = len(pending_renewals)
-            gratia_after_renewed = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-            debug_info['gratia_after_renewed_filter'] = len(gratia_after_renewed)
-    
-    # Exclude policies that have been cancelled or excluded
-    # Check if any transaction for a policy number has type "CAN" or "XCL"
-    transaction_type_col = get_mapped_column("Transaction Type")
-    if transaction_type_col and transaction_type_col in df.columns:
-        # Get all policy numbers that have a CAN or XCL transaction
-        cancelled_policies = df[df[transaction_type_col].isin(["CAN", "XCL"])]["Policy Number"].unique()
-        if debug:
-            debug_info['cancelled_policies_count'] = len(cancelled_policies)
-            # Check if Gratia policies are cancelled
-            gratia_policy_nums = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]['Policy Number'].unique()
-            debug_info['gratia_in_cancelled'] = [p for p in gratia_policy_nums if p in cancelled_policies]
-        # Exclude these from pending renewals
-        pending_renewals = pending_renewals[~pending_renewals["Policy Number"].isin(cancelled_policies)]
-        if debug:
-            debug_info['after_cancelled_filter'] = len(pending_renewals)
-            gratia_after_cancelled = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-            debug_info['gratia_after_cancelled_filter'] = len(gratia_after_cancelled)
-    
-    # Sort by Days Until Expiration (ascending, so most past-due show first)
-    pending_renewals = pending_renewals.sort_values('Days Until Expiration', ascending=True)
-    
+    diagnostics = Diagnostics(enabled=debug)
+    pending_renewals = core_pending_renewals(
+        df, get_mapped_column, scope=get_user_session_key('renewal_pipeline'), diagnostics=diagnostics
+    )
     if debug:
-        debug_info['final_count'] = len(pending_renewals)
-        gratia_final = pending_renewals[pending_renewals['Customer'].str.contains('Gratia', case=False, na=False)]
-        debug_info['gratia_final_count'] = len(gratia_final)
-        if not gratia_final.empty:
-            debug_info['gratia_final_policies'] = gratia_final[['Transaction ID', 'Policy Number', 'Days Until Expiration']].to_dict('records')
-        
-        # Store debug info in session state for display
-        import streamlit as st
-        st.session_state['pending_renewals_debug'] = debug_info
-    
+        st.session_state['pending_renewals_debug'] = diagnostics.values['pending_renewals']
     return pending_renewals
 
 def style_renewal_rows(row):
@@ -2563,139 +2137,6 @@ def style_renewal_rows(row):
         # Normal (8+ days) - no special styling
         return [''] * len(row)
 
-def normalize_business_name(name):
-    """
-    Normalize business names by removing common suffixes and punctuation.
-    Helps match "RCM Construction" to "RCM Construction of SWFL LLC"
-    """
-    if not name:
-        return ""
-    
-    # Common business suffixes to remove
-    suffixes = [
-        'LLC', 'L.L.C.', 'L.L.C', 'Inc', 'Inc.', 'Incorporated',
-        'Corp', 'Corp.', 'Corporation', 'Ltd', 'Ltd.', 'Limited',
-        'PA', 'P.A.', 'PC', 'P.C.', 'PLLC', 'P.L.L.C.',
-        'LLP', 'L.L.P.', 'LP', 'L.P.', 'Company', 'Co.', 'Co'
-    ]
-    
-    # Convert to string and strip
-    normalized = str(name).strip()
-    
-    # Remove suffixes (case-insensitive)
-    for suffix in suffixes:
-        # Check both with and without leading comma
-        patterns = [
-            rf',?\s+{re.escape(suffix)}\s*$',
-            rf'\s+{re.escape(suffix)}\s*$'
-        ]
-        for pattern in patterns:
-            normalized = re.sub(pattern, '', normalized, flags=re.IGNORECASE)
-    
-    # Remove "of [Location]" patterns
-    normalized = re.sub(r'\s+of\s+[A-Z][A-Za-z\s]+(?:LLC|Inc|Corp)?$', '', normalized, flags=re.IGNORECASE)
-    
-    # Clean up extra whitespace and punctuation
-    normalized = ' '.join(normalized.split())
-    normalized = normalized.strip(' ,.-')
-    
-    return normalized
-
-def find_potential_customer_matches(search_name, existing_customers):
-    """
-    Find potential customer matches using various strategies.
-    Returns list of (customer_name, match_type, score) tuples.
-    """
-    if not search_name:
-        return []
-    
-    search_name_lower = search_name.lower().strip()
-    search_normalized = normalize_business_name(search_name).lower()
-    search_first_word = search_name.split()[0].lower() if search_name else ""
-    
-    # Handle "Last, First" format
-    search_name_reversed = ""
-    if "," in search_name:
-        parts = search_name.split(",", 1)
-        if len(parts) == 2:
-            search_name_reversed = f"{parts[1].strip()} {parts[0].strip()}".lower()
-    
-    matches = {}  # Use dict to avoid duplicates
-    
-    for customer in existing_customers:
-        if not customer:
-            continue
-            
-        customer_lower = customer.lower().strip()
-        customer_normalized = normalize_business_name(customer).lower()
-        customer_first_word = customer.split()[0].lower() if customer else ""
-        
-        # 1. Exact match (highest priority)
-        if search_name_lower == customer_lower:
-            matches[customer] = ('exact', 100)
-            continue
-        
-        # 2. Reversed name match (Last, First -> First Last)
-        if search_name_reversed and search_name_reversed == customer_lower:
-            if customer not in matches or matches[customer][1] < 98:
-                matches[customer] = ('name_reversed', 98)
-            continue
-        
-        # 3. Normalized match (very high priority)
-        if search_normalized and search_normalized == customer_normalized:
-            if customer not in matches or matches[customer][1] < 95:
-                matches[customer] = ('normalized', 95)
-            continue
-        
-        # 4. First word match (e.g., "Barboun" matches "Barboun, Thomas")
-        if search_first_word and customer_first_word == search_first_word:
-            if customer not in matches or matches[customer][1] < 90:
-                matches[customer] = ('first_word', 90)
-            continue
-        
-        # 5. Contains match (e.g., "RCM" in "RCM Construction")
-        if len(search_name) >= 3:
-            if search_name_lower in customer_lower:
-                if customer not in matches or matches[customer][1] < 85:
-                    matches[customer] = ('contains', 85)
-                continue
-            
-            # Check if search is contained in normalized version
-            if search_normalized in customer_normalized:
-                if customer not in matches or matches[customer][1] < 83:
-                    matches[customer] = ('normalized_contains', 83)
-                continue
-        
-        # 6. Customer contains search (e.g., searching "RCM Construction" finds "RCM Construction of SWFL LLC")
-        if customer_lower in search_name_lower and len(customer) >= 3:
-            if customer not in matches or matches[customer][1] < 80:
-                matches[customer] = ('reverse_contains', 80)
-            continue
-        
-        # 7. Starts with match
-        if customer_lower.startswith(search_name_lower[:3]) and len(search_name) >= 3:
-            if customer not in matches or matches[customer][1] < 75:
-                matches[customer] = ('starts_with', 75)
-        
-        # 8. Fuzzy word matching (e.g., "Adam Gomes" matches "Gomes Adam" or "Adam J Gomes")
-        search_words = set(search_name_lower.split())
-        customer_words = set(customer_lower.split())
-        if len(search_words) >= 2 and len(customer_words) >= 2:
-            # Check if all search words are in customer name (any order)
-            if search_words.issubset(customer_words):
-                if customer not in matches or matches[customer][1] < 88:
-                    matches[customer] = ('all_words', 88)
-            # Check if most words match
-            elif len(search_words.intersection(customer_words)) >= min(len(search_words), len(customer_words)) - 1:
-                if customer not in matches or matches[customer][1] < 82:
-                    matches[customer] = ('most_words', 82)
-    
-    # Convert to sorted list
-    result = [(name, match_type, score) for name, (match_type, score) in matches.items()]
-    result.sort(key=lambda x: (-x[2], x[0]))  # Sort by score desc, then name
-    
-    return result
-
 def safe_str_contains(df, column, pattern, na=False, negate=False, case=True):
     """
     Safely perform string contains operation on a dataframe column.
@@ -2741,931 +2182,33 @@ def safe_str_lower_contains(df, column, pattern, na=False):
     except Exception:
         return pd.Series([False] * len(df), index=df.index)
 
+@profiled('transform')
 def calculate_transaction_balances(all_data, show_all_for_reconciliation=False):
     """
-    Calculate outstanding balances for all transactions.
-    Reuses the exact logic from Unreconciled Transactions tab.
-    Returns DataFrame with _balance column added.
-    
-    Args:
-        all_data: DataFrame with all transaction data
-        show_all_for_reconciliation: If True, returns all transactions from past 18 months regardless of balance
-    """
-    if all_data.empty:
-        return pd.DataFrame()
-    
-    # Check if Transaction ID column exists
-    if 'Transaction ID' not in all_data.columns:
-        return pd.DataFrame()
-    
-    # Get original transactions only (exclude -STMT-, -ADJ-, -VOID-)
-    original_trans = all_data[
-        safe_str_contains(all_data, 'Transaction ID', '-STMT-|-ADJ-|-VOID-', na=False, negate=True)
-    ].copy()
-    
-    if original_trans.empty:
-        return pd.DataFrame()
-    
-    # Debug: Check if Total Agent Comm column exists
-    if 'Total Agent Comm' not in original_trans.columns:
-        print("WARNING: 'Total Agent Comm' column not found in data!")
-    
-    # Normalize effective dates for comparison
-    # Convert all dates to a consistent format for comparison
-    all_data_normalized = all_data.copy()
-    try:
-        # Try to parse dates with mixed formats
-        all_data_normalized['_normalized_date'] = pd.to_datetime(all_data['Effective Date'], format='mixed', errors='coerce')
-    except:
-        # Fallback to coerce if mixed format fails
-        all_data_normalized['_normalized_date'] = pd.to_datetime(all_data['Effective Date'], errors='coerce')
-    
-    original_trans_normalized = original_trans.copy()
-    try:
-        original_trans_normalized['_normalized_date'] = pd.to_datetime(original_trans['Effective Date'], format='mixed', errors='coerce')
-    except:
-        original_trans_normalized['_normalized_date'] = pd.to_datetime(original_trans['Effective Date'], errors='coerce')
-    
-    # DEBUG: Check column names first
-    if len(original_trans) > 0:
-        with st.expander("🔍 DEBUG: Column names in transaction data", expanded=False):
-            st.markdown("**Available columns:**")
-            cols_list = list(original_trans.columns)
-            # Check for commission-related columns
-            comm_cols = [col for col in cols_list if 'comm' in col.lower() or 'agent' in col.lower()]
-            st.markdown(f"Commission-related columns: {comm_cols}")
-            
-            # Check specifically for Total Agent Comm variations
-            total_agent_variations = [col for col in cols_list if 'total' in col.lower() and 'agent' in col.lower()]
-            st.markdown(f"Total Agent Comm variations: {total_agent_variations}")
-            
-            # Show all columns
-            st.text("All columns:")
-            for col in sorted(cols_list):
-                st.text(f"  - {col}")
-    
-    # Calculate balance for each transaction
-    for idx, row in original_trans.iterrows():
-        # Calculate credits (commission owed) - use Total Agent Comm which includes broker fees
-        if 'Total Agent Comm' in row.index:
-            total_agent_comm = row['Total Agent Comm']
-        else:
-            total_agent_comm = 0
-        
-        # Handle NaN values explicitly
-        if pd.isna(total_agent_comm) or total_agent_comm == 0:
-            # Fallback: Calculate from components if Total Agent Comm is missing
-            agent_est_comm = 0
-            broker_fee_comm = 0
-            
-            if 'Agent Estimated Comm $' in row.index:
-                agent_est_comm = row['Agent Estimated Comm $']
-                if pd.isna(agent_est_comm):
-                    agent_est_comm = 0
-                    
-            if 'Broker Fee Agent Comm' in row.index:
-                broker_fee_comm = row['Broker Fee Agent Comm']
-                if pd.isna(broker_fee_comm):
-                    broker_fee_comm = 0
-            
-            total_agent_comm = float(agent_est_comm or 0) + float(broker_fee_comm or 0)
-        
-        credit = float(total_agent_comm or 0)
-        
-        # Calculate debits (total paid for this policy)
-        policy_num = row['Policy Number']
-        
-        # Get normalized date for comparison
-        effective_date_normalized = original_trans_normalized.at[idx, '_normalized_date']
-        
-        # Get all STMT and VOID entries for this specific policy and date
-        # Include -VOID- entries since they have negative amounts that reduce the debit
-        # Strip whitespace from policy numbers to ensure matching
-        policy_num_stripped = str(policy_num).strip()
-        if pd.notna(effective_date_normalized):
-            recon_entries = all_data_normalized[
-                (all_data_normalized['Policy Number'].astype(str).str.strip() == policy_num_stripped) &
-                (all_data_normalized['_normalized_date'] == effective_date_normalized) &
-                (safe_str_contains(all_data, 'Transaction ID', '-STMT-|-VOID-', na=False))
-            ]
-        else:
-            # Fallback to string comparison if date parsing failed
-            effective_date = row['Effective Date']
-            recon_entries = all_data[
-                (all_data['Policy Number'].astype(str).str.strip() == policy_num_stripped) &
-                (all_data['Effective Date'] == effective_date) &
-                (safe_str_contains(all_data, 'Transaction ID', '-STMT-|-VOID-', na=False))
-            ]
-        
-        debit = 0
-        if not recon_entries.empty:
-            debit = recon_entries['Agent Paid Amount (STMT)'].fillna(0).sum()
-        
-        # Calculate balance
-        balance = credit - debit
-        original_trans.at[idx, '_balance'] = balance
-    
-    # For reconciliation, optionally show all transactions from past 18 months
-    if show_all_for_reconciliation:
-        # Filter to past 18 months
-        cutoff_date = pd.Timestamp.now() - pd.DateOffset(months=18)
-        
-        # Parse effective dates for filtering
-        original_trans['_parsed_date'] = pd.to_datetime(original_trans['Effective Date'], errors='coerce')
-        
-        # Return all transactions from past 18 months with balance info
-        recent_trans = original_trans[original_trans['_parsed_date'] >= cutoff_date].copy()
-        recent_trans = recent_trans.drop('_parsed_date', axis=1)
-        
-        # DEBUG: Show balance calculation details for first few transactions
-        if not recent_trans.empty and '_balance' in recent_trans.columns:
-            sample_size = min(5, len(recent_trans))
-            debug_sample = recent_trans.head(sample_size)
-            
-            # Create a debug dataframe with key fields
-            debug_data = []
-            for idx, row in debug_sample.iterrows():
-                debug_row = {
-                    'Transaction ID': row.get('Transaction ID', ''),
-                    'Customer': row.get('Customer', '')[:30],  # Truncate for display
-                    'Total Agent Comm': row.get('Total Agent Comm', 0),
-                    'Agent Est Comm': row.get('Agent Est Comm', 0),
-                    'Broker Fee Agent Comm': row.get('Broker Fee Agent Comm', 0),
-                    '_balance': row.get('_balance', 0),
-                    'Has STMT entries': 'Check DB'
-                }
-                debug_data.append(debug_row)
-            
-            with st.expander("🔍 DEBUG: Balance Calculation Sample", expanded=False):
-                st.markdown("**Sample of balance calculations:**")
-                st.dataframe(pd.DataFrame(debug_data))
-                st.markdown("**Note:** Balance = Total Agent Comm - (sum of Agent Paid Amount from STMT entries)")
-        
-        return recent_trans
-    else:
-        # Normal mode - return only transactions with outstanding balance
-        return original_trans[original_trans['_balance'] > 0.01]
-
-def match_statement_transactions(statement_df, column_mapping, existing_data, statement_date):
-    """
-    Match statement transactions to existing database records.
-    Now uses the same balance calculation as Unreconciled Transactions tab.
-    Returns: (matched_list, unmatched_list, can_create_list)
-    """
-    matched = []
-    unmatched = []
-    can_create = []
-    
-    # DEBUG: Show raw input data
-    with st.expander("🔍 DEBUG: Raw statement data and mapping", expanded=False):
-        st.markdown("**Column Mapping:**")
-        st.json(column_mapping)
-        
-        st.markdown("**Statement DataFrame Info:**")
-        st.markdown(f"- Shape: {statement_df.shape}")
-        st.markdown(f"- Columns: {list(statement_df.columns)}")
-        
-        st.markdown("**First 5 rows of statement data:**")
-        st.dataframe(statement_df.head())
-        
-        # Check if mapped columns actually exist
-        st.markdown("\n**Column Mapping Validation:**")
-        for field, col in column_mapping.items():
-            # Check if it's a numeric index
-            try:
-                col_index = int(col)
-                # It's a numeric index
-                if 0 <= col_index < len(statement_df.columns):
-                    exists = True
-                    st.markdown(f"- {field} → column index {col_index} ✅ EXISTS")
-                    if not statement_df.empty:
-                        # Show sample values using iloc
-                        sample_values = statement_df.iloc[:, col_index].dropna().head(3).tolist()
-                        if sample_values:
-                            st.markdown(f"  Sample values: {sample_values}")
-                else:
-                    exists = False
-                    st.markdown(f"- {field} → column index {col_index} ❌ OUT OF RANGE (max index: {len(statement_df.columns)-1})")
-            except ValueError:
-                # Not a numeric index, check as column name
-                exists = col in statement_df.columns
-                st.markdown(f"- {field} → '{col}' {'✅ EXISTS' if exists else '❌ NOT FOUND'}")
-                if exists and not statement_df.empty:
-                    # Show sample values
-                    sample_values = statement_df[col].dropna().head(3).tolist()
-                    if sample_values:
-                        st.markdown(f"  Sample values: {sample_values}")
-    
-    # REMOVE DUPLICATES from statement before processing
-    # Create a key for each row based on customer, policy, amount, and date
-    if not statement_df.empty:
-        # Create columns for deduplication
-        dedup_cols = []
-        
-        # Helper function to check if column exists (handles both names and indices)
-        def column_exists_and_get_name(mapped_col):
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, return the column index if valid
-                if 0 <= col_index < len(statement_df.columns):
-                    return col_index
-            except ValueError:
-                # Not a numeric index, check as column name
-                if mapped_col in statement_df.columns:
-                    return mapped_col
-            return None
-        
-        if 'Customer' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Customer'])
-            if col is not None:
-                dedup_cols.append(col)
-        if 'Policy Number' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Policy Number'])
-            if col is not None:
-                dedup_cols.append(col)
-        if 'Effective Date' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Effective Date'])
-            if col is not None:
-                dedup_cols.append(col)
-        if 'Agent Paid Amount (STMT)' in column_mapping:
-            col = column_exists_and_get_name(column_mapping['Agent Paid Amount (STMT)'])
-            if col is not None:
-                dedup_cols.append(col)
-        
-        if dedup_cols:
-            # Remove duplicates based on key columns
-            original_count = len(statement_df)
-            statement_df = statement_df.drop_duplicates(subset=dedup_cols, keep='first')
-            duplicate_count = original_count - len(statement_df)
-            
-            if duplicate_count > 0:
-                st.warning(f"⚠️ Removed {duplicate_count} duplicate rows from the statement import")
-    
-    # Get all transactions from past 18 months for reconciliation matching
-    outstanding_trans = calculate_transaction_balances(existing_data, show_all_for_reconciliation=True)
-    
-    # Debug output
-    if outstanding_trans.empty:
-        st.warning("⚠️ No transactions found with commission data in the past 18 months.")
-    else:
-        # Check commission data quality
-        valid_balance_count = (outstanding_trans['_balance'] > 0.01).sum()
-        total_agent_comm_count = outstanding_trans['Total Agent Comm'].notna().sum()
-        positive_comm_count = (outstanding_trans['Total Agent Comm'] > 0).sum()
-        
-        st.info(f"📊 Found {len(outstanding_trans)} transactions from the past 18 months for matching.")
-        
-        # DEBUG: Show sample of transactions found
-        with st.expander("🔍 DEBUG: Sample of transactions found", expanded=False):
-            if not outstanding_trans.empty:
-                debug_cols = ['Transaction ID', 'Customer', 'Policy Number', 'Effective Date', 
-                             'Total Agent Comm', '_balance', 'Agent Paid Amount (STMT)', 'Status']
-                available_cols = [col for col in debug_cols if col in outstanding_trans.columns]
-                sample_trans = outstanding_trans.head(10)[available_cols]
-                st.dataframe(sample_trans)
-                
-                # Show balance calculation details
-                st.markdown("**Balance Calculation Details:**")
-                st.markdown("- Credit = Total Agent Comm (amount owed to agent)")
-                st.markdown("- Debit = Sum of Agent Paid Amount (STMT) from reconciliation entries")
-                st.markdown("- Balance = Credit - Debit")
-                
-                # Check for common issues
-                zero_comm = (outstanding_trans['Total Agent Comm'] == 0).sum()
-                null_comm = outstanding_trans['Total Agent Comm'].isna().sum()
-                negative_comm = (outstanding_trans['Total Agent Comm'] < 0).sum()
-                
-                st.markdown(f"**Commission Data Quality:**")
-                st.markdown(f"- Total transactions: {len(outstanding_trans)}")
-                st.markdown(f"- With zero commission: {zero_comm}")
-                st.markdown(f"- With null commission: {null_comm}")
-                st.markdown(f"- With negative commission: {negative_comm}")
-                st.markdown(f"- With positive commission: {positive_comm_count}")
-                st.markdown(f"- With outstanding balance > 0: {valid_balance_count}")
-        
-        if valid_balance_count == 0:
-            st.warning(f"⚠️ None of the transactions have an outstanding balance. Check Total Agent Comm values: {total_agent_comm_count} have values, {positive_comm_count} are positive.")
-    
-    # DEBUG: Show statement data sample
-    with st.expander("🔍 DEBUG: Statement data being matched", expanded=False):
-        if not statement_df.empty:
-            st.markdown("**Column Mapping:**")
-            for key, col in column_mapping.items():
-                # Check if it's a numeric index or column name
-                try:
-                    col_index = int(col)
-                    if 0 <= col_index < len(statement_df.columns):
-                        st.markdown(f"- {key} → Column index {col_index}")
-                except ValueError:
-                    if col in statement_df.columns:
-                        st.markdown(f"- {key} → {col}")
-            
-            st.markdown("\n**Sample Statement Data:**")
-            # Build list of columns to show (handling both names and indices)
-            cols_to_show = []
-            for col in column_mapping.values():
-                try:
-                    col_index = int(col)
-                    if 0 <= col_index < len(statement_df.columns):
-                        cols_to_show.append(col_index)
-                except ValueError:
-                    if col in statement_df.columns:
-                        cols_to_show.append(col)
-            
-            if cols_to_show:
-                # Create a subset dataframe with the mapped columns
-                subset_data = pd.DataFrame()
-                for i, (key, col) in enumerate(column_mapping.items()):
-                    try:
-                        col_index = int(col)
-                        if 0 <= col_index < len(statement_df.columns):
-                            subset_data[f"{key} (col {col_index})"] = statement_df.iloc[:5, col_index]
-                    except ValueError:
-                        if col in statement_df.columns:
-                            subset_data[f"{key} ({col})"] = statement_df[col].head(5)
-                st.dataframe(subset_data)
-            else:
-                st.dataframe(statement_df.head(5))
-        else:
-            st.warning("Statement dataframe is empty!")
-    
-    # Build lookup dictionaries
-    existing_lookup = {}
-    customer_trans_lookup = {}  # Customer -> list of transactions
-    
-    if not outstanding_trans.empty:
-        for idx, trans in outstanding_trans.iterrows():
-            trans_dict = trans.to_dict()
-            trans_dict['balance'] = trans['_balance']
-            
-            # Store by policy key - normalize date format for matching
-            eff_date_normalized = trans['Effective Date']
-            if pd.notna(eff_date_normalized):
-                try:
-                    eff_date_normalized = pd.to_datetime(eff_date_normalized).strftime('%Y-%m-%d')
-                except:
-                    eff_date_normalized = str(eff_date_normalized)
-            policy_key = f"{trans['Policy Number']}_{eff_date_normalized}"
-            existing_lookup[policy_key] = trans_dict
-            
-            # Store by customer (for fuzzy matching)
-            customer = trans['Customer']
-            if pd.notna(customer):
-                customer_key = customer.lower().strip()
-                if customer_key not in customer_trans_lookup:
-                    customer_trans_lookup[customer_key] = []
-                customer_trans_lookup[customer_key].append(trans_dict)
-    
-    # Get unique customer list for fuzzy matching
-    all_customers = []
-    if not existing_data.empty:
-        all_customers = existing_data['Customer'].dropna().unique().tolist()
-    
-    # DEBUG: Show lookup dictionary sample
-    with st.expander("🔍 DEBUG: Transaction lookup dictionaries", expanded=False):
-        st.markdown(f"**Existing lookup keys (first 10):**")
-        if existing_lookup:
-            for i, (key, trans) in enumerate(list(existing_lookup.items())[:10]):
-                st.text(f"  {key}: {trans.get('Customer', 'Unknown')} - Balance: ${trans.get('balance', 0):.2f}")
-        else:
-            st.warning("No transactions in existing_lookup dictionary!")
-        
-        st.markdown(f"\n**Customer lookup (first 5 customers):**")
-        if customer_trans_lookup:
-            for i, (customer, trans_list) in enumerate(list(customer_trans_lookup.items())[:5]):
-                st.text(f"  {customer}: {len(trans_list)} transaction(s)")
-        else:
-            st.warning("No customers in customer_trans_lookup dictionary!")
-    
-    # Track processed statement rows to prevent duplicates
-    processed_statement_rows = set()
-    
-    # DEBUG: Track matching attempts
-    debug_matches = {
-        'total_rows': 0,
-        'skipped_totals': 0,
-        'skipped_empty': 0,
-        'policy_date_attempts': 0,
-        'customer_attempts': 0,
-        'matched': 0,
-        'unmatched': 0,
-        'can_create': 0
-    }
-    
-    # Process each statement row
-    for idx, row in statement_df.iterrows():
-        debug_matches['total_rows'] += 1
-        
-        # Show debug for first 3 rows to understand the data
-        if debug_matches['total_rows'] <= 3:
-            with st.expander(f"🔍 DEBUG: Processing row {idx} - BEFORE extraction", expanded=False):
-                st.markdown("**Raw row data:**")
-                st.json(row.to_dict())
-                st.markdown("**Column mapping:**")
-                st.json(column_mapping)
-                st.markdown("**DataFrame columns:**")
-                st.text(list(statement_df.columns))
-        
-        # Extract mapped values more carefully
-        customer = ''
-        policy_num = ''
-        eff_date = None
-        
-        # Extract Customer
-        if 'Customer' in column_mapping:
-            mapped_col = column_mapping['Customer']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    val = row.iloc[col_index]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        customer = str(val).strip()
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    val = row[mapped_col]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        customer = str(val).strip()
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        val = row[matching_cols[0]]
-                        if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                            customer = str(val).strip()
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Extract Policy Number
-        if 'Policy Number' in column_mapping:
-            mapped_col = column_mapping['Policy Number']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    val = row.iloc[col_index]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        policy_num = str(val).strip()
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    val = row[mapped_col]
-                    if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                        policy_num = str(val).strip()
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        val = row[matching_cols[0]]
-                        if pd.notna(val) and str(val).strip() and str(val).strip().lower() not in ['nan', 'none']:
-                            policy_num = str(val).strip()
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Extract Effective Date
-        if 'Effective Date' in column_mapping:
-            mapped_col = column_mapping['Effective Date']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    eff_date = row.iloc[col_index]
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                if mapped_col in statement_df.columns:
-                    eff_date = row[mapped_col]
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        eff_date = row[matching_cols[0]]
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Skip rows that appear to be totals
-        # Check if customer name contains common total indicators
-        customer_lower = customer.lower()
-        if any(total_word in customer_lower for total_word in ['total', 'totals', 'subtotal', 'sub-total', 'grand total', 'sum']):
-            continue
-        
-        # Also skip if policy number or customer is empty/missing and it looks like a summary row
-        if (not customer or customer.lower() in ['', 'nan', 'none']) and (not policy_num or policy_num.lower() in ['', 'nan', 'none']):
-            continue
-        
-        # Check if this is truly an empty row
-        # Get the amount to help determine if row has data
-        amount = 0
-        if 'Agent Paid Amount (STMT)' in column_mapping:
-            mapped_col = column_mapping['Agent Paid Amount (STMT)']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    try:
-                        val = row.iloc[col_index]
-                        if pd.notna(val):
-                            amount = float(val)
-                    except (ValueError, TypeError):
-                        amount = 0
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    try:
-                        val = row[mapped_col]
-                        if pd.notna(val):
-                            amount = float(val)
-                    except (ValueError, TypeError):
-                        amount = 0
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        try:
-                            val = row[matching_cols[0]]
-                            if pd.notna(val):
-                                amount = float(val)
-                        except (ValueError, TypeError):
-                            amount = 0
-                        if debug_matches['total_rows'] <= 3:
-                            st.warning(f"Column '{mapped_col}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
-                    else:
-                        if debug_matches['total_rows'] <= 3:
-                            st.error(f"Column '{mapped_col}' not found in DataFrame columns!")
-        
-        # Skip only if ALL key fields are empty/missing
-        # A row needs at least customer OR policy number OR a non-zero amount to be valid
-        if not customer and not policy_num and amount == 0:
-            debug_matches['skipped_empty'] += 1
-            # Log ALL skipped rows for debugging (not just first 3)
-            with st.expander(f"⚠️ DEBUG: Skipped empty row {idx} (#{debug_matches['skipped_empty']})", expanded=False):
-                st.markdown("**Raw row data:**")
-                st.json(row.to_dict())
-                
-                st.markdown("**Column mapping being used:**")
-                st.json(column_mapping)
-                
-                st.markdown("**Extraction attempts:**")
-                
-                # Customer extraction debug
-                st.markdown("1. **Customer extraction:**")
-                if 'Customer' in column_mapping:
-                    mapped_col = column_mapping['Customer']
-                    st.text(f"   - Mapped column: '{mapped_col}'")
-                    
-                    # Check if it's numeric index or column name
-                    try:
-                        col_index = int(mapped_col)
-                        st.text(f"   - Column type: Numeric index {col_index}")
-                        st.text(f"   - Index valid: {0 <= col_index < len(row)}")
-                        if 0 <= col_index < len(row):
-                            raw_val = row.iloc[col_index]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                            st.text(f"   - Is empty after strip: {not str(raw_val).strip() if pd.notna(raw_val) else True}")
-                            st.text(f"   - Lower is in ['nan', 'none']: {str(raw_val).strip().lower() in ['nan', 'none'] if pd.notna(raw_val) and str(raw_val).strip() else False}")
-                    except ValueError:
-                        st.text(f"   - Column type: Named column")
-                        st.text(f"   - Column exists in df: {mapped_col in statement_df.columns}")
-                        if mapped_col in statement_df.columns:
-                            raw_val = row[mapped_col]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                            st.text(f"   - Is empty after strip: {not str(raw_val).strip() if pd.notna(raw_val) else True}")
-                            st.text(f"   - Lower is in ['nan', 'none']: {str(raw_val).strip().lower() in ['nan', 'none'] if pd.notna(raw_val) and str(raw_val).strip() else False}")
-                else:
-                    st.text("   - 'Customer' not in column_mapping")
-                st.text(f"   - Final customer value: '{customer}' (empty: {not customer})")
-                
-                # Policy Number extraction debug
-                st.markdown("2. **Policy Number extraction:**")
-                if 'Policy Number' in column_mapping:
-                    mapped_col = column_mapping['Policy Number']
-                    st.text(f"   - Mapped column: '{mapped_col}'")
-                    
-                    # Check if it's numeric index or column name
-                    try:
-                        col_index = int(mapped_col)
-                        st.text(f"   - Column type: Numeric index {col_index}")
-                        st.text(f"   - Index valid: {0 <= col_index < len(row)}")
-                        if 0 <= col_index < len(row):
-                            raw_val = row.iloc[col_index]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                    except ValueError:
-                        st.text(f"   - Column type: Named column")
-                        st.text(f"   - Column exists in df: {mapped_col in statement_df.columns}")
-                        if mapped_col in statement_df.columns:
-                            raw_val = row[mapped_col]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            st.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
-                else:
-                    st.text("   - 'Policy Number' not in column_mapping")
-                st.text(f"   - Final policy_num value: '{policy_num}' (empty: {not policy_num})")
-                
-                # Amount extraction debug
-                st.markdown("3. **Amount extraction:**")
-                if 'Agent Paid Amount (STMT)' in column_mapping:
-                    mapped_col = column_mapping['Agent Paid Amount (STMT)']
-                    st.text(f"   - Mapped column: '{mapped_col}'")
-                    
-                    # Check if it's numeric index or column name
-                    try:
-                        col_index = int(mapped_col)
-                        st.text(f"   - Column type: Numeric index {col_index}")
-                        st.text(f"   - Index valid: {0 <= col_index < len(row)}")
-                        if 0 <= col_index < len(row):
-                            raw_val = row.iloc[col_index]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            try:
-                                float_val = float(raw_val) if pd.notna(raw_val) else 0
-                                st.text(f"   - float(val): {float_val}")
-                            except Exception as e:
-                                st.text(f"   - float(val) failed: {str(e)}")
-                    except ValueError:
-                        st.text(f"   - Column type: Named column")
-                        st.text(f"   - Column exists in df: {mapped_col in statement_df.columns}")
-                        if mapped_col in statement_df.columns:
-                            raw_val = row[mapped_col]
-                            st.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
-                            st.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
-                            try:
-                                float_val = float(raw_val) if pd.notna(raw_val) else 0
-                                st.text(f"   - float(val): {float_val}")
-                            except Exception as e:
-                                st.text(f"   - float(val) failed: {str(e)}")
-                else:
-                    st.text("   - 'Agent Paid Amount (STMT)' not in column_mapping")
-                st.text(f"   - Final amount value: {amount} (zero: {amount == 0})")
-                
-                st.markdown("**Decision:**")
-                st.text(f"Customer empty: {not customer}")
-                st.text(f"Policy empty: {not policy_num}")
-                st.text(f"Amount zero: {amount == 0}")
-                st.text(f"All empty/zero: {not customer and not policy_num and amount == 0}")
-                st.text("**Row will be SKIPPED**")
-            continue
-        
-        # Agency amount is optional for audit purposes
-        agency_amount = 0
-        if 'Agency Comm Received (STMT)' in column_mapping:
-            mapped_col = column_mapping['Agency Comm Received (STMT)']
-            # Check if mapped_col is a numeric index (string representation of integer)
-            try:
-                col_index = int(mapped_col)
-                # It's a numeric index, use iloc
-                if 0 <= col_index < len(row):
-                    try:
-                        val = row.iloc[col_index]
-                        if pd.notna(val):
-                            agency_amount = float(val)
-                    except (ValueError, TypeError):
-                        agency_amount = 0
-                else:
-                    if debug_matches['total_rows'] <= 3:
-                        st.error(f"Column index {col_index} is out of range (row has {len(row)} columns)")
-            except ValueError:
-                # Not a numeric index, proceed with column name lookup
-                # Try exact match first, then case-insensitive match
-                if mapped_col in statement_df.columns:
-                    try:
-                        val = row[mapped_col]
-                        if pd.notna(val):
-                            agency_amount = float(val)
-                    except (ValueError, TypeError):
-                        agency_amount = 0
-                else:
-                    # Try case-insensitive column lookup
-                    matching_cols = [col for col in statement_df.columns if col.lower() == mapped_col.lower()]
-                    if matching_cols:
-                        try:
-                            val = row[matching_cols[0]]
-                            if pd.notna(val):
-                                agency_amount = float(val)
-                        except (ValueError, TypeError):
-                            agency_amount = 0
-        
-        # Convert effective date to string format
-        if pd.notna(eff_date):
-            try:
-                eff_date = pd.to_datetime(eff_date).strftime('%Y-%m-%d')
-            except:
-                eff_date = str(eff_date)
-        
-        match_result = {
-            'row_index': idx,
-            'customer': customer,
-            'policy_number': policy_num,
-            'effective_date': eff_date,
-            'amount': amount,  # Agent Paid Amount (primary)
-            'agency_amount': agency_amount,  # Agency Comm Received (audit)
-            'statement_data': row.to_dict()
-        }
-        
-        # DEBUG: Show first 3 match attempts in detail
-        if debug_matches['total_rows'] <= 3:
-            with st.expander(f"🔍 DEBUG: Matching row {idx} - {customer[:30]}", expanded=False):
-                st.markdown(f"**Statement data:**")
-                st.text(f"  Customer: {customer}")
-                st.text(f"  Policy: {policy_num}")
-                st.text(f"  Eff Date: {eff_date}")
-                st.text(f"  Amount: ${amount:.2f}")
-                st.text(f"  Agency Amount: ${agency_amount:.2f}")
-                st.markdown(f"\n**Matching attempt:**")
-                st.text(f"  Policy key: {policy_num}_{eff_date}")
-                st.text(f"  Key exists in lookup: {f'{policy_num}_{eff_date}' in existing_lookup}")
-        
-        # Try to match: Policy Number + Effective Date (highest confidence)
-        policy_key = f"{policy_num}_{eff_date}"
-        debug_matches['policy_date_attempts'] += 1
-        if policy_key in existing_lookup:
-            match_result['match'] = existing_lookup[policy_key]
-            match_result['confidence'] = 100
-            match_result['match_type'] = 'Policy + Date'
-            matched.append(match_result)
-            debug_matches['matched'] += 1
-            continue
-        
-        # Try enhanced customer matching
-        debug_matches['customer_attempts'] += 1
-        potential_customers = find_potential_customer_matches(customer, all_customers)
-        
-        if potential_customers:
-            # Check if we have a single high-confidence match
-            if len(potential_customers) == 1 and potential_customers[0][2] >= 90:
-                # Single high-confidence match - try to find transaction
-                matched_customer = potential_customers[0][0]
-                customer_key = matched_customer.lower().strip()
-                
-                if customer_key in customer_trans_lookup:
-                    customer_trans = customer_trans_lookup[customer_key]
-                    # Check for amount match among transactions WITH policy verification
-                    # Strip whitespace from policy numbers for comparison
-                    policy_num_stripped = str(policy_num).strip() if policy_num else ""
-                    amount_matched = False
-                    for trans in customer_trans:
-                        if amount > 0 and abs(trans['balance'] - amount) / amount <= 0.05:  # 5% tolerance
-                            # Also verify policy number matches
-                            trans_policy = str(trans.get('Policy Number', '')).strip()
-                            if trans_policy == policy_num_stripped and policy_num_stripped:
-                                match_result['match'] = trans
-                                match_result['confidence'] = 90
-                                match_result['match_type'] = f'{potential_customers[0][1]} + Policy + Amount'
-                                match_result['matched_customer'] = matched_customer
-                                matched.append(match_result)
-                                amount_matched = True
-                                break
-
-                    if not amount_matched:
-                        # Check if any transaction matches the policy number
-                        policy_matched = False
-                        for trans in customer_trans:
-                            trans_policy = str(trans.get('Policy Number', '')).strip()
-                            if trans_policy == policy_num_stripped and policy_num_stripped:
-                                # Policy number matches!
-                                match_result['match'] = trans
-                                match_result['confidence'] = 95
-                                match_result['match_type'] = f'{potential_customers[0][1]} + Policy'
-                                match_result['matched_customer'] = matched_customer
-                                matched.append(match_result)
-                                policy_matched = True
-                                break
-                        
-                        if not policy_matched:
-                            # No policy match - needs manual selection
-                            match_result['potential_matches'] = customer_trans
-                            match_result['potential_customers'] = potential_customers
-                            match_result['needs_selection'] = True
-                            unmatched.append(match_result)
-                else:
-                    # Customer found but no transactions in lookup - still add to unmatched for manual selection
-                    match_result['potential_customers'] = potential_customers
-                    match_result['needs_selection'] = True
-                    unmatched.append(match_result)
-            else:
-                # Multiple potential matches or low confidence - needs manual selection
-                match_result['potential_customers'] = potential_customers
-                match_result['needs_selection'] = True
-                
-                # Collect all transactions for all potential customers
-                all_potential_trans = []
-                for potential_customer, match_type, score in potential_customers[:5]:  # Limit to top 5
-                    customer_key = potential_customer.lower().strip()
-                    if customer_key in customer_trans_lookup:
-                        trans_list = customer_trans_lookup[customer_key]
-                        for trans in trans_list:
-                            trans_copy = trans.copy()  # Avoid modifying original
-                            trans_copy['_customer_match'] = potential_customer
-                            trans_copy['_match_type'] = match_type
-                            trans_copy['_match_score'] = score
-                            all_potential_trans.append(trans_copy)
-                
-                if all_potential_trans:
-                    match_result['potential_matches'] = all_potential_trans
-                    
-                unmatched.append(match_result)
-        else:
-            # No fuzzy match found - check if exact customer exists
-            customer_key = customer.lower().strip()
-            if customer_key in customer_trans_lookup:
-                # Exact match exists
-                customer_matches = customer_trans_lookup[customer_key]
-                # Check for amount match WITH policy number verification
-                amount_matched = False
-                for trans in customer_matches:
-                    if amount > 0 and abs(trans['balance'] - amount) / amount <= 0.05:  # 5% tolerance
-                        # Also verify policy number matches
-                        if trans.get('Policy Number') == policy_num and policy_num:
-                            match_result['match'] = trans
-                            match_result['confidence'] = 90
-                            match_result['match_type'] = 'Customer + Policy + Amount'
-                            matched.append(match_result)
-                            amount_matched = True
-                            break
-                
-                if not amount_matched:
-                    # Check for policy number match
-                    policy_matched = False
-                    for trans in customer_matches:
-                        if trans.get('Policy Number') == policy_num and policy_num:
-                            # Policy number matches!
-                            match_result['match'] = trans
-                            match_result['confidence'] = 95
-                            match_result['match_type'] = 'Customer + Policy'
-                            matched.append(match_result)
-                            policy_matched = True
-                            break
-                    
-                    if not policy_matched:
-                        # No policy match - needs selection
-                        match_result['potential_matches'] = customer_matches
-                        match_result['potential_customers'] = [(customer, 'exact', 100)]
-                        match_result['needs_selection'] = True
-                        unmatched.append(match_result)
-            else:
-                # No match found - can create new transaction
-                match_result['can_create'] = True
-                can_create.append(match_result)
-                debug_matches['can_create'] += 1
-    
-    # Count unmatched at the end
-    debug_matches['unmatched'] = len(unmatched)
-    debug_matches['matched'] = len(matched)
-    
-    # DEBUG: Show matching summary
-    with st.expander("🔍 DEBUG: Matching Summary", expanded=False):
-        st.markdown("**Statement Processing:**")
-        st.markdown(f"- Total rows processed: {debug_matches['total_rows']}")
-        st.markdown(f"- Skipped (totals): {debug_matches['skipped_totals']}")
-        st.markdown(f"- Skipped (empty): {debug_matches['skipped_empty']}")
-        st.markdown(f"- Valid rows: {debug_matches['total_rows'] - debug_matches['skipped_totals'] - debug_matches['skipped_empty']}")
-        
-        if debug_matches['skipped_empty'] > 0:
-            st.warning(f"⚠️ {debug_matches['skipped_empty']} rows were skipped as empty. This happens when a row has no customer name, no policy number, AND zero amount. Check your column mappings!")
-        
-        st.markdown("\n**Matching Attempts:**")
-        st.markdown(f"- Policy + Date attempts: {debug_matches['policy_date_attempts']}")
-        st.markdown(f"- Customer matching attempts: {debug_matches['customer_attempts']}")
-        
-        st.markdown("\n**Results:**")
-        st.markdown(f"- Matched: {debug_matches['matched']}")
-        st.markdown(f"- Unmatched (need review): {debug_matches['unmatched']}")
-        st.markdown(f"- Can create new: {debug_matches['can_create']}")
+    Calculate outstanding balances for all transactions.
+    Reuses the exact logic from Unreconciled Transactions tab.
+    Returns DataFrame with _balance column added (commission_core.balances).
     
-    return matched, unmatched, can_create
+    Args:
+        all_data: DataFrame with all transaction data
+        show_all_for_reconciliation: If True, returns all transactions from past 18 months regardless of balance
+    """
+    diagnostics = new_diagnostics()
+    balances = core_transaction_balances(all_data, show_all_for_reconciliation, diagnostics=diagnostics)
+    render_diagnostics(diagnostics)
+    return balances
+
+@profiled('transform')
+def match_statement_transactions(statement_df, column_mapping, existing_data, statement_date):
+    """
+    Match statement transactions to existing database records.
+    Now uses the same balance calculation as Unreconciled Transactions tab.
+    Returns: (matched_list, unmatched_list, can_create_list)
+    """
+    diagnostics = new_diagnostics()
+    result = core_match_statement(statement_df, column_mapping, existing_data, statement_date, diagnostics=diagnostics)
+    render_diagnostics(diagnostics)
+    return result.matched, result.unmatched, result.can_create
 
 def show_import_results(statement_date, all_data):
     """Display import results and allow user to review/confirm"""
@@ -3780,7 +2323,7 @@ def show_import_results(statement_date, all_data):
             df = pd.DataFrame(matched_df)
             
             # Make it editable to allow unmatch selection
-            edited_df = st.data_editor(
+            edited_df = data_editor(
                 df,
                 column_config={
                     "Unmatch": st.column_config.CheckboxColumn("Unmatch", help="Check to unmatch this transaction"),
@@ -4844,7 +3387,7 @@ def show_import_results(statement_date, all_data):
             # Make all columns except 'Create' and 'Create Offset NEW' disabled
             disabled_cols = [col for col in df.columns if col not in ['Create', 'Create Offset NEW']]
             
-            edited_df = st.data_editor(
+            edited_df = data_editor(
                 df,
                 column_config=column_config,
                 disabled=disabled_cols,
@@ -5304,29 +3847,13 @@ def duplicate_for_renewal(df: pd.DataFrame) -> pd.DataFrame:
     """
     Duplicates the given policies and updates their dates for renewal.
     """
-    if df.empty:
-        return pd.DataFrame()
-
-    renewed_df = df.copy()
-    
-    # Calculate new term dates
-    renewed_df['new_effective_date'] = renewed_df['expiration_date']
-    
-    # Calculate new expiration date based on Policy Term
-    policy_term_col = get_mapped_column("Policy Term")
-    renewed_df['new_expiration_date'] = renewed_df.apply(
-        lambda row: row['new_effective_date'] + pd.DateOffset(months=int(row[policy_term_col])) 
-        if policy_term_col in row and pd.notna(row.get(policy_term_col)) and row.get(policy_term_col) != 0
-        else row['new_effective_date'] + pd.DateOffset(months=6),  # Default to 6 months if not specified
-        axis=1
+    return duplicate_renewal_terms(
+        df,
+        effective_col=get_mapped_column("Effective Date"),
+        x_date_col=get_mapped_column("X-DATE"),
+        type_col=get_mapped_column("Transaction Type"),
+        policy_term_col=get_mapped_column("Policy Term")
     )
-    
-    # Update the relevant columns - Using YYYY-MM-DD format
-    renewed_df[get_mapped_column("Effective Date")] = renewed_df['new_effective_date'].dt.strftime('%Y-%m-%d')
-    renewed_df[get_mapped_column("X-DATE")] = renewed_df['new_expiration_date'].dt.strftime('%Y-%m-%d')
-    renewed_df[get_mapped_column("Transaction Type")] = "RWL"
-    
-    return renewed_df
 
 def edit_transaction_form(modal_data, source_page="edit_policies", is_renewal=False):
     """
@@ -6943,6 +5470,8 @@ def main():
             "Help"
         ]
     )
+    if render_profiler.begin_page(page, st.session_state):
+        show_render_profile_panel(page)
     
     # User session info and logout button after navigation menu
     st.sidebar.divider()
@@ -7288,7 +5817,7 @@ def main():
                                 search_results[col] = search_results[col].fillna(0.0)
                         
                         # Display search results in an editable table
-                        edited_data = st.data_editor(
+                        edited_data = data_editor(
                             search_results,
                             use_container_width=True,
                             height=400,
@@ -7396,6 +5925,7 @@ def main():
                 if 'Transaction Type' in all_data.columns:
                     # Transaction type distribution pie chart
                     trans_types = all_data['Transaction Type'].value_counts()
+                    import plotly.express as px
                     fig = px.pie(values=trans_types.values, names=trans_types.index, 
                                  title="Transaction Type Distribution",
                                  color_discrete_map={
@@ -8410,6 +6940,7 @@ def main():
                         search_key = f"last_search_{editor_key}"
                         edit_position_key = f"edit_position_{editor_key}"
                         unsaved_changes_key = f"unsaved_changes_{editor_key}"
+                        baseline_key = f"{editor_key}_baseline"
                         
                         # Create a unique search identifier that includes both search term and filter state
                         # Add version number to force refresh when column order changes
@@ -8420,6 +6951,8 @@ def main():
                             search_key not in st.session_state or 
                             st.session_state[search_key] != current_search_state):
                             st.session_state[editor_key] = edit_results_with_selection.copy()
+                            # Snapshot of the loaded rows - Save diffs against this
+                            st.session_state[baseline_key] = edit_results_with_selection.copy()
                             st.session_state[search_key] = current_search_state
                             # Clear position tracking on new search
                             if edit_position_key in st.session_state:
@@ -8493,7 +7026,7 @@ def main():
                                 st.session_state[editor_key] = st.session_state[editor_key][desired_order]
                         
                         # Editable data grid with selection column
-                        edited_data = st.data_editor(
+                        edited_data = data_editor(
                             st.session_state[editor_key],
                             use_container_width=True,
                             height=calculated_height,
@@ -8557,6 +7090,7 @@ def main():
                                     
                                     if saved_count > 0:
                                         status_container.success(f"✅ Auto-saved {saved_count} changes")
+                                        st.session_state[baseline_key] = edited_data.copy()
                                         # Update the base data to reflect saved changes
                                         # Preserve column order when updating session state
                                         column_order_key = f"{editor_key}_column_order"
@@ -8762,153 +7296,59 @@ def main():
                                 print(f"DEBUG: Clearing stale widget state for {editor_key}_widget")
                             
                             try:
-                                updated_count = 0
-                                inserted_count = 0
-                                
-                                # Store original transaction IDs to track which rows are updates vs inserts
-                                original_transaction_ids = set()
+                                # Diff against the frame loaded into the editor - only rows
+                                # with changed cells are written, and only those cells
+                                baseline = st.session_state.get(baseline_key, edit_results_with_selection)
+                                save_data = edited_data.copy()
                                 if transaction_id_col:
-                                    # IMPORTANT: Use the UNFILTERED data to check for existing transactions
-                                    # This prevents creating duplicates when editing filtered views
-                                    all_transactions = load_policies_data()
-                                    if not all_transactions.empty and transaction_id_col in all_transactions.columns:
-                                        # Remove any duplicate transaction IDs from the loaded data first
-                                        all_transactions = all_transactions.drop_duplicates(subset=[transaction_id_col])
-                                        original_transaction_ids = set(all_transactions[transaction_id_col].dropna().astype(str))
-                                        # Debug: Show what we're tracking
-                                        print(f"DEBUG: Tracking {len(original_transaction_ids)} original transaction IDs")
-                                        print(f"DEBUG: Environment: {os.getenv('APP_ENVIRONMENT', 'Not Set')}")
-                                        print(f"DEBUG: Total records loaded: {len(all_transactions)}")
+                                    # STMT transactions are filtered out of the search, but double-check
+                                    stmt_mask = save_data[transaction_id_col].map(is_reconciliation_transaction)
+                                    if stmt_mask.any():
+                                        print(f"WARNING: {int(stmt_mask.sum())} STMT transactions found in edit results - skipping")
+                                        save_data = save_data[~stmt_mask]
+                                    changes = diff_editor_frames(baseline, save_data, transaction_id_col)
+                                else:
+                                    changes = {'updates': [], 'new_rows': [], 'changed_cells': 0, 'unchanged_rows': len(save_data)}
+                                    st.warning("No Transaction ID column found - changes cannot be saved")
                                 
-                                # SIMPLIFIED FIX: Use Transaction ID as source of truth
-                                # Don't rely on complex session state comparisons that fail
-                                print(f"DEBUG: Save triggered for {len(edited_data)} rows")
-                                print(f"DEBUG: Original transaction IDs tracked: {len(original_transaction_ids)}")
+                                print(f"DEBUG: Save diff - {len(changes['updates'])} changed rows ({changes['changed_cells']} cells), "
+                                      f"{len(changes['new_rows'])} new rows, {changes['unchanged_rows']} unchanged")
                                 
-                                # For bulk edits, we'll process all rows but ONLY do updates
-                                # This prevents the massive duplication issue
-                                bulk_edit_mode = len(edited_data) > 10  # Assume bulk edit if more than 10 rows
-                                if bulk_edit_mode:
-                                    print("INFO: Bulk edit mode - will only UPDATE existing records")
-                                    st.info("Bulk edit mode: Updating existing records only")
+                                def clean_save_value(value):
+                                    if pd.notna(value) and isinstance(value, (int, float)) and not isinstance(value, bool):
+                                        return clean_numeric_value(value)
+                                    return value if pd.notna(value) else None
+                                
+                                def prepare_new_row(row):
+                                    # For new rows, generate unique IDs if they're missing
+                                    if pd.isna(row.get(transaction_id_col)) or str(row.get(transaction_id_col)).strip() == '':
+                                        row[transaction_id_col] = generate_unique_transaction_id()
+                                    if client_id_col and (pd.isna(row.get(client_id_col)) or str(row.get(client_id_col)).strip() == ''):
+                                        # Use existing client ID if searching for a specific client, otherwise generate new
+                                        row[client_id_col] = existing_client_id if existing_client_id else generate_client_id()
+                                    row = {col: clean_save_value(value) for col, value in row.items()}
+                                    # Clean data before insertion and add user email for multi-tenancy
+                                    return add_user_email_to_data(clean_data_for_database(row))
+                                
+                                save_stats = save_editor_changes(
+                                    supabase,
+                                    changes,
+                                    transaction_id_col,
+                                    user_id=get_user_id(),
+                                    user_email=get_normalized_user_email(),
+                                    clean_value=clean_save_value,
+                                    prepare_insert=prepare_new_row
+                                ) if transaction_id_col else None
+                                
+                                if save_stats:
+                                    for error in save_stats['errors']:
+                                        st.error(error)
+                                    updated_count = save_stats['updated_rows']
+                                    inserted_count = save_stats['inserted_rows']
+                                    print(f"DEBUG: Save wrote {updated_count + inserted_count} rows in {save_stats['round_trips']} requests")
+                                else:
+                                    updated_count = inserted_count = 0
                                 
-                                # Process each row based on Transaction ID presence
-                                for idx, row in edited_data.iterrows():
-                                    # Skip the selection column for save operations
-                                    if 'Select' in row:
-                                        row = row.drop('Select')
-                                    
-                                    # Get the transaction ID for this row
-                                    transaction_id = row.get(transaction_id_col) if transaction_id_col else None
-                                    
-                                    # STMT transactions should not appear here as they're filtered out in the search
-                                    # But double-check just in case
-                                    if transaction_id and is_reconciliation_transaction(transaction_id):
-                                        print(f"WARNING: STMT transaction {transaction_id} found in search results - this shouldn't happen")
-                                        continue
-                                            
-                                    # SIMPLIFIED: If it has a transaction ID, it's an UPDATE. Period.
-                                    # This prevents the massive duplication issue
-                                    is_new_row = False
-                                    if transaction_id_col:
-                                        if pd.isna(transaction_id) or str(transaction_id).strip() == '':
-                                            # Only truly new if no transaction ID at all
-                                            is_new_row = True
-                                        elif str(transaction_id) in original_transaction_ids:
-                                            # Exists in database - UPDATE ONLY
-                                            is_new_row = False
-                                        else:
-                                            # Has ID but not in our list? In bulk mode, assume UPDATE
-                                            if bulk_edit_mode:
-                                                print(f"BULK MODE: Treating {transaction_id} as UPDATE to prevent duplicates")
-                                                is_new_row = False
-                                            else:
-                                                # Single edit mode - verify with database
-                                                is_new_row = True
-                                            
-                                    if is_new_row:
-                                        # For new rows, generate unique IDs if they're missing
-                                        if transaction_id_col and (pd.isna(transaction_id) or str(transaction_id).strip() == ''):
-                                            transaction_id = generate_unique_transaction_id()
-                                            row[transaction_id_col] = transaction_id
-                                        if client_id_col and (pd.isna(row[client_id_col]) or str(row[client_id_col]).strip() == ''):
-                                            # Use existing client ID if searching for a specific client, otherwise generate new
-                                            if existing_client_id:
-                                                row[client_id_col] = existing_client_id
-                                            else:
-                                                row[client_id_col] = generate_client_id()
-                                    
-                                    # Process all rows
-                                    if is_new_row:
-                                        # INSERT new record
-                                        insert_dict = {}
-                                        for col in edited_data.columns:
-                                            if col not in ['_id', 'Select']:  # Exclude auto-generated fields and selection column
-                                                value = row[col]
-                                                # Clean numeric values
-                                                if pd.notna(value) and isinstance(value, (int, float)):
-                                                    insert_dict[col] = clean_numeric_value(value)
-                                                else:
-                                                    insert_dict[col] = value if pd.notna(value) else None
-                                                    
-                                            try:
-                                                # SAFETY CHECK: Verify this transaction ID truly doesn't exist
-                                                if transaction_id_col and transaction_id:
-                                                    check_exists = supabase.table('policies').select('_id').eq(transaction_id_col, transaction_id)
-                                                    user_id = get_user_id()
-                                                    if user_id:
-                                                        check_exists = check_exists.eq('user_id', user_id)
-                                                    else:
-                                                        user_email = get_normalized_user_email()
-                                                        if user_email:
-                                                            check_exists = check_exists.eq('user_email', user_email)
-                                                    
-                                                    exists_result = check_exists.execute()
-                                                    if exists_result.data and len(exists_result.data) > 0:
-                                                        print(f"WARNING: Skipping duplicate insert - Transaction ID {transaction_id} already exists")
-                                                    else:
-                                                        # Clean data before insertion
-                                                        cleaned_insert = clean_data_for_database(insert_dict)
-                                                        # Add user email for multi-tenancy
-                                                        cleaned_insert = add_user_email_to_data(cleaned_insert)
-                                                        supabase.table('policies').insert(add_user_email_to_data(cleaned_insert)).execute()
-                                                        inserted_count += 1
-                                            except Exception as insert_error:
-                                                st.error(f"Error inserting new record: {insert_error}")
-                                    elif transaction_id:  # Only update if we have a transaction ID
-                                        # UPDATE existing record
-                                        update_dict = {}
-                                        for col in edited_data.columns:
-                                            if col not in ['_id', 'Select', transaction_id_col]:  # Don't update ID field or selection column
-                                                value = row[col]
-                                                # Clean numeric values
-                                                if pd.notna(value) and isinstance(value, (int, float)):
-                                                    update_dict[col] = clean_numeric_value(value)
-                                                else:
-                                                    update_dict[col] = value if pd.notna(value) else None
-                                                    
-                                            try:
-                                                # Add user_id filtering for secure updates
-                                                update_query = supabase.table('policies').update(update_dict).eq(transaction_id_col, transaction_id)
-                                            
-                                                # Add user filtering for security
-                                                user_id = get_user_id()
-                                                if user_id:
-                                                    update_query = update_query.eq('user_id', user_id)
-                                                else:
-                                                    # Fallback to email if user_id not available
-                                                    user_email = get_normalized_user_email()
-                                                    if user_email:
-                                                        update_query = update_query.eq('user_email', user_email)
-                                                
-                                                update_query.execute()
-                                                updated_count += 1
-                                            except Exception as update_error:
-                                                st.error(f"Error updating record: {update_error}")
-                                    else:
-                                        # This shouldn't happen, but log it if it does
-                                        st.warning(f"Skipped row {idx} - existing row but no transaction ID found")
-                                        
                                 # Clear cache and show success message
                                 clear_policies_cache()
                                 
@@ -8917,16 +7357,18 @@ def main():
                                 elif inserted_count > 0:
                                     st.success(f"Successfully inserted {inserted_count} new records!")
                                 elif updated_count > 0:
-                                    st.success(f"Successfully updated {updated_count} records!")
+                                    st.success(f"Successfully updated {updated_count} records ({save_stats['changed_cells']} changed cells)!")
                                 else:
                                     st.info("No changes were made.")
                                 
-                                st.rerun()
-                                
-                                # Clear unsaved changes after successful save
+                                # Saved state becomes the new baseline; clear unsaved changes before rerun
+                                if not (save_stats and save_stats['errors']):
+                                    st.session_state[baseline_key] = edited_data.copy()
                                 if unsaved_changes_key in st.session_state:
                                     del st.session_state[unsaved_changes_key]
                                 
+                                st.rerun()
+                                
                             except Exception as e:
                                 st.error(f"Error saving changes: {e}")
                             
@@ -9499,7 +7941,7 @@ def main():
                     st.warning("⚠️ **UNSAVED CHANGES** - Click 'Save Changes' below before navigating to another page or your changes will be lost!")
                 
                 # Try minimal column config to see if it helps with sorting
-                edited_all_data = st.data_editor(
+                edited_all_data = data_editor(
                     edit_all_data,
                     use_container_width=True,
                         height=500,
@@ -10700,7 +9142,7 @@ def main():
                     # Only include columns that exist
                     available_columns = [col for col in display_columns if col in batch_df.columns]
                     
-                    edited_batch = st.data_editor(
+                    edited_batch = data_editor(
                         batch_df[available_columns],
                         column_config={
                             "Remove": st.column_config.CheckboxColumn("Remove", help="Check to remove from batch"),
@@ -11153,21 +9595,9 @@ def main():
                         st.error(f"❌ File size ({file_size_mb:.2f} MB) exceeds the 200 MB limit. Please use a smaller file.")
                         st.stop()
                     
-                    # Parse file
+                    # Parse file (once per upload; re-uploads of the same file come from the statement cache)
                     try:
-                        # Reset file position to beginning
-                        uploaded_file.seek(0)
-                        
-                        if uploaded_file.name.endswith('.csv'):
-                            df = pd.read_csv(uploaded_file, on_bad_lines='warn')
-                        else:
-                            # For Excel files, try to read with error handling
-                            try:
-                                df = pd.read_excel(uploaded_file, engine='openpyxl')
-                            except:
-                                # Fallback to xlrd for older Excel files
-                                uploaded_file.seek(0)
-                                df = pd.read_excel(uploaded_file, engine='xlrd')
+                        df = load_uploaded_statement(uploaded_file, get_user_session_key('parsed_statement'))
                         
                         # Check if dataframe is empty
                         if df.empty:
@@ -11181,17 +9611,7 @@ def main():
                         st.session_state[import_data_key] = df
                         
                         # Count actual transactions (excluding totals rows)
-                        transaction_count = len(df)
-                        # Check if any row contains 'total' in any column
-                        for col in df.columns:
-                            try:
-                                if df[col].astype(str).str.lower().str.contains('total|totals|subtotal|sub-total|grand total|sum', na=False).any():
-                                    transaction_count = len(df) - df[col].astype(str).str.lower().str.contains('total|totals|subtotal|sub-total|grand total|sum', na=False).sum()
-                                    break
-                            except Exception as e:
-                                # Log the error but continue processing
-                                print(f"Warning: Error checking column {col} for totals: {str(e)}")
-                                continue
+                        transaction_count = len(df) - count_total_rows(df)
                         
                         if transaction_count == len(df):
                             st.success(f"✅ Loaded {transaction_count} transactions from {uploaded_file.name}")
@@ -11638,7 +10058,7 @@ def main():
                                             customer_col = st.session_state.column_mapping.get('Customer', '')
                                             if customer_col:
                                                 # Find rows that look like totals (to exclude them)
-                                                totals_mask = df[customer_col].astype(str).str.lower().str.contains('total|totals|subtotal|sub-total|grand total|sum', na=False)
+                                                totals_mask = total_row_mask(df[customer_col])
                                                 # Also check for empty customer names which might be totals rows
                                                 empty_customer_mask = df[customer_col].astype(str).str.strip() == ''
                                                 # Also check for NaN values
@@ -11700,7 +10120,7 @@ def main():
                                                             st.write(f"Row {idx}: Customer='{customer_val}' (type: {type(customer_val).__name__}, repr: {repr(customer_val)}), Amount={amount_val}")
                                                     
                                                     # Find rows that look like totals (to exclude them)
-                                                    totals_mask = df[customer_col].astype(str).str.lower().str.contains('total|totals|subtotal|sub-total|grand total|sum', na=False)
+                                                    totals_mask = total_row_mask(df[customer_col])
                                                     # Also check for empty customer names which might be totals rows
                                                     empty_customer_mask = df[customer_col].astype(str).str.strip() == ''
                                                     # Also check for NaN values
@@ -12152,7 +10572,7 @@ def main():
                             max_visible_rows = min(len(batch_summary_sorted), 15)
                             table_height = header_height + (row_height * max_visible_rows)
                             
-                            edited_df = st.data_editor(
+                            edited_df = data_editor(
                                 batch_summary_sorted,
                                 column_config=column_config,
                                 use_container_width=True,
@@ -12576,7 +10996,7 @@ def main():
                             st.write("**Transaction List**")
                             
                             # Use data editor for checkbox selection
-                            edited_transactions = st.data_editor(
+                            edited_transactions = data_editor(
                                 display_recon_sorted,
                                 column_config={
                                     "Edit": st.column_config.CheckboxColumn(
@@ -13014,6 +11434,17 @@ def main():
             st.subheader("🐛 Debug Logs")
             st.info("This section captures all debug messages, errors, and system events to help diagnose issues.")
             
+            # Stored outside the widget key so it survives leaving the Admin Panel
+            st.session_state['debug_mode'] = st.checkbox(
+                "Show calculation diagnostics", value=st.session_state.get('debug_mode', False),
+                help="Show the balance, metrics and statement matching debug details on every page"
+            )
+            st.session_state[render_profiler.STATE_ENABLED] = st.checkbox(
+                "Profile page renders", value=st.session_state.get(render_profiler.STATE_ENABLED, False),
+                help="Time each page's data loads, transforms, editors and exports and count Supabase calls; "
+                     "the breakdown shows in the sidebar from the next rerun"
+            )
+            
             # Initialize debug logs if not exists
             if "debug_logs" not in st.session_state:
                 st.session_state.debug_logs = []
@@ -16873,7 +15304,7 @@ CL12349,CAN001,AUTO,Bob Johnson,AUTO-2024-002,CAN,08/01/2024,-800.00,15,-120.00,
                     st.write(f"**Found {len(deleted_df)} deleted records:**")
                     
                     # Show key info at the top
-                    edited_deleted = st.data_editor(
+                    edited_deleted = data_editor(
                         deleted_df,
                         use_container_width=True,
                         height=400,
@@ -17262,52 +15693,23 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                 
                 # Filter transactions if specific X-DATE selected
                 if selected_xdate != "All Terms":
-                    # Find the term's effective date (from NEW or RWL transaction with this X-DATE)
-                    term_transactions = policy_rows[
-                        (policy_rows["X-DATE"] == selected_xdate) & 
-                        (policy_rows["Transaction Type"].isin(["NEW", "RWL", "REWRITE"]))
-                    ]
-                    
-                    if not term_transactions.empty:
-                        term_eff_date = pd.to_datetime(term_transactions.iloc[0]["Effective Date"], errors='coerce')
-                        term_x_date = pd.to_datetime(selected_xdate, errors='coerce')
+                    # Terms are assigned exactly as in Policy Revenue Ledger Reports:
+                    # the NEW/RWL/REWRITE with this X-DATE and everything dated inside its term
+                    ledger_term_index = PolicyTermIndex(policy_rows)
+                    selected_terms = ledger_term_index.terms_for_x_date(selected_xdate)
+                    
+                    if not selected_terms.empty:
+                        term_eff_date = selected_terms.iloc[0]["effective_date"]
+                        term_x_date = selected_terms.iloc[0]["x_date"]
 
-                        if pd.notna(term_eff_date) and pd.notna(term_x_date):
-                            with term_col2:
-                                st.info(f"📆 Term: {term_eff_date.strftime('%Y-%m-%d')} to {term_x_date.strftime('%Y-%m-%d')}")
-                        
-                        # Filter policy_rows to include:
-                        # 1. NEW/RWL transaction with this X-DATE
-                        # 2. END transactions with effective dates between term dates
-                        # 3. STMT/VOID/ADJ transactions within the term period
-                        filtered_rows = []
-                        
-                        for idx, row in policy_rows.iterrows():
-                            trans_type = row.get("Transaction Type", "")
-                            trans_eff_date = pd.to_datetime(row.get("Effective Date"), errors='coerce')
-                            trans_x_date = row.get("X-DATE")
-                            
-                            # Check for STMT/VOID transactions FIRST (they might have various transaction types)
-                            if "-STMT-" in str(row.get("Transaction ID", "")) or "-VOID-" in str(row.get("Transaction ID", "")):
-                                # Include if Effective Date falls within term
-                                if pd.notna(trans_eff_date) and term_eff_date <= trans_eff_date <= term_x_date:
-                                    filtered_rows.append(idx)
-                            # Include NEW/RWL with matching X-DATE
-                            elif trans_type in ["NEW", "RWL", "REWRITE"] and trans_x_date == selected_xdate:
-                                filtered_rows.append(idx)
-                            # Include END within the term dates
-                            elif trans_type == "END" and pd.notna(trans_eff_date):
-                                if term_eff_date <= trans_eff_date <= term_x_date:
-                                    filtered_rows.append(idx)
-                            # Include other payment/adjustment transactions
-                            elif trans_type in ["STMT", "VOID", "ADJ"]:
-                                # Check if Effective Date falls within term
-                                if pd.notna(trans_eff_date) and term_eff_date <= trans_eff_date <= term_x_date:
-                                    filtered_rows.append(idx)
+                        with term_col2:
+                            st.info(f"📆 Term: {term_eff_date.strftime('%Y-%m-%d')} to {term_x_date.strftime('%Y-%m-%d')}")
+                        
+                        in_term = ledger_term_index.term_ids.isin(selected_terms["term_id"])
                         
                         # Apply the filter
-                        if filtered_rows:
-                            policy_rows = policy_rows.loc[filtered_rows].copy()
+                        if in_term.any():
+                            policy_rows = policy_rows[in_term.to_numpy()].copy()
                             with term_col3:
                                 st.success(f"✅ Showing {len(policy_rows)} transactions for this term")
                         else:
@@ -19421,7 +17823,8 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                 preserved_current_page = st.session_state.get('prl_current_page', 1)
                 
                 st.cache_data.clear()
-                
+                st.session_state.pop(get_user_session_key('prl_aggregated_cache'), None)
+
                 # Restore selections after cache clear
                 st.session_state.prl_current_view_mode = preserved_view_mode
                 st.session_state.prl_statement_month_selectbox = preserved_month
@@ -19538,59 +17941,17 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
             
             # Process data based on view mode
             if view_mode == "Aggregated by Policy":
-                # Simple data processing - AGGREGATE BY POLICY NUMBER using mapped columns
-                # This ensures one row per policy with totals from all transactions
-                working_data = all_data.copy()
-            
-                # Get mapped column for Policy Number
-                policy_number_col = get_mapped_column("Policy Number") or "Policy Number"
-                
-                # Group by Policy Number and aggregate the data
-                if policy_number_col in working_data.columns and not working_data.empty:
-                    # Define aggregation rules using mapped column names
-                    agg_dict = {}
-                
-                    # For descriptive fields, take the first value (they should be the same for all transactions of the same policy)
-                    descriptive_field_names = ["Customer", "Policy Type", "Carrier Name", "MGA Name", "Effective Date", 
-                                             "Policy Origination Date", "X-DATE", "Client ID", "Transaction Type", 
-                                             "Prior Policy Number", "Transaction ID", "NOTES", "Policy Term", 
-                                             "Policy Checklist Complete", "STMT DATE"]
-                    for field_name in descriptive_field_names:
-                        mapped_col = get_mapped_column(field_name)
-                        target_col = mapped_col if mapped_col and mapped_col in working_data.columns else (field_name if field_name in working_data.columns else None)
-                        if target_col:
-                            agg_dict[target_col] = 'first'
-                    
-                    # For monetary fields, sum all transactions for each policy
-                    monetary_field_names = ["Agent Estimated Comm $", "Agent Paid Amount (STMT)", 
-                                           "Agency Estimated Comm/Revenue (CRM)", "Premium Sold", "Policy Gross Comm %",
-                                           "Broker Fee", "Broker Fee Agent Comm", "Total Agent Comm", 
-                                           "Policy Taxes & Fees", "Commissionable Premium"]
-                    for field_name in monetary_field_names:
-                        mapped_col = get_mapped_column(field_name)
-                        target_col = mapped_col if mapped_col and mapped_col in working_data.columns else (field_name if field_name in working_data.columns else None)
-                        if target_col:
-                            # Convert to numeric first, then sum
-                            import pandas as pd  # Ensure pandas is available in this scope
-                            working_data[target_col] = pd.to_numeric(working_data[target_col], errors='coerce').fillna(0)
-                            agg_dict[target_col] = 'sum'
-                    
-                    # For percentage fields, take the first value (should be consistent per policy)
-                    percentage_fields = ["Agent Comm %", "Policy Gross Comm %"]
-                    for field in percentage_fields:
-                        if field in working_data.columns and field not in agg_dict:
-                            agg_dict[field] = 'first'
-
-                    # Strip whitespace from Policy Number before grouping to avoid duplicates
-                    if 'Policy Number' in working_data.columns:
-                        working_data['Policy Number'] = working_data['Policy Number'].astype(str).str.strip()
-
-                    # Group by Policy Number and aggregate
-                    working_data = working_data.groupby('Policy Number', as_index=False).agg(agg_dict)
-                    
-                    # Sort aggregated data by Customer then Policy Number
-                    if 'Customer' in working_data.columns and 'Policy Number' in working_data.columns:
-                        working_data = working_data.sort_values(['Customer', 'Policy Number'], ascending=[True, True])
+                # AGGREGATE BY POLICY NUMBER using mapped columns - one row per policy with
+                # totals from all transactions. The aggregated frame is cached per user and
+                # column mapping; only policies whose transactions changed are recomputed,
+                # so pagination and review clicks reuse it.
+                working_data = get_aggregated_policies(
+                    st.session_state,
+                    get_user_session_key('prl_aggregated_cache'),
+                    all_data,
+                    get_mapped_column,
+                    mapping_version=get_mapping_version()
+                )
             else:
                 # Detailed view - show all transactions without aggregation
                 working_data = all_data.copy()
@@ -19635,7 +17996,12 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
             # Ensure Policy Balance Due is numeric for calculations
             if "Policy Balance Due" in working_data.columns:
                 working_data["Policy Balance Due"] = pd.to_numeric(working_data["Policy Balance Due"], errors="coerce").fillna(0)
-            
+
+            # Assign every transaction to its policy term once; the month filter,
+            # detailed-view grouping and subtotals all look terms up by row label
+            working_data = working_data.reset_index(drop=True)
+            prl_term_index = PolicyTermIndex(working_data)
+
             # Statement Month Filter
             st.markdown("### 📅 Statement Month Selection")
             
@@ -19694,67 +18060,8 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                     ]
                     
                     if not new_rwl_in_month.empty:
-                        month_data = pd.DataFrame()
-                        
-                        # Process each NEW/RWL transaction to find its term boundaries
-                        for _, term_defining_row in new_rwl_in_month.iterrows():
-                            policy_num = term_defining_row['Policy Number']
-                            term_eff_date = pd.to_datetime(term_defining_row['Effective Date'])
-                            term_x_date = pd.to_datetime(term_defining_row['X-DATE']) if pd.notna(term_defining_row.get('X-DATE')) else None
-                            
-                            # Get all transactions for this specific policy
-                            if 'Client ID' in working_data.columns and pd.notna(term_defining_row.get('Client ID')):
-                                policy_transactions = working_data[
-                                    (working_data['Client ID'] == term_defining_row['Client ID']) & 
-                                    (working_data['Policy Number'] == policy_num)
-                                ].copy()
-                            else:
-                                policy_transactions = working_data[
-                                    working_data['Policy Number'] == policy_num
-                                ].copy()
-                            
-                            # Filter to only include transactions within this specific term
-                            term_transactions = []
-                            
-                            for _, trans_row in policy_transactions.iterrows():
-                                trans_type = trans_row.get('Transaction Type', '')
-                                trans_id = str(trans_row.get('Transaction ID', ''))
-                                trans_eff_date = pd.to_datetime(trans_row.get('Effective Date'), errors='coerce')
-                                
-                                include_transaction = False
-                                
-                                # For NEW/RWL/REWRITE transactions, be very strict - only include if in selected month
-                                if trans_type in ['NEW', 'RWL', 'REWRITE']:
-                                    trans_year_month = trans_eff_date.strftime('%Y-%m') if pd.notna(trans_eff_date) else ''
-                                    # Only include if this NEW/RWL/REWRITE is in our selected month
-                                    if trans_year_month == selected_ym:
-                                        include_transaction = True
-                                # Include END transactions within the term dates
-                                elif trans_type == 'END' and pd.notna(trans_eff_date) and term_x_date:
-                                    if term_eff_date <= trans_eff_date < term_x_date:
-                                        include_transaction = True
-                                # Include STMT/VOID transactions within term (using Effective Date only)
-                                elif '-STMT-' in trans_id or '-VOID-' in trans_id:
-                                    # Use Effective Date just like other transactions
-                                    if pd.notna(trans_eff_date) and term_x_date:
-                                        if term_eff_date <= trans_eff_date < term_x_date:
-                                            include_transaction = True
-                                # Include other transactions (CAN, PMT, etc.) within the term dates
-                                elif pd.notna(trans_eff_date) and term_x_date:
-                                    if term_eff_date <= trans_eff_date < term_x_date:
-                                        include_transaction = True
-                                
-                                if include_transaction:
-                                    term_transactions.append(trans_row.to_dict())
-                            
-                            # Add this term's transactions to the month data
-                            if term_transactions:
-                                term_df = pd.DataFrame(term_transactions)
-                                month_data = pd.concat([month_data, term_df], ignore_index=True)
-                        
-                        # Remove any duplicates that might have been added
-                        if not month_data.empty and 'Transaction ID' in month_data.columns:
-                            month_data = month_data.drop_duplicates(subset=['Transaction ID'])
+                        # All transactions of the policy terms that started in this month
+                        month_data = working_data[prl_term_index.month_mask(selected_ym)]
                     else:
                         # No NEW/RWL transactions in this month
                         month_data = pd.DataFrame()
@@ -20047,6 +18354,7 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                         # Generate unique key for sortable component
                         sortable_key = f"prl_column_order_sortable_{st.session_state.get('prl_column_order_sortable_counter', 0)}"
                         
+                        import streamlit_sortables
                         reordered_columns = streamlit_sortables.sort_items(
                             items=selected_columns,
                             direction="horizontal",
@@ -20359,7 +18667,7 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                                     )
                             
                             # Use data editor for reviewed transactions with extra row padding
-                            edited_reviewed = st.data_editor(
+                            edited_reviewed = data_editor(
                                 reviewed_editable,
                                 use_container_width=True,
                                 column_config=reviewed_column_config,
@@ -20728,97 +19036,11 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                         # Apply visual grouping by policy term BEFORE column reordering (only in detailed view)
                         if view_mode != "Aggregated by Policy" and 'Policy Number' in editable_data.columns:
                             # Group by policy terms using Effective Date and X-DATE ranges
-                            # This matches the logic in Policy Revenue Ledger
-                            
-                            # Track term groups for each row
-                            editable_data['_term_group'] = ''
-                            editable_data['_term_dates'] = ''
-                            
-                            # Process each unique policy number
-                            unique_policies = editable_data['Policy Number'].unique()
-                            all_term_groups = []
-                            
-                            for policy_num in unique_policies:
-                                # Get all transactions for this policy
-                                policy_mask = editable_data['Policy Number'] == policy_num
-                                policy_data = editable_data[policy_mask].copy()
-                                
-                                if 'X-DATE' in policy_data.columns and 'Transaction Type' in policy_data.columns:
-                                    # Find all NEW/RWL/REWRITE transactions with X-DATEs (these define terms)
-                                    term_defining = policy_data[
-                                        (policy_data['Transaction Type'].isin(['NEW', 'RWL', 'REWRITE'])) & 
-                                        (policy_data['X-DATE'].notna())
-                                    ].sort_values('Effective Date')
-                                    
-                                    if not term_defining.empty:
-                                        # Remove duplicates based on Effective Date and X-DATE to avoid double-counting terms
-                                        term_defining = term_defining.drop_duplicates(subset=['Effective Date', 'X-DATE'])
-                                        
-                                        # Process each term
-                                        for term_idx, (_, term_row) in enumerate(term_defining.iterrows()):
-                                            term_eff_date = pd.to_datetime(term_row['Effective Date'], errors='coerce')
-                                            term_x_date = pd.to_datetime(term_row['X-DATE'], errors='coerce')
-
-                                            if pd.isna(term_eff_date) or pd.isna(term_x_date):
-                                                continue  # Skip invalid dates
-
-                                            term_name = f"{policy_num} - Term {term_idx + 1}"
-                                            term_dates = f"{term_eff_date.strftime('%m/%d/%Y')} to {term_x_date.strftime('%m/%d/%Y')}"
-                                            
-                                            # Find all transactions within this term's date range
-                                            for idx, row in policy_data.iterrows():
-                                                trans_type = row.get('Transaction Type', '')
-                                                trans_id = str(row.get('Transaction ID', ''))
-                                                
-                                                # Include the NEW/RWL/REWRITE transaction that defines this term
-                                                if row['X-DATE'] == term_row['X-DATE'] and trans_type in ['NEW', 'RWL', 'REWRITE']:
-                                                    editable_data.at[idx, '_term_group'] = term_name
-                                                    editable_data.at[idx, '_term_dates'] = term_dates
-                                                # Include END transactions within the term dates (but not on X-DATE)
-                                                elif trans_type == 'END':
-                                                    trans_eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
-                                                    if pd.notna(trans_eff_date) and term_eff_date <= trans_eff_date < term_x_date:
-                                                        editable_data.at[idx, '_term_group'] = term_name
-                                                        editable_data.at[idx, '_term_dates'] = term_dates
-                                                # Include STMT/VOID transactions within term (but not on X-DATE)
-                                                elif '-STMT-' in trans_id or '-VOID-' in trans_id:
-                                                    trans_eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
-                                                    if pd.notna(trans_eff_date) and term_eff_date <= trans_eff_date < term_x_date:
-                                                        editable_data.at[idx, '_term_group'] = term_name
-                                                        editable_data.at[idx, '_term_dates'] = term_dates
-                                                # Include CAN transactions - special exception for X-DATE
-                                                elif trans_type == 'CAN':
-                                                    trans_eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
-                                                    # CAN transactions on X-DATE go to expiring term (use <= instead of <)
-                                                    if pd.notna(trans_eff_date) and term_eff_date <= trans_eff_date <= term_x_date:
-                                                        editable_data.at[idx, '_term_group'] = term_name
-                                                        editable_data.at[idx, '_term_dates'] = term_dates
-                                                # Include all other transactions within term (but not on X-DATE)
-                                                else:
-                                                    trans_eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
-                                                    if pd.notna(trans_eff_date) and term_eff_date <= trans_eff_date < term_x_date:
-                                                        editable_data.at[idx, '_term_group'] = term_name
-                                                        editable_data.at[idx, '_term_dates'] = term_dates
-                                            
-                                            all_term_groups.append(term_name)
-                                    else:
-                                        # No terms found, group all transactions together
-                                        term_name = f"{policy_num} - All Transactions"
-                                        editable_data.loc[policy_mask, '_term_group'] = term_name
-                                        all_term_groups.append(term_name)
-                                else:
-                                    # Missing required columns, group by policy only
-                                    term_name = f"{policy_num} - All Transactions"
-                                    editable_data.loc[policy_mask, '_term_group'] = term_name
-                                    all_term_groups.append(term_name)
-                            
-                            # Remove duplicates while preserving order
-                            unique_groups = []
-                            seen = set()
-                            for group in all_term_groups:
-                                if group not in seen:
-                                    unique_groups.append(group)
-                                    seen.add(group)
+                            # Term IDs come from the PolicyTermIndex built for the whole report,
+                            # so this matches the month filter and the Policy Revenue Ledger
+                            editable_data = prl_term_index.annotate(editable_data)
+                            unique_groups = prl_term_index.ordered_term_ids(editable_data)
+                            group_rank = {group: i for i, group in enumerate(unique_groups)}
                             
                             # Sort transactions within each term group with enhanced logic
                             sorted_dfs = []
@@ -20860,56 +19082,25 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                                 sorted_dfs.append(no_group_copy)
                                 sorted_dfs.append(orphan_footer)
                             
-                            # Then process all grouped transactions
-                            for group_name in unique_groups:
-                                group_df = editable_data[editable_data['_term_group'] == group_name].copy()
+                            # Then all grouped transactions in one sort: term order, then
+                            # NEW/RWL/REWRITE (1), END (2), others (3), with STMT/VOID after them (4-6)
+                            grouped = editable_data[editable_data['_term_group'] != ''].copy()
+                            if len(grouped) > 0:
+                                trans_types = grouped['Transaction Type'] if 'Transaction Type' in grouped.columns else pd.Series('', index=grouped.index)
+                                is_recon = is_reconciliation_id(grouped['Transaction ID'])
+                                grouped['_group_rank'] = grouped['_term_group'].map(group_rank)
+                                grouped['_sort_key'] = np.select(
+                                    [trans_types.isin(['NEW', 'RWL', 'REWRITE']), trans_types == 'END'], [1, 2], 3
+                                ) + np.where(is_recon, 3, 0)
                                 
-                                if len(group_df) > 0:
-                                    # Add a sort key for transaction types to ensure proper ordering
-                                    def get_type_sort_key(row):
-                                        trans_id = str(row.get('Transaction ID', ''))
-                                        trans_type = row.get('Transaction Type', '')
-                                        
-                                        # Check if it's STMT/VOID
-                                        if '-STMT-' in trans_id or '-VOID-' in trans_id:
-                                            # STMT/VOID get higher numbers to appear last
-                                            if trans_type in ['NEW', 'RWL', 'REWRITE']:
-                                                return 4
-                                            elif trans_type == 'END':
-                                                return 5
-                                            else:
-                                                return 6
-                                        else:
-                                            # Regular transactions
-                                            if trans_type in ['NEW', 'RWL', 'REWRITE']:
-                                                return 1
-                                            elif trans_type == 'END':
-                                                return 2
-                                            else:
-                                                return 3
-                                    
-                                    # Apply the sort key
-                                    group_df['_sort_key'] = group_df.apply(get_type_sort_key, axis=1)
-                                    
-                                    # Sort by sort key first, then by appropriate date
-                                    date_col = group_df.apply(
-                                        lambda row: 'STMT DATE' if ('-STMT-' in str(row['Transaction ID']) or '-VOID-' in str(row['Transaction ID'])) else 'Effective Date',
-                                        axis=1
-                                    )
-                                    
-                                    # Create a unified date column for sorting
-                                    group_df['_sort_date'] = group_df.apply(
-                                        lambda row: row.get('STMT DATE', row.get('Effective Date', '')) if ('-STMT-' in str(row.get('Transaction ID', '')) or '-VOID-' in str(row.get('Transaction ID', ''))) else row.get('Effective Date', ''),
-                                        axis=1
-                                    )
-                                    
-                                    # Sort by sort key, then date, then transaction type (for grouping within others), then ID
-                                    sorted_group = group_df.sort_values(['_sort_key', '_sort_date', 'Transaction Type', 'Transaction ID'])
-                                    
-                                    # Remove the temporary columns
-                                    sorted_group = sorted_group.drop(['_sort_key', '_sort_date'], axis=1)
-                                    
-                                    sorted_dfs.append(sorted_group)
+                                # STMT/VOID sort by statement date, everything else by Effective Date
+                                eff_dates = pd.to_datetime(grouped['Effective Date'], errors='coerce') if 'Effective Date' in grouped.columns else pd.Series(pd.NaT, index=grouped.index)
+                                stmt_dates = pd.to_datetime(grouped['STMT DATE'], errors='coerce') if 'STMT DATE' in grouped.columns else eff_dates
+                                grouped['_sort_date'] = stmt_dates.where(is_recon, eff_dates)
+                                
+                                sort_cols = ['_group_rank', '_sort_key', '_sort_date'] + [c for c in ['Transaction Type', 'Transaction ID'] if c in grouped.columns]
+                                sorted_group = grouped.sort_values(sort_cols, kind='mergesort')
+                                sorted_dfs.append(sorted_group.drop(['_group_rank', '_sort_key', '_sort_date'], axis=1))
                             
                             # Orphaned transactions are now handled at the beginning with visual indicators
                             
@@ -20917,38 +19108,19 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                             if sorted_dfs:
                                 editable_data = pd.concat(sorted_dfs, ignore_index=True)
                             
-                            # Create group indicator column and subtotal rows
-                            group_indicators = []
-                            current_group = None
-                            subtotal_rows = []
-                            group_counters = {}  # Track row count within each group
-                            
-                            for idx, row in editable_data.iterrows():
-                                term_group = row['_term_group']
-                                if term_group:
-                                    if term_group != current_group:
-                                        current_group = term_group
-                                        group_counters[term_group] = 0
-                                    
-                                    # Increment counter for this group
-                                    group_counters[term_group] += 1
-                                    
-                                    # Find group number (1-based)
-                                    if term_group in unique_groups:
-                                        group_num = unique_groups.index(term_group) + 1
-                                        row_num = group_counters[term_group]
-                                        group_indicators.append(f'{group_num}.{row_num}')
-                                    else:
-                                        group_indicators.append('')
-                                else:
-                                    group_indicators.append('')  # No indicator for rows without term group
+                            # Create group indicator column (term number . row number within the term)
+                            in_term = editable_data['_term_group'].isin(group_rank)
+                            group_nums = editable_data['_term_group'].map(group_rank)
+                            row_nums = editable_data[in_term].groupby('_term_group').cumcount() + 1
+                            group_indicators = pd.Series('', index=editable_data.index, dtype=object)
+                            group_indicators[in_term] = (group_nums[in_term] + 1).astype(int).astype(str) + '.' + row_nums.astype(str)
                             
                             # Insert group indicator after Select column (only if it doesn't exist)
                             if 'Group' not in editable_data.columns:
-                                editable_data.insert(1, 'Group', group_indicators)
+                                editable_data.insert(1, 'Group', group_indicators.tolist())
                             else:
                                 # Update existing Group column
-                                editable_data['Group'] = group_indicators
+                                editable_data['Group'] = group_indicators.tolist()
                             
                             # Create subtotal rows for each term group
                             numeric_columns = ['Total Agent Comm', 'Agent Paid Amount (STMT)', 'Policy Balance Due']
@@ -20956,73 +19128,44 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                             if 'As Earned Balance Due' in editable_data.columns:
                                 numeric_columns.append('As Earned Balance Due')
                             
-                            # Process each unique term group
+                            term_totals = term_subtotals(editable_data[in_term], numeric_columns)
+                            term_dates = editable_data[in_term].groupby('_term_group')['_term_dates'].first()
+                            last_positions = pd.Series(np.arange(len(editable_data)))[in_term.to_numpy()].groupby(
+                                editable_data.loc[in_term, '_term_group'].to_numpy()).max()
+                            if 'Reviewed' in editable_data.columns:
+                                # A term is reviewed when all of its transactions are
+                                is_reviewed = editable_data['Transaction ID'].astype(str).isin(st.session_state.prl_transaction_reviews)
+                                term_reviewed = is_reviewed[in_term].groupby(editable_data.loc[in_term, '_term_group']).all()
+                            
+                            subtotal_rows = []
                             for group_name in unique_groups:
-                                group_data = editable_data[editable_data['_term_group'] == group_name]
-                                if len(group_data) > 0:
-                                    # Create subtotal row
-                                    subtotal_row = {}
-                                    
-                                    # Copy structure from first row to get all columns
-                                    for col in editable_data.columns:
-                                        subtotal_row[col] = ''
-                                    
-                                    # Set specific values for subtotal row
-                                    if 'Reviewed' in editable_data.columns:
-                                        # Check if all transactions in this group are reviewed
-                                        group_trans_ids = [str(row['Transaction ID']) for _, row in group_data.iterrows() 
-                                                         if not str(row.get('Transaction ID', '')).startswith('SUBTOTAL:')]
-                                        all_reviewed = all(trans_id in st.session_state.prl_transaction_reviews 
-                                                         for trans_id in group_trans_ids)
-                                        subtotal_row['Reviewed'] = all_reviewed
-                                    subtotal_row['Group'] = '='  # Equals sign for subtotal
-                                    subtotal_row['Transaction ID'] = f'SUBTOTAL: {group_name}'
-                                    
-                                    # Add term dates if available
-                                    term_dates = group_data['_term_dates'].iloc[0] if '_term_dates' in group_data.columns else ''
-                                    if term_dates:
-                                        subtotal_row['Customer'] = f'{len(group_data)} transactions ({term_dates})'
-                                    else:
-                                        subtotal_row['Customer'] = f'{len(group_data)} transactions'
-                                    
-                                    # Calculate numeric totals
-                                    for col in numeric_columns:
-                                        if col in group_data.columns:
-                                            try:
-                                                total = group_data[col].replace('', 0).fillna(0).astype(float).sum()
-                                                subtotal_row[col] = f'${total:,.2f}'
-                                            except:
-                                                subtotal_row[col] = '$0.00'
-                                        else:
-                                            # Column doesn't exist in group_data, set to $0.00
-                                            subtotal_row[col] = '$0.00'
-                                    
-                                    
-                                    # Store the group name and position for insertion
-                                    # Find the position of the last row in this group
-                                    last_position = editable_data.index.get_loc(group_data.index[-1])
-                                    subtotal_rows.append((last_position, subtotal_row))
-                            
-                            # Insert subtotal rows in reverse order to maintain positions
-                            for idx, (insert_position, subtotal_row) in enumerate(reversed(subtotal_rows)):
-                                # First, create a complete row dictionary with all columns from editable_data
-                                complete_row = {}
-                                for col in editable_data.columns:
-                                    if col in subtotal_row:
-                                        complete_row[col] = subtotal_row[col]
-                                    else:
-                                        complete_row[col] = ''
-                                
-                                # Now create DataFrame with the complete row
-                                subtotal_df = pd.DataFrame([complete_row])
+                                if group_name not in term_totals.index:
+                                    continue
+                                subtotal_row = {col: '' for col in editable_data.columns}
+                                if 'Reviewed' in editable_data.columns:
+                                    subtotal_row['Reviewed'] = bool(term_reviewed[group_name])
+                                subtotal_row['Group'] = '='  # Equals sign for subtotal
+                                subtotal_row['Transaction ID'] = f'SUBTOTAL: {group_name}'
                                 
+                                # Add term dates if available
+                                group_count = int(term_totals.at[group_name, 'count'])
+                                if term_dates.get(group_name):
+                                    subtotal_row['Customer'] = f'{group_count} transactions ({term_dates[group_name]})'
+                                else:
+                                    subtotal_row['Customer'] = f'{group_count} transactions'
                                 
-                                # Split the original dataframe and insert subtotal
-                                before = editable_data.iloc[:insert_position+1]
-                                after = editable_data.iloc[insert_position+1:]
+                                # Numeric totals
+                                for col in numeric_columns:
+                                    subtotal_row[col] = f'${term_totals.at[group_name, col]:,.2f}'
                                 
-                                # Concatenate with subtotal in between
-                                editable_data = pd.concat([before, subtotal_df, after], ignore_index=True)
+                                # Subtotal goes right after the last row of its term
+                                subtotal_row['_position'] = last_positions[group_name] + 0.5
+                                subtotal_rows.append(subtotal_row)
+                            
+                            if subtotal_rows:
+                                editable_data['_position'] = np.arange(len(editable_data), dtype=float)
+                                editable_data = pd.concat([editable_data, pd.DataFrame(subtotal_rows)], ignore_index=True)
+                                editable_data = editable_data.sort_values('_position', kind='mergesort').drop(columns=['_position']).reset_index(drop=True)
                             
                             # Add column config for Group
                             # Use the group_width from special columns config above
@@ -21041,53 +19184,30 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                             if st.session_state.get('prl_balance_filter', 'All Balances') != "All Balances":
                                 balance_filter = st.session_state.get('prl_balance_filter', 'All Balances')
                                 
-                                # Find term groups that meet the filter criteria
+                                # Find term groups that meet the filter criteria (balances rounded to cents, as displayed)
                                 filtered_term_groups = set()
-                                
-                                for group_name in unique_groups:
-                                    # Find the subtotal row for this group
-                                    # Just use Transaction ID to find subtotal rows since Group might not be set yet
-                                    subtotal_mask = editable_data['Transaction ID'] == f'SUBTOTAL: {group_name}'
-                                    subtotal_row = editable_data[subtotal_mask]
-                                    
-                                    if not subtotal_row.empty and 'Policy Balance Due' in subtotal_row.columns:
-                                        # Get the balance from the subtotal row
-                                        balance_str = subtotal_row['Policy Balance Due'].iloc[0]
-                                        # Convert from formatted string (e.g., "$1,234.56") to float
-                                        try:
-                                            if isinstance(balance_str, str):
-                                                # Handle both positive "$1,234.56" and negative "-$1,234.56" formats
-                                                clean_str = balance_str.replace('$', '').replace(',', '')
-                                                balance = float(clean_str)
-                                            else:
-                                                balance = float(balance_str)
-                                        except:
-                                            balance = 0.0
-                                        
-                                        # Check if this term meets the filter criteria
-                                        include_term = False
-                                        if balance_filter == "Positive Balance Only (> $0)" and balance > 0:
-                                            include_term = True
-                                        elif balance_filter == "Zero Balance Only (= $0)" and balance == 0:
-                                            include_term = True
-                                        elif balance_filter == "Negative Balance Only (< $0)" and balance < 0:
-                                            include_term = True
-                                        elif balance_filter == "Non-Zero Balance (≠ $0)" and balance != 0:
-                                            include_term = True
-                                        
-                                        if include_term:
-                                            filtered_term_groups.add(group_name)
+                                if 'Policy Balance Due' in term_totals.columns:
+                                    term_balances = term_totals['Policy Balance Due'].round(2)
+                                    if balance_filter == "Positive Balance Only (> $0)":
+                                        filtered_term_groups = set(term_balances.index[term_balances > 0])
+                                    elif balance_filter == "Zero Balance Only (= $0)":
+                                        filtered_term_groups = set(term_balances.index[term_balances == 0])
+                                    elif balance_filter == "Negative Balance Only (< $0)":
+                                        filtered_term_groups = set(term_balances.index[term_balances < 0])
+                                    elif balance_filter == "Non-Zero Balance (≠ $0)":
+                                        filtered_term_groups = set(term_balances.index[term_balances != 0])
                                 
                                 # Filter to only include rows from the selected term groups
                                 if filtered_term_groups:
                                     # Include rows that belong to filtered term groups OR are subtotal rows for those groups
+                                    subtotal_ids = {f'SUBTOTAL: {group}' for group in filtered_term_groups}
                                     mask = (editable_data['_term_group'].isin(filtered_term_groups)) | \
-                                           (editable_data['Transaction ID'].apply(lambda x: any(x == f'SUBTOTAL: {group}' for group in filtered_term_groups)))
+                                           (editable_data['Transaction ID'].isin(subtotal_ids))
                                     original_count = len(editable_data)
                                     editable_data = editable_data[mask].copy()
                                     
                                     # Update the info message with detailed counts
-                                    total_terms = len(unique_groups)
+                                    total_terms = len(term_totals)
                                     shown_terms = len(filtered_term_groups)
                                     transaction_count = len(editable_data) - shown_terms  # Subtract subtotal rows
                                     st.info(f"📊 Showing {shown_terms} of {total_terms} policy terms ({transaction_count} transactions) matching filter: {balance_filter}")
@@ -21319,7 +19439,7 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                             st.session_state[prl_export_key] = editable_data.copy()
                         
                         # Use data_editor with styled data
-                        edited_df = st.data_editor(
+                        edited_df = data_editor(
                             styled_data,
                             use_container_width=True,
                             height=display_height,
@@ -21368,14 +19488,14 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                                                             term_transactions = editable_data[editable_data['_term_group'] == term_group]
                                                             
                                                             # Update all transactions in this term
-                                                            for _, trans_row in term_transactions.iterrows():
-                                                                trans_id_to_update = str(trans_row['Transaction ID'])
-                                                                # Skip subtotal rows
-                                                                if not trans_id_to_update.startswith('SUBTOTAL:'):
-                                                                    if new_reviewed:
-                                                                        st.session_state.prl_transaction_reviews.add(trans_id_to_update)
-                                                                    else:
-                                                                        st.session_state.prl_transaction_reviews.discard(trans_id_to_update)
+                                                            term_trans_ids = {
+                                                                trans_id for trans_id in term_transactions['Transaction ID'].astype(str)
+                                                                if not trans_id.startswith('SUBTOTAL:')  # Skip subtotal rows
+                                                            }
+                                                            if new_reviewed:
+                                                                st.session_state.prl_transaction_reviews.update(term_trans_ids)
+                                                            else:
+                                                                st.session_state.prl_transaction_reviews.difference_update(term_trans_ids)
                                                             
                                                             st.session_state.rerun_history.append(f"Bulk update: {term_group} - {'Reviewed' if new_reviewed else 'Unreviewed'}")
                                                 else:
@@ -21660,256 +19780,107 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                     with export_col3:
                         excel_filename = filename if filename.endswith('.xlsx') else filename + '.xlsx'
                         
-                        # Create Excel file with metadata sheet
-                        excel_buffer = io.BytesIO()
-                        with pd.ExcelWriter(excel_buffer, engine='xlsxwriter') as writer:
-                            # Write metadata to first sheet
-                            metadata_df.to_excel(writer, sheet_name='Report Parameters', index=False)
+                        # Prepare data for the second sheet with formatted numeric columns
+                        # Use editable_data if we're in detailed view with subtotals, otherwise use working_data
+                        prl_export_key = get_user_session_key('prl_export_data')
+                        if view_mode != "Aggregated by Policy" and prl_export_key in st.session_state and 'Group' in st.session_state[prl_export_key].columns:
+                            # For Detailed view with subtotals, use the editable_data which includes subtotals
+                            excel_export_data = st.session_state[prl_export_key].copy()
                             
-                            # Write data to second sheet with formatted numeric columns
-                            # Use editable_data if we're in detailed view with subtotals, otherwise use working_data
-                            prl_export_key = get_user_session_key('prl_export_data')
-                            if view_mode != "Aggregated by Policy" and prl_export_key in st.session_state and 'Group' in st.session_state[prl_export_key].columns:
-                                # For Detailed view with subtotals, use the editable_data which includes subtotals
-                                excel_export_data = st.session_state[prl_export_key].copy()
-                                
-                                # Remove internal columns
-                                cols_to_remove = ['_term_group', '_term_dates']
-                                for col in cols_to_remove:
-                                    if col in excel_export_data.columns:
-                                        excel_export_data = excel_export_data.drop(columns=[col])
-                                
-                                # Ensure we only include the selected columns plus the special columns
-                                special_cols = ['Reviewed', 'Group', 'Type →']
-                                # Also ensure subtotal columns are included
-                                subtotal_cols = ['Total Agent Comm', 'Agent Paid Amount (STMT)', 'Policy Balance Due', 'As Earned Balance Due']
-                                
-                                export_cols = []
-                                for col in special_cols:
-                                    if col in excel_export_data.columns:
-                                        export_cols.append(col)
-                                        
-                                # Add selected columns
-                                export_cols.extend([col for col in valid_columns if col in excel_export_data.columns])
-                                
-                                # Add subtotal columns if they exist in the data (even if not selected)
-                                for col in subtotal_cols:
-                                    if col in excel_export_data.columns and col not in export_cols:
-                                        export_cols.append(col)
-                                
-                                # Remove duplicates while preserving order
-                                seen = set()
-                                final_export_cols = []
-                                for col in export_cols:
-                                    if col not in seen:
-                                        seen.add(col)
-                                        final_export_cols.append(col)
-                                
-                                excel_export_data = excel_export_data[final_export_cols]
-                            else:
-                                # For Aggregated view or if no subtotals, use working_data
-                                # IMPORTANT: working_data has already been filtered by balance filter
-                                excel_export_data = working_data[valid_columns].copy()
-                            
-                            # Format numeric columns - but skip subtotal rows in detailed view
-                            if view_mode != "Aggregated by Policy" and 'Group' in excel_export_data.columns:
-                                # For detailed view with subtotals, only convert non-subtotal rows
-                                for col in all_numeric_columns:
-                                    if col in excel_export_data.columns:
-                                        # Create a mask for non-subtotal rows
-                                        non_subtotal_mask = excel_export_data['Group'] != '='
-                                        # Convert only non-subtotal rows to numeric
-                                        excel_export_data.loc[non_subtotal_mask, col] = pd.to_numeric(
-                                            excel_export_data.loc[non_subtotal_mask, col], 
-                                            errors='coerce'
-                                        ).round(2)
-                            else:
-                                # For aggregated view, convert all rows normally
-                                for col in all_numeric_columns:
-                                    if col in excel_export_data.columns:
-                                        excel_export_data[col] = pd.to_numeric(excel_export_data[col], errors='coerce').round(2)
-                            
-                            # Format date columns to remove time component
-                            date_columns = ['Effective Date', 'X-DATE', 'STMT DATE', 'Policy Origination Date', 
-                                          'Expiration Date', 'As of Date', 'Transaction Date']
-                            for col in date_columns:
+                            # Remove internal columns
+                            cols_to_remove = ['_term_group', '_term_dates']
+                            for col in cols_to_remove:
                                 if col in excel_export_data.columns:
-                                    # Convert to datetime and format as date only
-                                    excel_export_data[col] = pd.to_datetime(excel_export_data[col], errors='coerce').dt.strftime('%Y-%m-%d')
-                            
-                            excel_export_data.to_excel(writer, sheet_name='Policy Revenue Report', index=False)
-                            
-                            # Get workbook and sheets
-                            workbook = writer.book
-                            metadata_sheet = writer.sheets['Report Parameters']
-                            data_sheet = writer.sheets['Policy Revenue Report']
-                            
-                            # Format metadata sheet
-                            header_format = workbook.add_format({'bold': True, 'bg_color': '#D7E4BC'})
-                            metadata_sheet.set_column('A:A', 25)
-                            metadata_sheet.set_column('B:B', 50)
-                            metadata_sheet.write_row(0, 0, ['Parameter', 'Value'], header_format)
-                            
-                            # Apply formatting to data sheet if we have subtotals (Detailed view)
-                            if view_mode != "Aggregated by Policy" and 'Group' in excel_export_data.columns:
-                                # Define formats for different row types
-                                subtotal_format = workbook.add_format({
-                                    'bg_color': '#4a4a4a',
-                                    'font_color': 'white',
-                                    'bold': True
-                                })
-                                subtotal_currency_format = workbook.add_format({
-                                    'bg_color': '#4a4a4a',
-                                    'font_color': 'white',
-                                    'bold': True,
-                                    'num_format': '$#,##0.00'
-                                })
-                                stmt_format = workbook.add_format({'bg_color': '#e6f3ff'})
-                                stmt_currency_format = workbook.add_format({
-                                    'bg_color': '#e6f3ff',
-                                    'num_format': '$#,##0.00'
-                                })
-                                void_format = workbook.add_format({'bg_color': '#ffe6e6'})
-                                void_currency_format = workbook.add_format({
-                                    'bg_color': '#ffe6e6',
-                                    'num_format': '$#,##0.00'
-                                })
-                                regular_currency_format = workbook.add_format({
-                                    'num_format': '$#,##0.00'
-                                })
-                                header_format_data = workbook.add_format({
-                                    'bold': True,
-                                    'bg_color': '#D7E4BC',
-                                    'border': 1
-                                })
-                                
-                                # Format header row
-                                for col_num, value in enumerate(excel_export_data.columns.values):
-                                    data_sheet.write(0, col_num, value, header_format_data)
-                                
-                                # List of currency columns that should use currency format
-                                currency_columns = ['Total Agent Comm', 'Agent Paid Amount (STMT)', 'Policy Balance Due',
-                                                  'Premium Sold', 'Broker Fee', 'Broker Fee Agent Comm',
-                                                  'Agency Estimated Comm/Revenue (CRM)', 'Agent Estimated Comm $',
-                                                  'Policy Taxes & Fees', 'Commissionable Premium']
-                                
-                                # Format data rows
-                                for row_num, (idx, row) in enumerate(excel_export_data.iterrows(), 1):
-                                    # Determine row type
-                                    is_subtotal = 'Group' in row and row['Group'] == '='
-                                    is_stmt = False
-                                    is_void = False
-                                    
-                                    
-                                    if 'Transaction ID' in row and not is_subtotal:
-                                        trans_id = str(row['Transaction ID'])
-                                        is_stmt = '-STMT-' in trans_id
-                                        is_void = '-VOID-' in trans_id
+                                    excel_export_data = excel_export_data.drop(columns=[col])
+                            
+                            # Ensure we only include the selected columns plus the special columns
+                            special_cols = ['Reviewed', 'Group', 'Type →']
+                            # Also ensure subtotal columns are included
+                            subtotal_cols = ['Total Agent Comm', 'Agent Paid Amount (STMT)', 'Policy Balance Due', 'As Earned Balance Due']
+                            
+                            export_cols = []
+                            for col in special_cols:
+                                if col in excel_export_data.columns:
+                                    export_cols.append(col)
                                     
-                                    # Write each cell with appropriate format
-                                    for col_num, (col_name, value) in enumerate(zip(excel_export_data.columns, row)):
-                                        # Determine the format to use
-                                        cell_format = None
-                                        
-                                        # Check if this is a currency column
-                                        is_currency_col = col_name in currency_columns
-                                        
-                                        
-                                        # Handle different data types and apply appropriate format
-                                        # Check for currency strings FIRST (before empty check)
-                                        if isinstance(value, str) and (value.startswith('$') or value.startswith('-$')):
-                                            # Formatted currency string (from subtotal rows)
-                                            # Handle formats: "$1,234.56", "-$1,234.56", "$1234.56", "$0.00", etc.
-                                            try:
-                                                # Remove $ and commas, handle negative values
-                                                clean_value = value.replace('$', '').replace(',', '')
-                                                num_value = float(clean_value)
-                                                
-                                                
-                                                if is_subtotal:
-                                                    data_sheet.write_number(row_num, col_num, num_value, subtotal_currency_format)
-                                                elif is_stmt:
-                                                    data_sheet.write_number(row_num, col_num, num_value, stmt_currency_format)
-                                                elif is_void:
-                                                    data_sheet.write_number(row_num, col_num, num_value, void_currency_format)
-                                                else:
-                                                    data_sheet.write_number(row_num, col_num, num_value, regular_currency_format)
-                                            except Exception as e:
-                                                # If conversion fails, write as string
-                                                if is_subtotal:
-                                                    data_sheet.write(row_num, col_num, str(value), subtotal_format)
-                                                elif is_stmt:
-                                                    data_sheet.write(row_num, col_num, str(value), stmt_format)
-                                                elif is_void:
-                                                    data_sheet.write(row_num, col_num, str(value), void_format)
-                                                else:
-                                                    data_sheet.write(row_num, col_num, str(value))
-                                        elif pd.isna(value) or value == '':
-                                            # Empty cell
-                                            if is_subtotal:
-                                                data_sheet.write(row_num, col_num, '', subtotal_format)
-                                            elif is_stmt:
-                                                data_sheet.write(row_num, col_num, '', stmt_format)
-                                            elif is_void:
-                                                data_sheet.write(row_num, col_num, '', void_format)
-                                            else:
-                                                data_sheet.write(row_num, col_num, '')
-                                        elif isinstance(value, bool):
-                                            # Boolean value (checkboxes)
-                                            if is_subtotal:
-                                                data_sheet.write(row_num, col_num, value, subtotal_format)
-                                            elif is_stmt:
-                                                data_sheet.write(row_num, col_num, value, stmt_format)
-                                            elif is_void:
-                                                data_sheet.write(row_num, col_num, value, void_format)
-                                            else:
-                                                data_sheet.write(row_num, col_num, value)
-                                        elif isinstance(value, (int, float)) and is_currency_col:
-                                            # Numeric value in a currency column
-                                            if is_subtotal:
-                                                data_sheet.write_number(row_num, col_num, value, subtotal_currency_format)
-                                            elif is_stmt:
-                                                data_sheet.write_number(row_num, col_num, value, stmt_currency_format)
-                                            elif is_void:
-                                                data_sheet.write_number(row_num, col_num, value, void_currency_format)
-                                            else:
-                                                data_sheet.write_number(row_num, col_num, value, regular_currency_format)
-                                        elif isinstance(value, (int, float)):
-                                            # Regular numeric value
-                                            if is_subtotal:
-                                                data_sheet.write_number(row_num, col_num, value, subtotal_format)
-                                            elif is_stmt:
-                                                data_sheet.write_number(row_num, col_num, value, stmt_format)
-                                            elif is_void:
-                                                data_sheet.write_number(row_num, col_num, value, void_format)
-                                            else:
-                                                data_sheet.write_number(row_num, col_num, value)
-                                        else:
-                                            # String value
-                                            if is_subtotal:
-                                                data_sheet.write(row_num, col_num, str(value), subtotal_format)
-                                            elif is_stmt:
-                                                data_sheet.write(row_num, col_num, str(value), stmt_format)
-                                            elif is_void:
-                                                data_sheet.write(row_num, col_num, str(value), void_format)
-                                            else:
-                                                data_sheet.write(row_num, col_num, str(value))
-                                
-                                # Auto-fit columns
-                                for i, col in enumerate(excel_export_data.columns):
-                                    # Set column width based on content
-                                    if col == 'Group':
-                                        data_sheet.set_column(i, i, 8)
-                                    elif col == 'Type →':
-                                        data_sheet.set_column(i, i, 8)
-                                    elif col == 'Reviewed':
-                                        data_sheet.set_column(i, i, 10)
-                                    elif col in ['Customer', 'Policy Number', 'Transaction ID']:
-                                        data_sheet.set_column(i, i, 20)
-                                    else:
-                                        data_sheet.set_column(i, i, 15)
+                            # Add selected columns
+                            export_cols.extend([col for col in valid_columns if col in excel_export_data.columns])
+                            
+                            # Add subtotal columns if they exist in the data (even if not selected)
+                            for col in subtotal_cols:
+                                if col in excel_export_data.columns and col not in export_cols:
+                                    export_cols.append(col)
+                            
+                            # Remove duplicates while preserving order
+                            seen = set()
+                            final_export_cols = []
+                            for col in export_cols:
+                                if col not in seen:
+                                    seen.add(col)
+                                    final_export_cols.append(col)
+                            
+                            excel_export_data = excel_export_data[final_export_cols]
+                        else:
+                            # For Aggregated view or if no subtotals, use working_data
+                            # IMPORTANT: working_data has already been filtered by balance filter
+                            excel_export_data = working_data[valid_columns].copy()
+                        
+                        # Format numeric columns - but skip subtotal rows in detailed view
+                        if view_mode != "Aggregated by Policy" and 'Group' in excel_export_data.columns:
+                            # For detailed view with subtotals, only convert non-subtotal rows
+                            for col in all_numeric_columns:
+                                if col in excel_export_data.columns:
+                                    # Create a mask for non-subtotal rows
+                                    non_subtotal_mask = excel_export_data['Group'] != '='
+                                    # Convert only non-subtotal rows to numeric
+                                    excel_export_data.loc[non_subtotal_mask, col] = pd.to_numeric(
+                                        excel_export_data.loc[non_subtotal_mask, col], 
+                                        errors='coerce'
+                                    ).round(2)
+                        else:
+                            # For aggregated view, convert all rows normally
+                            for col in all_numeric_columns:
+                                if col in excel_export_data.columns:
+                                    excel_export_data[col] = pd.to_numeric(excel_export_data[col], errors='coerce').round(2)
                         
-                        excel_buffer.seek(0)
+                        # Format date columns to remove time component
+                        date_columns = ['Effective Date', 'X-DATE', 'STMT DATE', 'Policy Origination Date', 
+                                      'Expiration Date', 'As of Date', 'Transaction Date']
+                        for col in date_columns:
+                            if col in excel_export_data.columns:
+                                # Convert to datetime and format as date only
+                                excel_export_data[col] = pd.to_datetime(excel_export_data[col], errors='coerce').dt.strftime('%Y-%m-%d')
+                        
+                        # Subtotal rows carry formatted currency strings - export them as numbers
+                        currency_columns = ['Total Agent Comm', 'Agent Paid Amount (STMT)', 'Policy Balance Due',
+                                          'Premium Sold', 'Broker Fee', 'Broker Fee Agent Comm',
+                                          'Agency Estimated Comm/Revenue (CRM)', 'Agent Estimated Comm $',
+                                          'Policy Taxes & Fees', 'Commissionable Premium']
+                        excel_export_data = coerce_currency_strings(excel_export_data)
+                        
+                        # Highlight subtotal / STMT / VOID rows in the Detailed view
+                        row_styles = None
+                        if view_mode != "Aggregated by Policy" and 'Group' in excel_export_data.columns:
+                            row_styles = prl_row_styles(excel_export_data)
+                        
+                        with render_profiler.span('PRL report workbook', 'export'):
+                            excel_buffer = write_excel_workbook([
+                                {
+                                    'name': 'Report Parameters',
+                                    'data': metadata_df,
+                                    'widths': [25, 50],
+                                    'header_style': 'green',
+                                },
+                                {
+                                    'name': 'Policy Revenue Report',
+                                    'data': excel_export_data,
+                                    'currency_columns': currency_columns,
+                                    'widths': {'Group': 8, 'Type →': 8, 'Reviewed': 10, 'Customer': 20,
+                                               'Policy Number': 20, 'Transaction ID': 20, '*': 15},
+                                    'header_style': 'green',
+                                    'row_styles': row_styles,
+                                },
+                            ])
                         
                         st.download_button(
                             "📊 Export as Excel (with Parameters)",
@@ -22034,9 +20005,10 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
         # Add summary metrics at the top
         if not display_df.empty:
             # Calculate summary statistics
-            past_due_count = len(display_df[display_df['Days Until Expiration'] < 0])
-            this_week_count = len(display_df[(display_df['Days Until Expiration'] >= 0) & (display_df['Days Until Expiration'] <= 7)])
-            this_month_count = len(display_df[(display_df['Days Until Expiration'] >= 0) & (display_df['Days Until Expiration'] <= 30)])
+            buckets = bucket_counts(display_df['Days Until Expiration'])
+            past_due_count = buckets['past_due']
+            this_week_count = buckets['due_7_days']
+            this_month_count = buckets['due_30_days']
             total_count = len(display_df)
             
             # Display metrics
@@ -22089,8 +20061,13 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
             #         # Convert to datetime, then to string with MM/DD/YYYY format
             #         display_df[col] = pd.to_datetime(display_df[col], errors='coerce').dt.strftime('%m/%d/%Y')
             
-            # Add Edit checkbox column only
-            display_df.insert(0, "Edit", False)
+            # Add Edit checkbox column only (also the selection for bulk renewal)
+            select_all_renewals = st.checkbox(
+                "Select all shown renewals",
+                key="select_all_pending_renewals",
+                help="Check every renewal in the table for bulk renewal"
+            )
+            display_df.insert(0, "Edit", select_all_renewals)
             
             # Configure the data editor
             column_config = {
@@ -22152,7 +20129,7 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                 width="small"
             )
             
-            edited_df = st.data_editor(
+            edited_df = data_editor(
                 display_df,
                 column_config=column_config,
                 hide_index=True,
@@ -22361,15 +20338,7 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                     renewal_data[get_mapped_column("X-DATE")] = new_expiration.strftime('%Y-%m-%d')  # Changed to YYYY-MM-DD
                 
                 # Clear commission fields and NOTES for renewal
-                fields_to_clear = [
-                    'Premium Sold', 'Commissionable Premium', 'Commission %', 
-                    'Commission $', 'Producer Commission %', 'Producer Commission $',
-                    'Override %', 'Override Commission', 'Commission Already Earned',
-                    'Commission Already Received', 'Balance Owed', 'Renewal/Bonus Percentage',
-                    'Renewal Amount', 'Not Paid/Paid', 'Agent Paid Amount (STMT)',
-                    'Agency Comm Received (STMT)', 'NOTES'  # Added NOTES to clear it
-                ]
-                for field in fields_to_clear:
+                for field in RENEWAL_CLEARED_FIELDS:
                     if field in renewal_data:
                         renewal_data[field] = None
                 
@@ -22510,6 +20479,41 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
                 else:
                     st.button("✏️ Edit Selected Pending Renewal", type="primary", use_container_width=True, 
                              disabled=True, help=f"{selected_count} selected - please select only ONE renewal to edit")
+                
+                # Bulk renewal of every checked policy
+                st.markdown("### Bulk Renewal")
+                st.caption("Renews every checked policy as-is: one RWL transaction for the next term, with premium and "
+                           "commission amounts left blank and the agent commission at your renewal rate.")
+                if st.button(f"🔁 Renew {selected_count} Selected Policies", use_container_width=True,
+                             disabled=selected_count == 0, key="bulk_renew_button"):
+                    selected_renewals = pending_renewals_df.loc[edit_selected_rows.index]
+                    _, renewal_rate = get_default_rates()
+                    
+                    def prepare_bulk_renewal(row):
+                        return add_user_email_to_data(clean_data_for_database(row))
+                    
+                    with st.spinner(f"Renewing {selected_count} policies..."):
+                        bulk_stats = bulk_renew_policies(
+                            supabase,
+                            selected_renewals,
+                            generate_transaction_id,
+                            columns={field: get_mapped_column(field) for field in [
+                                "Effective Date", "X-DATE", "Transaction Type", "Policy Term", "Transaction ID"
+                            ]},
+                            prepare_insert=prepare_bulk_renewal,
+                            agent_comm_rate=renewal_rate
+                        )
+                    
+                    for error in bulk_stats['errors']:
+                        st.error(error)
+                    if bulk_stats['renewed']:
+                        # Refresh the cached ledger once for the whole batch
+                        st.session_state['deleted_renewals'].extend(bulk_stats['renewed_indexes'])
+                        clear_policies_cache()
+                        st.success(f"✅ Renewed {bulk_stats['renewed']} policies "
+                                   f"({bulk_stats['round_trips']} database requests)")
+                        time.sleep(1)
+                        st.rerun()
         else:
             if pending_renewals_df.empty:
                 st.info("No policies are pending renewal at this time.")
@@ -22520,4 +20524,10 @@ CREATE TABLE IF NOT EXISTS deleted_policies (
         display_app_footer()
 
 # Call main function
-main()
+loading_placeholder.empty()
+try:
+    main()
+    render_profiler.end_page()
+finally:
+    render_profiler.end_page(completed=False)  # No-op unless st.stop() / st.rerun() cut the run short
+    startup_profiler.first_render_done()
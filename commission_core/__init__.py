@@ -0,0 +1,42 @@
+"""
+commission_core - the commission engine without the UI.
+
+Pure functions over pandas DataFrames: balances, dashboard metrics,
+statement matching, pending renewals and commission formulas. Nothing here
+imports Streamlit; functions that have something to report take an
+optional Diagnostics collector (see commission_core.diagnostics), which
+commission_app.py renders in debug mode and the API / batch jobs can log.
+"""
+
+from commission_core.balances import calculate_transaction_balances
+from commission_core.diagnostics import DiagnosticSection, Diagnostics, Notice
+from commission_core.formulas import agent_commission_rate, apply_formula_display, calculate_commission
+from commission_core.matching import (
+    StatementMatch,
+    find_potential_customer_matches,
+    match_statement_transactions,
+    normalize_business_name,
+)
+from commission_core.metrics import calculate_dashboard_metrics
+from commission_core.renewals import get_pending_renewals
+from commission_core.statements import NormalizedStatement, count_total_rows, normalize_statement, total_row_mask
+
+__all__ = [
+    'Diagnostics',
+    'DiagnosticSection',
+    'NormalizedStatement',
+    'Notice',
+    'StatementMatch',
+    'agent_commission_rate',
+    'apply_formula_display',
+    'calculate_commission',
+    'calculate_dashboard_metrics',
+    'calculate_transaction_balances',
+    'count_total_rows',
+    'find_potential_customer_matches',
+    'get_pending_renewals',
+    'match_statement_transactions',
+    'normalize_business_name',
+    'normalize_statement',
+    'total_row_mask',
+]
@@ -0,0 +1,161 @@
+"""
+Outstanding commission balance per original transaction.
+
+Balance = Total Agent Comm (credit, includes the broker fee share) minus the
+Agent Paid Amount (STMT) of every -STMT- / -VOID- entry with the same policy
+number and effective date (debit). This is the Unreconciled Transactions
+logic, shared by the dashboard, statement matching and reconciliation.
+"""
+
+from typing import Optional
+
+import pandas as pd
+
+from commission_core.diagnostics import Diagnostics, ensure_diagnostics
+
+RECONCILIATION_PATTERN = '-STMT-|-ADJ-|-VOID-'
+PAYMENT_PATTERN = '-STMT-|-VOID-'
+RECONCILIATION_WINDOW_MONTHS = 18
+
+
+def str_contains(df: pd.DataFrame, column: str, pattern: str, na: bool = False,
+                 negate: bool = False, case: bool = True) -> pd.Series:
+    """Boolean Series of column matching pattern; all False when the column is missing or not text."""
+    if df.empty or column not in df.columns:
+        return pd.Series([False] * len(df), index=df.index)
+
+    try:
+        result = df[column].str.contains(pattern, case=case, na=na)
+        return ~result if negate else result
+    except Exception:
+        return pd.Series([False] * len(df), index=df.index)
+
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    try:
+        return pd.to_datetime(values, format='mixed', errors='coerce')
+    except Exception:
+        return pd.to_datetime(values, errors='coerce')
+
+
+def _credit(row: pd.Series) -> float:
+    """Commission owed: Total Agent Comm, else Agent Estimated Comm $ + Broker Fee Agent Comm."""
+    total_agent_comm = row['Total Agent Comm'] if 'Total Agent Comm' in row.index else 0
+
+    if pd.isna(total_agent_comm) or total_agent_comm == 0:
+        agent_est_comm = 0
+        broker_fee_comm = 0
+
+        if 'Agent Estimated Comm $' in row.index:
+            agent_est_comm = row['Agent Estimated Comm $']
+            if pd.isna(agent_est_comm):
+                agent_est_comm = 0
+
+        if 'Broker Fee Agent Comm' in row.index:
+            broker_fee_comm = row['Broker Fee Agent Comm']
+            if pd.isna(broker_fee_comm):
+                broker_fee_comm = 0
+
+        total_agent_comm = float(agent_est_comm or 0) + float(broker_fee_comm or 0)
+
+    return float(total_agent_comm or 0)
+
+
+def calculate_transaction_balances(
+    all_data: pd.DataFrame,
+    show_all_for_reconciliation: bool = False,
+    diagnostics: Optional[Diagnostics] = None
+) -> pd.DataFrame:
+    """
+    Original transactions with a _balance column.
+
+    Args:
+        all_data: Full ledger (originals and reconciliation entries)
+        show_all_for_reconciliation: Return every original from the past 18
+            months regardless of balance, instead of only those still owed
+        diagnostics: Optional collector for debug detail
+
+    Returns:
+        Original transactions with _balance (empty DataFrame when there are none)
+    """
+    diagnostics = ensure_diagnostics(diagnostics)
+
+    if all_data.empty or 'Transaction ID' not in all_data.columns:
+        return pd.DataFrame()
+
+    # Original transactions only (exclude -STMT-, -ADJ-, -VOID-)
+    original_trans = all_data[
+        str_contains(all_data, 'Transaction ID', RECONCILIATION_PATTERN, na=False, negate=True)
+    ].copy()
+
+    if original_trans.empty:
+        return pd.DataFrame()
+
+    if 'Total Agent Comm' not in original_trans.columns:
+        print("WARNING: 'Total Agent Comm' column not found in data!")
+
+    if diagnostics.enabled:
+        cols_list = list(original_trans.columns)
+        section = diagnostics.section("🔍 DEBUG: Column names in transaction data")
+        section.markdown("**Available columns:**")
+        section.markdown(f"Commission-related columns: {[c for c in cols_list if 'comm' in c.lower() or 'agent' in c.lower()]}")
+        section.markdown(f"Total Agent Comm variations: {[c for c in cols_list if 'total' in c.lower() and 'agent' in c.lower()]}")
+        section.text("All columns:")
+        for col in sorted(cols_list):
+            section.text(f"  - {col}")
+
+    # Normalized effective dates (mixed formats) for comparison
+    all_dates = _parse_dates(all_data['Effective Date'])
+    original_dates = _parse_dates(original_trans['Effective Date'])
+
+    # Loop invariants: payment entries and stripped policy numbers of the whole ledger
+    payment_mask = str_contains(all_data, 'Transaction ID', PAYMENT_PATTERN, na=False)
+    all_policies = all_data['Policy Number'].astype(str).str.strip()
+    paid_amounts = all_data['Agent Paid Amount (STMT)'] if 'Agent Paid Amount (STMT)' in all_data.columns else None
+
+    balances = []
+    for (_, row), effective_date_normalized in zip(original_trans.iterrows(), original_dates):
+        credit = _credit(row)
+
+        # Debits: STMT and VOID entries for this policy and effective date
+        # (VOIDs carry negative amounts that reduce the debit)
+        policy_num_stripped = str(row['Policy Number']).strip()
+        if pd.notna(effective_date_normalized):
+            entries = (all_policies == policy_num_stripped) & (all_dates == effective_date_normalized) & payment_mask
+        else:
+            # Fall back to string comparison if date parsing failed
+            entries = (all_policies == policy_num_stripped) & (all_data['Effective Date'] == row['Effective Date']) & payment_mask
+
+        debit = 0
+        if entries.any():
+            if paid_amounts is None:
+                raise KeyError('Agent Paid Amount (STMT)')
+            debit = paid_amounts[entries].fillna(0).sum()
+
+        balances.append(credit - debit)
+
+    original_trans['_balance'] = pd.Series(balances, index=original_trans.index, dtype=float)
+
+    if not show_all_for_reconciliation:
+        return original_trans[original_trans['_balance'] > 0.01]
+
+    cutoff_date = pd.Timestamp.now() - pd.DateOffset(months=RECONCILIATION_WINDOW_MONTHS)
+    parsed_dates = pd.to_datetime(original_trans['Effective Date'], errors='coerce')
+    recent_trans = original_trans[parsed_dates >= cutoff_date].copy()
+
+    if diagnostics.enabled and not recent_trans.empty:
+        sample = pd.DataFrame([{
+            'Transaction ID': row.get('Transaction ID', ''),
+            'Customer': str(row.get('Customer', ''))[:30],
+            'Total Agent Comm': row.get('Total Agent Comm', 0),
+            'Agent Est Comm': row.get('Agent Est Comm', 0),
+            'Broker Fee Agent Comm': row.get('Broker Fee Agent Comm', 0),
+            '_balance': row.get('_balance', 0),
+            'Has STMT entries': 'Check DB'
+        } for _, row in recent_trans.head(5).iterrows()])
+        section = diagnostics.section("🔍 DEBUG: Balance Calculation Sample")
+        section.markdown("**Sample of balance calculations:**")
+        section.table(sample)
+        section.markdown("**Note:** Balance = Total Agent Comm - (sum of Agent Paid Amount from STMT entries)")
+
+    return recent_trans
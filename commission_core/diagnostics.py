@@ -0,0 +1,146 @@
+"""
+Structured diagnostics for commission_core.
+
+Core functions never render anything. They report what happened into a
+Diagnostics object and the caller decides what to show:
+
+    - notices: short user-facing messages (info / warning / error) that the
+      app shows every time, e.g. "Removed 3 duplicate rows"
+    - values: counters and small dicts (matching stats, stage row counts)
+    - sections: titled debug detail (sample rows, lookup keys, per-row
+      extraction traces) - only collected when the object is enabled, so
+      the work of building them is skipped in normal use
+
+The Streamlit layer renders it with render_diagnostics() in
+commission_app.py; the API and batch jobs can log to_dict().
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+NOTICE_LEVELS = ('info', 'warning', 'error', 'success')
+
+# Debug tables are capped - a section is a sample, not a copy of the ledger
+MAX_TABLE_ROWS = 50
+
+
+@dataclass
+class Notice:
+    level: str
+    message: str
+
+
+@dataclass
+class DiagnosticItem:
+    """One line of a debug section: kind is 'markdown', 'text', 'table', 'json' or a notice level."""
+    kind: str
+    value: Any
+
+
+@dataclass
+class DiagnosticSection:
+    title: str
+    items: List[DiagnosticItem] = field(default_factory=list)
+
+    def markdown(self, text: str):
+        self.items.append(DiagnosticItem('markdown', text))
+
+    def text(self, text: str):
+        self.items.append(DiagnosticItem('text', text))
+
+    def table(self, df: pd.DataFrame, max_rows: int = MAX_TABLE_ROWS):
+        self.items.append(DiagnosticItem('table', df.head(max_rows).copy()))
+
+    def json(self, value: Any):
+        self.items.append(DiagnosticItem('json', value))
+
+    def warning(self, message: str):
+        self.items.append(DiagnosticItem('warning', message))
+
+    def error(self, message: str):
+        self.items.append(DiagnosticItem('error', message))
+
+
+class _DisabledSection(DiagnosticSection):
+    """Returned by Diagnostics.section() when disabled: every call is a no-op."""
+
+    def __init__(self):
+        super().__init__('')
+
+    def markdown(self, text: str):
+        pass
+
+    def text(self, text: str):
+        pass
+
+    def table(self, df: pd.DataFrame, max_rows: int = MAX_TABLE_ROWS):
+        pass
+
+    def json(self, value: Any):
+        pass
+
+    def warning(self, message: str):
+        pass
+
+    def error(self, message: str):
+        pass
+
+
+_DISABLED_SECTION = _DisabledSection()
+
+
+class Diagnostics:
+    """
+    Collector passed into core functions.
+
+    Args:
+        enabled: Collect debug sections. Notices and values are always kept.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.notices: List[Notice] = []
+        self.values: Dict[str, Any] = {}
+        self.sections: List[DiagnosticSection] = []
+
+    def notice(self, level: str, message: str):
+        if level not in NOTICE_LEVELS:
+            raise ValueError(f"Unknown notice level: {level}")
+        self.notices.append(Notice(level, message))
+
+    def info(self, message: str):
+        self.notice('info', message)
+
+    def warning(self, message: str):
+        self.notice('warning', message)
+
+    def section(self, title: str) -> DiagnosticSection:
+        """New debug section (a no-op section when disabled)."""
+        if not self.enabled:
+            return _DISABLED_SECTION
+        section = DiagnosticSection(title)
+        self.sections.append(section)
+        return section
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-friendly form for logs and API responses."""
+        def item_value(item: DiagnosticItem):
+            if isinstance(item.value, pd.DataFrame):
+                return item.value.astype(object).where(item.value.notna(), None).to_dict('records')
+            return item.value
+
+        return {
+            'notices': [{'level': n.level, 'message': n.message} for n in self.notices],
+            'values': self.values,
+            'sections': [
+                {'title': s.title, 'items': [{'kind': i.kind, 'value': item_value(i)} for i in s.items]}
+                for s in self.sections
+            ],
+        }
+
+
+def ensure_diagnostics(diagnostics: Optional[Diagnostics]) -> Diagnostics:
+    """The caller's collector, or a disabled one to discard into."""
+    return diagnostics if diagnostics is not None else Diagnostics()
@@ -0,0 +1,162 @@
+"""
+Commission formulas: agent commission rates by transaction type, the
+per-row agent commission, and the formula view of the policies table
+(recalculated agency / agent commission with variance indicators).
+"""
+
+from typing import Callable, Optional
+
+import pandas as pd
+
+NEW_BUSINESS_TYPES = ['NEW', 'NBS', 'STL', 'BoR']
+RENEWAL_TYPES = ['RWL', 'REWRITE']
+CANCEL_TYPES = ['CAN', 'XCL']
+MIDTERM_TYPES = ['END', 'PCH']
+
+NEW_BUSINESS_RATE = 50.0
+RENEWAL_RATE = 25.0
+BROKER_FEE_AGENT_SHARE = 0.50
+
+LOCKED_PATTERNS = ('-STMT-', '-VOID-', '-ADJ-')
+TEMP_COLUMNS = ['_original_agency', '_original_agent', '_formula_agency', '_formula_agent',
+                '_agency_indicator', '_agent_indicator']
+
+
+def agent_commission_rate(row) -> float:
+    """
+    Agent commission % for a ledger row: 50 for new business, 25 for
+    renewals, 0 for cancellations; endorsements follow the term (new
+    business when origination == effective date). Other types use the
+    row's Agent Comm % (decimals are converted to percent).
+    """
+    trans_type = row.get('Transaction Type', '')
+    if trans_type in NEW_BUSINESS_TYPES:
+        return NEW_BUSINESS_RATE
+    elif trans_type in RENEWAL_TYPES:
+        return RENEWAL_RATE
+    elif trans_type in CANCEL_TYPES:
+        return 0.0
+    elif trans_type in MIDTERM_TYPES:
+        if row.get('Policy Origination Date') == row.get('Effective Date'):
+            return NEW_BUSINESS_RATE
+        return RENEWAL_RATE
+    agent_rate = row.get('Agent Comm %', 0)
+    if agent_rate and agent_rate < 1:
+        return agent_rate * 100
+    return agent_rate or 0
+
+
+def calculate_commission(row, get_mapped_column: Optional[Callable[[str], Optional[str]]] = None) -> float:
+    """
+    Agent commission for a row from its agency revenue and transaction type.
+
+    Args:
+        row: Ledger row (dict or Series)
+        get_mapped_column: Field name -> the user's column name (identity by default)
+    """
+    column_for = get_mapped_column or (lambda field_name: field_name)
+    try:
+        agency_revenue_col = column_for("Agency Estimated Comm/Revenue (CRM)")
+        revenue = float(row[agency_revenue_col]) if agency_revenue_col and row[agency_revenue_col] is not None else 0.0
+    except (ValueError, TypeError, KeyError):
+        revenue = 0.0
+
+    transaction_type_col = column_for("Transaction Type")
+    policy_orig_col = column_for("Policy Origination Date")
+    effective_date_col = column_for("Effective Date")
+
+    try:
+        transaction_type = row.get(transaction_type_col, "") if transaction_type_col else ""
+        if transaction_type in NEW_BUSINESS_TYPES:
+            return revenue * 0.50
+        elif transaction_type in MIDTERM_TYPES:
+            policy_orig = row.get(policy_orig_col, "") if policy_orig_col else ""
+            effective_date = row.get(effective_date_col, "") if effective_date_col else ""
+            return revenue * 0.50 if policy_orig == effective_date else revenue * 0.25
+        elif transaction_type in RENEWAL_TYPES:
+            return revenue * 0.25
+        elif transaction_type in CANCEL_TYPES:
+            return 0
+        else:
+            return revenue * 0.25
+    except (KeyError, TypeError):
+        return revenue * 0.25
+
+
+def _indicator(row, original_col: str, formula_col: str) -> str:
+    """🔒 reconciliation entry, ⚠️ missing premium / rate, ✏️ differs from formula, ✓ matches."""
+    transaction_id = row.get('Transaction ID', '')
+    if any(transaction_id.find(pattern) >= 0 for pattern in LOCKED_PATTERNS):
+        return '🔒'
+    if (pd.isna(row.get('Premium Sold')) or pd.isna(row.get('Policy Gross Comm %')) or
+            row.get('Premium Sold', 0) == 0 or row.get('Policy Gross Comm %', 0) == 0):
+        return '⚠️'
+    if abs(float(row.get(original_col, 0) or 0) - row[formula_col]) > 0.01:
+        return '✏️'
+    return '✓'
+
+
+def apply_formula_display(df: pd.DataFrame, show_formulas: bool = True) -> pd.DataFrame:
+    """
+    Policies table with formula-calculated commission columns.
+
+    With show_formulas, Commissionable Premium, Broker Fee Agent Comm and
+    Total Agent Comm are recalculated and the agency / agent commission
+    columns become display strings ("$123.45 ✓") with a variance indicator.
+    Returns a copy; the input is not modified.
+    """
+    if df.empty:
+        return df
+
+    df = df.copy()
+
+    # Original values for comparison
+    df['_original_agency'] = df['Agency Estimated Comm/Revenue (CRM)'].copy()
+    df['_original_agent'] = df['Agent Estimated Comm $'].copy()
+
+    if show_formulas:
+        # Commissionable Premium = Premium Sold - Policy Taxes & Fees
+        df['Commissionable Premium'] = df.apply(
+            lambda row: float(row.get('Premium Sold', 0) or 0) - float(row.get('Policy Taxes & Fees', 0) or 0),
+            axis=1
+        )
+
+        df['_formula_agency'] = df.apply(
+            lambda row: (
+                0.0 if pd.isna(row.get('Commissionable Premium', 0)) or pd.isna(row.get('Policy Gross Comm %', 0))
+                else float(row.get('Commissionable Premium', 0) or 0) * float(row.get('Policy Gross Comm %', 0) or 0) / 100
+            ),
+            axis=1
+        )
+
+        df['_formula_agent'] = df.apply(
+            lambda row: row['_formula_agency'] * agent_commission_rate(row) / 100,
+            axis=1
+        )
+
+        df['Broker Fee Agent Comm'] = df.apply(
+            lambda row: float(row.get('Broker Fee', 0) or 0) * BROKER_FEE_AGENT_SHARE,
+            axis=1
+        )
+
+        df['Total Agent Comm'] = df.apply(
+            lambda row: round(row['_formula_agent'] + row['Broker Fee Agent Comm'], 2),
+            axis=1
+        )
+
+        df['Agency Estimated Comm/Revenue (CRM)'] = df['_formula_agency'].round(2)
+        df['Agent Estimated Comm $'] = df['_formula_agent'].round(2)
+
+        df['_agency_indicator'] = df.apply(lambda row: _indicator(row, '_original_agency', '_formula_agency'), axis=1)
+        df['_agent_indicator'] = df.apply(lambda row: _indicator(row, '_original_agent', '_formula_agent'), axis=1)
+
+        df['Agency Estimated Comm/Revenue (CRM)'] = df.apply(
+            lambda row: f"${row['Agency Estimated Comm/Revenue (CRM)']:.2f} {row['_agency_indicator']}",
+            axis=1
+        )
+        df['Agent Estimated Comm $'] = df.apply(
+            lambda row: f"${row['Agent Estimated Comm $']:.2f} {row['_agent_indicator']}",
+            axis=1
+        )
+
+    return df.drop(columns=[col for col in TEMP_COLUMNS if col in df.columns])
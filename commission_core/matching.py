@@ -0,0 +1,585 @@
+"""
+Statement matching: carrier / agency statement rows against the ledger's
+transactions from the past 18 months.
+
+Each statement row is matched, in order of confidence:
+    1. Policy Number + Effective Date (100)
+    2. A single high-confidence customer match whose transactions contain
+       the policy number - with the amount within 5% (90) or without (95)
+    3. An exact customer whose transactions contain the policy number
+Rows with customer candidates but no policy match need manual selection
+(unmatched); rows with no known customer can be created as new
+transactions.
+
+column_mapping maps a field ('Customer', 'Policy Number', 'Effective Date',
+'Agent Paid Amount (STMT)', optional 'Agency Comm Received (STMT)') to a
+statement column name or a column index.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from commission_core.balances import calculate_transaction_balances
+from commission_core.diagnostics import DiagnosticSection, Diagnostics, ensure_diagnostics
+from commission_core.statements import (
+    _column_index,
+    _MappedColumn,
+    _resolve_column,
+    normalize_statement,
+    resolve_statement_columns,
+)
+
+BUSINESS_SUFFIXES = [
+    'LLC', 'L.L.C.', 'L.L.C', 'Inc', 'Inc.', 'Incorporated',
+    'Corp', 'Corp.', 'Corporation', 'Ltd', 'Ltd.', 'Limited',
+    'PA', 'P.A.', 'PC', 'P.C.', 'PLLC', 'P.L.L.C.',
+    'LLP', 'L.L.P.', 'LP', 'L.P.', 'Company', 'Co.', 'Co'
+]
+
+DEDUP_FIELDS = ['Customer', 'Policy Number', 'Effective Date', 'Agent Paid Amount (STMT)']
+AMOUNT_TOLERANCE = 0.05
+DEBUG_ROWS = 3
+
+
+def normalize_business_name(name) -> str:
+    """
+    Business name without common suffixes and punctuation, so
+    "RCM Construction" matches "RCM Construction of SWFL LLC".
+    """
+    if not name:
+        return ""
+
+    normalized = str(name).strip()
+
+    for suffix in BUSINESS_SUFFIXES:
+        # With and without a leading comma
+        patterns = [
+            rf',?\s+{re.escape(suffix)}\s*$',
+            rf'\s+{re.escape(suffix)}\s*$'
+        ]
+        for pattern in patterns:
+            normalized = re.sub(pattern, '', normalized, flags=re.IGNORECASE)
+
+    # "of [Location]"
+    normalized = re.sub(r'\s+of\s+[A-Z][A-Za-z\s]+(?:LLC|Inc|Corp)?$', '', normalized, flags=re.IGNORECASE)
+
+    normalized = ' '.join(normalized.split())
+    return normalized.strip(' ,.-')
+
+
+def find_potential_customer_matches(search_name: str, existing_customers: List[str]) -> List[Tuple[str, str, int]]:
+    """
+    Customers that may be search_name, best first.
+
+    Returns:
+        List of (customer_name, match_type, score) tuples
+    """
+    if not search_name:
+        return []
+
+    search_name_lower = search_name.lower().strip()
+    search_normalized = normalize_business_name(search_name).lower()
+    search_first_word = search_name.split()[0].lower() if search_name else ""
+
+    # "Last, First" format
+    search_name_reversed = ""
+    if "," in search_name:
+        parts = search_name.split(",", 1)
+        if len(parts) == 2:
+            search_name_reversed = f"{parts[1].strip()} {parts[0].strip()}".lower()
+
+    matches = {}
+
+    for customer in existing_customers:
+        if not customer:
+            continue
+
+        customer_lower = customer.lower().strip()
+        customer_normalized = normalize_business_name(customer).lower()
+        customer_first_word = customer.split()[0].lower() if customer else ""
+
+        # 1. Exact match
+        if search_name_lower == customer_lower:
+            matches[customer] = ('exact', 100)
+            continue
+
+        # 2. Reversed name (Last, First -> First Last)
+        if search_name_reversed and search_name_reversed == customer_lower:
+            if customer not in matches or matches[customer][1] < 98:
+                matches[customer] = ('name_reversed', 98)
+            continue
+
+        # 3. Normalized business name
+        if search_normalized and search_normalized == customer_normalized:
+            if customer not in matches or matches[customer][1] < 95:
+                matches[customer] = ('normalized', 95)
+            continue
+
+        # 4. First word ("Barboun" matches "Barboun, Thomas")
+        if search_first_word and customer_first_word == search_first_word:
+            if customer not in matches or matches[customer][1] < 90:
+                matches[customer] = ('first_word', 90)
+            continue
+
+        # 5. Contains ("RCM" in "RCM Construction")
+        if len(search_name) >= 3:
+            if search_name_lower in customer_lower:
+                if customer not in matches or matches[customer][1] < 85:
+                    matches[customer] = ('contains', 85)
+                continue
+
+            if search_normalized in customer_normalized:
+                if customer not in matches or matches[customer][1] < 83:
+                    matches[customer] = ('normalized_contains', 83)
+                continue
+
+        # 6. Customer contains search ("RCM Construction" finds "RCM Construction of SWFL LLC")
+        if customer_lower in search_name_lower and len(customer) >= 3:
+            if customer not in matches or matches[customer][1] < 80:
+                matches[customer] = ('reverse_contains', 80)
+            continue
+
+        # 7. Starts with
+        if customer_lower.startswith(search_name_lower[:3]) and len(search_name) >= 3:
+            if customer not in matches or matches[customer][1] < 75:
+                matches[customer] = ('starts_with', 75)
+
+        # 8. Words in any order ("Adam Gomes" matches "Gomes Adam" or "Adam J Gomes")
+        search_words = set(search_name_lower.split())
+        customer_words = set(customer_lower.split())
+        if len(search_words) >= 2 and len(customer_words) >= 2:
+            if search_words.issubset(customer_words):
+                if customer not in matches or matches[customer][1] < 88:
+                    matches[customer] = ('all_words', 88)
+            elif len(search_words.intersection(customer_words)) >= min(len(search_words), len(customer_words)) - 1:
+                if customer not in matches or matches[customer][1] < 82:
+                    matches[customer] = ('most_words', 82)
+
+    result = [(name, match_type, score) for name, (match_type, score) in matches.items()]
+    result.sort(key=lambda x: (-x[2], x[0]))  # Score desc, then name
+    return result
+
+
+@dataclass
+class StatementMatch:
+    """
+    Result of match_statement_transactions. Unpacks like the old
+    (matched, unmatched, can_create) tuple.
+    """
+    matched: List[Dict[str, Any]] = field(default_factory=list)
+    unmatched: List[Dict[str, Any]] = field(default_factory=list)
+    can_create: List[Dict[str, Any]] = field(default_factory=list)
+    stats: Dict[str, int] = field(default_factory=dict)
+    duplicates_removed: int = 0
+
+    def __iter__(self) -> Iterator[List[Dict[str, Any]]]:
+        return iter((self.matched, self.unmatched, self.can_create))
+
+
+def _dedup_columns(statement_df: pd.DataFrame, column_mapping: Dict[str, Any]) -> List[Any]:
+    """Labels of the mapped key columns that exist (by index or exact name)."""
+    labels = []
+    for field_name in DEDUP_FIELDS:
+        if field_name not in column_mapping:
+            continue
+        column = _resolve_column(statement_df, field_name, column_mapping[field_name], case_insensitive=False)
+        if column.index is not None:
+            labels.append(statement_df.columns[column.index])
+        elif column.label is not None and not column.issue:
+            labels.append(column.label)
+    return labels
+
+
+def _describe_mapping(section: DiagnosticSection, statement_df: pd.DataFrame, column_mapping: Dict[str, Any]):
+    section.markdown("**Column Mapping:**")
+    section.json(column_mapping)
+    section.markdown("**Statement DataFrame Info:**")
+    section.markdown(f"- Shape: {statement_df.shape}")
+    section.markdown(f"- Columns: {list(statement_df.columns)}")
+    section.markdown("**First 5 rows of statement data:**")
+    section.table(statement_df.head())
+
+    section.markdown("\n**Column Mapping Validation:**")
+    for field_name, mapped in column_mapping.items():
+        col_index = _column_index(mapped)
+        if col_index is not None:
+            if 0 <= col_index < len(statement_df.columns):
+                section.markdown(f"- {field_name} → column index {col_index} ✅ EXISTS")
+                samples = statement_df.iloc[:, col_index].dropna().head(3).tolist()
+            else:
+                section.markdown(f"- {field_name} → column index {col_index} ❌ OUT OF RANGE "
+                                 f"(max index: {len(statement_df.columns) - 1})")
+                samples = []
+        else:
+            exists = mapped in statement_df.columns
+            section.markdown(f"- {field_name} → '{mapped}' {'✅ EXISTS' if exists else '❌ NOT FOUND'}")
+            samples = statement_df[mapped].dropna().head(3).tolist() if exists else []
+        if samples:
+            section.markdown(f"  Sample values: {samples}")
+
+
+def _describe_outstanding(section: DiagnosticSection, outstanding_trans: pd.DataFrame,
+                          positive_comm_count: int, valid_balance_count: int):
+    debug_cols = ['Transaction ID', 'Customer', 'Policy Number', 'Effective Date',
+                  'Total Agent Comm', '_balance', 'Agent Paid Amount (STMT)', 'Status']
+    section.table(outstanding_trans.head(10)[[col for col in debug_cols if col in outstanding_trans.columns]])
+    section.markdown("**Balance Calculation Details:**")
+    section.markdown("- Credit = Total Agent Comm (amount owed to agent)")
+    section.markdown("- Debit = Sum of Agent Paid Amount (STMT) from reconciliation entries")
+    section.markdown("- Balance = Credit - Debit")
+
+    comm = outstanding_trans.get('Total Agent Comm', pd.Series(dtype=float))
+    section.markdown("**Commission Data Quality:**")
+    section.markdown(f"- Total transactions: {len(outstanding_trans)}")
+    section.markdown(f"- With zero commission: {(comm == 0).sum()}")
+    section.markdown(f"- With null commission: {comm.isna().sum()}")
+    section.markdown(f"- With negative commission: {(comm < 0).sum()}")
+    section.markdown(f"- With positive commission: {positive_comm_count}")
+    section.markdown(f"- With outstanding balance > 0: {valid_balance_count}")
+
+
+def _describe_statement_sample(section: DiagnosticSection, statement_df: pd.DataFrame, column_mapping: Dict[str, Any]):
+    if statement_df.empty:
+        section.warning("Statement dataframe is empty!")
+        return
+
+    section.markdown("**Column Mapping:**")
+    subset_data = pd.DataFrame()
+    for key, mapped in column_mapping.items():
+        col_index = _column_index(mapped)
+        if col_index is not None:
+            if 0 <= col_index < len(statement_df.columns):
+                section.markdown(f"- {key} → Column index {col_index}")
+                subset_data[f"{key} (col {col_index})"] = statement_df.iloc[:5, col_index]
+        elif mapped in statement_df.columns:
+            section.markdown(f"- {key} → {mapped}")
+            subset_data[f"{key} ({mapped})"] = statement_df[mapped].head(5)
+
+    section.markdown("\n**Sample Statement Data:**")
+    section.table(subset_data if not subset_data.empty else statement_df.head(5))
+
+
+def _describe_lookups(section: DiagnosticSection, existing_lookup: Dict[str, Dict], customer_trans_lookup: Dict[str, List]):
+    section.markdown("**Existing lookup keys (first 10):**")
+    if existing_lookup:
+        for key, trans in list(existing_lookup.items())[:10]:
+            section.text(f"  {key}: {trans.get('Customer', 'Unknown')} - Balance: ${trans.get('balance', 0):.2f}")
+    else:
+        section.warning("No transactions in existing_lookup dictionary!")
+
+    section.markdown("\n**Customer lookup (first 5 customers):**")
+    if customer_trans_lookup:
+        for customer, trans_list in list(customer_trans_lookup.items())[:5]:
+            section.text(f"  {customer}: {len(trans_list)} transaction(s)")
+    else:
+        section.warning("No customers in customer_trans_lookup dictionary!")
+
+
+def _trace_field(section: DiagnosticSection, number: int, field_name: str, column: Optional[_MappedColumn],
+                 row: pd.Series, final_value, is_amount: bool = False):
+    """How one field of a skipped row was extracted."""
+    section.markdown(f"{number}. **{field_name} extraction:**")
+    if column is None:
+        section.text(f"   - '{field_name}' not in column_mapping")
+    else:
+        section.text(f"   - Mapped column: '{column.mapped}'")
+        if _column_index(column.mapped) is not None:
+            section.text(f"   - Column type: Numeric index {_column_index(column.mapped)}")
+            section.text(f"   - Index valid: {column.index is not None}")
+        else:
+            section.text("   - Column type: Named column")
+            section.text(f"   - Column exists in df: {column.label is not None}")
+        if column.found:
+            raw_val = column.raw(row)
+            section.text(f"   - Raw value: {repr(raw_val)} (type: {type(raw_val).__name__})")
+            section.text(f"   - pd.notna(val): {pd.notna(raw_val)}")
+            if is_amount:
+                try:
+                    section.text(f"   - float(val): {float(raw_val) if pd.notna(raw_val) else 0}")
+                except Exception as e:
+                    section.text(f"   - float(val) failed: {str(e)}")
+            else:
+                section.text(f"   - str(val).strip(): '{str(raw_val).strip() if pd.notna(raw_val) else ''}'")
+    section.text(f"   - Final value: {final_value!r}")
+
+
+def _describe_rows(diagnostics: Diagnostics, statement_df: pd.DataFrame, column_mapping: Dict[str, Any], statement):
+    """The first rows as uploaded, and how every skipped empty row was extracted."""
+    for position in range(min(DEBUG_ROWS, len(statement_df))):
+        section = diagnostics.section(f"🔍 DEBUG: Processing row {statement_df.index[position]} - BEFORE extraction")
+        section.markdown("**Raw row data:**")
+        section.json(statement_df.iloc[position].to_dict())
+        section.markdown("**Column mapping:**")
+        section.json(column_mapping)
+        section.markdown("**DataFrame columns:**")
+        section.text(str(list(statement_df.columns)))
+
+    fields = statement.fields
+    empty = statement.is_blank & (fields['amount'].to_numpy() == 0)
+    for number, position in enumerate(np.flatnonzero(empty), start=1):
+        row = statement_df.iloc[position]
+        section = diagnostics.section(f"⚠️ DEBUG: Skipped empty row {statement_df.index[position]} (#{number})")
+        section.json(row.to_dict())
+        _trace_field(section, 1, 'Customer', statement.columns.get('Customer'), row, fields['customer'].iat[position])
+        _trace_field(section, 2, 'Policy Number', statement.columns.get('Policy Number'), row,
+                     fields['policy_number'].iat[position])
+        _trace_field(section, 3, 'Agent Paid Amount (STMT)', statement.columns.get('Agent Paid Amount (STMT)'),
+                     row, fields['amount'].iat[position], is_amount=True)
+        section.text("Row will be SKIPPED")
+
+
+def _build_lookups(outstanding_trans: pd.DataFrame) -> Tuple[Dict[str, Dict], Dict[str, List[Dict]]]:
+    """Transactions by '<policy>_<YYYY-MM-DD>' and by lowercased customer."""
+    existing_lookup = {}
+    customer_trans_lookup = {}
+
+    for _, trans in outstanding_trans.iterrows():
+        trans_dict = trans.to_dict()
+        trans_dict['balance'] = trans['_balance']
+
+        eff_date_normalized = trans['Effective Date']
+        if pd.notna(eff_date_normalized):
+            try:
+                eff_date_normalized = pd.to_datetime(eff_date_normalized).strftime('%Y-%m-%d')
+            except Exception:
+                eff_date_normalized = str(eff_date_normalized)
+        existing_lookup[f"{trans['Policy Number']}_{eff_date_normalized}"] = trans_dict
+
+        customer = trans['Customer']
+        if pd.notna(customer):
+            customer_trans_lookup.setdefault(customer.lower().strip(), []).append(trans_dict)
+
+    return existing_lookup, customer_trans_lookup
+
+
+def _match_customer_transactions(match_result: Dict, customer_trans: List[Dict], policy_num: str, amount: float,
+                                 match_label: str, strip_policies: bool) -> bool:
+    """Policy + amount (90), else policy alone (95), among one customer's transactions."""
+    policy_key = str(policy_num).strip() if strip_policies and policy_num else policy_num
+
+    def same_policy(trans):
+        if strip_policies:
+            return str(trans.get('Policy Number', '')).strip() == policy_key and policy_key
+        return trans.get('Policy Number') == policy_num and policy_num
+
+    for trans in customer_trans:
+        if amount > 0 and abs(trans['balance'] - amount) / amount <= AMOUNT_TOLERANCE and same_policy(trans):
+            match_result.update(match=trans, confidence=90, match_type=f'{match_label} + Policy + Amount')
+            return True
+
+    for trans in customer_trans:
+        if same_policy(trans):
+            match_result.update(match=trans, confidence=95, match_type=f'{match_label} + Policy')
+            return True
+
+    return False
+
+
+def match_statement_transactions(
+    statement_df: pd.DataFrame,
+    column_mapping: Dict[str, Any],
+    existing_data: pd.DataFrame,
+    statement_date=None,
+    diagnostics: Optional[Diagnostics] = None
+) -> StatementMatch:
+    """
+    Match statement rows to the ledger's transactions from the past 18 months.
+
+    Args:
+        statement_df: Uploaded statement
+        column_mapping: Field -> statement column name or index
+        existing_data: Full ledger
+        statement_date: Statement date (kept for callers; matching is by effective date)
+        diagnostics: Optional collector for notices and debug detail
+
+    Returns:
+        StatementMatch (unpacks to matched, unmatched, can_create)
+    """
+    diagnostics = ensure_diagnostics(diagnostics)
+    result = StatementMatch()
+
+    if diagnostics.enabled:
+        _describe_mapping(diagnostics.section("🔍 DEBUG: Raw statement data and mapping"), statement_df, column_mapping)
+
+    # Drop duplicate rows (same customer, policy, date and amount) before matching
+    if not statement_df.empty:
+        dedup_cols = _dedup_columns(statement_df, column_mapping)
+        if dedup_cols:
+            original_count = len(statement_df)
+            statement_df = statement_df.drop_duplicates(subset=dedup_cols, keep='first')
+            result.duplicates_removed = original_count - len(statement_df)
+            if result.duplicates_removed > 0:
+                diagnostics.warning(f"⚠️ Removed {result.duplicates_removed} duplicate rows from the statement import")
+
+    outstanding_trans = calculate_transaction_balances(existing_data, show_all_for_reconciliation=True,
+                                                       diagnostics=diagnostics)
+
+    if outstanding_trans.empty:
+        diagnostics.warning("⚠️ No transactions found with commission data in the past 18 months.")
+    else:
+        comm = outstanding_trans.get('Total Agent Comm', pd.Series(dtype=float))
+        valid_balance_count = int((outstanding_trans['_balance'] > 0.01).sum())
+        total_agent_comm_count = int(comm.notna().sum())
+        positive_comm_count = int((comm > 0).sum())
+
+        diagnostics.info(f"📊 Found {len(outstanding_trans)} transactions from the past 18 months for matching.")
+        if diagnostics.enabled:
+            _describe_outstanding(diagnostics.section("🔍 DEBUG: Sample of transactions found"),
+                                  outstanding_trans, positive_comm_count, valid_balance_count)
+        if valid_balance_count == 0:
+            diagnostics.warning(f"⚠️ None of the transactions have an outstanding balance. Check Total Agent Comm values: "
+                                f"{total_agent_comm_count} have values, {positive_comm_count} are positive.")
+
+    if diagnostics.enabled:
+        _describe_statement_sample(diagnostics.section("🔍 DEBUG: Statement data being matched"),
+                                   statement_df, column_mapping)
+
+    existing_lookup, customer_trans_lookup = ({}, {}) if outstanding_trans.empty else _build_lookups(outstanding_trans)
+
+    all_customers = []
+    if not existing_data.empty:
+        all_customers = existing_data['Customer'].dropna().unique().tolist()
+
+    if diagnostics.enabled:
+        _describe_lookups(diagnostics.section("🔍 DEBUG: Transaction lookup dictionaries"),
+                          existing_lookup, customer_trans_lookup)
+
+    # Normalize the statement column-wise; the loop below only matches
+    columns = resolve_statement_columns(statement_df, column_mapping)
+    if not statement_df.empty:
+        for field_name, column in columns.items():
+            if column.issue and field_name != 'Agency Comm Received (STMT)':
+                diagnostics.notice(*column.issue)
+    statement = normalize_statement(statement_df, column_mapping, columns)
+
+    stats = {
+        'total_rows': len(statement_df),
+        'skipped_totals': statement.skipped_totals,
+        'skipped_empty': statement.skipped_empty,
+        'policy_date_attempts': 0,
+        'customer_attempts': 0,
+        'matched': 0,
+        'unmatched': 0,
+        'can_create': 0
+    }
+
+    if diagnostics.enabled:
+        _describe_rows(diagnostics, statement_df, column_mapping, statement)
+
+    # Statement rows as dicts, only for the rows being matched
+    statement_rows = statement_df.iloc[statement.to_match].to_dict('records')
+
+    for record, statement_data in zip(statement.records(), statement_rows):
+        idx = record.row_index
+        customer = record.customer
+        policy_num = record.policy_number
+        eff_date = record.effective_date
+        amount = record.amount
+        agency_amount = record.agency_amount  # Optional (audit)
+
+        match_result = {
+            'row_index': idx,
+            'customer': customer,
+            'policy_number': policy_num,
+            'effective_date': eff_date,
+            'amount': amount,  # Agent Paid Amount (primary)
+            'agency_amount': agency_amount,  # Agency Comm Received (audit)
+            'statement_data': statement_data
+        }
+
+        policy_key = f"{policy_num}_{eff_date}"
+
+        if diagnostics.enabled and record.position < DEBUG_ROWS:
+            section = diagnostics.section(f"🔍 DEBUG: Matching row {idx} - {customer[:30]}")
+            section.text(f"  Customer: {customer}")
+            section.text(f"  Policy: {policy_num}")
+            section.text(f"  Eff Date: {eff_date}")
+            section.text(f"  Amount: ${amount:.2f}")
+            section.text(f"  Agency Amount: ${agency_amount:.2f}")
+            section.text(f"  Policy key: {policy_key}")
+            section.text(f"  Key exists in lookup: {policy_key in existing_lookup}")
+
+        # 1. Policy Number + Effective Date
+        stats['policy_date_attempts'] += 1
+        if policy_key in existing_lookup:
+            match_result.update(match=existing_lookup[policy_key], confidence=100, match_type='Policy + Date')
+            result.matched.append(match_result)
+            continue
+
+        # 2. Customer matching
+        stats['customer_attempts'] += 1
+        potential_customers = find_potential_customer_matches(customer, all_customers)
+
+        if potential_customers:
+            if len(potential_customers) == 1 and potential_customers[0][2] >= 90:
+                # Single high-confidence customer
+                matched_customer, match_type, _ = potential_customers[0]
+                customer_trans = customer_trans_lookup.get(matched_customer.lower().strip())
+                if customer_trans is not None:
+                    if _match_customer_transactions(match_result, customer_trans, policy_num, amount,
+                                                    match_type, strip_policies=True):
+                        match_result['matched_customer'] = matched_customer
+                        result.matched.append(match_result)
+                    else:
+                        match_result.update(potential_matches=customer_trans, potential_customers=potential_customers,
+                                            needs_selection=True)
+                        result.unmatched.append(match_result)
+                else:
+                    match_result.update(potential_customers=potential_customers, needs_selection=True)
+                    result.unmatched.append(match_result)
+            else:
+                # Several candidates or low confidence - offer the top 5 customers' transactions
+                match_result.update(potential_customers=potential_customers, needs_selection=True)
+                all_potential_trans = []
+                for potential_customer, match_type, score in potential_customers[:5]:
+                    for trans in customer_trans_lookup.get(potential_customer.lower().strip(), []):
+                        all_potential_trans.append({**trans, '_customer_match': potential_customer,
+                                                    '_match_type': match_type, '_match_score': score})
+                if all_potential_trans:
+                    match_result['potential_matches'] = all_potential_trans
+                result.unmatched.append(match_result)
+        else:
+            customer_matches = customer_trans_lookup.get(customer.lower().strip())
+            if customer_matches is not None:
+                if _match_customer_transactions(match_result, customer_matches, policy_num, amount,
+                                                'Customer', strip_policies=False):
+                    result.matched.append(match_result)
+                else:
+                    match_result.update(potential_matches=customer_matches,
+                                        potential_customers=[(customer, 'exact', 100)], needs_selection=True)
+                    result.unmatched.append(match_result)
+            else:
+                # Unknown customer - can be created as a new transaction
+                match_result['can_create'] = True
+                result.can_create.append(match_result)
+                stats['can_create'] += 1
+
+    stats['matched'] = len(result.matched)
+    stats['unmatched'] = len(result.unmatched)
+    result.stats = stats
+    diagnostics.values['statement_matching'] = stats
+
+    if stats['skipped_empty'] > 0:
+        diagnostics.warning(f"⚠️ {stats['skipped_empty']} rows were skipped as empty. This happens when a row has no "
+                            f"customer name, no policy number, AND zero amount. Check your column mappings!")
+
+    if diagnostics.enabled:
+        section = diagnostics.section("🔍 DEBUG: Matching Summary")
+        section.markdown("**Statement Processing:**")
+        section.markdown(f"- Total rows processed: {stats['total_rows']}")
+        section.markdown(f"- Skipped (totals): {stats['skipped_totals']}")
+        section.markdown(f"- Skipped (empty): {stats['skipped_empty']}")
+        section.markdown(f"- Valid rows: {stats['total_rows'] - stats['skipped_totals'] - stats['skipped_empty']}")
+        section.markdown("\n**Matching Attempts:**")
+        section.markdown(f"- Policy + Date attempts: {stats['policy_date_attempts']}")
+        section.markdown(f"- Customer matching attempts: {stats['customer_attempts']}")
+        section.markdown("\n**Results:**")
+        section.markdown(f"- Matched: {stats['matched']}")
+        section.markdown(f"- Unmatched (need review): {stats['unmatched']}")
+        section.markdown(f"- Can create new: {stats['can_create']}")
+
+    return result
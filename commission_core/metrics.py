@@ -0,0 +1,185 @@
+"""
+Dashboard metrics: transaction and policy counts, all-time financial totals
+and the reconciled vs unreconciled year-to-date figures.
+"""
+
+import datetime
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+from commission_core.balances import calculate_transaction_balances
+from commission_core.diagnostics import Diagnostics, ensure_diagnostics
+
+ORIGINAL_EXCLUDE_PATTERN = '-STMT-|-VOID-|-ADJ-'
+CANCELLED_TYPES = ['CAN', 'XCL']
+YTD_YEAR = 2025
+
+
+def _default_metrics() -> Dict[str, Any]:
+    return {
+        # Transaction metrics
+        'total_transactions': 0,
+        'transactions_this_month': 0,
+        'stmt_transactions': 0,
+
+        # Policy metrics (unique policy numbers)
+        'unique_policies': 0,
+        'active_policies': 0,
+        'cancelled_policies': 0,
+
+        # Financial totals (all time, not just YTD)
+        'premium_sold_total': 0.0,
+        'agent_comm_paid_total': 0.0,
+        'agent_comm_due_total': 0.0
+    }
+
+
+def _commission_earned(df_originals: pd.DataFrame) -> float:
+    """Total Agent Comm, else Agent Estimated Comm $ + Broker Fee Agent Comm."""
+    if 'Total Agent Comm' in df_originals.columns:
+        return df_originals['Total Agent Comm'].sum()
+    total_earned = 0
+    if 'Agent Estimated Comm $' in df_originals.columns:
+        total_earned = df_originals['Agent Estimated Comm $'].sum()
+        if 'Broker Fee Agent Comm' in df_originals.columns:
+            total_earned += df_originals['Broker Fee Agent Comm'].sum()
+    return total_earned
+
+
+def _ytd_metrics(df: pd.DataFrame, metrics: Dict[str, Any]):
+    """Premium / commission reconciled in YTD_YEAR (by statement date) and still unreconciled."""
+    stmt_mask = pd.Series(False, index=df.index)
+    if 'Transaction ID' in df.columns:
+        stmt_mask = df['Transaction ID'].str.contains('-STMT-', na=False)
+
+    # -STMT- entries by effective date, used when there is no STMT DATE
+    df_stmt_all = df[stmt_mask].copy()
+    df_stmt_ytd = df_stmt_all[df_stmt_all['Effective Date'].dt.year == YTD_YEAR]
+
+    # All originals (from any year) - a YTD payment can be for an older policy
+    original_mask = pd.Series(True, index=df.index)
+    if 'Transaction ID' in df.columns:
+        original_mask = ~df['Transaction ID'].str.contains(ORIGINAL_EXCLUDE_PATTERN, na=False)
+    df_originals = df[original_mask]
+    df_originals_ytd = df_originals[df_originals['Effective Date'].dt.year == YTD_YEAR]
+
+    # Payments made this year (by STMT DATE)
+    df_stmt_paid_ytd = pd.DataFrame()
+    if 'STMT DATE' in df_stmt_all.columns:
+        df_stmt_all['STMT DATE'] = pd.to_datetime(df_stmt_all['STMT DATE'], errors='coerce', format='mixed')
+        df_stmt_paid_ytd = df_stmt_all[df_stmt_all['STMT DATE'].dt.year == YTD_YEAR]
+    if df_stmt_paid_ytd.empty:
+        df_stmt_paid_ytd = df_stmt_ytd
+
+    # Originals those payments were for (policy number + effective date)
+    reconciled_keys = set()
+    if not df_stmt_paid_ytd.empty and all(col in df_stmt_paid_ytd.columns for col in ['Policy Number', 'Effective Date']):
+        for _, stmt_row in df_stmt_paid_ytd.iterrows():
+            policy = stmt_row.get('Policy Number', '')
+            eff_date = pd.to_datetime(stmt_row.get('Effective Date'), errors='coerce')
+            if policy and pd.notna(eff_date):
+                reconciled_keys.add((policy, eff_date))
+
+    paid_mask = pd.Series(False, index=df_originals.index)
+    if reconciled_keys and all(col in df_originals.columns for col in ['Policy Number', 'Effective Date']):
+        for idx, row in df_originals.iterrows():
+            eff_date = pd.to_datetime(row.get('Effective Date'), errors='coerce')
+            if (row.get('Policy Number', ''), eff_date) in reconciled_keys:
+                paid_mask.loc[idx] = True
+
+    df_originals_paid = df_originals[paid_mask]
+    df_originals_ytd_unpaid = df_originals_ytd[~df_originals_ytd.index.isin(df_originals_paid.index)]
+
+    if 'Premium Sold' in df_originals_paid.columns:
+        metrics['premium_reconciled_ytd'] = df_originals_paid['Premium Sold'].sum()
+    if 'Agent Paid Amount (STMT)' in df_stmt_paid_ytd.columns:
+        metrics['agent_comm_paid_ytd'] = df_stmt_paid_ytd['Agent Paid Amount (STMT)'].sum()
+    if 'Premium Sold' in df_originals_ytd_unpaid.columns:
+        metrics['premium_unreconciled_ytd'] = df_originals_ytd_unpaid['Premium Sold'].sum()
+    # Total Agent Comm includes broker fees
+    if 'Total Agent Comm' in df_originals_ytd_unpaid.columns:
+        metrics['agent_comm_estimated_ytd'] = df_originals_ytd_unpaid['Total Agent Comm'].sum()
+    elif 'Agent Estimated Comm $' in df_originals_ytd_unpaid.columns:
+        metrics['agent_comm_estimated_ytd'] = df_originals_ytd_unpaid['Agent Estimated Comm $'].sum()
+
+
+def calculate_dashboard_metrics(df: pd.DataFrame, diagnostics: Optional[Diagnostics] = None) -> Dict[str, Any]:
+    """
+    Dashboard metrics with reconciled vs unreconciled YTD focus.
+
+    The input frame is not modified.
+
+    Returns:
+        Dict of counts and totals (see _default_metrics; YTD keys are only
+        present when effective dates could be parsed)
+    """
+    diagnostics = ensure_diagnostics(diagnostics)
+    metrics = _default_metrics()
+
+    if df is None or df.empty:
+        return metrics
+
+    df = df.copy()
+    metrics['total_transactions'] = len(df)
+
+    # Current month transactions
+    if 'Effective Date' in df.columns:
+        try:
+            df['Effective Date'] = pd.to_datetime(df['Effective Date'], errors='coerce')
+            now = datetime.datetime.now()
+            metrics['transactions_this_month'] = len(df[(df['Effective Date'].dt.month == now.month) &
+                                                       (df['Effective Date'].dt.year == now.year)])
+        except Exception:
+            pass
+
+    # STMT transactions
+    if 'Transaction Type' in df.columns:
+        metrics['stmt_transactions'] = len(df[df['Transaction Type'].str.startswith('-', na=False)])
+
+    # Unique policies, active vs cancelled by each policy's latest transaction
+    if 'Policy Number' in df.columns:
+        metrics['unique_policies'] = df['Policy Number'].nunique()
+
+        if 'Transaction Type' in df.columns:
+            # Strip whitespace from Policy Number to avoid duplicate policy counts
+            df['Policy Number'] = df['Policy Number'].astype(str).str.strip()
+            latest_trans = df.sort_values('Effective Date').groupby('Policy Number').last()
+            cancelled = latest_trans['Transaction Type'].isin(CANCELLED_TYPES)
+            metrics['active_policies'] = int((~cancelled).sum())
+            metrics['cancelled_policies'] = int(cancelled.sum())
+
+    # Financial totals (all time): premium from originals, commission paid from -STMT- entries
+    original_mask = pd.Series(True, index=df.index)
+    stmt_mask = pd.Series(False, index=df.index)
+    if 'Transaction ID' in df.columns:
+        original_mask = ~df['Transaction ID'].str.contains(ORIGINAL_EXCLUDE_PATTERN, na=False, regex=True)
+        stmt_mask = df['Transaction ID'].str.contains('-STMT-', na=False)
+
+    df_originals = df[original_mask]
+    if 'Premium Sold' in df_originals.columns:
+        metrics['premium_sold_total'] = df_originals['Premium Sold'].sum()
+
+    df_stmt = df[stmt_mask]
+    if 'Agent Paid Amount (STMT)' in df_stmt.columns:
+        metrics['agent_comm_paid_total'] = df_stmt['Agent Paid Amount (STMT)'].sum()
+
+    # Commission due: sum of positive outstanding balances
+    try:
+        trans_with_balance = calculate_transaction_balances(df, diagnostics=diagnostics)
+        if '_balance' not in trans_with_balance.columns:
+            raise KeyError('_balance')
+        metrics['agent_comm_due_total'] = trans_with_balance.loc[trans_with_balance['_balance'] > 0, '_balance'].sum()
+    except Exception as e:
+        # Earned minus paid when balances cannot be calculated
+        diagnostics.values['agent_comm_due_fallback'] = str(e)
+        metrics['agent_comm_due_total'] = max(0, _commission_earned(df_originals) - metrics['agent_comm_paid_total'])
+
+    if 'Effective Date' in df.columns:
+        try:
+            df['Effective Date'] = pd.to_datetime(df['Effective Date'], errors='coerce')
+            _ytd_metrics(df, metrics)
+        except Exception as e:
+            diagnostics.values['ytd_metrics_error'] = str(e)
+
+    return metrics
@@ -0,0 +1,56 @@
+"""
+Pending renewals on top of the shared renewal pipeline engine
+(utils/renewal_pipeline): latest terms that are not renewed or cancelled,
+past due or expiring within the window.
+"""
+
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from commission_core.diagnostics import Diagnostics, ensure_diagnostics
+from utils.renewal_pipeline import RenewalPipeline, get_renewal_pipeline_cache, resolve_columns
+
+DEFAULT_DAYS_AHEAD = 365
+
+
+def get_pending_renewals(
+    df: pd.DataFrame,
+    get_mapped_column: Optional[Callable[[str], Optional[str]]] = None,
+    scope: Optional[str] = None,
+    days_ahead: int = DEFAULT_DAYS_AHEAD,
+    diagnostics: Optional[Diagnostics] = None
+) -> pd.DataFrame:
+    """
+    Policies pending renewal: every past-due renewal plus those expiring
+    within days_ahead, most overdue first.
+
+    Args:
+        df: Policies ledger
+        get_mapped_column: Field name -> the user's column name
+        scope: Cache scope (e.g. the user's session key); the latest-term
+            table is then reused until the ledger changes. None builds it
+            uncached.
+        days_ahead: Renewal window
+        diagnostics: Optional collector; when enabled, values['pending_renewals']
+            gets the pipeline stage counts and urgency buckets
+
+    Returns:
+        Pending renewals with Days Until Expiration
+    """
+    diagnostics = ensure_diagnostics(diagnostics)
+    columns = resolve_columns(get_mapped_column)
+    if scope is None:
+        pipeline = RenewalPipeline.from_ledger(df, columns)
+    else:
+        pipeline = get_renewal_pipeline_cache().get(scope, df, columns)
+    pending_renewals = pipeline.pending(days_ahead=days_ahead, include_past_due=True)
+
+    if diagnostics.enabled:
+        stats: Dict = dict(pipeline.stats)
+        stats['after_date_filter'] = len(pending_renewals)
+        stats['final_count'] = len(pending_renewals)
+        stats['buckets'] = pipeline.summary(pending_renewals)
+        diagnostics.values['pending_renewals'] = stats
+
+    return pending_renewals
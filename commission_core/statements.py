@@ -0,0 +1,243 @@
+"""
+Statement normalization: the column-wise stage in front of statement matching.
+
+The column mapping is resolved once, then every mapped field is extracted
+for the whole statement at a time:
+    - Customer / Policy Number: stripped strings, '' for missing, blank,
+      'nan' and 'none' cells
+    - Effective Date: 'YYYY-MM-DD' strings (unparseable dates kept as text,
+      missing dates left as they are)
+    - amounts: floats, 0 for missing and non-numeric cells
+Totals rows (customer containing 'total', 'sum', ...) and rows without a
+customer and policy number are flagged with one pass each, so the matcher
+only loops over the rows it actually has to match.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+TOTAL_ROW_WORDS = ['total', 'totals', 'subtotal', 'sub-total', 'grand total', 'sum']
+EMPTY_MARKERS = ['nan', 'none']
+STATEMENT_FIELDS = ('Customer', 'Policy Number', 'Effective Date', 'Agent Paid Amount (STMT)',
+                    'Agency Comm Received (STMT)')
+
+_TOTAL_ROW_PATTERN = '|'.join(re.escape(word) for word in TOTAL_ROW_WORDS)
+
+
+@dataclass
+class _MappedColumn:
+    """Where a mapped field lives in the statement: a column position or label."""
+    field_name: str
+    mapped: Any
+    index: Optional[int] = None
+    label: Any = None
+    issue: Optional[Tuple[str, str]] = None  # (level, message)
+
+    @property
+    def found(self) -> bool:
+        return self.index is not None or self.label is not None
+
+    def raw(self, row: pd.Series):
+        if self.index is not None:
+            return row.iloc[self.index]
+        return row[self.label]
+
+    def values(self, statement_df: pd.DataFrame) -> pd.Series:
+        if self.index is not None:
+            return statement_df.iloc[:, self.index]
+        return statement_df[self.label]
+
+
+def _column_index(mapped) -> Optional[int]:
+    try:
+        return int(mapped)
+    except (ValueError, TypeError):
+        return None
+
+
+def _resolve_column(statement_df: pd.DataFrame, field_name: str, mapped, case_insensitive: bool = True) -> _MappedColumn:
+    """Mapped value -> column index, exact label, or (optionally) case-insensitive label."""
+    column = _MappedColumn(field_name, mapped)
+    col_index = _column_index(mapped)
+    if col_index is not None:
+        if 0 <= col_index < len(statement_df.columns):
+            column.index = col_index
+        else:
+            column.issue = ('error', f"Column index {col_index} is out of range "
+                                     f"(row has {len(statement_df.columns)} columns)")
+        return column
+
+    if mapped in statement_df.columns:
+        column.label = mapped
+        return column
+
+    matching_cols = []
+    if case_insensitive and isinstance(mapped, str):
+        matching_cols = [col for col in statement_df.columns if str(col).lower() == mapped.lower()]
+    if matching_cols:
+        column.label = matching_cols[0]
+        column.issue = ('warning', f"Column '{mapped}' not found exactly, but found case-insensitive match: '{matching_cols[0]}'")
+    else:
+        column.issue = ('error', f"Column '{mapped}' not found in DataFrame columns!")
+    return column
+
+
+def resolve_statement_columns(statement_df: pd.DataFrame, column_mapping: Dict[str, Any]) -> Dict[str, _MappedColumn]:
+    """Each mapped statement field resolved to a column, once."""
+    return {
+        field_name: _resolve_column(statement_df, field_name, column_mapping[field_name])
+        for field_name in STATEMENT_FIELDS
+        if field_name in column_mapping
+    }
+
+
+def total_row_mask(values: pd.Series) -> pd.Series:
+    """Cells that look like a totals row ('total', 'subtotal', 'sum', ...), one regex pass."""
+    return values.astype(str).str.contains(_TOTAL_ROW_PATTERN, case=False, regex=True, na=False)
+
+
+def count_total_rows(df: pd.DataFrame) -> int:
+    """Totals rows of an uploaded statement, counted in the first column that has any."""
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values, pd.DataFrame) or pd.api.types.is_numeric_dtype(values) \
+                or pd.api.types.is_datetime64_any_dtype(values):
+            continue  # Duplicate labels, numbers and dates can't spell 'total'
+        totals = int(total_row_mask(values).sum())
+        if totals:
+            return totals
+    return 0
+
+
+def text_values(values: pd.Series) -> np.ndarray:
+    """Stripped strings; '' for missing, blank, 'nan' and 'none' cells."""
+    present = values.notna().to_numpy()
+    text = np.full(len(values), '', dtype=object)
+    if present.any():
+        stripped = values[present].map(str).str.strip()
+        stripped = stripped.where(~stripped.str.lower().isin(EMPTY_MARKERS), '')
+        text[present] = stripped.to_numpy()
+    return text
+
+
+def _amount(val) -> float:
+    try:
+        return float(val) if pd.notna(val) else 0
+    except (ValueError, TypeError):
+        return 0
+
+
+def amount_values(values: pd.Series) -> np.ndarray:
+    """Floats; 0 for missing and non-numeric cells."""
+    amounts = pd.to_numeric(values, errors='coerce').to_numpy(dtype=float, na_value=np.nan, copy=True)
+    # Cells to_numeric rejects but float() accepts (e.g. Decimal-like objects)
+    retry = np.isnan(amounts) & values.notna().to_numpy()
+    if retry.any():
+        amounts[retry] = [_amount(val) for val in values.to_numpy(dtype=object)[retry]]
+    amounts[np.isnan(amounts)] = 0
+    return amounts
+
+
+def _date_text(val):
+    try:
+        return pd.to_datetime(val).strftime('%Y-%m-%d')
+    except Exception:
+        return str(val)
+
+
+def date_values(values: pd.Series) -> np.ndarray:
+    """'YYYY-MM-DD' strings; unparseable dates as text, missing dates unchanged."""
+    dates = values.to_numpy(dtype=object).copy()
+    present = np.flatnonzero(values.notna().to_numpy())
+    if not len(present):
+        return dates
+    try:
+        parsed = pd.to_datetime(values.iloc[present], errors='coerce', format='mixed')
+        ok = parsed.notna().to_numpy()
+        dates[present[ok]] = parsed[ok].dt.strftime('%Y-%m-%d').to_numpy(dtype=object)
+    except (TypeError, ValueError):
+        ok = np.zeros(len(present), dtype=bool)
+    # Per cell for what the column-wise parse rejects (numbers, odd formats)
+    dates[present[~ok]] = [_date_text(val) for val in dates[present[~ok]]]
+    return dates
+
+
+class StatementRecord(NamedTuple):
+    """One statement row to match."""
+    position: int
+    row_index: Any
+    customer: str
+    policy_number: str
+    effective_date: Any
+    amount: float
+    agency_amount: float
+
+
+@dataclass
+class NormalizedStatement:
+    """
+    Typed statement fields (one column per field, statement index) plus the
+    row flags; records() yields the rows left to match.
+    """
+    columns: Dict[str, _MappedColumn]
+    fields: pd.DataFrame
+    is_total: np.ndarray
+    is_blank: np.ndarray
+
+    @property
+    def to_match(self) -> np.ndarray:
+        return ~(self.is_total | self.is_blank)
+
+    @property
+    def skipped_totals(self) -> int:
+        """Totals rows, and summary rows with an amount but no customer or policy number."""
+        return int((self.is_total | (self.is_blank & (self.fields['amount'].to_numpy() != 0))).sum())
+
+    @property
+    def skipped_empty(self) -> int:
+        """Rows without customer, policy number or amount."""
+        return int((self.is_blank & (self.fields['amount'].to_numpy() == 0)).sum())
+
+    def records(self) -> Iterator[StatementRecord]:
+        positions = np.flatnonzero(self.to_match)
+        rows = self.fields.iloc[positions]
+        return map(StatementRecord._make, zip(
+            positions.tolist(), rows.index, rows['customer'], rows['policy_number'],
+            rows['effective_date'], rows['amount'], rows['agency_amount'],
+        ))
+
+
+def normalize_statement(statement_df: pd.DataFrame, column_mapping: Dict[str, Any],
+                        columns: Optional[Dict[str, _MappedColumn]] = None) -> NormalizedStatement:
+    """Resolve the column mapping once and extract every field column-wise."""
+    if columns is None:
+        columns = resolve_statement_columns(statement_df, column_mapping)
+
+    def mapped(field_name: str) -> Optional[pd.Series]:
+        column = columns.get(field_name)
+        if column is None or not column.found:
+            return None
+        return column.values(statement_df)
+
+    n_rows = len(statement_df)
+    customer = mapped('Customer')
+    policy = mapped('Policy Number')
+    eff_date = mapped('Effective Date')
+    amount = mapped('Agent Paid Amount (STMT)')
+    agency_amount = mapped('Agency Comm Received (STMT)')
+
+    fields = pd.DataFrame({
+        'customer': text_values(customer) if customer is not None else np.full(n_rows, '', dtype=object),
+        'policy_number': text_values(policy) if policy is not None else np.full(n_rows, '', dtype=object),
+        'effective_date': date_values(eff_date) if eff_date is not None else np.full(n_rows, None, dtype=object),
+        'amount': amount_values(amount) if amount is not None else np.zeros(n_rows),
+        'agency_amount': amount_values(agency_amount) if agency_amount is not None else np.zeros(n_rows),
+    }, index=statement_df.index)
+
+    is_total = total_row_mask(fields['customer']).to_numpy(dtype=bool)
+    is_blank = ((fields['customer'] == '') & (fields['policy_number'] == '')).to_numpy()
+    return NormalizedStatement(columns, fields, is_total, is_blank)
@@ -35,4 +35,28 @@ def get_supabase_client() -> Client:
     
     # Create client instance
     supabase: Client = create_client(url, key)
-    return supabase
\ No newline at end of file
+    return supabase
+
+
+class LazySupabaseClient:
+    """
+    Supabase client attribute created on first access instead of in __init__,
+    so importing a module with a settings singleton doesn't connect.
+
+        class UserPreferences:
+            supabase = LazySupabaseClient()
+    """
+
+    def __set_name__(self, owner, name):
+        self.attr = f"_{name}"
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        client = instance.__dict__.get(self.attr)
+        if client is None:
+            client = instance.__dict__[self.attr] = get_supabase_client()
+        return client
+
+    def __set__(self, instance, client):
+        instance.__dict__[self.attr] = client
@@ -107,8 +107,7 @@ try:
         
     # Check cache
     print(f"\n   Cache status:")
-    print(f"   - _types_cache: {'Set' if upt._types_cache else 'Not set'}")
-    print(f"   - _cache_user_id: {upt._cache_user_id}")
+    print(f"   - settings store: {upt._settings.stats}")
     
 except Exception as e:
     print(f"   ✗ Error in get_user_policy_types(): {e}")
@@ -5,79 +5,195 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import logging
 
+from utils.email_outbox import PermanentEmailError
+
 logger = logging.getLogger(__name__)
 
-def send_email(to_email: str, subject: str, html_body: str, text_body: str = None):
-    """Send an email using SendGrid or SMTP."""
-    
-    # Check for SendGrid first (preferred)
+FROM_NAME = "Agent Commission Tracker"
+
+def get_from_email() -> str:
+    """Sender address for all outgoing mail."""
+    return os.getenv("FROM_EMAIL", "support@agentcommissiontracker.com")
+
+
+def build_mime_message(to_email: str, subject: str, html_body: str, text_body: str = None,
+                       from_email: str = None) -> MIMEMultipart:
+    """Build the multipart/alternative message used for SMTP delivery."""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"{FROM_NAME} <{from_email or get_from_email()}>"
+    msg['To'] = to_email
+
+    # Add text and HTML parts
+    if text_body:
+        msg.attach(MIMEText(text_body, 'plain'))
+    msg.attach(MIMEText(html_body, 'html'))
+    return msg
+
+
+class SMTPTransport:
+    """
+    One long-lived SMTP session.
+
+    The connection is opened on first send and reused for every following
+    message; if the server drops an idle connection it is re-opened once.
+    Not thread-safe - use one transport per worker thread.
+    """
+
+    def __init__(self, host: str, port: int = 587, user: str = None, password: str = None,
+                 use_tls: bool = True, from_email: str = None, timeout: float = 30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.from_email = from_email or get_from_email()
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            server.starttls()
+        if self.user and self.password:
+            server.login(self.user, self.password)
+        self.connections_opened += 1
+        self._server = server
+
+    def send(self, to_email: str, subject: str, html_body: str, text_body: str = None):
+        """Send one message, raising PermanentEmailError for 5xx rejections."""
+        msg = build_mime_message(to_email, subject, html_body, text_body, self.from_email)
+
+        for attempt in range(2):
+            if self._server is None:
+                self._connect()
+            try:
+                self._server.send_message(msg)
+                return
+            except smtplib.SMTPServerDisconnected:
+                self._server = None
+                if attempt:
+                    raise
+            except smtplib.SMTPRecipientsRefused as e:
+                raise PermanentEmailError(f"Recipient refused: {e.recipients}") from e
+            except (smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                if 500 <= e.smtp_code < 600:
+                    raise PermanentEmailError(f"{e.smtp_code} {e.smtp_error!r}") from e
+                raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except smtplib.SMTPException:
+                pass
+            self._server = None
+
+
+class SendGridTransport:
+    """One SendGrid API client reused for every message."""
+
+    def __init__(self, api_key: str, from_email: str = None):
+        import sendgrid
+
+        self.client = sendgrid.SendGridAPIClient(api_key=api_key)
+        self.from_email = from_email or get_from_email()
+        self.connections_opened = 1
+
+    def send(self, to_email: str, subject: str, html_body: str, text_body: str = None):
+        """Send one message, raising PermanentEmailError for 4xx responses other than 429."""
+        from sendgrid.helpers.mail import Mail, Email, To, Content
+        from python_http_client.exceptions import HTTPError
+
+        mail = Mail(Email(self.from_email, FROM_NAME), To(to_email), subject)
+        if text_body:
+            mail.content = [Content("text/plain", text_body), Content("text/html", html_body)]
+        else:
+            mail.content = Content("text/html", html_body)
+
+        try:
+            response = self.client.send(mail)
+        except HTTPError as e:
+            if 400 <= e.status_code < 500 and e.status_code != 429:
+                raise PermanentEmailError(f"SendGrid rejected message ({e.status_code})") from e
+            raise
+
+        if response.status_code not in [200, 201, 202]:
+            raise RuntimeError(f"SendGrid returned status {response.status_code}")
+
+    def close(self):
+        pass
+
+
+def get_email_transport():
+    """
+    Build the transport configured in the environment.
+
+    SendGrid is preferred when SENDGRID_API_KEY is set, otherwise SMTP_HOST /
+    SMTP_PORT / SMTP_USER / SMTP_PASS are used. SMTP_USE_TLS=false disables
+    STARTTLS (local relays and test sinks). Returns None when neither is configured.
+    """
     sendgrid_api_key = os.getenv("SENDGRID_API_KEY")
-    from_email = os.getenv("FROM_EMAIL", "support@agentcommissiontracker.com")
-    
     if sendgrid_api_key:
-        # Use SendGrid
-        try:
-            import sendgrid
-            from sendgrid.helpers.mail import Mail, Email, To, Content
-            
-            sg = sendgrid.SendGridAPIClient(api_key=sendgrid_api_key)
-            
-            from_email_obj = Email(from_email, "Agent Commission Tracker")
-            to_email_obj = To(to_email)
-            
-            mail = Mail(from_email_obj, to_email_obj, subject)
-            
-            if text_body:
-                mail.content = [Content("text/plain", text_body), Content("text/html", html_body)]
-            else:
-                mail.content = Content("text/html", html_body)
-            
-            response = sg.send(mail)
-            
-            logger.info(f"Email sent successfully via SendGrid to {to_email} (status: {response.status_code})")
-            return response.status_code in [200, 201, 202]
-            
-        except ImportError:
-            logger.error("SendGrid library not installed. Run: pip install sendgrid")
-            return False
-        except Exception as e:
-            logger.error(f"SendGrid email failed: {e}")
-            return False
-    
-    # Fall back to SMTP
-    smtp_host = os.getenv("SMTP_HOST", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
+        return SendGridTransport(sendgrid_api_key)
+
     smtp_user = os.getenv("SMTP_USER")
     smtp_pass = os.getenv("SMTP_PASS")
+    use_tls = os.getenv("SMTP_USE_TLS", "true").lower() not in ("0", "false", "no")
+    if (not smtp_user or not smtp_pass) and use_tls:
+        return None
+
+    return SMTPTransport(
+        host=os.getenv("SMTP_HOST", "smtp.gmail.com"),
+        port=int(os.getenv("SMTP_PORT", "587")),
+        user=smtp_user,
+        password=smtp_pass,
+        use_tls=use_tls,
+    )
+
+
+def send_email(to_email: str, subject: str, html_body: str, text_body: str = None):
+    """Send an email using SendGrid or SMTP."""
+    
+    try:
+        transport = get_email_transport()
+    except ImportError:
+        logger.error("SendGrid library not installed. Run: pip install sendgrid")
+        return False
     
-    if not smtp_user or not smtp_pass:
+    if transport is None:
         logger.error("Email configuration missing. Set SENDGRID_API_KEY or SMTP credentials.")
         return False
     
+    via = "SendGrid" if isinstance(transport, SendGridTransport) else "SMTP"
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"Agent Commission Tracker <{from_email}>"
-        msg['To'] = to_email
+        transport.send(to_email, subject, html_body, text_body)
+        logger.info(f"Email sent successfully via {via} to {to_email}")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to send {via} email: {e}")
+        return False
+    finally:
+        transport.close()
         
-        # Add text and HTML parts
-        if text_body:
-            msg.attach(MIMEText(text_body, 'plain'))
-        msg.attach(MIMEText(html_body, 'html'))
         
-        # Send email
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_pass)
-            server.send_message(msg)
+def queue_email(to_email: str, subject: str, html_body: str, text_body: str = None,
+                template: str = None, dedupe_key: str = None):
+    """
+    Add an email to the outbox instead of sending it inline.
             
-        logger.info(f"Email sent successfully via SMTP to {to_email}")
-        return True
+    Bulk mail (digests, notifications) should use this; the outbox worker
+    (scripts/run_email_outbox_worker.py) delivers it over a reused session.
+    Transactional mail the user is waiting for (password reset) keeps using send_email.
         
-    except Exception as e:
-        logger.error(f"Failed to send SMTP email: {e}")
-        return False
+    Returns:
+        Outbox message id, or None if dedupe_key was already queued
+    """
+    from utils.email_outbox import get_email_outbox
+
+    return get_email_outbox().enqueue(to_email, subject, html_body, text_body,
+                                      template=template, dedupe_key=dedupe_key)
 
 def send_password_reset_email(to_email: str, reset_link: str):
     """Send password reset email."""
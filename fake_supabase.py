@@ -0,0 +1,198 @@
+"""
+In-memory stand-in for the Supabase client, for unit tests.
+
+Implements the subset of the PostgREST query builder the app uses:
+select / eq / neq / in_ / lte / gte / lt / gt / like / order / limit / range
+plus insert / upsert / update / delete and rpc-free execute(). Column names
+may be passed quoted ('"Policy Number"') exactly like the production code.
+
+Every executed request is counted in client.calls so tests can assert on
+round trips. max_rows caps every select like PostgREST's db-max-rows.
+"""
+
+import copy
+import fnmatch
+import uuid
+
+
+class FakeResult:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = []
+        self.order_by = []
+        self.window = None
+        self.row_limit = None
+        self.action = 'select'
+        self.payload = None
+        self.on_conflict = None
+        self.ignore_duplicates = False
+        self.count = None
+
+    @staticmethod
+    def _col(name):
+        return name.strip().strip('"')
+
+    # -- reads --------------------------------------------------------------
+    def select(self, *_, count=None):
+        self.count = count
+        return self
+
+    def eq(self, col, value):
+        c = self._col(col)
+        self.filters.append(lambda r: r.get(c) == value)
+        return self
+
+    def neq(self, col, value):
+        c = self._col(col)
+        self.filters.append(lambda r: r.get(c) != value)
+        return self
+
+    def in_(self, col, values):
+        c = self._col(col)
+        values = list(values)
+        self.filters.append(lambda r: r.get(c) in values)
+        return self
+
+    def _compare(self, col, value, op):
+        c = self._col(col)
+
+        def matches(r):
+            cell = r.get(c)
+            if cell is None:
+                return False
+            # Numbers compare as numbers, everything else (ISO dates) as text
+            if isinstance(cell, (int, float)) and isinstance(value, (int, float)):
+                return op(cell, value)
+            return op(str(cell), str(value))
+
+        self.filters.append(matches)
+        return self
+
+    def lte(self, col, value):
+        return self._compare(col, value, lambda a, b: a <= b)
+
+    def gte(self, col, value):
+        return self._compare(col, value, lambda a, b: a >= b)
+
+    def lt(self, col, value):
+        return self._compare(col, value, lambda a, b: a < b)
+
+    def gt(self, col, value):
+        return self._compare(col, value, lambda a, b: a > b)
+
+    def like(self, col, pattern):
+        c = self._col(col)
+        glob = pattern.replace('%', '*')
+        self.filters.append(lambda r: r.get(c) is not None and fnmatch.fnmatchcase(str(r.get(c)), glob))
+        return self
+
+    def order(self, col, desc=False):
+        self.order_by.append((self._col(col), desc))
+        return self
+
+    def limit(self, n):
+        self.row_limit = n
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end)
+        return self
+
+    # -- writes -------------------------------------------------------------
+    def insert(self, rows, default_to_null=True):
+        self.action, self.payload = 'insert', self._fill_columns(rows, default_to_null)
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False, default_to_null=True):
+        self.action, self.payload, self.on_conflict = 'upsert', self._fill_columns(rows, default_to_null), on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        return self
+
+    @staticmethod
+    def _fill_columns(rows, default_to_null):
+        # PostgREST names the union of a bulk payload's keys as the columns and,
+        # by default, writes NULL where a row lacks one.
+        if not isinstance(rows, list) or not default_to_null:
+            return rows
+        columns = {key for row in rows for key in row}
+        return [{**{key: None for key in columns}, **row} for row in rows]
+
+    def update(self, values):
+        self.action, self.payload = 'update', values
+        return self
+
+    def delete(self):
+        self.action = 'delete'
+        return self
+
+    # -- execution ----------------------------------------------------------
+    def _matching(self):
+        return [r for r in self.client.tables.setdefault(self.table, []) if all(f(r) for f in self.filters)]
+
+    def execute(self):
+        self.client.calls.append((self.table, self.action))
+        rows = self.client.tables.setdefault(self.table, [])
+
+        if self.action in ('insert', 'upsert'):
+            payload = self.payload if isinstance(self.payload, list) else [self.payload]
+            written = []
+            keys = [self._col(k) for k in self.on_conflict.split(',')] if self.on_conflict else []
+            for item in payload:
+                item = dict(item)
+                item.setdefault('id', str(uuid.uuid4()))
+                existing = None
+                if keys:
+                    existing = next((r for r in rows if all(r.get(k) == item.get(k) for k in keys)), None)
+                if existing is not None and self.ignore_duplicates:
+                    continue  # ON CONFLICT DO NOTHING - not returned
+                if existing is not None:
+                    existing.update(item)
+                    written.append(copy.deepcopy(existing))
+                else:
+                    rows.append(item)
+                    written.append(copy.deepcopy(item))
+            return FakeResult(written)
+
+        matching = self._matching()
+
+        if self.action == 'update':
+            for r in matching:
+                r.update(self.payload)
+            return FakeResult(copy.deepcopy(matching))
+
+        if self.action == 'delete':
+            self.client.tables[self.table] = [r for r in rows if r not in matching]
+            return FakeResult(copy.deepcopy(matching))
+
+        for col, desc in reversed(self.order_by):
+            matching = sorted(matching, key=lambda r: (r.get(col) is None, str(r.get(col))), reverse=desc)
+        total = len(matching)
+        if self.window:
+            matching = matching[self.window[0]:self.window[1] + 1]
+        if self.row_limit is not None:
+            matching = matching[:self.row_limit]
+        if self.client.max_rows is not None:
+            matching = matching[:self.client.max_rows]
+        return FakeResult(copy.deepcopy(matching), count=total if self.count else None)
+
+
+class FakeSupabase:
+    """Minimal in-memory Supabase client: FakeSupabase({'policies': [...]})."""
+
+    def __init__(self, tables=None, max_rows=None):
+        self.tables = {name: [dict(r) for r in rows] for name, rows in (tables or {}).items()}
+        self.calls = []
+        self.max_rows = max_rows
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def calls_to(self, table, action=None):
+        return [c for c in self.calls if c[0] == table and (action is None or c[1] == action)]
@@ -0,0 +1,29 @@
+-- Migration: Promote the Transaction ID unique index to a UNIQUE constraint
+-- Edit Policy Transactions: diff-based save (utils/editor_changes.py)
+--
+-- The editor saves changed cells with a batched upsert
+-- (ON CONFLICT ("Transaction ID")). PostgreSQL cannot use the partial index
+-- idx_policies_transaction_id_unique (sql_scripts/add_unique_constraint_transaction_id.sql)
+-- as a conflict target, so add a plain UNIQUE constraint. NULLs stay allowed
+-- and distinct, which matches the partial index.
+--
+-- Until this runs, save_editor_changes() falls back to per-row updates.
+-- Rollback: ALTER TABLE policies DROP CONSTRAINT IF EXISTS uq_policies_transaction_id;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'uq_policies_transaction_id'
+          AND conrelid = 'public.policies'::regclass
+    ) THEN
+        ALTER TABLE public.policies
+            ADD CONSTRAINT uq_policies_transaction_id UNIQUE ("Transaction ID");
+    END IF;
+END $$;
+
+-- The constraint's own index replaces the partial one
+DROP INDEX IF EXISTS public.idx_policies_transaction_id_unique;
+
+COMMENT ON CONSTRAINT uq_policies_transaction_id ON public.policies IS
+'Unique Transaction ID; conflict target for batched upserts from the policy editor.';
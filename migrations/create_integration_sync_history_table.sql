@@ -0,0 +1,58 @@
+-- Migration: Create integration_sync_history and make policies upsertable by external_id
+--
+-- Written by api_platform/integrations/sync_engine.SyncEngine, one row per
+-- sync run; read by utils/integration_manager.get_sync_history.
+-- The newest successful row's watermark is where the next incremental sync
+-- starts, so a failed run (which keeps the previous watermark) is retried.
+--
+-- Synced policies are written with a batched upsert
+-- (ON CONFLICT (user_email, external_id)), which needs a plain UNIQUE
+-- constraint; NULL external_ids (policies entered in the app) stay allowed.
+-- Rollback:
+--   DROP TABLE IF EXISTS integration_sync_history CASCADE;
+--   ALTER TABLE policies DROP CONSTRAINT IF EXISTS uq_policies_user_external_id;
+
+CREATE TABLE IF NOT EXISTS integration_sync_history (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    agency_id TEXT,
+    user_email TEXT NOT NULL,
+    integration_name TEXT NOT NULL,  -- 'EZLynx', 'HubSpot'
+    sync_timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    status VARCHAR(20) NOT NULL,  -- success, failed
+
+    -- Incremental window
+    since TIMESTAMP WITH TIME ZONE,  -- watermark the run started from (NULL = full sync)
+    watermark TIMESTAMP WITH TIME ZONE,  -- newest source modification seen
+
+    -- Throughput
+    records_synced INTEGER DEFAULT 0,  -- rows upserted into policies
+    records_fetched INTEGER DEFAULT 0,
+    records_skipped INTEGER DEFAULT 0,
+    pages INTEGER DEFAULT 0,
+    duration_seconds NUMERIC(10, 3),
+    rows_per_second NUMERIC(12, 1),
+    lag_seconds NUMERIC(14, 3),  -- longest source change -> policies delay in the run
+
+    error_message TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_integration_sync_history_lookup
+    ON integration_sync_history(user_email, integration_name, sync_timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_integration_sync_history_agency
+    ON integration_sync_history(agency_id, integration_name, sync_timestamp DESC);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conname = 'uq_policies_user_external_id'
+          AND conrelid = 'public.policies'::regclass
+    ) THEN
+        ALTER TABLE public.policies
+            ADD CONSTRAINT uq_policies_user_external_id UNIQUE (user_email, external_id);
+    END IF;
+END $$;
+
+COMMENT ON TABLE integration_sync_history IS 'One row per CRM/AMS sync run: incremental watermark, rows per second and lag.';
+COMMENT ON CONSTRAINT uq_policies_user_external_id ON public.policies IS
+'One policy per source record per user; conflict target for the integration sync upsert.';
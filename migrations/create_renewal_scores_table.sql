@@ -0,0 +1,63 @@
+-- Migration: Create renewal_scores table for batch renewal prediction
+-- Phase 3, Sprint 3, Task 3.1: Renewal Prediction (batch scoring)
+--
+-- Written by utils/ml_models.score_all_policies_for_renewal().
+-- One row per scored policy term per model version.
+-- Rollback: DROP TABLE IF EXISTS renewal_scores CASCADE;
+
+CREATE TABLE IF NOT EXISTS renewal_scores (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+
+    -- Scored term (latest NEW/RWL/REWRITE transaction of the policy)
+    transaction_id TEXT NOT NULL,
+    policy_number TEXT NOT NULL,
+    insured_name TEXT,
+    expiration_date DATE,
+
+    -- Ownership (copied from policies for filtering)
+    agent_id UUID,
+    agency_id UUID,
+    user_id UUID,
+
+    -- Prediction
+    renewal_probability DECIMAL(5,4) NOT NULL,
+    renewal_risk VARCHAR(20) NOT NULL,  -- Very Low Risk .. Critical Risk
+    model_version VARCHAR(50) NOT NULL,  -- e.g. renewal-20260101120000
+
+    scored_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+
+    CONSTRAINT uq_renewal_scores_transaction_model UNIQUE (transaction_id, model_version)
+);
+
+-- Indexes for dashboard queries
+CREATE INDEX IF NOT EXISTS idx_renewal_scores_agent ON renewal_scores(agent_id, model_version);
+CREATE INDEX IF NOT EXISTS idx_renewal_scores_agency ON renewal_scores(agency_id, model_version);
+CREATE INDEX IF NOT EXISTS idx_renewal_scores_user ON renewal_scores(user_id, model_version);
+CREATE INDEX IF NOT EXISTS idx_renewal_scores_expiration ON renewal_scores(expiration_date);
+CREATE INDEX IF NOT EXISTS idx_renewal_scores_risk ON renewal_scores(renewal_probability)
+    WHERE renewal_probability < 0.4;
+
+-- Row Level Security
+ALTER TABLE renewal_scores ENABLE ROW LEVEL SECURITY;
+
+-- Policy: Users see scores for their own policies or their agency's policies
+CREATE POLICY renewal_scores_select_policy ON renewal_scores
+    FOR SELECT
+    USING (
+        user_id = auth.uid()
+        OR
+        agency_id IN (
+            SELECT agencies.id FROM agencies
+            WHERE agencies.owner_user_id = auth.uid()
+        )
+        OR
+        agent_id IN (
+            SELECT agents.id FROM agents
+            WHERE agents.user_id = auth.uid()
+        )
+    );
+
+-- Scores are written by the batch scoring job (service role bypasses RLS)
+
+COMMENT ON TABLE renewal_scores IS 'Batch renewal probability scores produced by RenewalPredictor. Part of Task 3.1 (Phase 3, Sprint 3).';
+COMMENT ON COLUMN renewal_scores.model_version IS 'Version of the trained model that produced the score. Re-scoring with the same version overwrites the row.';
@@ -0,0 +1,45 @@
+-- Migration: Create stripe_webhook_events table for asynchronous webhook processing
+--
+-- Written by webhook_events.WebhookEventStore (webhook_server.py).
+-- One row per Stripe event ID: the raw event is stored before the endpoint
+-- answers 200 and processed afterwards by the webhook worker pool.
+-- Rollback: DROP TABLE IF EXISTS stripe_webhook_events CASCADE;
+
+CREATE TABLE IF NOT EXISTS stripe_webhook_events (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+
+    -- Idempotency key: Stripe retries deliver the same event ID
+    event_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    customer_key TEXT,  -- Stripe customer (or email) - per-customer processing order
+
+    payload JSONB NOT NULL,  -- Raw event as received (replayable)
+
+    -- Processing state
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',  -- pending, processing, processed, failed, abandoned
+    attempts INTEGER NOT NULL DEFAULT 0,  -- across all retries
+    next_attempt_at TIMESTAMP WITH TIME ZONE,  -- failed: when the retry sweep queues it again
+    last_error TEXT,
+    result JSONB,
+
+    received_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    processed_at TIMESTAMP WITH TIME ZONE,
+
+    CONSTRAINT uq_stripe_webhook_events_event_id UNIQUE (event_id)
+);
+
+-- Tables created before the retry sweep
+ALTER TABLE stripe_webhook_events ADD COLUMN IF NOT EXISTS next_attempt_at TIMESTAMP WITH TIME ZONE;
+
+-- Indexes for startup recovery, the retry sweep and support lookups
+CREATE INDEX IF NOT EXISTS idx_stripe_webhook_events_unfinished ON stripe_webhook_events(received_at)
+    WHERE status IN ('pending', 'processing');
+CREATE INDEX IF NOT EXISTS idx_stripe_webhook_events_customer ON stripe_webhook_events(customer_key, received_at);
+CREATE INDEX IF NOT EXISTS idx_stripe_webhook_events_failed ON stripe_webhook_events(next_attempt_at)
+    WHERE status = 'failed';
+
+-- Only the webhook server reads or writes this table, with the same
+-- credentials it uses for users, so no RLS policies are defined here.
+
+COMMENT ON TABLE stripe_webhook_events IS 'Raw Stripe webhook events, stored before acknowledgement and processed in order per customer by the webhook worker pool.';
+COMMENT ON COLUMN stripe_webhook_events.status IS 'pending -> processing -> processed, or failed after the worker retries; the retry sweep queues failed events again with backoff until they succeed or are abandoned after too many attempts.';
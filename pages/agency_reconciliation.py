@@ -43,6 +43,8 @@ from utils.agency_statement_matcher import (
     create_new_transaction
 )
 
+from utils.result_cache import invalidate_agency_results
+
 st.set_page_config(
     page_title="Agency Reconciliation",
     page_icon="💳",
@@ -657,6 +659,9 @@ def import_agency_transactions(
             result = supabase.table('policies').insert(transactions_to_insert).execute()
 
             if result.data:
+                invalidate_agency_results(
+                    agency_id, agent_ids={trans.get('agent_id') for trans in transactions_to_insert}
+                )
                 count = len(result.data)
                 return True, f"Successfully imported {count} transactions ({len(matched)} -STMT- entries, {len(unmatched)} new policies)", count
             else:
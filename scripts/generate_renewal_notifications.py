@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Generate renewal_due notifications for all active agents.
+
+Cron / CLI entry point for utils.agent_data_helpers.run_renewal_notification_job.
+The job fetches candidate renewals for every agent in one windowed query,
+computes next renewal dates vectorized, skips policies that already have an
+unread renewal notification and bulk-inserts the rest.
+
+Examples:
+    python scripts/generate_renewal_notifications.py --dry-run
+    python scripts/generate_renewal_notifications.py --days 14 --json
+
+Environment:
+    SUPABASE_URL, and SUPABASE_SERVICE_KEY (preferred for cron) or SUPABASE_ANON_KEY
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate renewal_due notifications for all active agents.")
+    parser.add_argument("--days", type=int, default=7, help="Notify renewals due within this many days (default: 7)")
+    parser.add_argument("--dry-run", action="store_true", help="Compute notifications without inserting them")
+    parser.add_argument("--today", help="Override today's date (YYYY-MM-DD) for backfills")
+    parser.add_argument("--json", action="store_true", help="Print job statistics as JSON")
+    parser.add_argument("--show", type=int, default=10, help="In dry-run mode, print up to N notifications")
+    return parser.parse_args(argv)
+
+
+def get_job_supabase_client():
+    from supabase import create_client
+
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY") or os.getenv("SUPABASE_ANON_KEY")
+    if not url or not key:
+        raise SystemExit("SUPABASE_URL and SUPABASE_SERVICE_KEY (or SUPABASE_ANON_KEY) must be set")
+    return create_client(url, key)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(ROOT / ".env")
+    except ImportError:
+        pass
+
+    from utils.agent_data_helpers import run_renewal_notification_job
+
+    stats = run_renewal_notification_job(
+        days_threshold=args.days,
+        supabase=get_job_supabase_client(),
+        dry_run=args.dry_run,
+        today=args.today,
+    )
+
+    notifications = stats.pop("notifications")
+
+    if args.json:
+        print(json.dumps(stats, indent=2))
+    else:
+        mode = "DRY RUN - " if args.dry_run else ""
+        print(f"{mode}Renewal notifications (window: {args.days} days)")
+        print(f"  Policies scanned:      {stats['policies_scanned']:,}")
+        print(f"  Due in window:         {stats['due_in_window']:,}")
+        print(f"  Already notified:      {stats['already_notified']:,}")
+        verb = "Would create" if args.dry_run else "Created"
+        print(f"  {verb}:{' ' * (21 - len(verb))}{stats['notifications_created']:,}")
+        print(f"  Elapsed:               {stats['elapsed_seconds']:.3f}s ({stats['rows_per_second']:,.0f} rows/s)")
+
+        if args.dry_run and notifications:
+            print()
+            for notification in notifications[:args.show]:
+                print(f"  [{notification['priority']}] {notification['agent_id']}: {notification['message']}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
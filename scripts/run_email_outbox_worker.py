@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Deliver queued emails from the email outbox.
+
+Cron / service entry point for utils.email_outbox.OutboxWorker. Each run
+opens one SMTP (or SendGrid) session per sender thread, sends everything
+that is due under a global rate limit and reschedules transient failures
+with exponential backoff.
+
+Examples:
+    python scripts/run_email_outbox_worker.py --once
+    python scripts/run_email_outbox_worker.py --concurrency 8 --rate 10 --interval 15
+
+Environment:
+    EMAIL_OUTBOX_PATH (default: email_outbox.db)
+    SENDGRID_API_KEY, or SMTP_HOST / SMTP_PORT / SMTP_USER / SMTP_PASS / SMTP_USE_TLS
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Deliver queued emails from the email outbox.")
+    parser.add_argument("--outbox", help="Outbox database path (default: EMAIL_OUTBOX_PATH or email_outbox.db)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Sender threads / open sessions (default: 4)")
+    parser.add_argument("--rate", type=float, default=None, help="Max messages per second across all threads")
+    parser.add_argument("--max-attempts", type=int, default=5, help="Attempts before a message is marked failed")
+    parser.add_argument("--once", action="store_true", help="Drain what is due now and exit")
+    parser.add_argument("--interval", type=float, default=30, help="Seconds between polls when running continuously")
+    parser.add_argument("--json", action="store_true", help="Print run statistics as JSON")
+    return parser.parse_args(argv)
+
+
+def print_stats(stats: dict, counts: dict, as_json: bool) -> None:
+    if as_json:
+        print(json.dumps({**stats, "queue": counts}))
+        return
+    print(
+        f"sent={stats['sent']} retried={stats['retried']} failed={stats['failed']} "
+        f"connections={stats['connections_opened']} "
+        f"elapsed={stats['elapsed_seconds']:.2f}s ({stats['messages_per_second']:.1f} msg/s) "
+        f"| queued={counts['queued']} failed_total={counts['failed']}"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+
+    try:
+        from dotenv import load_dotenv
+        load_dotenv(ROOT / ".env")
+    except ImportError:
+        pass
+
+    from utils.email_outbox import OutboxWorker, get_email_outbox
+
+    outbox = get_email_outbox(args.outbox)
+    worker = OutboxWorker(
+        outbox,
+        concurrency=args.concurrency,
+        rate_per_second=args.rate,
+        max_attempts=args.max_attempts,
+    )
+
+    while True:
+        stats = worker.run_once()
+        if stats["sent"] or stats["retried"] or stats["failed"] or args.once:
+            print_stats(stats, outbox.counts(), args.json)
+        if args.once:
+            return 0
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+"""
+Unit tests for utils/bulk_renewal: bulk renewal from the Pending Policy
+Renewals page.
+
+Run: python -m pytest test_bulk_renewal.py
+"""
+import json
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSupabase  # noqa: E402
+from utils.bulk_renewal import (  # noqa: E402
+    bulk_renew_policies,
+    duplicate_for_renewal,
+    reserve_transaction_ids,
+)
+
+
+def _pending(n=120):
+    df = pd.DataFrame({
+        'Transaction ID': [f"OLD{i:04d}" for i in range(n)],
+        'Policy Number': [f"P{i}" for i in range(n)],
+        'Customer': [f"Customer {i}" for i in range(n)],
+        'Transaction Type': ['NEW'] * n,
+        'Effective Date': ['2024-03-31'] * n,
+        'X-DATE': ['2025-03-31'] * n,
+        'Policy Term': [12 if i % 3 else 6 for i in range(n)],
+        'Premium Sold': [1000.0] * n,
+        'NOTES': ['old term'] * n,
+        'Agent Comm %': [50.0] * n,
+        '_id': list(range(n)),
+        'Edit': [True] * n,
+    })
+    df['expiration_date'] = pd.to_datetime(df['X-DATE'])
+    df['Days Until Expiration'] = -10
+    df.index = df.index * 2 + 1
+    return df
+
+
+def _sequence(prefix='N'):
+    counter = iter(range(10 ** 6))
+    return lambda: f"{prefix}{next(counter):05d}"
+
+
+class TestDuplicateForRenewal(unittest.TestCase):
+
+    def test_next_term_dates_by_policy_term(self):
+        df = _pending(3)
+        df.loc[df.index[2], 'Policy Term'] = None
+        renewed = duplicate_for_renewal(df)
+        self.assertEqual(renewed['Effective Date'].tolist(), ['2025-03-31'] * 3)
+        # 6 months, 12 months, default (6) - month-end dates clamp like DateOffset
+        self.assertEqual(renewed['X-DATE'].tolist(), ['2025-09-30', '2026-03-31', '2025-09-30'])
+        self.assertEqual(set(renewed['Transaction Type']), {'RWL'})
+        self.assertEqual(renewed.index.tolist(), df.index.tolist())
+
+
+class TestReserveTransactionIds(unittest.TestCase):
+
+    def test_collisions_are_regenerated_in_bulk(self):
+        client = FakeSupabase({'policies': [{'Transaction ID': f"N{i:05d}"} for i in range(0, 10, 2)]})
+        ids = reserve_transaction_ids(client, 20, _sequence())
+        self.assertEqual(len(set(ids)), 20)
+        self.assertFalse({f"N{i:05d}" for i in range(0, 10, 2)} & set(ids))
+        self.assertEqual(len(client.calls_to('policies', 'select')), 2)
+
+    def test_falls_back_to_timestamp_ids(self):
+        client = FakeSupabase({'policies': [{'Transaction ID': 'SAME'}]})
+        ids = reserve_transaction_ids(client, 3, lambda: 'SAME')
+        self.assertEqual(len(set(ids)), 3)
+        self.assertTrue(all(i.startswith('TXN') for i in ids))
+
+
+class TestBulkRenewPolicies(unittest.TestCase):
+
+    def test_bulk_inserts_policies_and_history(self):
+        pending = _pending(120)
+        client = FakeSupabase({'policies': [], 'renewal_history': []})
+
+        stats = bulk_renew_policies(client, pending, _sequence(), agent_comm_rate=25.0,
+                                    prepare_insert=lambda row: dict(row, user_email='a@b.com'), batch_size=50)
+
+        self.assertEqual(stats['errors'], [])
+        self.assertEqual(stats['renewed'], 120)
+        self.assertEqual(stats['history_rows'], 120)
+        self.assertEqual(stats['renewed_indexes'], pending.index.tolist())
+        # 3 ID checks + 3 policy inserts + 3 history inserts
+        self.assertEqual(len(client.calls_to('policies', 'select')), 3)
+        self.assertEqual(len(client.calls_to('policies', 'insert')), 3)
+        self.assertEqual(len(client.calls_to('renewal_history', 'insert')), 3)
+        self.assertEqual(stats['round_trips'], 9)
+
+        row = client.tables['policies'][0]
+        self.assertEqual(row['Transaction Type'], 'RWL')
+        self.assertEqual(row['Prior Policy Number'], 'P0')
+        self.assertEqual(row['Effective Date'], '2025-03-31')
+        self.assertIsNone(row['Premium Sold'])
+        self.assertIsNone(row['NOTES'])
+        self.assertEqual(row['Agent Comm %'], 25.0)
+        self.assertEqual(row['user_email'], 'a@b.com')
+        for helper in ('_id', 'Edit', 'expiration_date', 'Days Until Expiration', 'new_effective_date'):
+            self.assertNotIn(helper, row)
+
+        history = client.tables['renewal_history'][0]
+        self.assertEqual(history['original_transaction_id'], 'OLD0000')
+        self.assertEqual(history['new_transaction_id'], row['Transaction ID'])
+        details = json.loads(history['details'])
+        self.assertEqual((details['original_policy_number'], details['bulk_count']), ('P0', 120))
+
+    def test_rows_without_x_date_are_skipped(self):
+        pending = _pending(3)
+        pending.loc[pending.index[1], 'expiration_date'] = pd.NaT
+        client = FakeSupabase({'policies': [], 'renewal_history': []})
+        stats = bulk_renew_policies(client, pending, _sequence())
+        self.assertEqual(stats['renewed'], 2)
+        self.assertEqual(stats['renewed_indexes'], [pending.index[0], pending.index[2]])
+        self.assertEqual(len(stats['errors']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Unit tests for the columnar CLVCalculator.calculate_clv_for_all_clients().
+
+The vectorized path must produce the same numbers as calling
+calculate_clv() once per client, which is what the agency dashboards
+used to do.
+
+Run: python -m pytest test_clv_calculator.py
+"""
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.ml_models import CLVCalculator  # noqa: E402
+
+
+def _make_policies(n_clients=50, seed=7, with_renewed=True):
+    rng = np.random.default_rng(seed)
+    n_rows = n_clients * 3
+    today = datetime.now()
+    data = {
+        'insured_name': [f"Client {i:04d}" for i in rng.integers(0, n_clients, n_rows)],
+        'premium': rng.uniform(100, 9000, n_rows).round(2),
+        'effective_date': [
+            (today - timedelta(days=int(d))).strftime('%Y-%m-%d')
+            for d in rng.integers(0, 365 * 12, n_rows)
+        ],
+    }
+    if with_renewed:
+        data['renewed'] = rng.random(n_rows) < 0.7
+    return pd.DataFrame(data)
+
+
+class TestCLVForAllClients(unittest.TestCase):
+
+    def _assert_matches_per_client(self, policies, **kwargs):
+        calculator = CLVCalculator()
+        vectorized = calculator.calculate_clv_for_all_clients(policies, **kwargs).set_index('client_id')
+
+        for client_name, client_policies in policies.groupby('insured_name'):
+            expected = calculator.calculate_clv(client_policies, **kwargs)
+            row = vectorized.loc[client_name]
+            for key in ('clv', 'clv_present_value', 'avg_annual_premium',
+                        'retention_rate', 'lifespan_years', 'total_policies'):
+                self.assertAlmostEqual(row[key], expected[key], places=2, msg=f"{client_name} {key}")
+            self.assertEqual(row['tier'], expected['tier'])
+
+    def test_matches_per_client_calculation(self):
+        self._assert_matches_per_client(_make_policies())
+
+    def test_missing_renewed_column_uses_default_retention(self):
+        policies = _make_policies(with_renewed=False)
+        result = CLVCalculator().calculate_clv_for_all_clients(policies)
+        self.assertTrue((result['retention_rate'] == 0.85).all())
+        self._assert_matches_per_client(policies)
+
+    def test_override_parameters(self):
+        self._assert_matches_per_client(
+            _make_policies(), acquisition_cost=250, retention_rate=0.9, lifespan_years=4.5
+        )
+
+    def test_new_client_uses_default_lifespan(self):
+        policies = pd.DataFrame({
+            'insured_name': ['New Client'],
+            'premium': [1200.0],
+            'effective_date': [datetime.now().strftime('%Y-%m-%d')],
+            'renewed': [True],
+        })
+        result = CLVCalculator().calculate_clv_for_all_clients(policies)
+        self.assertEqual(result.loc[0, 'lifespan_years'], 7)
+        self.assertEqual(result.loc[0, 'tier'], 'Gold')
+
+    def test_empty_frame(self):
+        result = CLVCalculator().calculate_clv_for_all_clients(pd.DataFrame())
+        self.assertTrue(result.empty)
+        self.assertIn('clv', result.columns)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+Unit tests for commission_core: the UI-free commission engine and its
+structured diagnostics.
+
+Run: python -m pytest test_commission_core.py
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from commission_core import (  # noqa: E402
+    Diagnostics,
+    StatementMatch,
+    agent_commission_rate,
+    apply_formula_display,
+    calculate_dashboard_metrics,
+    calculate_transaction_balances,
+    find_potential_customer_matches,
+    match_statement_transactions,
+    normalize_statement,
+)
+
+
+def _ledger():
+    today = pd.Timestamp.now().normalize()
+    recent = (today - pd.DateOffset(months=2)).strftime('%Y-%m-%d')
+    older = (today - pd.DateOffset(months=3)).strftime('%Y-%m-%d')
+    return pd.DataFrame([
+        {'Transaction ID': 'AAA111X', 'Customer': 'Jane Smith', 'Policy Number': 'P-1', 'Effective Date': recent,
+         'Transaction Type': 'NEW', 'Premium Sold': 1000.0, 'Total Agent Comm': 100.0,
+         'Agent Paid Amount (STMT)': None},
+        {'Transaction ID': 'AAA111X-STMT-20250101', 'Customer': 'Jane Smith', 'Policy Number': 'P-1 ',
+         'Effective Date': recent, 'Transaction Type': 'NEW', 'Premium Sold': 0.0, 'Total Agent Comm': 0.0,
+         'Agent Paid Amount (STMT)': 40.0},
+        {'Transaction ID': 'BBB222Y', 'Customer': 'RCM Construction of SWFL LLC', 'Policy Number': 'P-2',
+         'Effective Date': older, 'Transaction Type': 'RWL', 'Premium Sold': 500.0, 'Total Agent Comm': 30.0,
+         'Agent Paid Amount (STMT)': None},
+    ])
+
+
+class TestBalancesAndMetrics(unittest.TestCase):
+
+    def test_balance_is_commission_minus_payments(self):
+        balances = calculate_transaction_balances(_ledger())
+        self.assertEqual(balances.set_index('Transaction ID')['_balance'].to_dict(), {'AAA111X': 60.0, 'BBB222Y': 30.0})
+
+    def test_metrics_do_not_modify_the_ledger(self):
+        ledger = _ledger()
+        before = ledger.copy()
+        metrics = calculate_dashboard_metrics(ledger)
+        pd.testing.assert_frame_equal(ledger, before)
+        self.assertEqual(metrics['total_transactions'], 3)
+        self.assertEqual(metrics['unique_policies'], 3)  # 'P-1 ' is stripped only for active / cancelled
+        self.assertEqual(metrics['active_policies'], 2)
+        self.assertAlmostEqual(metrics['agent_comm_due_total'], 90.0)
+
+
+class TestStatementMatching(unittest.TestCase):
+
+    def setUp(self):
+        self.ledger = _ledger()
+        recent = self.ledger.loc[0, 'Effective Date']
+        self.statement = pd.DataFrame([
+            {'Insured': 'Jane Smith', 'Policy': 'P-1', 'Eff': recent, 'Paid': 60.0},
+            {'Insured': 'Jane Smith', 'Policy': 'P-1', 'Eff': recent, 'Paid': 60.0},
+            {'Insured': 'RCM Construction', 'Policy': 'P-2', 'Eff': '2001-01-01', 'Paid': 30.0},
+            {'Insured': 'Brand New Client', 'Policy': 'P-9', 'Eff': recent, 'Paid': 10.0},
+            {'Insured': 'Grand Total', 'Policy': '', 'Eff': None, 'Paid': 160.0},
+        ])
+        self.mapping = {'Customer': 'Insured', 'Policy Number': 'Policy', 'Effective Date': 'Eff',
+                        'Agent Paid Amount (STMT)': 'Paid'}
+
+    def test_matches_and_unpacks_like_a_tuple(self):
+        diagnostics = Diagnostics()
+        result = match_statement_transactions(self.statement, self.mapping, self.ledger, diagnostics=diagnostics)
+        self.assertIsInstance(result, StatementMatch)
+        matched, unmatched, can_create = result
+
+        self.assertEqual([m['match_type'] for m in matched], ['Policy + Date', 'normalized + Policy + Amount'])
+        self.assertEqual(unmatched, [])
+        self.assertEqual([c['customer'] for c in can_create], ['Brand New Client'])
+        self.assertEqual(result.duplicates_removed, 1)
+        self.assertEqual(result.stats['policy_date_attempts'], 3)
+
+        # Notices are always collected, debug sections only when enabled
+        self.assertIn('Removed 1 duplicate rows', diagnostics.notices[0].message)
+        self.assertEqual(diagnostics.sections, [])
+
+    def test_debug_sections_and_index_mapping(self):
+        diagnostics = Diagnostics(enabled=True)
+        by_index = {'Customer': '0', 'Policy Number': 1, 'Effective Date': '2', 'Agent Paid Amount (STMT)': '3'}
+        matched, unmatched, can_create = match_statement_transactions(
+            self.statement, by_index, self.ledger, diagnostics=diagnostics
+        )
+        self.assertEqual((len(matched), len(unmatched), len(can_create)), (2, 0, 1))
+        titles = [section.title for section in diagnostics.sections]
+        self.assertIn("🔍 DEBUG: Matching Summary", titles)
+        self.assertEqual(diagnostics.to_dict()['values']['statement_matching']['can_create'], 1)
+
+
+class TestNormalizeStatement(unittest.TestCase):
+
+    def test_typed_fields_and_row_flags(self):
+        statement = pd.DataFrame({
+            'Insured': ['  Jane Smith ', 'nan', None, 'Sub-Total', 'Bob Jones'],
+            'Policy': ['P-1', 'P-2', None, None, 'NONE'],
+            'Eff': ['01/07/2025', '2025-02-01', None, None, 'not a date'],
+            'Paid': ['60.5', 'n/a', None, 100, 5],
+        })
+        normalized = normalize_statement(statement, {'Customer': 'insured', 'Policy Number': 1,
+                                                     'Effective Date': 'Eff', 'Agent Paid Amount (STMT)': 'Paid'})
+        fields = normalized.fields
+        self.assertEqual(fields['customer'].tolist(), ['Jane Smith', '', '', 'Sub-Total', 'Bob Jones'])
+        self.assertEqual(fields['policy_number'].tolist(), ['P-1', 'P-2', '', '', ''])
+        self.assertEqual(fields['effective_date'].tolist()[:2], ['2025-01-07', '2025-02-01'])
+        self.assertEqual(fields['effective_date'].iat[4], 'not a date')
+        self.assertEqual(fields['amount'].tolist(), [60.5, 0.0, 0.0, 100.0, 5.0])
+        self.assertEqual(fields['agency_amount'].tolist(), [0.0] * 5)
+
+        self.assertEqual((normalized.skipped_totals, normalized.skipped_empty), (1, 1))
+        self.assertEqual([record.row_index for record in normalized.records()], [0, 1, 4])
+
+
+class TestFormulasAndCustomers(unittest.TestCase):
+
+    def test_agent_rates(self):
+        self.assertEqual(agent_commission_rate({'Transaction Type': 'NEW'}), 50.0)
+        self.assertEqual(agent_commission_rate({'Transaction Type': 'RWL'}), 25.0)
+        self.assertEqual(agent_commission_rate({'Transaction Type': 'END', 'Policy Origination Date': '2025-01-01',
+                                                'Effective Date': '2025-01-01'}), 50.0)
+        self.assertEqual(agent_commission_rate({'Transaction Type': 'PMT', 'Agent Comm %': 0.1}), 10.0)
+
+    def test_formula_display(self):
+        df = pd.DataFrame([{'Transaction ID': 'AAA111X', 'Transaction Type': 'NEW', 'Premium Sold': 1000.0,
+                            'Policy Taxes & Fees': 0.0, 'Policy Gross Comm %': 10.0, 'Broker Fee': 20.0,
+                            'Agency Estimated Comm/Revenue (CRM)': 100.0, 'Agent Estimated Comm $': 40.0}])
+        display = apply_formula_display(df)
+        self.assertEqual(display.loc[0, 'Agency Estimated Comm/Revenue (CRM)'], '$100.00 ✓')
+        self.assertEqual(display.loc[0, 'Agent Estimated Comm $'], '$50.00 ✏️')
+        self.assertEqual(display.loc[0, 'Total Agent Comm'], 60.0)
+        self.assertEqual(df.loc[0, 'Agent Estimated Comm $'], 40.0)
+
+    def test_customer_matches(self):
+        matches = find_potential_customer_matches('Smith, Jane', ['Jane Smith', 'Janet Smythe', ''])
+        self.assertEqual(matches[0], ('Jane Smith', 'name_reversed', 98))
+
+
+class TestNoStreamlit(unittest.TestCase):
+
+    def test_core_does_not_import_streamlit(self):
+        script = "import sys, commission_core; print('streamlit' in sys.modules)"
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), 'False', result.stderr[-2000:])
+
+
+if __name__ == '__main__':
+    unittest.main()
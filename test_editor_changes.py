@@ -0,0 +1,164 @@
+"""
+Unit tests for utils/editor_changes: diff-based saving of the Edit Policy
+Transactions data editor.
+
+Run: python -m pytest test_editor_changes.py
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSupabase  # noqa: E402
+from utils.editor_changes import diff_editor_frames, save_editor_changes  # noqa: E402
+
+ID = 'Transaction ID'
+
+
+def _policies(n=300):
+    return pd.DataFrame({
+        'Select': [False] * n,
+        ID: [f"T{i:04d}" for i in range(n)],
+        'Customer': [f"Customer {i}" for i in range(n)],
+        'Premium Sold': np.arange(n, dtype=float) * 10,
+        'Policy Number': [f"P-{i}" if i % 7 else None for i in range(n)],
+    })
+
+
+def _client(df, user_id='u1'):
+    rows = df.drop(columns=['Select']).replace({np.nan: None}).to_dict('records')
+    for row in rows:
+        row['user_id'] = user_id
+    rows.append({ID: 'OTHER-1', 'Customer': 'Not mine', 'user_id': 'u2'})
+    return FakeSupabase({'policies': rows})
+
+
+class TestDiffEditorFrames(unittest.TestCase):
+
+    def test_only_changed_cells_are_reported(self):
+        original = _policies()
+        edited = original.copy()
+        edited.loc[3, 'Premium Sold'] = 999.0
+        edited.loc[10, 'Customer'] = 'Renamed'
+        edited.loc[10, 'Premium Sold'] = 1.5
+        edited['Select'] = True  # checkbox clicks are never saved
+
+        changes = diff_editor_frames(original, edited, ID)
+
+        self.assertEqual(changes['changed_cells'], 3)
+        self.assertEqual(changes['unchanged_rows'], 298)
+        self.assertEqual(changes['new_rows'], [])
+        by_id = {u[ID]: u for u in changes['updates']}
+        self.assertEqual(by_id['T0003'], {ID: 'T0003', 'Premium Sold': 999.0})
+        self.assertEqual(by_id['T0010'], {ID: 'T0010', 'Customer': 'Renamed', 'Premium Sold': 1.5})
+
+    def test_nulls_and_reordering_do_not_count_as_changes(self):
+        original = _policies(20)
+        edited = original.sample(frac=1, random_state=1)
+        edited['Policy Number'] = edited['Policy Number'].astype(object).where(edited['Policy Number'].notna(), np.nan)
+        changes = diff_editor_frames(original, edited, ID)
+        self.assertEqual(changes['updates'], [])
+        self.assertEqual(changes['unchanged_rows'], 20)
+
+    def test_blank_and_unknown_ids_are_new_rows(self):
+        original = _policies(3)
+        edited = pd.concat([original, pd.DataFrame({
+            'Select': [False, False], ID: [None, 'T9999'], 'Customer': ['New A', 'New B'],
+            'Premium Sold': [5.0, 6.0], 'Policy Number': ['N-1', 'N-2'],
+        })], ignore_index=True)
+        changes = diff_editor_frames(original, edited, ID)
+        self.assertEqual([r['Customer'] for r in changes['new_rows']], ['New A', 'New B'])
+        self.assertNotIn('Select', changes['new_rows'][0])
+
+
+class TestSaveEditorChanges(unittest.TestCase):
+
+    def test_two_changed_cells_in_300_rows_use_few_round_trips(self):
+        original = _policies()
+        supabase = _client(original)
+        edited = original.copy()
+        edited.loc[3, 'Premium Sold'] = 999.0
+        edited.loc[200, 'Premium Sold'] = np.float64(12.346)
+
+        stats = save_editor_changes(supabase, diff_editor_frames(original, edited, ID), ID,
+                                    user_id='u1', clean_value=lambda v: round(v, 2) if isinstance(v, float) else v)
+
+        self.assertEqual(stats['updated_rows'], 2)
+        self.assertEqual(stats['changed_cells'], 2)
+        # One in_() existence check + one upsert for the shared column set
+        self.assertEqual(len(supabase.calls), 2)
+        self.assertEqual(stats['round_trips'], 2)
+        rows = {r[ID]: r for r in supabase.tables['policies']}
+        self.assertEqual(rows['T0003']['Premium Sold'], 999.0)
+        self.assertEqual(rows['T0200']['Premium Sold'], 12.35)
+        self.assertIsInstance(rows['T0200']['Premium Sold'], float)
+        # Untouched cells keep their values
+        self.assertEqual(rows['T0003']['Customer'], 'Customer 3')
+
+    def test_inserts_batched_and_foreign_ids_not_written(self):
+        original = _policies(4)
+        # A row owned by another user that somehow reached the editor
+        original = pd.concat([original, pd.DataFrame({'Select': [False], ID: ['OTHER-1'], 'Customer': ['Not mine']})],
+                             ignore_index=True)
+        supabase = _client(_policies(5))
+        edited = original.copy()
+        edited.loc[1, 'Customer'] = 'Changed'
+        edited.loc[4, 'Customer'] = 'Hijack'
+        extra = pd.DataFrame({
+            'Select': [False] * 3,
+            ID: [None, '', 'T0004'],  # T0004 exists but was not loaded into the editor
+            'Customer': ['Brand new', 'Also new', 'Duplicate'],
+            'Premium Sold': [1.0, 2.0, 3.0],
+        })
+        edited = pd.concat([edited, extra], ignore_index=True)
+        changes = diff_editor_frames(original, edited, ID)
+
+        counter = iter(range(100))
+        stats = save_editor_changes(
+            supabase, changes, ID, user_id='u1',
+            prepare_insert=lambda row: {**row, ID: f"NEW-{next(counter)}", 'user_id': 'u1'},
+        )
+
+        self.assertEqual(stats['updated_rows'], 1)
+        self.assertEqual(stats['inserted_rows'], 2)
+        self.assertEqual(stats['skipped_rows'], 2)  # OTHER-1 update, T0004 duplicate insert
+        self.assertEqual(len(supabase.calls_to('policies', 'select')), 1)
+        self.assertEqual(len(supabase.calls_to('policies', 'insert')), 1)
+        rows = {r[ID]: r for r in supabase.tables['policies']}
+        self.assertEqual(rows['OTHER-1']['Customer'], 'Not mine')
+        self.assertEqual(rows['T0004']['Customer'], 'Customer 4')
+        self.assertEqual(rows['NEW-1']['Customer'], 'Also new')
+
+    def test_upsert_failure_falls_back_to_row_updates(self):
+        original = _policies(4)
+        supabase = _client(original)
+        edited = original.copy()
+        edited.loc[0, 'Customer'] = 'A'
+        edited.loc[1, 'Customer'] = 'B'
+
+        def failing_upsert(*args, **kwargs):
+            raise RuntimeError('there is no unique or exclusion constraint matching the ON CONFLICT specification')
+
+        table = supabase.table
+
+        def patched_table(name):
+            query = table(name)
+            query.upsert = failing_upsert
+            return query
+
+        supabase.table = patched_table
+        stats = save_editor_changes(supabase, diff_editor_frames(original, edited, ID), ID, user_id='u1')
+
+        self.assertEqual(stats['updated_rows'], 2)
+        self.assertEqual(stats['errors'], [])
+        self.assertEqual(len(supabase.calls_to('policies', 'update')), 2)
+        rows = {r[ID]: r for r in supabase.tables['policies']}
+        self.assertEqual((rows['T0000']['Customer'], rows['T0001']['Customer']), ('A', 'B'))
+
+
+if __name__ == '__main__':
+    unittest.main()
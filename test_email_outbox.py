@@ -0,0 +1,274 @@
+"""
+Unit tests for utils/email_outbox: the persisted email queue, the delivery
+worker (session reuse, rate limiting, retries) and the cached templates
+used by the send_*_email helpers in utils/agent_data_helpers.
+
+The SMTP round trip test runs against a local aiosmtpd sink when aiosmtpd
+is installed.
+
+Run: python -m pytest test_email_outbox.py
+"""
+import os
+import smtplib
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# test_webhook_subscription_status replaces email_utils with a MagicMock at import time
+if not isinstance(sys.modules.get('email_utils', types), types.ModuleType):
+    del sys.modules['email_utils']
+
+from email_utils import SMTPTransport  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+from utils import email_outbox  # noqa: E402
+from utils.email_outbox import (  # noqa: E402
+    EmailOutbox,
+    EmailTemplate,
+    OutboxWorker,
+    PermanentEmailError,
+    RateLimiter,
+    backoff_delay,
+)
+
+try:
+    from aiosmtpd.controller import Controller
+except ImportError:  # pragma: no cover - optional test dependency
+    Controller = None
+
+
+class FakeTransport:
+    """Records messages; fails according to a per-recipient script."""
+
+    opened = []
+
+    def __init__(self, failures=None):
+        self.failures = failures if failures is not None else {}
+        self.sent = []
+        self.connections_opened = 1
+        self.closed = False
+        FakeTransport.opened.append(self)
+
+    def send(self, to_email, subject, html_body, text_body=None):
+        script = self.failures.get(to_email)
+        if script:
+            error = script.pop(0)
+            raise error
+        self.sent.append((to_email, subject))
+
+    def close(self):
+        self.closed = True
+
+
+class OutboxTestCase(unittest.TestCase):
+
+    def setUp(self):
+        FakeTransport.opened = []
+        self.tmp = tempfile.TemporaryDirectory()
+        self.outbox = EmailOutbox(os.path.join(self.tmp.name, 'outbox.db'))
+
+    def tearDown(self):
+        self.outbox.close()
+        self.tmp.cleanup()
+
+    def _queue(self, n, prefix='agent'):
+        return self.outbox.enqueue_many([
+            {'to_email': f"{prefix}{i}@example.com", 'subject': f"Digest {i}",
+             'html_body': '<p>hi</p>', 'text_body': 'hi'}
+            for i in range(n)
+        ])
+
+
+class TestEmailOutboxQueue(OutboxTestCase):
+
+    def test_dedupe_key_queues_once(self):
+        first = self.outbox.enqueue('a@example.com', 'S', '<p>x</p>', dedupe_key='weekly_digest:a:2026-W10')
+        second = self.outbox.enqueue('a@example.com', 'S', '<p>x</p>', dedupe_key='weekly_digest:a:2026-W10')
+        self.assertIsNotNone(first)
+        self.assertIsNone(second)
+        self.assertEqual(self.outbox.counts()['queued'], 1)
+
+    def test_claim_is_exclusive_and_stale_claims_are_reclaimed(self):
+        self._queue(3)
+        now = time.time()
+        self.assertEqual(len(self.outbox.claim_batch(10, now=now)), 3)
+        self.assertEqual(self.outbox.claim_batch(10, now=now), [])
+        # A crashed worker's lease expires
+        reclaimed = self.outbox.claim_batch(10, now=now + email_outbox.LEASE_SECONDS + 1)
+        self.assertEqual(len(reclaimed), 3)
+
+
+class TestOutboxWorker(OutboxTestCase):
+
+    def test_drains_queue_reusing_one_session_per_thread(self):
+        self._queue(50)
+        worker = OutboxWorker(self.outbox, transport_factory=FakeTransport, concurrency=4)
+        stats = worker.run_once()
+
+        self.assertEqual(stats['sent'], 50)
+        self.assertLessEqual(stats['connections_opened'], 4)
+        self.assertEqual(sum(len(t.sent) for t in FakeTransport.opened), 50)
+        self.assertTrue(all(t.closed for t in FakeTransport.opened))
+        self.assertEqual(self.outbox.counts()['sent'], 50)
+        self.assertGreater(stats['messages_per_second'], 0)
+
+    def test_transient_failure_is_retried_with_backoff(self):
+        ids = self._queue(1)
+        failures = {'agent0@example.com': [smtplib.SMTPServerDisconnected('gone')]}
+        worker = OutboxWorker(self.outbox, transport_factory=lambda: FakeTransport(failures),
+                              concurrency=1, backoff_base=60)
+
+        stats = worker.run_once()
+        self.assertEqual(stats['retried'], 1)
+        message = self.outbox.get(ids[0])
+        self.assertEqual((message['status'], message['attempts']), ('queued', 1))
+        self.assertGreater(message['next_attempt_at'], time.time() + 50)
+
+        # Not due yet
+        self.assertEqual(worker.run_once()['sent'], 0)
+
+        with mock.patch('utils.email_outbox.time.time', return_value=time.time() + 120):
+            stats = worker.run_once()
+        self.assertEqual(stats['sent'], 1)
+        self.assertEqual(self.outbox.get(ids[0])['status'], 'sent')
+
+    def test_permanent_failures_and_exhausted_attempts(self):
+        ids = self._queue(2)
+        failures = {
+            'agent0@example.com': [PermanentEmailError('550 no such user')],
+            'agent1@example.com': [RuntimeError('timeout')] * 3,
+        }
+        worker = OutboxWorker(self.outbox, transport_factory=lambda: FakeTransport(failures),
+                              concurrency=1, max_attempts=2, backoff_base=0)
+
+        first = worker.run_once()
+        second = worker.run_once()
+
+        self.assertEqual(first['failed'] + second['failed'], 2)
+        self.assertEqual(self.outbox.get(ids[0])['status'], 'failed')
+        self.assertEqual(self.outbox.get(ids[0])['attempts'], 1)
+        self.assertEqual(self.outbox.get(ids[1])['status'], 'failed')
+        self.assertEqual(self.outbox.get(ids[1])['attempts'], 2)
+
+    def test_backoff_is_exponential_and_capped(self):
+        self.assertEqual([backoff_delay(n, base=10, cap=50) for n in (1, 2, 3, 4)], [10, 20, 40, 50])
+
+    def test_rate_limiter_spaces_sends(self):
+        clock = {'now': 0.0}
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            clock['now'] += seconds
+
+        limiter = RateLimiter(rate=5, burst=1, clock=lambda: clock['now'], sleep=sleep)
+        for _ in range(6):
+            limiter.acquire()
+        # First send uses the initial token, then one token every 0.2s
+        self.assertAlmostEqual(clock['now'], 1.0, places=6)
+        self.assertEqual(len(sleeps), 5)
+
+
+class TestTemplates(unittest.TestCase):
+
+    def test_render_uses_cached_parse(self):
+        template = EmailTemplate('t', 'Hi {name}', 'Total ${amount:,.2f}', '<b>{name!r}</b>')
+        email_outbox._compile.cache_clear()
+        for name in ('Ann', 'Bob', 'Cy'):
+            rendered = template.render(name=name, amount=1234.5)
+        self.assertEqual(rendered, {'subject': 'Hi Cy', 'text_body': 'Total $1,234.50', 'html_body': "<b>'Cy'</b>"})
+        info = email_outbox._compile.cache_info()
+        self.assertEqual(info.misses, 3)
+        self.assertEqual(info.hits, 6)
+
+    def test_helpers_queue_rendered_templates(self):
+        from utils.agent_data_helpers import send_achievement_email, send_critical_renewal_email
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'outbox.db')
+            with mock.patch('utils.email_outbox.DEFAULT_OUTBOX_PATH', path):
+                supabase = FakeSupabase({'agent_notification_preferences': [
+                    {'agent_id': 'a2', 'email_enabled': True, 'achievement_email': False},
+                ]})
+                self.assertTrue(send_critical_renewal_email(
+                    'a1', 'a1@example.com', 'AUTO-1', 'Jane Doe', '2026-03-12', -3, supabase))
+                # Re-sending the same reminder does not queue a duplicate
+                self.assertTrue(send_critical_renewal_email(
+                    'a1', 'a1@example.com', 'AUTO-1', 'Jane Doe', '2026-03-12', -3, supabase))
+                self.assertFalse(send_achievement_email('a2', 'a2@example.com', 'Closer', 'Ten sales', supabase))
+
+                outbox = email_outbox.get_email_outbox()
+                messages = outbox.claim_batch(10)
+                outbox.close()
+                del email_outbox._outboxes[path]
+
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(messages[0]['subject'], 'URGENT: Policy Renewal Past Due - AUTO-1')
+        self.assertIn('PAST DUE by 3 days', messages[0]['text_body'])
+        self.assertEqual(messages[0]['template'], 'critical_renewal')
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class SinkHandler:
+    def __init__(self):
+        self.messages = []
+        self.peers = set()
+        self.lock = threading.Lock()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('bounce'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        with self.lock:
+            self.messages.append(envelope)
+            self.peers.add(session.peer)
+        return '250 Message accepted for delivery'
+
+
+@unittest.skipIf(Controller is None, "aiosmtpd is not installed")
+class TestSMTPSink(OutboxTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.handler = SinkHandler()
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=_free_port())
+        self.controller.start()
+
+    def tearDown(self):
+        self.controller.stop()
+        super().tearDown()
+
+    def _transport(self):
+        return SMTPTransport('127.0.0.1', self.controller.port, use_tls=False, from_email='noreply@example.com')
+
+    def test_worker_delivers_over_reused_connections(self):
+        self._queue(40)
+        self.outbox.enqueue('bounce@example.com', 'Nope', '<p>x</p>')
+        worker = OutboxWorker(self.outbox, transport_factory=self._transport, concurrency=3)
+
+        stats = worker.run_once()
+
+        self.assertEqual(stats['sent'], 40)
+        self.assertEqual(stats['failed'], 1)
+        self.assertEqual(len(self.handler.messages), 40)
+        self.assertLessEqual(len(self.handler.peers), 3)
+        self.assertLessEqual(stats['connections_opened'], 3)
+        self.assertEqual(self.outbox.counts()['failed'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Unit tests for utils/excel_export: streaming .xlsx writer used by the
+report, PRL and multi-sheet downloads.
+
+Run: python -m pytest test_excel_export.py
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.excel_export import (  # noqa: E402
+    CURRENCY_NUM_FORMAT,
+    coerce_currency_strings,
+    estimate_column_widths,
+    prl_row_styles,
+    write_excel_workbook,
+)
+
+
+def _prl_frame():
+    return pd.DataFrame({
+        'Group': ['1', '1', '=', '2'],
+        'Transaction ID': ['T1', 'T1-STMT-01', '', 'T2-VOID-03'],
+        'Customer': ['Acme', 'Acme', 'Subtotal', 'Beta'],
+        'Premium Sold': ['$1,200.50', '$300.00', '$1,500.50', '-$12.00'],
+        'Effective Date': pd.to_datetime(['2024-01-01', '2024-02-01', None, '2024-03-15']),
+        'Notes': ['a', None, np.nan, 'd'],
+    })
+
+
+class TestExcelHelpers(unittest.TestCase):
+
+    def test_currency_strings_become_numbers(self):
+        df = coerce_currency_strings(_prl_frame())
+        self.assertEqual(df['Premium Sold'].tolist(), [1200.5, 300.0, 1500.5, -12.0])
+        self.assertEqual(df['Customer'].tolist(), ['Acme', 'Acme', 'Subtotal', 'Beta'])
+
+    def test_prl_row_styles(self):
+        self.assertEqual(prl_row_styles(_prl_frame()), [None, 'stmt', 'subtotal', 'void'])
+
+    def test_width_estimate_is_clamped(self):
+        widths = estimate_column_widths(['A', 'Long header name', 'C'], [('x', 'y', 'z' * 100)])
+        self.assertEqual(widths, [10, 18, 30])
+
+
+class TestWriteExcelWorkbook(unittest.TestCase):
+
+    def _load(self, sheets):
+        return load_workbook(write_excel_workbook(sheets))
+
+    def test_formats_styles_and_blanks(self):
+        df = coerce_currency_strings(_prl_frame())
+        wb = self._load([{
+            'name': 'Policy Revenue Report',
+            'data': df,
+            'currency_columns': ['Premium Sold'],
+            'widths': {'Group': 8, '*': 15},
+            'header_style': 'green',
+            'row_styles': prl_row_styles(df),
+        }])
+        ws = wb['Policy Revenue Report']
+
+        self.assertEqual([c.value for c in ws[1]], list(df.columns))
+        self.assertTrue(ws['A1'].font.bold)
+        # Subtotal marker is text, not a formula
+        self.assertEqual(ws['A4'].value, '=')
+        self.assertEqual(ws['D2'].value, 1200.5)
+        self.assertEqual(ws['D2'].number_format, CURRENCY_NUM_FORMAT)
+        self.assertEqual(ws['E2'].value.date().isoformat(), '2024-01-01')
+        # Missing values are blank cells
+        self.assertIsNone(ws['F3'].value)
+        self.assertIsNone(ws['E4'].value)
+        # Row highlights keep the column's number format
+        self.assertEqual(ws['D4'].fill.fgColor.rgb, 'FF4A4A4A')
+        self.assertEqual(ws['D4'].number_format, CURRENCY_NUM_FORMAT)
+        self.assertEqual(ws['C3'].fill.fgColor.rgb, 'FFE6F3FF')
+        self.assertEqual(ws['C5'].fill.fgColor.rgb, 'FFFFE6E6')
+        # xlsxwriter stores widths with Excel's padding added
+        self.assertAlmostEqual(ws.column_dimensions['A'].width, 8.71, places=2)
+        self.assertAlmostEqual(ws.column_dimensions['B'].width, 15.71, places=2)
+
+    def test_streamed_rows_and_multiple_sheets(self):
+        def rows():
+            for i in range(2500):
+                yield (f"T{i}", float(i), None if i % 2 else 'note')
+
+        wb = self._load([
+            {'name': 'Export Info', 'columns': ['Field', 'Value'], 'rows': [('Rows', 2500)], 'widths': [25, 50]},
+            {'name': 'Data', 'columns': ['Transaction ID', 'Premium Sold', 'Notes'], 'rows': rows(),
+             'currency_columns': ['Premium Sold']},
+        ])
+
+        self.assertEqual(wb.sheetnames, ['Export Info', 'Data'])
+        ws = wb['Data']
+        self.assertEqual(ws.max_row, 2501)
+        self.assertEqual(ws['B2501'].value, 2499.0)
+        self.assertEqual(ws['B2501'].number_format, CURRENCY_NUM_FORMAT)
+        self.assertEqual(ws['C2'].value, 'note')
+        self.assertIsNone(ws['C3'].value)
+        self.assertEqual(wb['Export Info']['B2'].value, 2500)
+
+    def test_long_sheet_names_are_truncated(self):
+        wb = self._load([{'name': 'X' * 40, 'data': pd.DataFrame({'A': [1]})}])
+        self.assertEqual(wb.sheetnames, ['X' * 31])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+"""
+Unit tests for utils/model_registry: versioned renewal model artifacts,
+memory-mapped loading and the warm, hot-swappable process predictor.
+
+Run: python -m pytest test_model_registry.py
+"""
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.ml_models import RenewalPredictor  # noqa: E402
+from utils.model_registry import (  # noqa: E402
+    ModelRegistry,
+    get_renewal_predictor,
+    reset_warm_predictors,
+)
+
+
+def _trained_predictor(seed):
+    rng = np.random.default_rng(seed)
+    n = 200
+    data = pd.DataFrame({
+        'expiration_date': pd.Timestamp('2026-06-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+        'effective_date': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+        'premium': rng.uniform(200, 5000, n),
+        'policy_type': rng.choice(['AUTO', 'HOME', 'GL'], n),
+        'carrier': rng.choice(['A', 'B', 'C'], n),
+    })
+    data['renewed'] = (data['premium'] > 1500).astype(int)
+    predictor = RenewalPredictor()
+    predictor.train(data)
+    return predictor, data
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        reset_warm_predictors()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(self.tmp.name)
+
+    def tearDown(self):
+        reset_warm_predictors()
+        self.tmp.cleanup()
+
+    def test_publish_and_load_round_trip(self):
+        predictor, data = _trained_predictor(1)
+        version = self.registry.publish_renewal_predictor(predictor, {'accuracy': 0.9})
+
+        self.assertEqual(self.registry.latest_version(), version)
+        self.assertEqual(self.registry.list_versions()[0]['metrics']['accuracy'], 0.9)
+
+        loaded = self.registry.load_renewal_predictor()
+        self.assertEqual(loaded.model_version, version)
+        self.assertIsInstance(loaded.scaler.mean_, np.memmap)
+        np.testing.assert_allclose(loaded.score_batch(data), predictor.score_batch(data))
+
+    def test_empty_registry_returns_none(self):
+        self.assertIsNone(self.registry.load_renewal_predictor())
+        self.assertIsNone(get_renewal_predictor(self.tmp.name))
+
+    def test_warm_predictor_loads_once(self):
+        predictor, _ = _trained_predictor(2)
+        self.registry.publish_renewal_predictor(predictor)
+
+        first = get_renewal_predictor(self.tmp.name, check_interval=0)
+        start = time.perf_counter()
+        second = get_renewal_predictor(self.tmp.name, check_interval=0)
+        warm_latency = time.perf_counter() - start
+
+        self.assertIs(first, second)
+        self.assertLess(warm_latency, 0.05)
+
+    def test_hot_swap_on_new_version(self):
+        predictor_a, _ = _trained_predictor(3)
+        predictor_a.model_version = 'renewal-a'
+        self.registry.publish_renewal_predictor(predictor_a)
+        self.assertEqual(get_renewal_predictor(self.tmp.name, check_interval=0).model_version, 'renewal-a')
+
+        predictor_b, _ = _trained_predictor(4)
+        predictor_b.model_version = 'renewal-b'
+        self.registry.publish_renewal_predictor(predictor_b)
+
+        # Within the check interval the old model keeps serving
+        self.assertEqual(get_renewal_predictor(self.tmp.name, check_interval=3600).model_version, 'renewal-a')
+        self.assertEqual(get_renewal_predictor(self.tmp.name, check_interval=0).model_version, 'renewal-b')
+
+    def test_untrained_model_cannot_be_published(self):
+        with self.assertRaises(ValueError):
+            self.registry.publish_renewal_predictor(RenewalPredictor())
+
+
+if __name__ == '__main__':
+    unittest.main()
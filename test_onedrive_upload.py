@@ -0,0 +1,231 @@
+"""
+Unit tests for utils/onedrive_manager uploads: chunked upload sessions
+with resume, concurrent uploads, batched indexing and first-pages-only
+PDF metadata. Graph is replaced by a requests transport adapter.
+
+Run: python -m pytest test_onedrive_upload.py
+"""
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSupabase  # noqa: E402
+from utils import onedrive_manager  # noqa: E402
+from utils.onedrive_manager import OneDriveDocumentManager, read_pdf_metadata  # noqa: E402
+
+UPLOAD_HOST = "https://upload.example.com/session/"
+
+
+class FakeGraph(BaseAdapter):
+    """Simple uploads and upload sessions kept in memory."""
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.files = {}
+        self.sessions = {}
+        self.requests = []
+        self.fail_chunks = []  # chunk numbers (1-based, across sessions) answered with 503
+        self.fail_paths = set()
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._chunks = 0
+        self._lock = threading.Lock()
+
+    def _response(self, request, status, body=None):
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body or {}).encode()
+        response.request = request
+        response.url = request.url
+        return response
+
+    def _item(self, path, content):
+        self.files[path] = content
+        return {'id': f"item-{len(self.files)}", 'name': path.rsplit('/', 1)[-1], 'size': len(content),
+                'webUrl': f"https://onedrive.example.com/{path}"}
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.requests.append((request.method, request.url, dict(request.headers)))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency)
+            return self._handle(request)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handle(self, request):
+        url = requests.utils.unquote(request.url)
+        match = re.search(r"/root:/(.+):/(content|createUploadSession)$", url)
+        if match:
+            path, action = match.groups()
+            if path.split('/')[-1] in self.fail_paths:
+                return self._response(request, 400, {'error': 'invalidRequest'})
+            if action == 'content':
+                return self._response(request, 201, self._item(path, request.body))
+            upload_url = f"{UPLOAD_HOST}{len(self.sessions) + 1}"
+            self.sessions[upload_url] = {'path': path, 'data': bytearray()}
+            return self._response(request, 200, {'uploadUrl': upload_url})
+
+        session = self.sessions.get(url)
+        if session is None:
+            return self._response(request, 404)
+        if request.method == 'GET':
+            return self._response(request, 200, {'nextExpectedRanges': [f"{len(session['data'])}-"]})
+        if request.method == 'DELETE':
+            del self.sessions[url]
+            return self._response(request, 204)
+
+        with self._lock:
+            self._chunks += 1
+            number = self._chunks
+        start, end, total = map(int, re.match(r"bytes (\d+)-(\d+)/(\d+)", request.headers['Content-Range']).groups())
+        if number in self.fail_chunks:
+            return self._response(request, 503)
+        if start != len(session['data']):
+            return self._response(request, 416)
+        session['data'] += request.body
+        if len(session['data']) == total:
+            return self._response(request, 201, self._item(session['path'], bytes(session['data'])))
+        return self._response(request, 202, {'nextExpectedRanges': [f"{end + 1}-"]})
+
+    def close(self):
+        pass
+
+
+def _pdf(pages):
+    """Minimal PDF with one line of Helvetica text per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+class TestOneDriveUpload(unittest.TestCase):
+
+    def setUp(self):
+        self.graph = FakeGraph()
+        self.manager = OneDriveDocumentManager('tenant', 'client', 'secret')
+        self.manager.access_token = 'token'
+        self.manager.token_expires_at = time.time() + 3600
+        self.manager.session.mount("https://", self.graph)
+        self.manager.chunk_size = 320 * 1024
+        self.manager.simple_upload_max_bytes = 320 * 1024
+        self.manager.retry_delay = 0
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _file(self, name, size=None, content=None):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(content if content is not None else os.urandom(size))
+        return path
+
+    def _upload(self, path, **fields):
+        args = dict(client_name='Smith, John', policy_number='AUTO12345', carrier='Progressive',
+                    doc_type='correspondence', metadata={})
+        args.update(fields)
+        return self.manager.upload_document(path, **args)
+
+    def test_large_file_uploaded_in_chunks_without_auth_header(self):
+        path = self._file('big.bin', size=1100 * 1024)
+        result = self._upload(path)
+
+        stored = self.graph.files[f"{result['folder_path']}/{result['name']}"]
+        with open(path, 'rb') as f:
+            self.assertEqual(stored, f.read())
+        chunks = [r for r in self.graph.requests if r[1].startswith(UPLOAD_HOST)]
+        self.assertEqual(len(chunks), 4)  # 3 x 320 KiB + 140 KiB
+        self.assertTrue(all('Authorization' not in headers for _, _, headers in chunks))
+        self.assertEqual(result['size'], 1100 * 1024)
+
+    def test_small_file_uses_simple_upload(self):
+        result = self._upload(self._file('small.txt', content=b'hello'))
+        self.assertEqual([r[0] for r in self.graph.requests], ['PUT'])
+        self.assertEqual(self.graph.requests[0][2]['Authorization'], 'Bearer token')
+        self.assertEqual(result['doc_type'], 'correspondence')
+
+    def test_failed_chunk_resumes_from_expected_range(self):
+        self.graph.fail_chunks = [2]
+        path = self._file('big.bin', size=700 * 1024)
+        result = self._upload(path)
+
+        with open(path, 'rb') as f:
+            self.assertEqual(self.graph.files[f"{result['folder_path']}/{result['name']}"], f.read())
+        methods = [r[0] for r in self.graph.requests if r[1].startswith(UPLOAD_HOST)]
+        self.assertEqual(methods, ['PUT', 'PUT', 'GET', 'PUT', 'PUT'])
+
+    def test_upload_documents_concurrently_and_index_in_one_batch(self):
+        self.graph.latency = 0.02
+        documents = [dict(file_path=self._file(f"doc{i}.bin", size=100 * 1024 * (i + 1)), client_name=f"Client {i}",
+                          policy_number=f"POL{i}", carrier='Erie', doc_type='quote') for i in range(6)]
+        self.graph.fail_paths = {'bad.bin'}
+        bad = self._file('bad.bin', content=b'x')
+        documents.append(dict(documents[0], file_path=bad, client_name='Client bad'))
+        self.manager._generate_filename = lambda metadata, doc_type, path: os.path.basename(path)
+        supabase = FakeSupabase()
+
+        results = self.manager.upload_documents(documents, max_workers=3, supabase=supabase,
+                                                agency_id='agency-1', uploaded_by_user_id='user-1')
+
+        self.assertEqual([r.get('name') for r in results[:6]], [f"doc{i}.bin" for i in range(6)])
+        self.assertEqual(results[6]['file_path'], bad)
+        self.assertIn('400', results[6]['error'])
+        self.assertTrue(1 < self.graph.max_in_flight <= 3)
+        self.assertEqual(supabase.calls_to('policy_documents'), [('policy_documents', 'insert')])
+        rows = supabase.tables['policy_documents']
+        self.assertEqual(len(rows), 6)
+        self.assertEqual({r['document_type'] for r in rows}, {'quote'})
+
+    @unittest.skipUnless(onedrive_manager.PYPDF_AVAILABLE, "pypdf not installed")
+    def test_pdf_metadata_reads_first_pages_only(self):
+        path = self._file('dec.pdf', content=_pdf([
+            'Policy Number: ABC1234567', 'Effective Date: 01/15/2026', 'Coverage details',
+            'Coverage details', 'Underwritten by Travelers']))
+        metadata = read_pdf_metadata(path, max_pages=3)
+        self.assertEqual((metadata['policy_number'], metadata['effective_date']), ('ABC1234567', '01/15/2026'))
+        self.assertIsNone(metadata['carrier'])
+        self.assertEqual(read_pdf_metadata(path, max_pages=5)['carrier'], 'Travelers')
+
+    @unittest.skipUnless(onedrive_manager.PYPDF_AVAILABLE, "pypdf not installed")
+    def test_batch_reads_pdf_metadata_in_process_pool(self):
+        documents = [dict(file_path=self._file(f"dec{i}.pdf", content=_pdf([f"Effective Date: 0{i + 1}/01/2026"])),
+                          client_name='Smith, John', policy_number='AUTO12345', carrier='Erie',
+                          doc_type='declaration') for i in range(2)]
+        results = self.manager.upload_documents(documents, max_workers=2, metadata_processes=2)
+        self.assertEqual([r['name'] for r in results], ['01-01-2026_declaration.pdf', '02-01-2026_declaration.pdf'])
+        self.assertEqual(results[1]['metadata']['effective_date'], '02/01/2026')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+Unit tests for benchmarks/perf/headless: commission_app loaded without
+running the Streamlit script, for the hot-path benchmark suite.
+
+Run: python -m pytest test_perf_headless.py
+"""
+import os
+import subprocess
+import sys
+import unittest
+
+import pandas as pd
+
+PERF_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'perf')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PERF_DIR)
+
+from headless import HeadlessStreamlit  # noqa: E402
+
+
+class TestHeadlessStreamlit(unittest.TestCase):
+
+    def test_elements_are_no_ops(self):
+        st = HeadlessStreamlit()
+        left, right = st.columns(2)
+        self.assertEqual(len(st.tabs(['a', 'b', 'c'])), 3)
+        with st.expander("Details"):
+            left.metric("Total", 1)
+            st.dataframe(pd.DataFrame())
+        self.assertFalse(st.button("Save"))
+        st.session_state.page = 'Dashboard'
+        self.assertEqual(st.session_state['page'], 'Dashboard')
+
+
+class TestLoadCommissionApp(unittest.TestCase):
+
+    def test_hot_path_functions_run_headless(self):
+        # Fresh interpreter: other tests replace the streamlit module in this one
+        script = (
+            "import pandas as pd\n"
+            "from headless import HeadlessStreamlit, load_commission_app, use_headless_streamlit\n"
+            "app = load_commission_app()\n"
+            "use_headless_streamlit(app)\n"
+            "assert isinstance(app.st, HeadlessStreamlit)\n"
+            "for name in ('calculate_transaction_balances', 'calculate_dashboard_metrics',\n"
+            "             'match_statement_transactions', 'get_pending_renewals',\n"
+            "             'apply_formula_display', 'find_potential_customer_matches'):\n"
+            "    assert callable(getattr(app, name)), name\n"
+            "print(app.calculate_dashboard_metrics(pd.DataFrame())['total_transactions'])\n"
+        )
+        result = subprocess.run([sys.executable, '-c', script], cwd=PERF_DIR, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        self.assertEqual(result.stdout.strip().splitlines()[-1], '0')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+"""
+Unit tests for utils/policy_terms: term assignment used by the Policy
+Revenue Ledger and Policy Revenue Ledger Reports pages.
+
+Run: python -m pytest test_policy_terms.py
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.policy_terms import PolicyTermIndex, term_subtotals  # noqa: E402
+
+
+def _ledger():
+    rows = [
+        # Transaction ID, Policy Number, Transaction Type, Effective Date, X-DATE, Total Agent Comm
+        ('N1', 'P1', 'NEW', '2024-01-01', '2025-01-01', 100.0),
+        ('E1', 'P1', 'END', '2024-06-15', None, 20.0),
+        ('S1-STMT-01', 'P1', 'NEW', '2024-08-01', None, -60.0),
+        ('R1', 'P1 ', 'RWL', '2025-01-01', '2026-01-01', 110.0),
+        ('E2', 'P1', 'END', '2025-01-01', None, 5.0),   # On the renewal date -> new term
+        ('C1', 'P1', 'CAN', '2025-01-01', None, -10.0),  # CAN on the X-DATE -> expiring term
+        ('O1', 'P1', 'END', '2023-05-01', None, 7.0),   # Before any term -> orphan
+        ('V1-VOID-02', 'P1', 'RWL', '2025-03-01', '2026-01-01', -5.0),
+        ('Q1', 'P2', 'END', '2024-02-01', None, 3.0),
+        ('N2', 'P3', 'NEW', '2024-02-10', None, 9.0),   # No X-DATE -> no term
+    ]
+    df = pd.DataFrame(rows, columns=['Transaction ID', 'Policy Number', 'Transaction Type',
+                                     'Effective Date', 'X-DATE', 'Total Agent Comm'])
+    df.index = df.index * 10 + 5  # Non-default labels
+    return df
+
+
+class TestPolicyTermIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.data = _ledger()
+        self.index = PolicyTermIndex(self.data)
+        self.terms = dict(zip(self.data['Transaction ID'], self.index.term_ids))
+
+    def test_terms_from_new_and_renewal_rows(self):
+        self.assertEqual(self.index.terms['term_id'].tolist(), ['P1 - Term 1', 'P1 - Term 2'])
+        self.assertEqual(self.index.terms['term_dates'].tolist(),
+                         ['01/01/2024 to 01/01/2025', '01/01/2025 to 01/01/2026'])
+
+    def test_interval_assignment(self):
+        self.assertEqual(self.terms['N1'], 'P1 - Term 1')
+        self.assertEqual(self.terms['E1'], 'P1 - Term 1')
+        self.assertEqual(self.terms['S1-STMT-01'], 'P1 - Term 1')
+        self.assertEqual(self.terms['R1'], 'P1 - Term 2')
+        self.assertEqual(self.terms['E2'], 'P1 - Term 2')
+        self.assertEqual(self.terms['C1'], 'P1 - Term 1')
+        self.assertEqual(self.terms['V1-VOID-02'], 'P1 - Term 2')
+        self.assertIsNone(self.terms['O1'])
+
+    def test_policies_without_terms_are_one_group(self):
+        self.assertEqual(self.terms['Q1'], 'P2 - All Transactions')
+        self.assertEqual(self.terms['N2'], 'P3 - All Transactions')
+
+    def test_month_mask(self):
+        selected = self.data.loc[self.index.month_mask('2024-01'), 'Transaction ID'].tolist()
+        self.assertEqual(selected, ['N1', 'E1', 'S1-STMT-01', 'C1'])
+        # A NEW without an X-DATE still shows in its own month
+        self.assertEqual(self.data.loc[self.index.month_mask('2024-02'), 'Transaction ID'].tolist(), ['N2'])
+
+    def test_annotate_subset_and_subtotals(self):
+        page = self.data.iloc[:6]
+        annotated = self.index.annotate(page)
+        self.assertEqual(annotated['_term_group'].tolist()[:2], ['P1 - Term 1', 'P1 - Term 1'])
+        totals = term_subtotals(annotated, ['Total Agent Comm', 'Missing'])
+        self.assertEqual(totals.loc['P1 - Term 1', 'count'], 4)
+        self.assertAlmostEqual(totals.loc['P1 - Term 1', 'Total Agent Comm'], 50.0)
+        self.assertAlmostEqual(totals.loc['P1 - Term 2', 'Total Agent Comm'], 115.0)
+        self.assertEqual(totals['Missing'].sum(), 0)
+
+    def test_ordered_term_ids_and_x_date_lookup(self):
+        self.assertEqual(self.index.ordered_term_ids(),
+                         ['P1 - Term 1', 'P1 - Term 2', 'P2 - All Transactions', 'P3 - All Transactions'])
+        self.assertEqual(self.index.terms_for_x_date('2026-01-01', 'P1')['term_id'].tolist(), ['P1 - Term 2'])
+
+    def test_blank_policy_numbers_do_not_break_term_numbers(self):
+        data = pd.concat([self.data, pd.DataFrame({
+            'Transaction ID': ['B1', 'B2'], 'Policy Number': [None, ' '], 'Transaction Type': ['NEW', 'NEW'],
+            'Effective Date': ['2024-03-01', '2024-04-01'], 'X-DATE': ['2025-03-01', '2025-04-01'],
+        })])
+        index = PolicyTermIndex(data)
+        self.assertEqual(index.terms['term_id'].tolist(), ['P1 - Term 1', 'P1 - Term 2'])
+        self.assertEqual(index.terms['term_number'].tolist(), [1, 2])
+        self.assertEqual(index.term_ids.tolist()[:len(self.data)], self.index.term_ids.tolist())
+        self.assertEqual(index.term_ids.tolist()[-2:], [None, None])
+
+    def test_matches_per_term_scan_on_random_ledger(self):
+        rng = np.random.default_rng(7)
+        rows = []
+        for p in range(40):
+            start = pd.Timestamp('2022-01-01') + pd.Timedelta(days=int(rng.integers(0, 365)))
+            for t in range(3):
+                eff = start + pd.DateOffset(years=t)
+                rows.append((f'P{p}-T{t}', f'P{p}', 'NEW' if t == 0 else 'RWL', eff, eff + pd.DateOffset(years=1)))
+            for i in range(10):
+                eff = start + pd.Timedelta(days=int(rng.integers(-30, 3 * 365 + 30)))
+                rows.append((f'P{p}-E{i}', f'P{p}', 'END', eff, pd.NaT))
+        data = pd.DataFrame(rows, columns=['Transaction ID', 'Policy Number', 'Transaction Type', 'Effective Date', 'X-DATE'])
+        index = PolicyTermIndex(data)
+
+        # Reference: scan every term of the policy
+        terms = data[data['X-DATE'].notna()]
+        for pos, row in data[data['Transaction Type'] == 'END'].iterrows():
+            policy_terms = terms[terms['Policy Number'] == row['Policy Number']].reset_index(drop=True)
+            inside = policy_terms[(policy_terms['Effective Date'] <= row['Effective Date'])
+                                  & (row['Effective Date'] < policy_terms['X-DATE'])]
+            expected = f"{row['Policy Number']} - Term {inside.index[-1] + 1}" if len(inside) else None
+            self.assertEqual(index.term_ids[pos], expected, row['Transaction ID'])
+
+
+if __name__ == '__main__':
+    unittest.main()
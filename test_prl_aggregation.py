@@ -0,0 +1,152 @@
+"""
+Unit tests for utils/prl_aggregation: cached "Aggregated by Policy" view of
+Policy Revenue Ledger Reports.
+
+Run: python -m pytest test_prl_aggregation.py
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import prl_aggregation  # noqa: E402
+from utils.prl_aggregation import (  # noqa: E402
+    AggregatedPolicyCache,
+    aggregate_policies,
+    get_aggregated_policies,
+    invalidate_aggregated_policies,
+    policies_write_version,
+    resolve_aggregation_plan,
+)
+
+
+def _ledger(n_policies=50, per_policy=4):
+    rng = np.random.default_rng(3)
+    n = n_policies * per_policy
+    return pd.DataFrame({
+        'Transaction ID': [f"T{i}" for i in range(n)],
+        'Policy Number': [f"P{i % n_policies} " for i in range(n)],  # Trailing spaces are stripped
+        'Customer': [f"Customer {(i % n_policies) // 3}" for i in range(n)],
+        'Transaction Type': ['NEW'] * n,
+        'Premium Sold': rng.integers(100, 1000, n).astype(float),
+        'Total Agent Comm': [str(v) for v in rng.integers(1, 100, n)],  # Coerced to numbers
+        'Agent Paid Amount (STMT)': [None if i % 5 else 10.0 for i in range(n)],
+        'Agent Comm %': [50.0] * n,
+    })
+
+
+def _identity(field):
+    return field
+
+
+class TestAggregationPlan(unittest.TestCase):
+
+    def test_plan_uses_mapping_and_present_columns(self):
+        plan = resolve_aggregation_plan(['Policy Number', 'Client Name', 'Premium Sold', 'Agent Comm %'],
+                                        {'Customer': 'Client Name'}.get)
+        self.assertEqual(plan, {'Client Name': 'first', 'Premium Sold': 'sum', 'Agent Comm %': 'first'})
+
+    def test_aggregate_matches_groupby(self):
+        data = _ledger()
+        plan = resolve_aggregation_plan(data.columns, _identity)
+        result = aggregate_policies(data, plan)
+        self.assertEqual(len(result), 50)
+        p0 = data[data['Policy Number'] == 'P0 ']
+        row = result[result['Policy Number'] == 'P0'].iloc[0]
+        self.assertEqual(row['Premium Sold'], p0['Premium Sold'].sum())
+        self.assertEqual(row['Total Agent Comm'], p0['Total Agent Comm'].astype(float).sum())
+        self.assertEqual(row['Transaction ID'], 'T0')
+        self.assertEqual(result['Customer'].tolist(), sorted(result['Customer']))
+
+
+class TestAggregatedPolicyCache(unittest.TestCase):
+
+    def setUp(self):
+        self.data = _ledger()
+        self.cache = AggregatedPolicyCache()
+        self.plan = self.cache.plan_for(self.data.columns, _identity, 'm1')
+
+    def test_reruns_with_unchanged_data_hit_the_cache(self):
+        first = self.cache.get(self.data, self.plan, 'm1')
+        self.assertEqual(self.cache.last_stats['mode'], 'full')
+        first['Policy Balance Due'] = 0  # Callers get a copy
+        again = self.cache.get(self.data.copy(), self.plan, 'm1')
+        self.assertEqual(self.cache.last_stats, {'mode': 'hit', 'recomputed_policies': 0})
+        self.assertNotIn('Policy Balance Due', again.columns)
+
+    def test_only_changed_policies_are_recomputed(self):
+        self.cache.get(self.data, self.plan, 'm1')
+        edited = self.data.copy()
+        edited.loc[0, 'Premium Sold'] = 1.0                      # P0 edited
+        edited = edited[edited['Policy Number'] != 'P1 ']        # P1 deleted
+        extra = edited.iloc[[0]].assign(**{'Transaction ID': 'NEW-1', 'Policy Number': 'P999'})
+        edited = pd.concat([edited, extra], ignore_index=True)   # P999 added
+
+        result = self.cache.get(edited, self.plan, 'm1')
+
+        self.assertEqual(self.cache.last_stats, {'mode': 'incremental', 'recomputed_policies': 2})
+        pd.testing.assert_frame_equal(result, aggregate_policies(edited, self.plan))
+
+    def test_row_order_within_policy_changes_first_values(self):
+        self.cache.get(self.data, self.plan, 'm1')
+        reordered = self.data.iloc[::-1]
+        result = self.cache.get(reordered, self.plan, 'm1')
+        self.assertEqual(self.cache.last_stats['recomputed_policies'], 50)
+        pd.testing.assert_frame_equal(result, aggregate_policies(reordered, self.plan))
+
+    def test_mapping_version_change_forces_full_recompute(self):
+        self.cache.get(self.data, self.plan, 'm1')
+        self.cache.get(self.data, self.plan, 'm2')
+        self.assertEqual(self.cache.last_stats['mode'], 'full')
+
+    def test_unchanged_write_version_skips_row_hashing(self):
+        self.cache.get(self.data, self.plan, 'm1', write_version=policies_write_version())
+        with mock.patch.object(prl_aggregation, '_row_hashes', wraps=prl_aggregation._row_hashes) as hashes:
+            self.cache.get(self.data.copy(), self.plan, 'm1', write_version=policies_write_version())
+            self.assertEqual(hashes.call_count, 0)
+            self.assertEqual(self.cache.last_stats['mode'], 'hit')
+
+            edited = self.data.copy()
+            edited.loc[0, 'Premium Sold'] = 1.0
+            invalidate_aggregated_policies()  # what clear_policies_cache() does after a save
+            result = self.cache.get(edited, self.plan, 'm1', write_version=policies_write_version())
+            self.assertEqual(hashes.call_count, 1)
+        self.assertEqual(self.cache.last_stats, {'mode': 'incremental', 'recomputed_policies': 1})
+        pd.testing.assert_frame_equal(result, aggregate_policies(edited, self.plan))
+
+    def test_rows_are_hashed_again_after_revalidate_interval_or_shape_change(self):
+        version = policies_write_version()
+        self.cache.get(self.data, self.plan, 'm1', write_version=version)
+        self.cache.get(self.data.iloc[:-1], self.plan, 'm1', write_version=version)
+        self.assertEqual(self.cache.last_stats['mode'], 'incremental')
+
+        edited = self.data.iloc[:-1].copy()
+        edited.loc[0, 'Premium Sold'] = 1.0  # written elsewhere - no version bump
+        with mock.patch.object(prl_aggregation, 'REVALIDATE_SECONDS', 0):
+            result = self.cache.get(edited, self.plan, 'm1', write_version=version)
+        self.assertEqual(self.cache.last_stats, {'mode': 'incremental', 'recomputed_policies': 1})
+        pd.testing.assert_frame_equal(result, aggregate_policies(edited, self.plan))
+
+    def test_session_helper_resolves_plan_once_per_mapping(self):
+        calls = []
+
+        def mapper(field):
+            calls.append(field)
+            return field
+
+        session = {}
+        get_aggregated_policies(session, 'u@x.com_prl_aggregated_cache', self.data, mapper, 'm1')
+        resolved = len(calls)
+        get_aggregated_policies(session, 'u@x.com_prl_aggregated_cache', self.data, mapper, 'm1')
+        self.assertEqual(len(calls), resolved)
+        get_aggregated_policies(session, 'u@x.com_prl_aggregated_cache', self.data, mapper, 'm2')
+        self.assertEqual(len(calls), resolved * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+Unit tests for utils/render_profiler: per-rerun page timings, Supabase
+request counts and the per-page history behind the render profile panel.
+
+Run: python -m pytest test_render_profiler.py
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import render_profiler  # noqa: E402
+from utils.render_profiler import profiled, span  # noqa: E402
+
+
+def _supabase_client():
+    rows = json.dumps([{'Transaction ID': 'T1'}] * 10).encode()
+
+    def handler(request):
+        return httpx.Response(200, content=rows if request.url.path.startswith('/rest/v1') else b'{}')
+    return httpx.Client(base_url='https://example.supabase.co', transport=httpx.MockTransport(handler))
+
+
+@profiled('data load')
+def load_policies(client):
+    return client.get('/rest/v1/policies').json()
+
+
+class TestRenderProfiler(unittest.TestCase):
+
+    def setUp(self):
+        self.state = {render_profiler.STATE_ENABLED: True}
+        self.addCleanup(render_profiler.end_page)
+
+    def test_disabled_profiler_records_nothing(self):
+        state = {}
+        with mock.patch.dict(os.environ, {'AMS_RENDER_PROFILE': ''}):
+            self.assertIsNone(render_profiler.begin_page('Dashboard', state))
+            with span('metrics', 'transform'):
+                pass
+            self.assertEqual(load_policies(_supabase_client())[0]['Transaction ID'], 'T1')
+            self.assertIsNone(render_profiler.end_page())
+        self.assertEqual(state, {})
+
+    def test_spans_nest_and_count_supabase_traffic(self):
+        client = _supabase_client()
+        render_profiler.begin_page('Reports', self.state)
+        load_policies(client)
+        with span('balances', 'transform'):
+            client.get('/rest/v1/policies')
+            client.get('/health')  # not a Supabase API call
+        sample = render_profiler.end_page()
+
+        names = [(s['name'], s['category'], s['depth']) for s in sample['spans']]
+        self.assertEqual(names, [('Reports', 'page', 0), ('load_policies', 'data load', 1),
+                                 ('balances', 'transform', 1)])
+        page, load, balances = sample['spans']
+        self.assertEqual((sample['supabase_calls'], load['supabase_calls'], balances['supabase_calls']), (2, 1, 1))
+        self.assertEqual(sample['supabase_bytes'], load['supabase_bytes'] * 2)
+        self.assertGreaterEqual(page['ms'], load['ms'] + balances['ms'])
+        self.assertTrue(sample['completed'])
+
+    def test_history_is_bounded_per_page(self):
+        for _ in range(render_profiler.HISTORY_SIZE + 5):
+            render_profiler.begin_page('Dashboard', self.state)
+            render_profiler.end_page()
+        render_profiler.begin_page('Reports', self.state)
+        render_profiler.begin_page('Reports', self.state)  # st.rerun() before the first one ended
+        render_profiler.end_page()
+
+        self.assertEqual(len(render_profiler.page_history(self.state, 'Dashboard')), render_profiler.HISTORY_SIZE)
+        reports = render_profiler.page_history(self.state, 'Reports')
+        self.assertEqual([sample['completed'] for sample in reports], [False, True])
+        summary = {row['Page']: row for row in render_profiler.summarize_history(self.state)}
+        self.assertEqual((summary['Dashboard']['Renders'], summary['Reports']['Renders']),
+                         (render_profiler.HISTORY_SIZE, 2))
+
+    def test_samples_logged_as_jsonl_and_flame_rows(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'renders.jsonl')
+            with mock.patch.dict(os.environ, {'AMS_RENDER_PROFILE_LOG': log_path}):
+                render_profiler.begin_page('Dashboard', self.state)
+                with span('outer'):
+                    with span('inner', 'editor'):
+                        pass
+                render_profiler.end_page()
+            with open(log_path) as f:
+                logged = [json.loads(line) for line in f]
+
+        self.assertEqual([sample['page'] for sample in logged], ['Dashboard'])
+        flame = render_profiler.flame_rows(logged[0])
+        self.assertEqual(flame['parents'], ['', '0', '1'])
+        self.assertEqual(flame['categories'], ['page', 'other', 'editor'])
+        self.assertTrue(flame['values'][0] >= flame['values'][1] >= flame['values'][2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""
+Unit tests for the set-based renewal notification job
+(utils.agent_data_helpers.run_renewal_notification_job).
+
+Run: python -m pytest test_renewal_notifications.py
+"""
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSupabase  # noqa: E402
+from utils.agent_data_helpers import (  # noqa: E402
+    _next_anniversary,
+    generate_renewal_due_notifications,
+    run_renewal_notification_job,
+)
+
+TODAY = '2026-03-10'
+
+
+def _policy(pid, agent_id, number, effective, status='active'):
+    return {'id': pid, 'agent_id': agent_id, 'policy_number': number,
+            'insured_name': f"Insured {number}", 'effective_date': effective, 'status': status}
+
+
+def _client():
+    return FakeSupabase({
+        'agents': [
+            {'id': 'a1', 'is_active': True},
+            {'id': 'a2', 'is_active': True},
+            {'id': 'a3', 'is_active': False},
+        ],
+        'policies': [
+            _policy('p1', 'a1', 'AUTO-1', '2024-03-12'),   # due in 2 days -> critical
+            _policy('p2', 'a1', 'HOME-1', '2025-03-16'),   # due in 6 days -> high
+            _policy('p3', 'a2', 'GL-1', '2023-04-20'),     # outside window
+            _policy('p4', 'a2', 'GL-2', '2026-03-10'),     # effective today -> next year
+            _policy('p5', 'a2', 'GL-3', '2025-03-11', status='cancelled'),
+            _policy('p6', 'a3', 'GL-4', '2025-03-11'),     # inactive agent
+            _policy('p7', 'a2', 'WC-1', '2025-03-14'),     # already notified
+        ],
+        'agent_notifications': [
+            {'id': 'n1', 'agent_id': 'a2', 'notification_type': 'renewal_due', 'read': False,
+             'message': 'Policy WC-1 for Insured WC-1 is due for renewal on Mar 14, 2026'},
+            {'id': 'n2', 'agent_id': 'a1', 'notification_type': 'renewal_due', 'read': True,
+             'message': 'Policy AUTO-1 for Insured AUTO-1 is due for renewal on Mar 12, 2025'},
+        ],
+    })
+
+
+class TestNextAnniversary(unittest.TestCase):
+
+    def test_anniversary_rules(self):
+        today = pd.Timestamp(TODAY)
+        dates = pd.to_datetime(pd.Series(['2020-03-11', '2020-03-10', '2020-03-09', '2026-04-01', '2024-02-29']))
+        result = _next_anniversary(dates, today).dt.strftime('%Y-%m-%d').tolist()
+        self.assertEqual(result, ['2026-03-11', '2027-03-10', '2027-03-09', '2026-04-01', '2027-02-28'])
+
+
+class TestRenewalNotificationJob(unittest.TestCase):
+
+    def test_creates_only_new_notifications_in_bulk(self):
+        supabase = _client()
+        stats = run_renewal_notification_job(days_threshold=7, supabase=supabase, today=TODAY)
+
+        self.assertEqual(stats['due_in_window'], 3)
+        self.assertEqual(stats['already_notified'], 1)
+        self.assertEqual(stats['notifications_created'], 2)
+        self.assertGreater(stats['rows_per_second'], 0)
+
+        by_number = {n['message'].split()[1]: n for n in stats['notifications']}
+        self.assertEqual(by_number['AUTO-1']['priority'], 'critical')
+        self.assertEqual(by_number['AUTO-1']['title'], 'Renewal Due in 2 Days')
+        self.assertEqual(by_number['HOME-1']['priority'], 'high')
+        self.assertEqual(by_number['HOME-1']['action_url'], '/my-policies?policy_id=p2')
+        self.assertIn('Mar 16, 2026', by_number['HOME-1']['message'])
+
+        # One insert round trip for the whole batch
+        self.assertEqual(len(supabase.calls_to('agent_notifications', 'insert')), 1)
+        self.assertEqual(len(supabase.tables['agent_notifications']), 4)
+
+    def test_second_run_is_idempotent(self):
+        supabase = _client()
+        run_renewal_notification_job(days_threshold=7, supabase=supabase, today=TODAY)
+        stats = run_renewal_notification_job(days_threshold=7, supabase=supabase, today=TODAY)
+        self.assertEqual(stats['notifications_created'], 0)
+        self.assertEqual(stats['already_notified'], 3)
+
+    def test_dry_run_does_not_insert(self):
+        supabase = _client()
+        stats = run_renewal_notification_job(days_threshold=7, supabase=supabase, dry_run=True, today=TODAY)
+        self.assertEqual(stats['notifications_created'], 2)
+        self.assertEqual(len(supabase.calls_to('agent_notifications', 'insert')), 0)
+        self.assertEqual(len(supabase.tables['agent_notifications']), 2)
+
+    def test_legacy_wrapper_returns_count(self):
+        supabase = _client()
+        supabase.tables['policies'] = [_policy('p9', 'a1', 'X-9', '2000-01-01')]
+        self.assertEqual(generate_renewal_due_notifications(7, supabase), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Unit tests for utils/renewal_pipeline: latest-term table, urgency buckets
+and caching shared by Pending Policy Renewals and the agent portal.
+
+Run: python -m pytest test_renewal_pipeline.py
+"""
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.renewal_pipeline import (  # noqa: E402
+    RenewalPipeline,
+    RenewalPipelineCache,
+    bucket_counts,
+    build_latest_terms,
+    urgency_levels,
+)
+
+TODAY = pd.Timestamp('2025-06-01')
+
+
+def _ledger():
+    rows = [
+        # Transaction ID, Policy Number, Transaction Type, Effective Date, X-DATE, Prior Policy Number
+        ('A1', 'PA', 'NEW', '2024-06-10', '2025-06-10', None),
+        ('A2', 'PA', 'RWL', '2025-06-10', '2026-06-10', None),    # Latest term of PA
+        ('A3-STMT-01', 'PA', 'RWL', '2025-07-01', '2027-01-01', None),  # Never a term
+        ('B1', 'PB', 'NEW', '2024-05-20', '2025-05-20', None),    # Past due
+        ('C1', 'PC', 'NEW', '2024-06-03', '2025-06-03', None),    # Renewed by PD
+        ('D1', 'PD', 'REWRITE', '2025-06-03', '2026-06-03', ' PC '),
+        ('E1', 'PE', 'NEW', '2024-07-01', '2025-07-01', None),
+        ('E2', 'PE', 'CAN', '2024-09-01', None, None),             # Cancelled
+        ('F1', 'PF', 'NEW', '2024-08-01', '2025-08-01', None),
+        ('F2', 'PF', 'CAN', '2024-09-01', None, None),
+        ('F3', 'PF', 'REI', '2024-09-15', None, None),             # Reinstated
+        ('G1', 'PG', 'END', '2024-06-05', '2025-06-05', None),     # No term transaction
+        ('H1', 'PH', 'NEW', '2024-01-01', None, None),             # No X-DATE
+    ]
+    df = pd.DataFrame(rows, columns=['Transaction ID', 'Policy Number', 'Transaction Type',
+                                     'Effective Date', 'X-DATE', 'Prior Policy Number'])
+    df.index = df.index + 100
+    return df
+
+
+class TestLatestTerms(unittest.TestCase):
+
+    def test_latest_term_per_policy_with_exclusions(self):
+        latest = build_latest_terms(_ledger())
+        self.assertEqual(latest['Transaction ID'].tolist(), ['A2', 'B1', 'D1', 'F1', 'H1'])
+        self.assertEqual(latest.index.tolist(), [101, 103, 105, 108, 112])
+        self.assertEqual(latest.attrs['stats'], {'term_rows': 8, 'policies': 7, 'renewed_excluded': 1,
+                                                 'cancelled_excluded': 1, 'latest_terms': 5})
+
+    def test_pending_windows(self):
+        pipeline = RenewalPipeline.from_ledger(_ledger())
+        pending = pipeline.pending(days_ahead=365, today=TODAY)
+        self.assertEqual(pending['Transaction ID'].tolist(), ['B1', 'F1'])
+        self.assertEqual(pending['Days Until Expiration'].tolist(), [-12, 61])
+        longer = pipeline.pending(days_ahead=400, today=TODAY)
+        self.assertEqual(longer['Transaction ID'].tolist(), ['B1', 'F1', 'D1', 'A2'])
+        upcoming = pipeline.pending(days_ahead=90, include_past_due=False, today=TODAY)
+        self.assertEqual(upcoming['Transaction ID'].tolist(), ['F1'])
+
+    def test_effective_date_fallback_without_x_date_column(self):
+        data = _ledger().drop(columns='X-DATE')
+        latest = build_latest_terms(data)
+        self.assertEqual(latest.set_index('Transaction ID').loc['B1', 'expiration_date'], pd.Timestamp('2025-05-20'))
+
+    def test_mapped_columns(self):
+        data = _ledger().rename(columns={'Transaction Type': 'Type', 'X-DATE': 'Expires'})
+        columns = {'policy': 'Policy Number', 'type': 'Type', 'id': 'Transaction ID',
+                   'effective': 'Effective Date', 'x_date': 'Expires', 'prior': 'Prior Policy Number'}
+        latest = build_latest_terms(data, columns)
+        self.assertEqual(latest['Transaction ID'].tolist(), ['A2', 'B1', 'D1', 'F1', 'H1'])
+
+
+class TestBuckets(unittest.TestCase):
+
+    def test_urgency_and_counts(self):
+        days = pd.Series([-3, 0, 7, 8, 30, 45, 61, 90, 200])
+        self.assertEqual(urgency_levels(days).tolist(),
+                         ['past_due', 'critical', 'critical', 'high', 'high', 'medium', 'low', 'low', 'low'])
+        counts = bucket_counts(days)
+        self.assertEqual((counts['past_due'], counts['due_7_days'], counts['due_30_days'],
+                          counts['due_60_days'], counts['due_90_days']), (1, 2, 4, 5, 7))
+        self.assertEqual(counts['by_urgency'], {'past_due': 1, 'critical': 2, 'high': 2, 'medium': 1, 'low': 3})
+
+    def test_summary_totals(self):
+        data = _ledger()
+        data['Premium'] = 100.0
+        pipeline = RenewalPipeline.from_ledger(data)
+        pending = pipeline.pending(today=TODAY)
+        summary = pipeline.summary(pending, premium_col='Premium', commission_col='Missing')
+        self.assertEqual(summary['premium_at_risk'], 200.0)
+        self.assertEqual(summary['commission_at_risk'], 0.0)
+
+
+class TestRenewalPipelineCache(unittest.TestCase):
+
+    def test_rebuilds_only_when_data_changes(self):
+        cache = RenewalPipelineCache()
+        data = _ledger()
+        first = cache.get('u@x.com_renewal_pipeline', data)
+        self.assertIs(cache.get('u@x.com_renewal_pipeline', data.copy()), first)
+        edited = data.copy()
+        edited.loc[104, 'Transaction Type'] = 'CAN'
+        self.assertIsNot(cache.get('u@x.com_renewal_pipeline', edited), first)
+        self.assertEqual(cache.stats['builds'], 2)
+
+    def test_loaded_scopes_until_invalidated(self):
+        cache = RenewalPipelineCache()
+        loads = []
+
+        def load():
+            loads.append(1)
+            return _ledger()
+
+        cache.get_or_load('agent:1:', load)
+        cache.get_or_load('agent:1:', load)
+        self.assertEqual(len(loads), 1)
+        cache.invalidate()
+        cache.get_or_load('agent:1:', load)
+        self.assertEqual(len(loads), 2)
+        cache.get_or_load('agent:1:', load, ttl_seconds=0)
+        self.assertEqual(len(loads), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
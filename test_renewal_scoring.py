@@ -0,0 +1,211 @@
+"""
+Unit tests for the batch renewal training/scoring pipeline in utils/ml_models.
+
+Runs without Supabase, against the in-memory client in fake_supabase.py.
+
+Run: python -m pytest test_renewal_scoring.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.ml_models import (  # noqa: E402
+    RenewalPredictor,
+    build_renewal_training_data,
+    iter_policy_chunks,
+    score_all_policies_for_renewal,
+    train_renewal_model_from_database,
+)
+from utils import ml_models  # noqa: E402
+from utils.model_registry import ModelRegistry  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# Synthetic ledger with Prior Policy Number chains
+# ---------------------------------------------------------------------------
+def _build_ledger(n_policies=240, seed=3):
+    rng = np.random.default_rng(seed)
+    today = datetime.now()
+    rows = []
+    for i in range(n_policies):
+        carrier = ['Progressive', 'Citizens', 'Travelers'][i % 3]
+        policy_type = ['AUTO', 'HOME', 'GL'][i % 3]
+        premium = float(rng.uniform(500, 5000))
+        start = today - timedelta(days=int(rng.integers(400, 900)))
+        expiry = start + timedelta(days=365)
+        number = f"P{i:05d}"
+        rows.append({
+            'Transaction ID': f"T{i:05d}A", 'Transaction Type': 'NEW',
+            'Policy Number': number, 'Prior Policy Number': None,
+            'Customer': f"Client {i}", 'Carrier Name': carrier, 'Policy Type': policy_type,
+            'Premium Sold': premium, 'Effective Date': start.strftime('%Y-%m-%d'),
+            'X-DATE': expiry.strftime('%Y-%m-%d'), 'agent_id': 'agent-1'
+        })
+        # Reconciliation rows must never be treated as terms
+        rows.append({
+            'Transaction ID': f"T{i:05d}A-STMT-20250101", 'Transaction Type': 'NEW',
+            'Policy Number': number, 'Prior Policy Number': None,
+            'Customer': f"Client {i}", 'Carrier Name': carrier, 'Policy Type': policy_type,
+            'Premium Sold': 0, 'Effective Date': start.strftime('%Y-%m-%d'),
+            'X-DATE': expiry.strftime('%Y-%m-%d'), 'agent_id': 'agent-1'
+        })
+        if premium > 1800:
+            # Renewed under a new policy number
+            rows.append({
+                'Transaction ID': f"T{i:05d}B", 'Transaction Type': 'RWL',
+                'Policy Number': f"{number}-R", 'Prior Policy Number': number,
+                'Customer': f"Client {i}", 'Carrier Name': carrier, 'Policy Type': policy_type,
+                'Premium Sold': premium * 1.05, 'Effective Date': expiry.strftime('%Y-%m-%d'),
+                'X-DATE': (expiry + timedelta(days=365)).strftime('%Y-%m-%d'), 'agent_id': 'agent-1'
+            })
+    return rows
+
+
+class TestTrainingLabels(unittest.TestCase):
+
+    def test_labels_follow_prior_policy_chain(self):
+        ledger = pd.DataFrame(_build_ledger(30))
+        training = build_renewal_training_data(ledger)
+
+        self.assertFalse(training['transaction_id'].str.contains('-STMT-').any())
+        renewed_numbers = set(ledger['Prior Policy Number'].dropna())
+        expected = training['policy_number'].isin(renewed_numbers).astype(int)
+        self.assertListEqual(training['renewed'].tolist(), expected.tolist())
+
+    def test_renewal_under_same_number_is_labeled(self):
+        today = datetime.now()
+        ledger = pd.DataFrame([
+            {'Transaction ID': 'A', 'Transaction Type': 'NEW', 'Policy Number': 'X1',
+             'Effective Date': (today - timedelta(days=800)).strftime('%Y-%m-%d'),
+             'X-DATE': (today - timedelta(days=435)).strftime('%Y-%m-%d'), 'Premium Sold': 100},
+            {'Transaction ID': 'B', 'Transaction Type': 'RWL', 'Policy Number': 'X1',
+             'Effective Date': (today - timedelta(days=435)).strftime('%Y-%m-%d'),
+             'X-DATE': (today - timedelta(days=70)).strftime('%Y-%m-%d'), 'Premium Sold': 100},
+        ])
+        training = build_renewal_training_data(ledger).set_index('transaction_id')
+        self.assertEqual(training.loc['A', 'renewed'], 1)
+        self.assertEqual(training.loc['B', 'renewed'], 0)
+
+
+class TestEncoders(unittest.TestCase):
+
+    def test_encoders_fitted_once_and_unseen_labels_do_not_raise(self):
+        predictor = RenewalPredictor()
+        train = pd.DataFrame({
+            'expiration_date': ['2026-01-01', '2026-02-01'], 'effective_date': ['2025-01-01', '2025-02-01'],
+            'premium': [100, 200], 'policy_type': ['AUTO', 'HOME'], 'carrier': ['A', 'B']
+        })
+        predictor.prepare_features(train, fit_encoders=True)
+        classes_before = list(predictor.label_encoders['carrier'].classes_)
+
+        score = train.assign(carrier=['B', 'Brand New Carrier'])
+        features = predictor.prepare_features(score)
+
+        self.assertEqual(list(predictor.label_encoders['carrier'].classes_), classes_before)
+        self.assertListEqual(features['carrier_encoded'].tolist(), [1, -1])
+
+
+class TestBatchPipeline(unittest.TestCase):
+
+    def test_iter_policy_chunks_never_splits_a_policy(self):
+        supabase = FakeSupabase({'policies': _build_ledger(40)})
+        seen = []
+        for chunk in iter_policy_chunks(supabase, chunk_size=7):
+            seen.append(set(chunk['Policy Number']))
+        for i, numbers in enumerate(seen):
+            for other in seen[i + 1:]:
+                self.assertFalse(numbers & other)
+        self.assertEqual(sum(len(s) for s in seen), len({r['Policy Number'] for r in _build_ledger(40)}))
+
+    def test_chunk_size_above_the_row_cap_still_reads_every_page(self):
+        ledger = _build_ledger(40)
+        supabase = FakeSupabase({'policies': ledger}, max_rows=7)
+        with mock.patch.object(ml_models, 'SCORING_CHUNK_SIZE', 7):
+            chunks = list(iter_policy_chunks(supabase, chunk_size=100))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), len(ledger))
+
+    def test_train_then_score_writes_versioned_scores(self):
+        ledger = _build_ledger()
+        today = datetime.now()
+        # Active terms to score (expire in the future, not renewed yet)
+        for i in range(25):
+            ledger.append({
+                'Transaction ID': f"ACT{i:03d}", 'Transaction Type': 'NEW',
+                'Policy Number': f"ACTIVE{i:03d}", 'Prior Policy Number': None,
+                'Customer': f"Active {i}", 'Carrier Name': 'Progressive', 'Policy Type': 'AUTO',
+                'Premium Sold': 1000 + i * 100,
+                'Effective Date': (today - timedelta(days=300)).strftime('%Y-%m-%d'),
+                'X-DATE': (today + timedelta(days=65)).strftime('%Y-%m-%d'), 'agent_id': 'agent-1'
+            })
+        supabase = FakeSupabase({'policies': ledger})
+
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, 'renewal_model.pkl')
+            metrics = train_renewal_model_from_database(supabase, model_path,
+                                                        registry=ModelRegistry(os.path.join(tmp, 'registry')))
+            self.assertEqual(metrics['status'], 'trained')
+            self.assertTrue(metrics['model_version'].startswith('renewal-'))
+
+            scores = score_all_policies_for_renewal(supabase, agent_id='agent-1',
+                                                    model_path=model_path, chunk_size=50)
+
+        self.assertEqual(len(scores), 25 + sum(1 for r in ledger if r['Transaction Type'] == 'RWL'
+                                               and pd.Timestamp(r['X-DATE']) >= pd.Timestamp(today.date())))
+        self.assertTrue(scores['renewal_probability'].between(0, 1).all())
+        self.assertTrue((scores['model_version'] == metrics['model_version']).all())
+        self.assertEqual(len(supabase.tables['renewal_scores']), len(scores))
+
+    def test_prior_policy_numbers_paged_past_row_cap(self):
+        today = datetime.now()
+        supabase = FakeSupabase({'policies': _build_ledger()})
+        with tempfile.TemporaryDirectory() as tmp:
+            model_path = os.path.join(tmp, 'renewal_model.pkl')
+            train_renewal_model_from_database(supabase, model_path,
+                                              registry=ModelRegistry(os.path.join(tmp, 'registry')))
+            # Renewals written last, past the first capped page of the table
+            supabase.tables['policies'] = []
+            for i in range(60):
+                supabase.tables['policies'].append({
+                    'Transaction ID': f"ACT{i:03d}", 'Transaction Type': 'NEW',
+                    'Policy Number': f"ACTIVE{i:03d}", 'Prior Policy Number': None,
+                    'Carrier Name': 'Progressive', 'Policy Type': 'AUTO', 'Premium Sold': 1000,
+                    'Effective Date': (today - timedelta(days=300)).strftime('%Y-%m-%d'),
+                    'X-DATE': (today + timedelta(days=65)).strftime('%Y-%m-%d')
+                })
+            for i in range(10):
+                supabase.tables['policies'].append({
+                    'Transaction ID': f"RWL{i:03d}", 'Transaction Type': 'RWL',
+                    'Policy Number': f"RENEWED{i:03d}", 'Prior Policy Number': f"ACTIVE{i:03d}",
+                    'Carrier Name': 'Progressive', 'Policy Type': 'AUTO', 'Premium Sold': 1000,
+                    'Effective Date': today.strftime('%Y-%m-%d'),
+                    'X-DATE': (today + timedelta(days=365)).strftime('%Y-%m-%d')
+                })
+            supabase.max_rows = 50
+
+            # A chunk size above the cap is clamped rather than ending after one short page
+            with mock.patch.object(ml_models, 'SCORING_CHUNK_SIZE', 50):
+                scores = score_all_policies_for_renewal(supabase, model_path=model_path,
+                                                        chunk_size=500, write_scores=False)
+
+        scored = set(scores['policy_number'])
+        self.assertEqual(len(scored), 60)
+        self.assertFalse(scored & {f"ACTIVE{i:03d}" for i in range(10)})
+
+    def test_untrained_model_returns_empty(self):
+        supabase = FakeSupabase({'policies': _build_ledger(5)})
+        scores = score_all_policies_for_renewal(supabase, model_path='/nonexistent/model.pkl')
+        self.assertTrue(scores.empty)
+
+
+if __name__ == '__main__':
+    unittest.main()
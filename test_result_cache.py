@@ -0,0 +1,163 @@
+"""
+Unit tests for utils/result_cache: the bounded, tenant-aware cache behind
+agent_data_helpers.cache_result.
+
+Run: python -m pytest test_result_cache.py
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSupabase  # noqa: E402
+from utils import agency_reconciliation_helpers, agent_data_helpers  # noqa: E402
+from utils.result_cache import ResultCache  # noqa: E402
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ResultCache(max_entries=3)
+        self.calls = []
+
+        @self.cache.cached(ttl_seconds=60)
+        def agency_summary(agency_id, year=2025, supabase=None):
+            self.calls.append((agency_id, year))
+            return {'agency_id': agency_id, 'year': year}
+
+        self.agency_summary = agency_summary
+
+    def test_keys_ignore_clients_and_apply_defaults(self):
+        self.agency_summary('a1', supabase=FakeSupabase())
+        self.agency_summary('a1', 2025, FakeSupabase())
+        self.agency_summary(agency_id='a1')
+        self.assertEqual(self.calls, [('a1', 2025)])
+        self.assertEqual(self.cache.metrics()['hits'], 2)
+
+    def test_bounded_lru_and_ttl(self):
+        for agency in ('a1', 'a2', 'a3'):
+            self.agency_summary(agency)
+        self.agency_summary('a1')  # a2 is now the least recently used
+        self.agency_summary('a4')
+        metrics = self.cache.metrics()
+        self.assertEqual((metrics['entries'], metrics['evictions']), (3, 1))
+        self.agency_summary('a2')
+        self.assertEqual(self.calls.count(('a2', 2025)), 2)
+        self.assertGreater(metrics['size_bytes'], 0)
+
+        @self.cache.cached(ttl_seconds=0)
+        def expires_at_once(agency_id):
+            self.calls.append(agency_id)
+
+        expires_at_once('x')
+        expires_at_once('x')
+        self.assertEqual(self.calls.count('x'), 2)
+
+    def test_agency_invalidation_only_drops_that_agency(self):
+        self.agency_summary('a1')
+        self.agency_summary('a2')
+        self.assertEqual(self.cache.invalidate(agency_id='a1'), 1)
+        self.agency_summary('a1')
+        self.agency_summary('a2')
+        self.assertEqual(self.calls, [('a1', 2025), ('a2', 2025), ('a1', 2025)])
+
+    def test_concurrent_identical_calls_run_once(self):
+        started = threading.Event()
+        release = threading.Event()
+        runs = []
+
+        @self.cache.cached(ttl_seconds=60)
+        def slow(agency_id):
+            runs.append(agency_id)
+            started.set()
+            release.wait(5)
+            return len(runs)
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(slow('a1'))) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while self.cache.metrics()['coalesced'] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual((runs, results), (['a1'], [1] * 5))
+
+    def test_errors_are_not_cached(self):
+        @self.cache.cached(ttl_seconds=60)
+        def flaky(agency_id):
+            self.calls.append(agency_id)
+            raise RuntimeError('database unavailable')
+
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                flaky('a1')
+        self.assertEqual(len(self.calls), 2)
+
+
+class TestAgentDataHelpersCache(unittest.TestCase):
+
+    def test_cache_result_uses_shared_cache(self):
+        agent_data_helpers.clear_cache()
+        calls = []
+
+        @agent_data_helpers.cache_result(ttl_seconds=60)
+        def clients(agency_id, supabase=None):
+            calls.append(agency_id)
+            return []
+
+        hits = agent_data_helpers.get_cache_stats()['hits']
+        clients('a1', FakeSupabase())
+        clients('a1', FakeSupabase())
+        stats = agent_data_helpers.get_cache_stats()
+        self.assertEqual((len(calls), stats['entries'], stats['hits'] - hits), (1, 1, 1))
+        agent_data_helpers.clear_cache()
+
+    def test_agent_results_recomputed_after_policy_insert(self):
+        agent_data_helpers.clear_cache()
+        self.addCleanup(agent_data_helpers.clear_cache)
+        supabase = FakeSupabase({'policies': [], 'agents': []})
+
+        agent_data_helpers.get_ai_recommendations_for_agent('agent-1', supabase=supabase)
+        agent_data_helpers.get_ai_recommendations_for_agent('agent-2', supabase=supabase)
+        agent_data_helpers.get_ai_recommendations_for_agent('agent-1', supabase=supabase)
+        self.assertEqual(len(supabase.calls_to('policies', 'select')), 2)
+
+        with mock.patch.object(agency_reconciliation_helpers, 'get_supabase_client', return_value=supabase):
+            ok, _ = agency_reconciliation_helpers.insert_transaction_with_agent(
+                {'Policy Number': 'P1'}, 'agent-1', 'agency-1', 'user-1')
+        self.assertTrue(ok)
+
+        agent_data_helpers.get_ai_recommendations_for_agent('agent-1', supabase=supabase)  # recomputed
+        agent_data_helpers.get_ai_recommendations_for_agent('agent-2', supabase=supabase)  # still cached
+        self.assertEqual(len(supabase.calls_to('policies', 'select')), 3)
+
+    def test_bulk_insert_drops_each_agents_results(self):
+        agent_data_helpers.clear_cache()
+        self.addCleanup(agent_data_helpers.clear_cache)
+        supabase = FakeSupabase({'policies': []})
+
+        def queries(agent):
+            before = len(supabase.calls)
+            agent_data_helpers.get_ai_analytics_summary(agent_id=agent, supabase=supabase)
+            return len(supabase.calls) - before
+
+        agents = ('agent-1', 'agent-2', 'agent-3')
+        self.assertTrue(all(queries(agent) for agent in agents))
+        self.assertEqual([queries(agent) for agent in agents], [0, 0, 0])
+        with mock.patch.object(agency_reconciliation_helpers, 'get_supabase_client', return_value=supabase):
+            agency_reconciliation_helpers.bulk_insert_transactions(
+                [{'agent_id': 'agent-1'}, {'agent_id': 'agent-2'}], 'agency-1', 'user-1')
+        recomputed = [queries(agent) > 0 for agent in agents]
+        self.assertEqual(recomputed, [True, True, False])  # agent-3's policies were not written
+
+
+if __name__ == '__main__':
+    unittest.main()
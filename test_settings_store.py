@@ -0,0 +1,128 @@
+"""
+Unit tests for utils/settings_store: the per-tenant settings cache shared by
+the user_*_db singletons.
+
+Run: python -m pytest test_settings_store.py
+"""
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import database_utils  # noqa: E402
+from fake_supabase import FakeSupabase  # noqa: E402
+from utils import settings_store  # noqa: E402
+from utils.settings_store import (  # noqa: E402
+    SETTINGS_TABLES,
+    SettingsStore,
+    prefetch_user_settings,
+    settings_tenant,
+)
+
+import user_agent_rates_db  # noqa: E402
+import user_column_mapping_db  # noqa: E402
+
+
+class TestSettingsStore(unittest.TestCase):
+
+    def test_lru_eviction_and_counters(self):
+        store = SettingsStore(max_tenants=2, ttl_seconds=None)
+        store.put('u1', 'prefs', {'color_theme': 'dark'})
+        store.put('u2', 'prefs', {'color_theme': 'light'})
+        self.assertEqual(store.get('u1', 'prefs'), {'color_theme': 'dark'})
+        store.put('u3', 'prefs', {})  # u2 is the least recently used
+        self.assertNotIn('u2', store)
+        self.assertIsNone(store.get('u2', 'prefs'))
+        self.assertEqual(len(store), 2)
+        self.assertEqual((store.stats['hits'], store.stats['misses'], store.stats['evictions']), (1, 1, 1))
+
+    def test_ttl_and_invalidation(self):
+        store = SettingsStore(ttl_seconds=0)
+        store.put('u1', 'prefs', 1)
+        self.assertIsNone(store.get('u1', 'prefs'))
+        self.assertEqual(store.stats['expirations'], 1)
+
+        store = SettingsStore(ttl_seconds=None)
+        store.put('u1', 'prefs', 1)
+        store.put('u1', 'rates', 2)
+        store.invalidate('u1', 'prefs')
+        self.assertEqual((store.get('u1', 'prefs'), store.get('u1', 'rates')), (None, 2))
+        store.invalidate('u1')
+        self.assertNotIn('u1', store)
+
+    def test_tenant_key(self):
+        self.assertEqual(settings_tenant('abc', 'A@B.com'), 'abc')
+        self.assertEqual(settings_tenant(None, 'A@B.com'), 'email:a@b.com')
+        self.assertIsNone(settings_tenant(None, ''))
+
+
+class TestSingletonsUseStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SettingsStore()
+        patcher = mock.patch.object(settings_store, '_settings_store', self.store)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = FakeSupabase({
+            'user_column_mappings': [
+                {'user_id': 'u1', 'user_email': 'one@x.com', 'column_mappings': {'Customer': 'Client'}},
+                {'user_id': 'u2', 'user_email': 'two@x.com', 'column_mappings': {'Customer': 'Insured'}},
+            ],
+            'user_default_agent_rates': [
+                {'user_id': 'u1', 'user_email': 'one@x.com', 'new_business_rate': 40, 'renewal_rate': 20},
+            ],
+        })
+
+    def _singleton(self, module, cls):
+        instance = getattr(module, cls)()
+        instance.supabase = self.client
+        return instance
+
+    def _login(self, module, user_id, email):
+        return mock.patch.object(module, 'st', SimpleNamespace(session_state={'user_id': user_id, 'user_email': email}))
+
+    def test_users_keep_their_own_settings(self):
+        mapper = self._singleton(user_column_mapping_db, 'UserColumnMapper')
+        for _ in range(3):
+            for user_id, email, expected in (('u1', 'one@x.com', 'Client'), ('u2', 'two@x.com', 'Insured')):
+                with self._login(user_column_mapping_db, user_id, email):
+                    self.assertEqual(mapper.get_mapped_column('Customer'), expected)
+        # Switching users no longer evicts the other user's mapping
+        self.assertEqual(len(self.client.calls_to('user_column_mappings')), 2)
+        self.assertEqual(self.store.stats['hits'], 4)
+
+    def test_save_invalidates(self):
+        mapper = self._singleton(user_column_mapping_db, 'UserColumnMapper')
+        with self._login(user_column_mapping_db, 'u1', 'one@x.com'):
+            mapper.get_user_mapping()
+            self.assertTrue(mapper.save_user_mapping({'Customer': 'Account'}))
+            self.assertEqual(mapper.get_mapped_column('Customer'), 'Account')
+
+    def test_prefetch_serves_first_reads(self):
+        self.assertEqual(prefetch_user_settings(self.client, 'u1', 'one@x.com'), len(SETTINGS_TABLES))
+        queries = len(self.client.calls)
+        mapper = self._singleton(user_column_mapping_db, 'UserColumnMapper')
+        rates = self._singleton(user_agent_rates_db, 'UserDefaultAgentRates')
+        with self._login(user_column_mapping_db, 'u1', 'one@x.com'), self._login(user_agent_rates_db, 'u1', 'one@x.com'):
+            self.assertEqual(mapper.get_mapped_column('Customer'), 'Client')
+            self.assertEqual(rates.get_rates_tuple(), (40.0, 20.0))
+        self.assertEqual(len(self.client.calls), queries)
+        self.assertEqual(self.store.stats['prefetch_hits'], 2)
+
+    def test_client_created_on_first_use(self):
+        factory = mock.Mock(return_value=self.client)
+        with mock.patch.object(database_utils, 'get_supabase_client', factory):
+            rates = user_agent_rates_db.UserDefaultAgentRates()
+            factory.assert_not_called()
+            with self._login(user_agent_rates_db, 'u1', 'one@x.com'):
+                self.assertEqual(rates.get_rates_tuple(), (40.0, 20.0))
+                rates.get_rates_tuple()
+        self.assertIs(rates.supabase, self.client)
+        factory.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
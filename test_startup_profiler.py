@@ -0,0 +1,66 @@
+"""
+Unit tests for utils/startup_profiler: the cold-start import tree and time
+to first render printed with AMS_PROFILE_STARTUP=1.
+
+Run: python -m pytest test_startup_profiler.py
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a fresh interpreter: the profiler replaces builtins.__import__ and
+# only measures modules that aren't imported yet
+SCRIPT = '''
+from utils import startup_profiler
+startup_profiler.start()
+import xml.dom.minidom
+startup_profiler.checkpoint('imports done')
+startup_profiler.first_render_done()
+import csv  # after the first render - not recorded
+startup_profiler.first_render_done()
+'''
+
+
+def _run(env):
+    return subprocess.run([sys.executable, '-c', SCRIPT], cwd=ROOT, capture_output=True, text=True,
+                          env={**os.environ, **env}, timeout=60)
+
+
+class TestStartupProfiler(unittest.TestCase):
+
+    def test_disabled_by_default(self):
+        result = _run({'AMS_PROFILE_STARTUP': ''})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn('[startup]', result.stdout)
+
+    def test_prints_import_tree_and_logs_profile(self):
+        with tempfile.TemporaryDirectory() as directory:
+            log_path = os.path.join(directory, 'startup.jsonl')
+            result = _run({'AMS_PROFILE_STARTUP': '1', 'AMS_PROFILE_STARTUP_MIN_MS': '0',
+                           'AMS_PROFILE_STARTUP_LOG': log_path})
+            self.assertEqual(result.returncode, 0, result.stderr)
+            with open(log_path) as f:
+                profiles = [json.loads(line) for line in f]
+
+        output = result.stdout
+        self.assertIn('xml.dom.minidom', output)
+        self.assertIn('time to first render', output)
+        self.assertEqual(output.count('time to first render'), 1)
+        self.assertNotIn(' csv', output)
+
+        self.assertEqual(len(profiles), 1)
+        profile = profiles[0]
+        minidom = next(node for node in profile['imports'] if node['name'] == 'xml.dom.minidom')
+        self.assertGreaterEqual(minidom['ms'], minidom['self_ms'])
+        self.assertTrue(minidom['children'])  # xml.dom and friends load underneath it
+        self.assertIn('imports done', profile['checkpoints'])
+        self.assertGreaterEqual(profile['time_to_first_render_s'], profile['checkpoints']['imports done'])
+
+
+if __name__ == '__main__':
+    unittest.main()
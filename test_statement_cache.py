@@ -0,0 +1,121 @@
+"""
+Unit tests for utils/statement_cache: parsed statement uploads cached on
+disk by content hash.
+
+Run: python -m pytest test_statement_cache.py
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from commission_core import count_total_rows  # noqa: E402
+from utils import statement_cache  # noqa: E402
+from utils.statement_cache import StatementCache, file_digest, load_statement  # noqa: E402
+
+STATEMENT = pd.DataFrame({
+    'Insured Name': ['Jane Smith', 'RCM Construction', 'Grand Total'],
+    'Policy Number': ['P-1', 'P-2', None],
+    'Agent Payment': [60.5, 30.0, 90.5],
+})
+
+
+def _csv_bytes(df=STATEMENT):
+    return df.to_csv(index=False).encode()
+
+
+def _xlsx_bytes(df=STATEMENT):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine='openpyxl')
+    return buffer.getvalue()
+
+
+class TestStatementCache(unittest.TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = StatementCache(directory.name, max_bytes=10 * 1024 * 1024)
+
+    def test_parsed_once_per_file_content(self):
+        data = _xlsx_bytes()
+        with mock.patch.object(statement_cache, 'read_statement_bytes',
+                               wraps=statement_cache.read_statement_bytes) as read:
+            first = load_statement(data, 'statement.xlsx', cache=self.cache)
+            again = load_statement(data, 'renamed.xlsx', cache=self.cache)
+        self.assertEqual(read.call_count, 1)
+        pd.testing.assert_frame_equal(first, again, check_dtype=False)
+        self.assertEqual(again['Agent Payment'].tolist(), [60.5, 30.0, 90.5])
+        self.assertEqual((self.cache.stats['hits'], self.cache.stats['misses']), (1, 1))
+        self.assertEqual(os.listdir(self.cache.directory), [f"{file_digest(data)}_0.parquet"])
+
+    def test_mixed_type_columns_are_stored_as_text(self):
+        mixed = STATEMENT.astype(object)
+        mixed.loc[2, 'Agent Payment'] = 'n/a'
+        mixed[2024] = [1, 'x', None]
+        data = _csv_bytes() + b'\n'
+        key = self.cache.key(file_digest(data), 'csv')
+        self.assertTrue(self.cache.put(key, mixed).endswith('.parquet'))
+        cached = self.cache.get(key)
+        self.assertEqual(cached['Agent Payment'].tolist(), ['60.5', '30.0', 'n/a'])
+        self.assertEqual(cached['2024'].tolist()[:2], ['1', 'x'])
+        self.assertTrue(pd.isna(cached['2024'].iloc[2]))  # missing stays missing, not 'None'
+        self.assertEqual(os.listdir(self.cache.directory), [f"{key}.parquet"])
+
+    def test_hit_returns_the_same_frame_as_the_miss(self):
+        df = STATEMENT.assign(Notes=['a', 5, None])
+        with mock.patch.object(statement_cache, 'read_statement_bytes', return_value=df):
+            miss = load_statement(b'statement', 'statement.xlsx', cache=self.cache)
+            hit = load_statement(b'statement', 'statement.xlsx', cache=self.cache)
+        pd.testing.assert_frame_equal(miss, hit, check_dtype=False)
+        self.assertEqual(hit['Notes'].tolist()[:2], ['a', '5'])
+        self.assertTrue(pd.isna(hit['Notes'].iloc[2]))
+
+    def test_cache_directory_is_private_and_not_in_temp(self):
+        directory = os.path.join(self.cache.directory, 'nested')
+        StatementCache(directory).put('a_0', STATEMENT)
+        self.assertEqual(os.stat(directory).st_mode & 0o777, 0o700)
+        if 'STATEMENT_CACHE_DIR' not in os.environ:
+            self.assertTrue(statement_cache.DEFAULT_CACHE_DIR.endswith(os.path.join('cache', 'statements')))
+
+    def test_least_recently_used_files_are_evicted(self):
+        self.cache.put('a_0', STATEMENT)
+        one_file = self.cache.size_bytes()
+        self.cache.max_bytes = int(one_file * 2.5)
+        self.cache.put('b_0', STATEMENT)
+        last_used = time.time() - 60
+        os.utime(self.cache._path('a_0'), (last_used, last_used))  # a is the oldest
+        self.cache.put('c_0', STATEMENT)
+        self.assertIsNone(self.cache.get('a_0'))
+        self.assertIsNotNone(self.cache.get('b_0'))
+        self.assertEqual(self.cache.stats['evictions'], 1)
+
+    def test_files_unused_past_max_age_are_deleted(self):
+        self.cache.max_age_seconds = 24 * 60 * 60
+        self.cache.put('a_0', STATEMENT)
+        self.cache.put('b_0', STATEMENT)
+        two_days_ago = time.time() - 2 * 24 * 60 * 60
+        os.utime(self.cache._path('a_0'), (two_days_ago, two_days_ago))
+        os.utime(self.cache._path('b_0'), (two_days_ago, two_days_ago))
+        self.assertIsNone(self.cache.get('a_0'))  # expired reads as a miss
+        self.assertFalse(os.path.exists(self.cache._path('a_0')))
+        self.cache.put('c_0', STATEMENT)  # the sweep drops b, well under max_bytes
+        self.assertEqual(sorted(os.listdir(self.cache.directory)), ['c_0.parquet'])
+        self.assertEqual(self.cache.stats['evictions'], 2)
+
+    def test_csv_and_total_rows(self):
+        df = load_statement(_csv_bytes(), 'statement.csv', cache=self.cache)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(count_total_rows(df), 1)
+        self.assertEqual(count_total_rows(df.iloc[:2]), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Unit tests for utils/synthetic_ledger: synthetic books used by benchmarks
+and load tests.
+
+Run: python -m pytest test_synthetic_ledger.py
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.renewal_pipeline import build_latest_terms  # noqa: E402
+from utils.synthetic_ledger import (  # noqa: E402
+    LEDGER_COLUMNS,
+    STATEMENT_COLUMNS,
+    generate_book,
+    load_book,
+)
+
+
+class TestGenerateBook(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.book = generate_book(5000, seed=7)
+        cls.ledger = cls.book['policies']
+        cls.statements = cls.book['statements']
+
+    def test_shape_and_determinism(self):
+        self.assertEqual(len(self.ledger), 5000)
+        self.assertEqual(list(self.ledger.columns), LEDGER_COLUMNS)
+        self.assertEqual(list(self.statements.columns), STATEMENT_COLUMNS)
+        self.assertTrue(self.ledger['Transaction ID'].is_unique)
+        pd.testing.assert_frame_equal(generate_book(5000, seed=7)['policies'], self.ledger)
+        self.assertFalse(generate_book(5000, seed=8)['policies']['Transaction ID'].equals(self.ledger['Transaction ID']))
+
+    def test_transaction_mix(self):
+        types = set(self.ledger['Transaction Type'])
+        self.assertTrue({'NEW', 'RWL', 'END', 'CAN', 'ADJUSTMENT'} <= types)
+        kinds = self.ledger['Transaction ID'].str.extract(r'-(STMT|VOID|ADJ)-\d{8}$')[0]
+        self.assertTrue({'STMT', 'VOID', 'ADJ'} <= set(kinds.dropna()))
+        self.assertTrue((kinds.notna() == self.ledger['is_reconciliation_entry']).all())
+
+        originals = self.ledger[kinds.isna()]
+        self.assertTrue(originals['Transaction ID'].str.fullmatch(r'[A-Z]{3}\d{3}[A-Z0-9]').all())
+        self.assertTrue((originals.loc[originals['Transaction Type'] == 'CAN', 'Premium Sold'] < 0).all())
+        renewals = originals[originals['Transaction Type'] == 'RWL']
+        self.assertTrue((renewals['Prior Policy Number'] == renewals['Policy Number']).all())
+
+    def test_voids_reverse_their_statement_entry(self):
+        ids = self.ledger.set_index('Transaction ID')
+        voids = self.ledger[self.ledger['Transaction ID'].str.contains('-VOID-')]
+        for void_id, amount in zip(voids['Transaction ID'], voids['Agent Paid Amount (STMT)']):
+            base = void_id.split('-VOID-')[0]
+            stmt = ids[ids.index.str.startswith(base + '-STMT-')]
+            self.assertEqual(len(stmt), 1)
+            self.assertAlmostEqual(stmt['Agent Paid Amount (STMT)'].iloc[0], -amount)
+
+    def test_statements_match_reconciled_entries(self):
+        stmt = self.ledger[self.ledger['Transaction ID'].str.contains('-STMT-')]
+        matched_to = stmt['NOTES'].str.extract(r'Matched to: (\w+)$')[0]
+        lines = self.statements.dropna(subset=['expected_transaction_id']).set_index('expected_transaction_id')
+        self.assertTrue(matched_to.isin(lines.index).all())
+        self.assertEqual(lines.loc[matched_to, 'Agent Payment'].tolist(), stmt['Agent Paid Amount (STMT)'].tolist())
+
+        # The latest statement month is still open - lines without a STMT entry yet
+        # (apart from the last policy, whose entries may be cut off at n_rows)
+        open_lines = lines[~lines.index.isin(matched_to)]
+        self.assertLess(stmt['STMT DATE'].max(), '2025-12-01')
+        self.assertGreater((open_lines['Statement Date'] == '2025-12-31').mean(), 0.9)
+        self.assertGreater(self.statements['expected_transaction_id'].isna().sum(), 0)
+
+    def test_ledger_feeds_app_pipelines(self):
+        latest = build_latest_terms(self.ledger)
+        self.assertGreater(len(latest), 0)
+        self.assertTrue(set(latest['Transaction Type']) <= {'NEW', 'RWL'})
+
+
+class TestLoadBook(unittest.TestCase):
+
+    def test_written_once_then_loaded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            book = load_book(300, seed=3, directory=directory, fmt='csv')
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['policies_300_seed3.csv', 'statements_300_seed3.csv'])
+            again = load_book(300, seed=3, directory=directory, fmt='csv')
+            pd.testing.assert_frame_equal(book['policies'], again['policies'])
+            self.assertEqual(book['policies']['Transaction ID'].tolist(),
+                             generate_book(300, seed=3)['policies']['Transaction ID'].tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
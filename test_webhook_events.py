@@ -0,0 +1,211 @@
+"""
+Unit tests for webhook_events: idempotent storage, per-customer ordering,
+retries and recovery of Stripe webhook events.
+
+Run: python -m pytest test_webhook_events.py
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_supabase import FakeSupabase  # noqa: E402
+from webhook_events import (  # noqa: E402
+    STATUS_ABANDONED,
+    STATUS_FAILED,
+    STATUS_PENDING,
+    STATUS_PROCESSED,
+    InMemoryEventStore,
+    OrderedEventWorkerPool,
+    WebhookDispatcher,
+    WebhookEventStore,
+    event_customer_key,
+)
+
+
+def _event(n, customer='cus_1', event_type='customer.subscription.updated'):
+    return {'id': f"evt_{n}", 'type': event_type, 'data': {'object': {'customer': customer, 'status': 'active'}}}
+
+
+class TestEventCustomerKey(unittest.TestCase):
+
+    def test_customer_then_email_then_event_id(self):
+        self.assertEqual(event_customer_key(_event(1, 'cus_9')), 'cus_9')
+        checkout = {'id': 'evt_2', 'data': {'object': {'customer': None,
+                                                      'customer_details': {'email': 'A@B.com'}}}}
+        self.assertEqual(event_customer_key(checkout), 'a@b.com')
+        self.assertEqual(event_customer_key({'id': 'evt_3', 'data': {'object': {}}}), 'evt_3')
+
+
+class TestWebhookEventStore(unittest.TestCase):
+
+    def test_record_is_idempotent_on_event_id(self):
+        client = FakeSupabase({'stripe_webhook_events': []})
+        store = WebhookEventStore(client)
+        self.assertTrue(store.record(_event(1)))
+        self.assertFalse(store.record(_event(1)))
+        self.assertEqual(len(client.tables['stripe_webhook_events']), 1)
+
+        store.mark_processed('evt_1', {'status': 'success'})
+        self.assertEqual(store.get('evt_1')['status'], STATUS_PROCESSED)
+        self.assertTrue(store.record(_event(2)))
+        self.assertEqual([e['id'] for e in store.unfinished_events()], ['evt_2'])
+
+
+class TestWebhookDispatcher(unittest.TestCase):
+
+    def _dispatcher(self, handler, workers=4, store=None):
+        store = store or InMemoryEventStore()
+        pool = OrderedEventWorkerPool(handler, store, workers=workers, retry_delay=0).start()
+        self.addCleanup(pool.stop)
+        return WebhookDispatcher(store, pool), store, pool
+
+    def test_duplicates_are_acknowledged_not_reprocessed(self):
+        handled = []
+        dispatcher, store, pool = self._dispatcher(lambda e: handled.append(e['id']))
+        self.assertEqual(dispatcher.accept(_event(1)), 'queued')
+        pool.join()
+        self.assertEqual(dispatcher.accept(_event(1)), 'duplicate')
+        pool.join()
+        self.assertEqual(handled, ['evt_1'])
+        self.assertEqual(store.get('evt_1')['status'], STATUS_PROCESSED)
+
+    def test_events_run_in_order_per_customer(self):
+        handled = {}
+        lock = threading.Lock()
+
+        def handler(event):
+            time.sleep(0.001)
+            with lock:
+                handled.setdefault(event_customer_key(event), []).append(event['id'])
+
+        dispatcher, _, pool = self._dispatcher(handler)
+        expected = {}
+        for n in range(200):
+            event = _event(n, customer=f"cus_{n % 7}")
+            expected.setdefault(f"cus_{n % 7}", []).append(event['id'])
+            dispatcher.accept(event)
+        pool.join()
+        self.assertEqual(handled, expected)
+
+    def test_failures_are_retried_then_marked_and_requeued(self):
+        calls = []
+
+        def flaky(event):
+            calls.append(event['id'])
+            raise RuntimeError('database unavailable')
+
+        dispatcher, store, pool = self._dispatcher(flaky, workers=0)
+        dispatcher.accept(_event(1))
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(store.get('evt_1')['status'], STATUS_FAILED)
+        self.assertIn('database unavailable', store.get('evt_1')['last_error'])
+        self.assertEqual(pool.stats['retries'], 2)
+
+        # Stripe redelivers the event once the database is back
+        pool.handler = lambda e: {'status': 'success'}
+        self.assertEqual(dispatcher.accept(_event(1)), 'requeued')
+        self.assertEqual(store.get('evt_1')['status'], STATUS_PROCESSED)
+
+    def test_failed_event_holds_customer_until_sweep_retry_succeeds(self):
+        handled = []
+        failing = {'evt_1'}
+
+        def handler(event):
+            if event['id'] in failing:
+                raise RuntimeError('stripe timeout')
+            handled.append(event['id'])
+
+        store = InMemoryEventStore()
+        pool = OrderedEventWorkerPool(handler, store, workers=0, retry_delay=0, retry_backoff=0)
+        dispatcher = WebhookDispatcher(store, pool)
+        for event in [_event(1), _event(2), _event(3, customer='cus_2'), _event(4)]:
+            dispatcher.accept(event)
+
+        self.assertEqual(handled, ['evt_3'])  # cus_1 is held behind evt_1
+        self.assertEqual((store.get('evt_1')['status'], store.get('evt_1')['attempts']), (STATUS_FAILED, 3))
+        self.assertIsNotNone(store.get('evt_1')['next_attempt_at'])
+        self.assertEqual([store.get(e)['status'] for e in ('evt_2', 'evt_4')], [STATUS_PENDING] * 2)
+
+        self.assertEqual(pool.sweep(), 1)  # still failing: attempts 4-6
+        self.assertEqual(store.get('evt_1')['attempts'], 6)
+        failing.clear()
+        self.assertEqual(pool.sweep(), 1)
+        self.assertEqual(handled, ['evt_3', 'evt_1', 'evt_2', 'evt_4'])
+        self.assertEqual(pool.sweep(), 0)
+        self.assertEqual({r['status'] for r in store.rows.values()}, {STATUS_PROCESSED})
+
+    def test_event_abandoned_after_max_total_attempts_releases_customer(self):
+        handled = []
+
+        def handler(event):
+            if event['id'] == 'evt_1':
+                raise RuntimeError('bad payload')
+            handled.append(event['id'])
+
+        store = InMemoryEventStore()
+        pool = OrderedEventWorkerPool(handler, store, workers=0, retry_delay=0, retry_backoff=0,
+                                      max_total_attempts=5)
+        dispatcher = WebhookDispatcher(store, pool)
+        dispatcher.accept(_event(1))
+        dispatcher.accept(_event(2))
+        self.assertEqual(pool.sweep(), 1)
+
+        self.assertEqual((store.get('evt_1')['status'], store.get('evt_1')['attempts']), (STATUS_ABANDONED, 5))
+        self.assertEqual(handled, ['evt_2'])
+        self.assertEqual(pool.sweep(), 0)
+        self.assertEqual(pool.stats['abandoned'], 1)
+
+    def test_sweep_queues_failed_events_from_the_store(self):
+        client = FakeSupabase({'stripe_webhook_events': []})
+        store = WebhookEventStore(client)
+        store.record(_event(1))
+        store.mark_processing('evt_1', 3)
+        store.mark_failed('evt_1', 'RuntimeError: boom', '2000-01-01T00:00:00+00:00')
+        store.record(_event(2))
+        store.mark_processing('evt_2', 3)
+        store.mark_failed('evt_2', 'RuntimeError: boom', '2999-01-01T00:00:00+00:00')
+
+        handled = []
+        pool = OrderedEventWorkerPool(lambda e: handled.append(e['id']), store, workers=0)
+        self.assertEqual(pool.sweep(), 1)
+        self.assertEqual(handled, ['evt_1'])
+        self.assertEqual(store.get('evt_1')['status'], STATUS_PROCESSED)
+
+    def test_recover_blocks_customer_of_failed_event_until_due(self):
+        store = InMemoryEventStore()
+        store.record(_event(1))
+        store.mark_processing('evt_1', 3)
+        store.mark_failed('evt_1', 'RuntimeError: boom', '2999-01-01T00:00:00+00:00')
+        store.record(_event(2))
+        store.record(_event(3, customer='cus_2'))
+
+        handled = []
+        pool = OrderedEventWorkerPool(lambda e: handled.append(e['id']), store, workers=0)
+        self.assertEqual(WebhookDispatcher(store, pool).recover(), 3)
+        self.assertEqual(handled, ['evt_3'])
+        self.assertEqual(pool.sweep(), 0)  # not due yet
+
+        store.rows['evt_1']['next_attempt_at'] = '2000-01-01T00:00:00+00:00'
+        self.assertEqual(pool.sweep(), 1)
+        self.assertEqual(handled, ['evt_3', 'evt_1', 'evt_2'])
+
+    def test_recover_requeues_unfinished_events_in_order(self):
+        store = InMemoryEventStore()
+        for n in range(3):
+            store.record(_event(n))
+        store.mark_processed('evt_1')
+        self.assertEqual(store.get('evt_0')['status'], STATUS_PENDING)
+
+        handled = []
+        dispatcher, _, pool = self._dispatcher(lambda e: handled.append(e['id']), store=store)
+        self.assertEqual(dispatcher.recover(), 2)
+        pool.join()
+        self.assertEqual(handled, ['evt_0', 'evt_2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,15 +5,16 @@ Each user can set their own default rates for new business and renewals.
 
 import streamlit as st
 from typing import Dict, Tuple
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 
 class UserDefaultAgentRates:
     """Handle user-specific default agent commission rates stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._rates_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     def get_user_rates(self) -> Dict[str, float]:
         """Get default agent commission rates for the current user."""
@@ -25,24 +26,22 @@ class UserDefaultAgentRates:
             return self._get_default_rates()
         
         # Check cache
-        if self._rates_cache and self._cache_user_id == user_id:
-            return self._rates_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_default_agent_rates')
+        if cached:
+            return cached
         
         try:
             # Try to get user's rates from database
-            if user_id:
-                response = self.supabase.table('user_default_agent_rates').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_default_agent_rates').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_default_agent_rates', user_id, user_email)
             
-            if response.data and len(response.data) > 0:
-                rates_data = response.data[0]
+            if rows:
+                rates_data = rows[0]
                 result = {
                     'new_business': float(rates_data.get('new_business_rate', 50.0)),
                     'renewal': float(rates_data.get('renewal_rate', 25.0))
                 }
-                self._rates_cache = result
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_default_agent_rates', result)
                 return result
             
             # No rates found, create default for user
@@ -91,8 +90,7 @@ class UserDefaultAgentRates:
                     response = self.supabase.table('user_default_agent_rates').insert(data).execute()
             
             # Clear cache to force reload
-            self._rates_cache = None
-            self._cache_user_id = None
+            invalidate_user_settings(user_id, user_email, 'user_default_agent_rates')
             
             return True
             
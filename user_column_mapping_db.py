@@ -6,16 +6,18 @@ Each user has their own column display preferences.
 import streamlit as st
 import pandas as pd
 from typing import Dict, Optional
+import hashlib
 import json
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 
 class UserColumnMapper:
     """Handle user-specific column mappings stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._mapping_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     def get_user_mapping(self) -> Dict[str, str]:
         """Get column mappings for the current user."""
@@ -27,21 +29,19 @@ class UserColumnMapper:
             return self._get_default_mapping()
         
         # Check cache
-        if self._mapping_cache and self._cache_user_id == user_id:
-            return self._mapping_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_column_mappings')
+        if cached:
+            return cached
         
         try:
             # Try to get user's mapping from database
-            if user_id:
-                response = self.supabase.table('user_column_mappings').select('column_mappings').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_column_mappings').select('column_mappings').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_column_mappings', user_id, user_email, 'column_mappings')
             
-            if response.data and len(response.data) > 0:
-                mapping = response.data[0].get('column_mappings', {})
+            if rows:
+                mapping = rows[0].get('column_mappings', {})
                 if mapping:
-                    self._mapping_cache = mapping
-                    self._cache_user_id = user_id
+                    self._settings.put(tenant, 'user_column_mappings', mapping)
                     return mapping
             
             # No mapping found, create default for user
@@ -82,8 +82,7 @@ class UserColumnMapper:
                     response = self.supabase.table('user_column_mappings').insert(data).execute()
             
             # Clear cache to force reload
-            self._mapping_cache = None
-            self._cache_user_id = None
+            invalidate_user_settings(user_id, user_email, 'user_column_mappings')
             
             return True
             
@@ -91,6 +90,11 @@ class UserColumnMapper:
             print(f"Error saving user column mapping: {e}")
             return False
     
+    def get_mapping_version(self) -> str:
+        """Stable fingerprint of the current user's mapping (changes whenever the mapping is saved)."""
+        mapping = self.get_user_mapping()
+        return hashlib.sha1(json.dumps(mapping, sort_keys=True, default=str).encode()).hexdigest()
+
     def get_mapped_column(self, db_column: str) -> str:
         """Get the display name for a database column."""
         mapping = self.get_user_mapping()
@@ -166,6 +170,10 @@ def get_mapped_column(db_column: str) -> str:
     """Get display name for a database column."""
     return user_column_mapper.get_mapped_column(db_column)
 
+def get_mapping_version() -> str:
+    """Fingerprint of the current user's column mapping."""
+    return user_column_mapper.get_mapping_version()
+
 def get_reverse_mapping() -> Dict[str, str]:
     """Get display name to database column mapping."""
     return user_column_mapper.get_reverse_mapping()
@@ -5,17 +5,17 @@ These mappings are used during CSV imports and reconciliation to standardize dat
 
 import streamlit as st
 from typing import Dict, Optional
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 import json
 
 class UserMappings:
     """Handle user-specific type mappings stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._policy_mappings_cache = None
-        self._transaction_mappings_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     # Policy Type Mappings
     def get_user_policy_type_mappings(self) -> Dict[str, str]:
@@ -28,21 +28,19 @@ class UserMappings:
             return self._get_default_policy_mappings()
         
         # Check cache
-        if self._policy_mappings_cache and self._cache_user_id == user_id:
-            return self._policy_mappings_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_policy_type_mappings')
+        if cached:
+            return cached
         
         try:
             # Try to get user's mappings from database
-            if user_id:
-                response = self.supabase.table('user_policy_type_mappings').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_policy_type_mappings').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_policy_type_mappings', user_id, user_email)
             
-            if response.data and len(response.data) > 0:
-                mappings_data = response.data[0]
+            if rows:
+                mappings_data = rows[0]
                 result = mappings_data.get('mappings', {})
-                self._policy_mappings_cache = result
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_policy_type_mappings', result)
                 return result
             
             # No mappings found, create default for user
@@ -85,7 +83,7 @@ class UserMappings:
                     response = self.supabase.table('user_policy_type_mappings').insert(data).execute()
             
             # Clear cache to force reload
-            self._policy_mappings_cache = None
+            invalidate_user_settings(user_id, user_email, 'user_policy_type_mappings')
             
             return True
             
@@ -104,21 +102,19 @@ class UserMappings:
             return self._get_default_transaction_mappings()
         
         # Check cache
-        if self._transaction_mappings_cache and self._cache_user_id == user_id:
-            return self._transaction_mappings_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_transaction_type_mappings')
+        if cached:
+            return cached
         
         try:
             # Try to get user's mappings from database
-            if user_id:
-                response = self.supabase.table('user_transaction_type_mappings').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_transaction_type_mappings').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_transaction_type_mappings', user_id, user_email)
             
-            if response.data and len(response.data) > 0:
-                mappings_data = response.data[0]
+            if rows:
+                mappings_data = rows[0]
                 result = mappings_data.get('mappings', {})
-                self._transaction_mappings_cache = result
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_transaction_type_mappings', result)
                 return result
             
             # No mappings found, create default for user
@@ -161,7 +157,7 @@ class UserMappings:
                     response = self.supabase.table('user_transaction_type_mappings').insert(data).execute()
             
             # Clear cache to force reload
-            self._transaction_mappings_cache = None
+            invalidate_user_settings(user_id, user_email, 'user_transaction_type_mappings')
             
             return True
             
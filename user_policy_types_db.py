@@ -5,16 +5,17 @@ Each user can manage their own policy types for dropdowns and categorization.
 
 import streamlit as st
 from typing import Dict, List, Optional, Any
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 import json
 
 class UserPolicyTypes:
     """Handle user-specific policy types stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._types_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     def get_user_policy_types(self) -> Dict[str, Any]:
         """Get policy types configuration for the current user."""
@@ -26,18 +27,17 @@ class UserPolicyTypes:
             return self._get_default_policy_types()
         
         # Check cache
-        if self._types_cache and self._cache_user_id == user_id:
-            return self._types_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_policy_types')
+        if cached:
+            return cached
         
         try:
             # Try to get user's policy types from database
-            if user_id:
-                response = self.supabase.table('user_policy_types').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_policy_types').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_policy_types', user_id, user_email)
             
-            if response.data and len(response.data) > 0:
-                types_data = response.data[0]
+            if rows:
+                types_data = rows[0]
                 
                 # DEBUG: Log what we got from database
                 raw_policy_types = types_data.get('policy_types', [])
@@ -101,8 +101,7 @@ class UserPolicyTypes:
                 else:
                     print(f"DEBUG: Successfully loaded {len(result['policy_types'])} policy types for {user_email}")
                 
-                self._types_cache = result
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_policy_types', result)
                 return result
             
             # No types found, create default for user
@@ -174,8 +173,7 @@ class UserPolicyTypes:
             # The try_save_with_columns function above handles all cases
             
             # Clear cache to force reload
-            self._types_cache = None
-            self._cache_user_id = None
+            invalidate_user_settings(user_id, user_email, 'user_policy_types')
             
             return True
             
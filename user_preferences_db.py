@@ -6,15 +6,16 @@ Each user has their own preferences including color theme.
 import streamlit as st
 import os
 from typing import Dict, Optional
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 
 class UserPreferences:
     """Handle user-specific preferences stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._preferences_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     def get_user_preferences(self) -> Dict:
         """Get preferences for the current user."""
@@ -26,24 +27,22 @@ class UserPreferences:
             return self._get_default_preferences()
         
         # Check cache
-        if self._preferences_cache and self._cache_user_id == user_id:
-            return self._preferences_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_preferences')
+        if cached:
+            return cached
         
         try:
             # Try to get user's preferences from database
-            if user_id:
-                response = self.supabase.table('user_preferences').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_preferences').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_preferences', user_id, user_email)
             
-            if response.data and len(response.data) > 0:
-                prefs = response.data[0]
+            if rows:
+                prefs = rows[0]
                 result = {
                     'color_theme': prefs.get('color_theme', 'light'),
                     'other_preferences': prefs.get('other_preferences', {})
                 }
-                self._preferences_cache = result
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_preferences', result)
                 return result
             
             # No preferences found, create default for user
@@ -94,8 +93,7 @@ class UserPreferences:
                     response = self.supabase.table('user_preferences').insert(data).execute()
             
             # Clear cache to force reload
-            self._preferences_cache = None
-            self._cache_user_id = None
+            invalidate_user_settings(user_id, user_email, 'user_preferences')
             
             return True
             
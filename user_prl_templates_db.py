@@ -5,17 +5,18 @@ These templates allow users to save and reuse column configurations for their re
 
 import streamlit as st
 from typing import Dict, List, Optional, Any
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 import json
 from datetime import datetime
 
 class UserPRLTemplates:
     """Handle user-specific PRL templates stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._templates_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     def get_user_templates(self) -> Dict[str, Any]:
         """Get PRL templates for the current user."""
@@ -27,20 +28,19 @@ class UserPRLTemplates:
             return {}
         
         # Check cache
-        if self._templates_cache and self._cache_user_id == user_id:
-            return self._templates_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_prl_templates')
+        if cached:
+            return cached
         
         try:
             # Try to get user's templates from database
-            if user_id:
-                response = self.supabase.table('user_prl_templates').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_prl_templates').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_prl_templates', user_id, user_email)
             
-            if response.data:
+            if rows:
                 # Convert list of template records to dict format
                 templates = {}
-                for template in response.data:
+                for template in rows:
                     template_name = template.get('template_name')
                     if template_name:
                         templates[template_name] = {
@@ -49,8 +49,7 @@ class UserPRLTemplates:
                             'view_mode': template.get('view_mode', 'all')
                         }
                 
-                self._templates_cache = templates
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_prl_templates', templates)
                 return templates
             
             return {}
@@ -83,7 +82,7 @@ class UserPRLTemplates:
             response = self.supabase.table('user_prl_templates').insert(data).execute()
             
             # Clear cache to force reload
-            self._templates_cache = None
+            invalidate_user_settings(user_id, user_email, 'user_prl_templates')
             
             return True
             
@@ -114,7 +113,7 @@ class UserPRLTemplates:
                 response = self.supabase.table('user_prl_templates').update(update_data).eq('user_email', user_email).eq('template_name', template_name).execute()
             
             # Clear cache to force reload
-            self._templates_cache = None
+            invalidate_user_settings(user_id, user_email, 'user_prl_templates')
             
             return True
             
@@ -138,7 +137,7 @@ class UserPRLTemplates:
                 response = self.supabase.table('user_prl_templates').delete().eq('user_email', user_email).eq('template_name', template_name).execute()
             
             # Clear cache to force reload
-            self._templates_cache = None
+            invalidate_user_settings(user_id, user_email, 'user_prl_templates')
             
             return True
             
@@ -158,8 +157,7 @@ class UserPRLTemplates:
     
     def clear_cache(self):
         """Clear the templates cache."""
-        self._templates_cache = None
-        self._cache_user_id = None
+        invalidate_user_settings(st.session_state.get('user_id'), st.session_state.get('user_email', '').lower(), 'user_prl_templates')
 
 # Create a global instance
 user_prl_templates = UserPRLTemplates()
@@ -6,17 +6,18 @@ statement columns to system fields.
 
 import streamlit as st
 from typing import Dict, Optional, List
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 import json
 from datetime import datetime
 
 class UserReconciliationMappings:
     """Handle user-specific reconciliation column mappings stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._mappings_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     def get_user_reconciliation_mappings(self) -> Dict[str, Dict]:
         """Get all reconciliation column mappings for the current user."""
@@ -28,20 +29,19 @@ class UserReconciliationMappings:
             return {}
         
         # Check cache
-        if self._mappings_cache and self._cache_user_id == user_id:
-            return self._mappings_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_reconciliation_mappings')
+        if cached:
+            return cached
         
         try:
             # Try to get user's mappings from database
-            if user_id:
-                response = self.supabase.table('user_reconciliation_mappings').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_reconciliation_mappings').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_reconciliation_mappings', user_id, user_email)
             
-            if response.data:
+            if rows:
                 # Convert list of mappings to dict keyed by mapping_name
                 result = {}
-                for mapping in response.data:
+                for mapping in rows:
                     mapping_name = mapping.get('mapping_name')
                     if mapping_name:
                         result[mapping_name] = {
@@ -50,8 +50,7 @@ class UserReconciliationMappings:
                             'field_count': len(mapping.get('column_mappings', {}))
                         }
                 
-                self._mappings_cache = result
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_reconciliation_mappings', result)
                 return result
             
             return {}
@@ -99,7 +98,7 @@ class UserReconciliationMappings:
                 response = self.supabase.table('user_reconciliation_mappings').insert(data).execute()
             
             # Clear cache to force reload
-            self._mappings_cache = None
+            invalidate_user_settings(user_id, user_email, 'user_reconciliation_mappings')
             
             return True
             
@@ -122,7 +121,7 @@ class UserReconciliationMappings:
                 response = self.supabase.table('user_reconciliation_mappings').delete().eq('user_email', user_email).eq('mapping_name', mapping_name).execute()
             
             # Clear cache
-            self._mappings_cache = None
+            invalidate_user_settings(user_id, user_email, 'user_reconciliation_mappings')
             
             return True
             
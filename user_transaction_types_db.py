@@ -5,16 +5,17 @@ Each user can manage their own transaction types for categorization.
 
 import streamlit as st
 from typing import Dict, Optional, Any
-from database_utils import get_supabase_client
+from database_utils import LazySupabaseClient
+from utils.settings_store import fetch_rows, get_settings_store, invalidate_user_settings, settings_tenant
 import json
 
 class UserTransactionTypes:
     """Handle user-specific transaction types stored in database."""
     
+    supabase = LazySupabaseClient()
+    
     def __init__(self):
-        self.supabase = get_supabase_client()
-        self._types_cache = None
-        self._cache_user_id = None
+        self._settings = get_settings_store()
     
     def get_user_transaction_types(self) -> Dict[str, Dict[str, Any]]:
         """Get transaction types for the current user."""
@@ -26,21 +27,19 @@ class UserTransactionTypes:
             return self._get_default_transaction_types()
         
         # Check cache
-        if self._types_cache and self._cache_user_id == user_id:
-            return self._types_cache
+        tenant = settings_tenant(user_id, user_email)
+        cached = self._settings.get(tenant, 'user_transaction_types')
+        if cached:
+            return cached
         
         try:
             # Try to get user's transaction types from database
-            if user_id:
-                response = self.supabase.table('user_transaction_types').select('*').eq('user_id', user_id).execute()
-            else:
-                response = self.supabase.table('user_transaction_types').select('*').eq('user_email', user_email).execute()
+            rows = fetch_rows(self.supabase, 'user_transaction_types', user_id, user_email)
             
-            if response.data and len(response.data) > 0:
-                types_data = response.data[0]
+            if rows:
+                types_data = rows[0]
                 result = types_data.get('transaction_types', {})
-                self._types_cache = result
-                self._cache_user_id = user_id
+                self._settings.put(tenant, 'user_transaction_types', result)
                 return result
             
             # No types found, create default for user
@@ -83,8 +82,7 @@ class UserTransactionTypes:
                     response = self.supabase.table('user_transaction_types').insert(data).execute()
             
             # Clear cache to force reload
-            self._types_cache = None
-            self._cache_user_id = None
+            invalidate_user_settings(user_id, user_email, 'user_transaction_types')
             
             return True
             
@@ -9,6 +9,8 @@ from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import pandas as pd
 
+from utils.result_cache import invalidate_agency_results
+
 
 def get_supabase_client() -> Client:
     """Get Supabase client."""
@@ -174,6 +176,7 @@ def insert_transaction_with_agent(
         result = supabase.table('policies').insert(transaction_data).execute()
 
         if result.data:
+            invalidate_agency_results(agency_id, agent_id=agent_id)
             return True, "Transaction created successfully"
         else:
             return False, "Error inserting transaction"
@@ -210,6 +213,7 @@ def bulk_insert_transactions(
         result = supabase.table('policies').insert(transactions).execute()
 
         if result.data:
+            invalidate_agency_results(agency_id, agent_ids={trans.get('agent_id') for trans in transactions})
             count = len(result.data)
             return True, f"Successfully inserted {count} transactions", count
         else:
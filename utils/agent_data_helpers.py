@@ -9,12 +9,16 @@ Performance optimizations added: Sprint 6, Task 6.1
 
 import os
 from typing import Optional, Dict, List, Any
-from supabase import create_client
+from supabase import create_client, Client
 from datetime import datetime, timedelta
 import pandas as pd
-import functools
+import numpy as np
 import time
 
+from utils.email_outbox import EmailTemplate, get_email_outbox
+from utils.renewal_pipeline import get_renewal_pipeline_cache, urgency_levels
+from utils.result_cache import get_result_cache
+
 # Initialize Supabase client
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
@@ -24,14 +28,17 @@ supabase = create_client(SUPABASE_URL, SUPABASE_KEY) if SUPABASE_URL and SUPABAS
 # PERFORMANCE OPTIMIZATION UTILITIES (SPRINT 6 - TASK 6.1)
 # =============================================================================
 
-# In-memory cache for expensive operations
-_cache = {}
-_cache_timestamps = {}
+# Results of expensive operations, shared with the rest of the process (see utils/result_cache)
+_result_cache = get_result_cache()
 
 def cache_result(ttl_seconds=300):
     """
     Decorator to cache function results with time-to-live.
 
+    Results are kept in the process-wide bounded LRU (utils/result_cache):
+    keys ignore the supabase client argument, concurrent identical calls run
+    once, and invalidate_agency_results(agency_id) drops an agency's entries.
+
     Args:
         ttl_seconds: Time to live in seconds (default 5 minutes)
 
@@ -40,40 +47,15 @@ def cache_result(ttl_seconds=300):
         def expensive_function(arg1, arg2):
             return result
     """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # Create cache key from function name and arguments
-            cache_key = f"{func.__name__}:{str(args)}:{str(sorted(kwargs.items()))}"
-
-            # Check if cached result exists and is fresh
-            if cache_key in _cache:
-                cached_time = _cache_timestamps.get(cache_key, 0)
-                if time.time() - cached_time < ttl_seconds:
-                    return _cache[cache_key]
-
-            # Call function and cache result
-            result = func(*args, **kwargs)
-            _cache[cache_key] = result
-            _cache_timestamps[cache_key] = time.time()
-
-            return result
-        return wrapper
-    return decorator
+    return _result_cache.cached(ttl_seconds=ttl_seconds)
 
 def clear_cache():
     """Clear all cached results."""
-    global _cache, _cache_timestamps
-    _cache.clear()
-    _cache_timestamps.clear()
+    _result_cache.clear()
 
 def get_cache_stats():
-    """Get cache statistics."""
-    return {
-        'entries': len(_cache),
-        'size_bytes': sum(len(str(v)) for v in _cache.values()),
-        'oldest_entry': min(_cache_timestamps.values()) if _cache_timestamps else None
-    }
+    """Get cache statistics (entries, estimated size_bytes, oldest_entry, hits / misses / evictions)."""
+    return _result_cache.metrics()
 
 
 def get_agent_performance_metrics(agent_id: str, year: int = None) -> Dict[str, Any]:
@@ -1667,110 +1649,63 @@ def get_agent_renewal_pipeline(
         }
     """
     try:
-        from datetime import datetime, timedelta
-
-        # Get policies data
         url = os.getenv("SUPABASE_URL")
         key = os.getenv("SUPABASE_ANON_KEY")
 
         if not url or not key:
             return _empty_renewal_pipeline()
 
-        supabase = create_client(url, key)
-
-        # Build query - fetch policies for this agent
-        query = supabase.table('policies').select('*').eq('agent_id', agent_id)
-
-        if agency_id:
-            query = query.eq('agency_id', agency_id)
-
-        result = query.execute()
-
-        if not result.data:
-            return _empty_renewal_pipeline()
-
-        # Convert to DataFrame for easier processing
-        df = pd.DataFrame(result.data)
-
-        # Get pending renewals (policies that need renewal)
-        # A policy needs renewal if it's the latest transaction for that policy number
-        # and hasn't been cancelled or replaced
-
-        # Filter for relevant transaction types (exclude STMT, VOID)
-        valid_types = ['NBD', 'RWL', 'EDT', 'CAN', 'REI']
-        df = df[df['Transaction Type'].isin(valid_types)]
-
-        # For each unique Policy Number, get the latest transaction
-        df['Effective Date'] = pd.to_datetime(df['Effective Date'])
-        df_sorted = df.sort_values('Effective Date', ascending=False)
-        latest_policies = df_sorted.drop_duplicates(subset=['Policy Number'], keep='first')
-
-        # Exclude cancelled policies and policies that have been replaced (have Prior Policy Number filled in another policy)
-        latest_policies = latest_policies[latest_policies['Transaction Type'] != 'CAN']
-
-        # Check for replacements - policies with Prior Policy Number pointing to this policy
-        replaced_policy_numbers = set()
-        if 'Prior Policy Number' in df.columns:
-            replaced_policy_numbers = set(df[df['Prior Policy Number'].notna()]['Prior Policy Number'].unique())
-
-        # Filter out replaced policies
-        pending_renewals = latest_policies[~latest_policies['Policy Number'].isin(replaced_policy_numbers)].copy()
+        def load_policies() -> pd.DataFrame:
+            supabase = create_client(url, key)
+            query = supabase.table('policies').select('*').eq('agent_id', agent_id)
+            if agency_id:
+                query = query.eq('agency_id', agency_id)
+            result = query.execute()
+            return pd.DataFrame(result.data or [])
+
+        # Latest term per policy (renewed / cancelled excluded), shared with
+        # the Pending Policy Renewals page and cached until policies change
+        pipeline = get_renewal_pipeline_cache().get_or_load(
+            f"agent:{agent_id}:{agency_id or ''}", load_policies
+        )
+        pending_renewals = pipeline.pending(days_ahead=days_ahead, include_past_due=include_past_due)
 
         if pending_renewals.empty:
             return _empty_renewal_pipeline()
 
-        # Calculate expiration date (Effective Date + 365 days for annual policies)
-        # TODO: Handle different policy terms (6-month, monthly, etc.)
-        pending_renewals['Expiration Date'] = pending_renewals['Effective Date'] + pd.Timedelta(days=365)
-
-        # Calculate days until expiration
-        today = pd.Timestamp.now().normalize()
-        pending_renewals['Days Until Expiration'] = (pending_renewals['Expiration Date'] - today).dt.days
-
-        # Filter based on days_ahead parameter
-        if not include_past_due:
-            pending_renewals = pending_renewals[pending_renewals['Days Until Expiration'] >= 0]
-
-        pending_renewals = pending_renewals[pending_renewals['Days Until Expiration'] <= days_ahead]
-
-        # Calculate summary statistics
-        total_renewals = len(pending_renewals)
-        past_due = len(pending_renewals[pending_renewals['Days Until Expiration'] < 0])
-        due_7_days = len(pending_renewals[pending_renewals['Days Until Expiration'].between(0, 7)])
-        due_30_days = len(pending_renewals[pending_renewals['Days Until Expiration'].between(0, 30)])
-        due_60_days = len(pending_renewals[pending_renewals['Days Until Expiration'].between(0, 60)])
-        due_90_days = len(pending_renewals[pending_renewals['Days Until Expiration'].between(0, 90)])
-
-        # Calculate at-risk amounts
-        total_premium = pending_renewals['Premium'].fillna(0).sum() if 'Premium' in pending_renewals.columns else 0
-        total_commission = pending_renewals['Commission Amount'].fillna(0).sum() if 'Commission Amount' in pending_renewals.columns else 0
-
-        # Convert renewals to list of dicts
-        renewals_list = []
-        for _, row in pending_renewals.iterrows():
-            renewals_list.append({
-                'policy_number': row.get('Policy Number', ''),
-                'insured_name': row.get('Insured Name', ''),
-                'carrier': row.get('Carrier', ''),
-                'policy_type': row.get('Policy Type', ''),
-                'effective_date': row['Effective Date'].strftime('%Y-%m-%d'),
-                'expiration_date': row['Expiration Date'].strftime('%Y-%m-%d'),
-                'days_until_expiration': int(row['Days Until Expiration']),
-                'premium': float(row.get('Premium', 0)),
-                'commission': float(row.get('Commission Amount', 0)),
-                'is_past_due': row['Days Until Expiration'] < 0,
-                'urgency': _get_renewal_urgency(row['Days Until Expiration'])
-            })
+        summary = pipeline.summary(pending_renewals, premium_col='Premium', commission_col='Commission Amount')
+
+        def column(name, default):
+            if name in pending_renewals.columns:
+                return pending_renewals[name].where(pending_renewals[name].notna(), default)
+            return pd.Series(default, index=pending_renewals.index)
+
+        days = pending_renewals['Days Until Expiration'].astype(int)
+        effective = pd.to_datetime(column('Effective Date', None), errors='coerce')
+
+        renewals_list = pd.DataFrame({
+            'policy_number': column('Policy Number', ''),
+            'insured_name': column('Insured Name', ''),
+            'carrier': column('Carrier', ''),
+            'policy_type': column('Policy Type', ''),
+            'effective_date': effective.dt.strftime('%Y-%m-%d').fillna(''),
+            'expiration_date': pending_renewals['expiration_date'].dt.strftime('%Y-%m-%d'),
+            'days_until_expiration': days,
+            'premium': pd.to_numeric(column('Premium', 0), errors='coerce').fillna(0).astype(float),
+            'commission': pd.to_numeric(column('Commission Amount', 0), errors='coerce').fillna(0).astype(float),
+            'is_past_due': days < 0,
+            'urgency': urgency_levels(days)
+        }).to_dict('records')
 
         return {
-            'total_renewals': total_renewals,
-            'past_due': past_due,
-            'due_7_days': due_7_days,
-            'due_30_days': due_30_days,
-            'due_60_days': due_60_days,
-            'due_90_days': due_90_days,
-            'total_premium_at_risk': float(total_premium),
-            'total_commission_at_risk': float(total_commission),
+            'total_renewals': summary['total'],
+            'past_due': summary['past_due'],
+            'due_7_days': summary['due_7_days'],
+            'due_30_days': summary['due_30_days'],
+            'due_60_days': summary['due_60_days'],
+            'due_90_days': summary['due_90_days'],
+            'total_premium_at_risk': summary['premium_at_risk'],
+            'total_commission_at_risk': summary['commission_at_risk'],
             'renewals': renewals_list
         }
 
@@ -1794,20 +1729,6 @@ def _empty_renewal_pipeline() -> Dict[str, Any]:
     }
 
 
-def _get_renewal_urgency(days_until_expiration: int) -> str:
-    """Determine urgency level for a renewal."""
-    if days_until_expiration < 0:
-        return 'past_due'
-    elif days_until_expiration <= 7:
-        return 'critical'
-    elif days_until_expiration <= 30:
-        return 'high'
-    elif days_until_expiration <= 60:
-        return 'medium'
-    else:
-        return 'low'
-
-
 def get_agent_renewal_retention_rate(
     agent_id: str,
     agency_id: str = None,
@@ -2357,6 +2278,10 @@ def delete_notification(notification_id: str, supabase: Client = None) -> bool:
         return False
 
 
+RENEWAL_NOTIFICATION_PAGE_SIZE = 1000
+NOTIFICATION_INSERT_BATCH_SIZE = 500
+
+
 def generate_renewal_due_notifications(days_threshold: int = 7, supabase: Client = None) -> int:
     """
     Auto-generate notifications for upcoming renewals.
@@ -2369,71 +2294,188 @@ def generate_renewal_due_notifications(days_threshold: int = 7, supabase: Client
     Returns:
         int: Number of notifications created
     """
+    stats = run_renewal_notification_job(days_threshold=days_threshold, supabase=supabase)
+    return stats['notifications_created']
+
+
+def run_renewal_notification_job(
+    days_threshold: int = 7,
+    supabase: Client = None,
+    dry_run: bool = False,
+    today=None
+) -> Dict[str, Any]:
+    """
+    Set-based renewal notification job for all active agents.
+
+    Steps:
+    1. One paginated query for active policies of active agents, windowed to
+       effective dates on or before the threshold date
+    2. Next renewal (anniversary of the effective date) computed vectorized
+    3. Anti-join against the unread renewal_due notifications, loaded once
+    4. Bulk insert of the new notifications
+
+    Args:
+        days_threshold: Number of days before renewal to notify (default 7)
+        supabase: Supabase client
+        dry_run: Compute notifications without inserting them
+        today: Override for the current date (testing / backfills)
+
+    Returns:
+        dict: Job statistics (policies_scanned, due_in_window, already_notified,
+              notifications_created, notifications, elapsed_seconds, rows_per_second)
+    """
+    started = time.perf_counter()
+    stats = {
+        'policies_scanned': 0,
+        'due_in_window': 0,
+        'already_notified': 0,
+        'notifications_created': 0,
+        'notifications': [],
+        'dry_run': dry_run,
+        'elapsed_seconds': 0.0,
+        'rows_per_second': 0.0
+    }
+
     try:
         if not supabase:
             url = os.getenv("SUPABASE_URL")
             key = os.getenv("SUPABASE_ANON_KEY")
             supabase = create_client(url, key)
 
-        # Get all agents
-        agents = supabase.table('agents').select('id, full_name, agency_id').eq('is_active', True).execute()
-
-        if not agents.data:
-            return 0
-
-        notifications_created = 0
-        today = datetime.now().date()
-        threshold_date = today + timedelta(days=days_threshold)
+        today = pd.Timestamp(today or datetime.now().date()).normalize()
+        threshold_date = today + pd.Timedelta(days=days_threshold)
+
+        agents = supabase.table('agents').select('id').eq('is_active', True).execute()
+        agent_ids = [a['id'] for a in (agents.data or [])]
+        if not agent_ids:
+            return _finish_job_stats(stats, started)
+
+        # 1. Candidate policies for all agents in one windowed, paginated query
+        policies = _fetch_all_pages(
+            lambda: supabase.table('policies')
+            .select('id, agent_id, policy_number, insured_name, effective_date')
+            .eq('status', 'active')
+            .in_('agent_id', agent_ids)
+            .lte('effective_date', threshold_date.strftime('%Y-%m-%d'))
+            .order('id')
+        )
+        stats['policies_scanned'] = len(policies)
+        if policies.empty:
+            return _finish_job_stats(stats, started)
+
+        # 2. Next renewal date, vectorized
+        policies = policies.dropna(subset=['effective_date'])
+        policies['next_renewal'] = _next_anniversary(
+            pd.to_datetime(policies['effective_date'], errors='coerce'), today
+        )
+        policies['days_until_renewal'] = (policies['next_renewal'] - today).dt.days
+        due = policies[policies['days_until_renewal'].between(0, days_threshold)].copy()
+        stats['due_in_window'] = len(due)
+        if due.empty:
+            return _finish_job_stats(stats, started)
+
+        # 3. Anti-join against existing unread renewal notifications (loaded once)
+        existing = _fetch_all_pages(
+            lambda: supabase.table('agent_notifications')
+            .select('id, agent_id, message')
+            .eq('notification_type', 'renewal_due')
+            .eq('read', False)
+            .in_('agent_id', due['agent_id'].unique().tolist())
+            .order('id')
+        )
+        if not existing.empty:
+            existing['policy_number'] = existing['message'].str.extract(r'^Policy (.*?) for ', expand=False)
+            existing_keys = existing[['agent_id', 'policy_number']].dropna().drop_duplicates()
+            due = due.merge(existing_keys, on=['agent_id', 'policy_number'], how='left', indicator=True)
+            stats['already_notified'] = int((due['_merge'] == 'both').sum())
+            due = due[due['_merge'] == 'left_only'].drop(columns='_merge')
+
+        if due.empty:
+            return _finish_job_stats(stats, started)
+
+        # 4. Build and bulk insert notifications
+        days = due['days_until_renewal'].astype(int)
+        due['priority'] = np.select([days <= 3, days <= 7], ['critical', 'high'], default='normal')
+        insured = due['insured_name'].fillna('Client').astype(str)
+        created_at = datetime.utcnow().isoformat()
+
+        notifications = pd.DataFrame({
+            'agent_id': due['agent_id'],
+            'notification_type': 'renewal_due',
+            'title': 'Renewal Due in ' + days.astype(str) + ' Days',
+            'message': (
+                'Policy ' + due['policy_number'].astype(str) + ' for ' + insured +
+                ' is due for renewal on ' + due['next_renewal'].dt.strftime('%b %d, %Y')
+            ),
+            'action_url': '/my-policies?policy_id=' + due['id'].astype(str),
+            'priority': due['priority'],
+            'read': False,
+            'created_at': created_at
+        }).to_dict('records')
 
-        for agent in agents.data:
-            agent_id = agent['id']
+        stats['notifications'] = notifications
 
-            # Get upcoming renewals for this agent
-            policies = supabase.table('policies').select('*').eq('agent_id', agent_id).eq('status', 'active').execute()
+        if not dry_run:
+            for start in range(0, len(notifications), NOTIFICATION_INSERT_BATCH_SIZE):
+                batch = notifications[start:start + NOTIFICATION_INSERT_BATCH_SIZE]
+                result = supabase.table('agent_notifications').insert(batch).execute()
+                stats['notifications_created'] += len(result.data) if result.data else 0
+        else:
+            stats['notifications_created'] = len(notifications)
 
-            if not policies.data:
-                continue
+        return _finish_job_stats(stats, started)
 
-            for policy in policies.data:
-                if not policy.get('effective_date'):
-                    continue
+    except Exception as e:
+        print(f"Error generating renewal notifications: {e}")
+        return _finish_job_stats(stats, started)
 
-                effective_date = datetime.fromisoformat(policy['effective_date']).date()
 
-                # Calculate next renewal date (assuming 1-year term)
-                next_renewal = effective_date
-                while next_renewal <= today:
-                    next_renewal = next_renewal.replace(year=next_renewal.year + 1)
+def _fetch_all_pages(build_query, page_size: int = RENEWAL_NOTIFICATION_PAGE_SIZE) -> pd.DataFrame:
+    """Run a query page by page with .range() and return all rows as a DataFrame."""
+    rows = []
+    offset = 0
+    while True:
+        result = build_query().range(offset, offset + page_size - 1).execute()
+        page = result.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+        offset += page_size
+    return pd.DataFrame(rows)
 
-                days_until_renewal = (next_renewal - today).days
 
-                # Check if renewal is within threshold
-                if 0 <= days_until_renewal <= days_threshold:
-                    # Check if notification already exists for this policy
-                    existing = supabase.table('agent_notifications').select('id').eq('agent_id', agent_id).eq('notification_type', 'renewal_due').like('message', f'%{policy["policy_number"]}%').eq('read', False).execute()
+def _next_anniversary(effective_dates: pd.Series, today: pd.Timestamp) -> pd.Series:
+    """
+    Next renewal date for annual policies: the first anniversary of the
+    effective date that falls after today (future effective dates are
+    returned unchanged). Feb 29 anniversaries fall on Feb 28 in non-leap years.
+    """
+    effective_dates = effective_dates.dt.normalize()
 
-                    if not existing.data:
-                        # Create notification
-                        priority = 'critical' if days_until_renewal <= 3 else 'high' if days_until_renewal <= 7 else 'normal'
+    def anniversary_in(years: pd.Series) -> pd.Series:
+        parts = pd.DataFrame({
+            'year': years,
+            'month': effective_dates.dt.month,
+            'day': effective_dates.dt.day
+        })
+        leap_day = (parts['month'] == 2) & (parts['day'] == 29)
+        result = pd.to_datetime(parts, errors='coerce')
+        fallback = pd.to_datetime(parts.assign(day=parts['day'].where(~leap_day, 28)), errors='coerce')
+        return result.fillna(fallback)
 
-                        notification = create_notification(
-                            agent_id=agent_id,
-                            notification_type='renewal_due',
-                            title=f"Renewal Due in {days_until_renewal} Days",
-                            message=f"Policy {policy['policy_number']} for {policy.get('insured_name', 'Client')} is due for renewal on {next_renewal.strftime('%b %d, %Y')}",
-                            action_url=f"/my-policies?policy_id={policy['id']}",
-                            priority=priority,
-                            supabase=supabase
-                        )
+    this_year = anniversary_in(pd.Series(today.year, index=effective_dates.index))
+    next_year = anniversary_in(pd.Series(today.year + 1, index=effective_dates.index))
 
-                        if notification:
-                            notifications_created += 1
+    anniversary = this_year.where(this_year > today, next_year)
+    return effective_dates.where(effective_dates > today, anniversary)
 
-        return notifications_created
 
-    except Exception as e:
-        print(f"Error generating renewal notifications: {e}")
-        return 0
+def _finish_job_stats(stats: Dict[str, Any], started: float) -> Dict[str, Any]:
+    """Fill in timing and throughput for a batch job's stats dict."""
+    elapsed = time.perf_counter() - started
+    stats['elapsed_seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['policies_scanned'] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
 
 
 def generate_badge_notification(agent_id: str, badge: dict, supabase: Client = None) -> dict:
@@ -2648,16 +2690,211 @@ def update_agent_notification_preferences(agent_id: str, preferences: dict, supa
         return False
 
 
+COMMISSION_STATEMENT_TEMPLATE = EmailTemplate(
+    name='commission_statement',
+    subject="New Commission Statement - {statement_date}",
+    text_body="""
+Hello,
+
+Your commission statement for {statement_date} is now available.
+
+Total Commission: ${total_amount:,.2f}
+
+Log in to your agent portal to view the full details:
+https://yourapp.com/commission-statements
+
+Best regards,
+Your Agency Team
+        """,
+    html_body="""
+<html>
+<body style="font-family: Arial, sans-serif;">
+    <h2>New Commission Statement Available</h2>
+    <p>Hello,</p>
+    <p>Your commission statement for <strong>{statement_date}</strong> is now available.</p>
+    <div style="background-color: #f0f8ff; padding: 15px; border-radius: 5px; margin: 20px 0;">
+        <h3 style="margin: 0; color: #1f77b4;">Total Commission: ${total_amount:,.2f}</h3>
+    </div>
+    <p>
+        <a href="https://yourapp.com/commission-statements"
+           style="background-color: #1f77b4; color: white; padding: 10px 20px;
+                  text-decoration: none; border-radius: 5px; display: inline-block;">
+            View Statement
+        </a>
+    </p>
+    <p>Best regards,<br>Your Agency Team</p>
+</body>
+</html>
+        """,
+)
+
+CRITICAL_RENEWAL_TEMPLATE = EmailTemplate(
+    name='critical_renewal',
+    subject="URGENT: {subject_status} - {policy_number}",
+    text_body="""
+URGENT: Action Required
+
+Policy {policy_number} for {insured_name} is {status}.
+
+Renewal Date: {renewal_date}
+
+Please contact the client immediately to process this renewal.
+
+Log in to your agent portal to view details:
+https://yourapp.com/my-policies
+
+Best regards,
+Your Agency Team
+        """,
+    html_body="""
+<html>
+<body style="font-family: Arial, sans-serif;">
+    <div style="background-color: #ff4444; color: white; padding: 15px; border-radius: 5px; margin-bottom: 20px;">
+        <h2 style="margin: 0;">⚠️ URGENT: Action Required</h2>
+    </div>
+    <p>Policy <strong>{policy_number}</strong> for <strong>{insured_name}</strong> is <strong style="color: #ff4444;">{status}</strong>.</p>
+    <div style="background-color: #fff3cd; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #ffc107;">
+        <p style="margin: 0;"><strong>Renewal Date:</strong> {renewal_date}</p>
+    </div>
+    <p>Please contact the client immediately to process this renewal.</p>
+    <p>
+        <a href="https://yourapp.com/my-policies"
+           style="background-color: #ff4444; color: white; padding: 10px 20px;
+                  text-decoration: none; border-radius: 5px; display: inline-block;">
+            View Policy
+        </a>
+    </p>
+    <p>Best regards,<br>Your Agency Team</p>
+</body>
+</html>
+        """,
+)
+
+ACHIEVEMENT_TEMPLATE = EmailTemplate(
+    name='achievement',
+    subject="🏆 Achievement Unlocked: {badge_title}",
+    text_body="""
+Congratulations!
+
+You've earned a new achievement: {badge_title}
+
+{badge_description}
+
+Keep up the great work! Log in to see all your badges and achievements:
+https://yourapp.com/gamification
+
+Best regards,
+Your Agency Team
+        """,
+    html_body="""
+<html>
+<body style="font-family: Arial, sans-serif;">
+    <div style="background-color: #28a745; color: white; padding: 15px; border-radius: 5px; margin-bottom: 20px;">
+        <h2 style="margin: 0;">🏆 Achievement Unlocked!</h2>
+    </div>
+    <p>Congratulations!</p>
+    <div style="background-color: #f0f8ff; padding: 20px; border-radius: 5px; margin: 20px 0; text-align: center;">
+        <h3 style="margin: 0; color: #1f77b4;">{badge_title}</h3>
+        <p style="margin: 10px 0 0 0; color: #666;">{badge_description}</p>
+    </div>
+    <p>Keep up the great work!</p>
+    <p>
+        <a href="https://yourapp.com/gamification"
+           style="background-color: #28a745; color: white; padding: 10px 20px;
+                  text-decoration: none; border-radius: 5px; display: inline-block;">
+            View All Achievements
+        </a>
+    </p>
+    <p>Best regards,<br>Your Agency Team</p>
+</body>
+</html>
+        """,
+)
+
+WEEKLY_DIGEST_TEMPLATE = EmailTemplate(
+    name='weekly_digest',
+    subject="Your Weekly Performance Summary - {week_end}",
+    text_body="""
+Weekly Performance Summary
+
+Week of {week_start} - {week_end}
+
+📊 Your Performance:
+- Total Commission: ${total_commission:,.2f}
+- Policies Written: {policies_written}
+- Current Rank: #{rank} out of {total_agents} agents
+
+🏆 Keep up the great work!
+
+Log in to view detailed reports:
+https://yourapp.com/my-dashboard
+
+Best regards,
+Your Agency Team
+        """,
+    html_body="""
+<html>
+<body style="font-family: Arial, sans-serif;">
+    <h2>Weekly Performance Summary</h2>
+    <p style="color: #666;">Week of {week_start} - {week_end}</p>
+
+    <div style="background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0;">
+        <h3 style="margin-top: 0;">📊 Your Performance</h3>
+        <table style="width: 100%; border-collapse: collapse;">
+            <tr>
+                <td style="padding: 10px 0;"><strong>Total Commission:</strong></td>
+                <td style="padding: 10px 0; text-align: right; color: #28a745; font-size: 18px;">
+                    <strong>${total_commission:,.2f}</strong>
+                </td>
+            </tr>
+            <tr>
+                <td style="padding: 10px 0;"><strong>Policies Written:</strong></td>
+                <td style="padding: 10px 0; text-align: right; font-size: 18px;">
+                    <strong>{policies_written}</strong>
+                </td>
+            </tr>
+            <tr>
+                <td style="padding: 10px 0;"><strong>Current Rank:</strong></td>
+                <td style="padding: 10px 0; text-align: right; font-size: 18px;">
+                    <strong>#{rank} out of {total_agents} agents</strong>
+                </td>
+            </tr>
+        </table>
+    </div>
+
+    <p>🏆 Keep up the great work!</p>
+
+    <p>
+        <a href="https://yourapp.com/my-dashboard"
+           style="background-color: #1f77b4; color: white; padding: 10px 20px;
+                  text-decoration: none; border-radius: 5px; display: inline-block;">
+            View Detailed Reports
+        </a>
+    </p>
+
+    <p>Best regards,<br>Your Agency Team</p>
+</body>
+</html>
+        """,
+)
+
+
 def send_email_notification(
     to_email: str,
     subject: str,
     body: str,
     html_body: str = None,
     agent_id: str = None,
-    supabase: Client = None
+    supabase: Client = None,
+    template: str = None,
+    dedupe_key: str = None,
+    prefs: dict = None
 ) -> bool:
     """
-    Send an email notification to an agent.
+    Queue an email notification to an agent.
+
+    The message is written to the email outbox (utils.email_outbox) and
+    delivered by the outbox worker, so callers never wait on SMTP/SendGrid.
 
     Args:
         to_email: Recipient email address
@@ -2666,42 +2903,29 @@ def send_email_notification(
         html_body: Optional HTML email body
         agent_id: Optional agent UUID for preference checking
         supabase: Supabase client
+        template: Optional template name (for outbox reporting)
+        dedupe_key: Optional key; a second message with the same key is not queued
+        prefs: Already-loaded preferences for agent_id (skips the lookup)
 
     Returns:
-        bool: Success status
+        bool: True if the message is queued (or was already queued)
     """
     try:
         # Check agent preferences first
         if agent_id:
-            prefs = get_agent_notification_preferences(agent_id, supabase)
+            prefs = prefs or get_agent_notification_preferences(agent_id, supabase)
             if not prefs.get('email_enabled', True):
                 print(f"Email notifications disabled for agent {agent_id}")
                 return False
 
-        # TODO: Integrate with actual email service (SendGrid, AWS SES, etc.)
-        # For now, just log the email
-        print(f"\n{'='*60}")
-        print(f"EMAIL NOTIFICATION")
-        print(f"{'='*60}")
-        print(f"To: {to_email}")
-        print(f"Subject: {subject}")
-        print(f"\n{body}")
-        print(f"{'='*60}\n")
-
-        # In production, replace with actual email service
-        # Example with SendGrid:
-        # import sendgrid
-        # sg = sendgrid.SendGridAPIClient(api_key=os.getenv('SENDGRID_API_KEY'))
-        # message = Mail(
-        #     from_email='notifications@youragency.com',
-        #     to_emails=to_email,
-        #     subject=subject,
-        #     plain_text_content=body,
-        #     html_content=html_body
-        # )
-        # response = sg.send(message)
-        # return response.status_code == 202
-
+        get_email_outbox().enqueue(
+            to_email,
+            subject,
+            html_body or f"<pre>{body}</pre>",
+            body,
+            template=template,
+            dedupe_key=dedupe_key
+        )
         return True
 
     except Exception as e:
@@ -2709,6 +2933,23 @@ def send_email_notification(
         return False
 
 
+def _queue_template_email(template: EmailTemplate, agent_id: str, agent_email: str, prefs: dict,
+                          supabase: Client = None, dedupe_key: str = None, **context) -> bool:
+    """Render a cached template and queue it for the agent."""
+    rendered = template.render(**context)
+    return send_email_notification(
+        agent_email,
+        rendered['subject'],
+        rendered['text_body'],
+        rendered['html_body'],
+        agent_id,
+        supabase,
+        template=template.name,
+        dedupe_key=dedupe_key,
+        prefs=prefs
+    )
+
+
 def send_commission_statement_email(
     agent_id: str,
     agent_email: str,
@@ -2735,43 +2976,12 @@ def send_commission_statement_email(
         if not prefs.get('commission_statement_email', True):
             return False
 
-        subject = f"New Commission Statement - {statement_date}"
-        body = f"""
-Hello,
-
-Your commission statement for {statement_date} is now available.
-
-Total Commission: ${total_amount:,.2f}
-
-Log in to your agent portal to view the full details:
-https://yourapp.com/commission-statements
-
-Best regards,
-Your Agency Team
-        """
-
-        html_body = f"""
-<html>
-<body style="font-family: Arial, sans-serif;">
-    <h2>New Commission Statement Available</h2>
-    <p>Hello,</p>
-    <p>Your commission statement for <strong>{statement_date}</strong> is now available.</p>
-    <div style="background-color: #f0f8ff; padding: 15px; border-radius: 5px; margin: 20px 0;">
-        <h3 style="margin: 0; color: #1f77b4;">Total Commission: ${total_amount:,.2f}</h3>
-    </div>
-    <p>
-        <a href="https://yourapp.com/commission-statements"
-           style="background-color: #1f77b4; color: white; padding: 10px 20px;
-                  text-decoration: none; border-radius: 5px; display: inline-block;">
-            View Statement
-        </a>
-    </p>
-    <p>Best regards,<br>Your Agency Team</p>
-</body>
-</html>
-        """
-
-        return send_email_notification(agent_email, subject, body, html_body, agent_id, supabase)
+        return _queue_template_email(
+            COMMISSION_STATEMENT_TEMPLATE, agent_id, agent_email, prefs, supabase,
+            dedupe_key=f"commission_statement:{agent_id}:{statement_date}",
+            statement_date=statement_date,
+            total_amount=total_amount
+        )
 
     except Exception as e:
         print(f"Error sending commission statement email: {e}")
@@ -2809,52 +3019,21 @@ def send_critical_renewal_email(
             return False
 
         if days_until_renewal < 0:
-            subject = f"URGENT: Policy Renewal Past Due - {policy_number}"
+            subject_status = "Policy Renewal Past Due"
             status = f"PAST DUE by {abs(days_until_renewal)} days"
         else:
-            subject = f"URGENT: Policy Renewal Due in {days_until_renewal} Days - {policy_number}"
+            subject_status = f"Policy Renewal Due in {days_until_renewal} Days"
             status = f"Due in {days_until_renewal} days"
 
-        body = f"""
-URGENT: Action Required
-
-Policy {policy_number} for {insured_name} is {status}.
-
-Renewal Date: {renewal_date}
-
-Please contact the client immediately to process this renewal.
-
-Log in to your agent portal to view details:
-https://yourapp.com/my-policies
-
-Best regards,
-Your Agency Team
-        """
-
-        html_body = f"""
-<html>
-<body style="font-family: Arial, sans-serif;">
-    <div style="background-color: #ff4444; color: white; padding: 15px; border-radius: 5px; margin-bottom: 20px;">
-        <h2 style="margin: 0;">⚠️ URGENT: Action Required</h2>
-    </div>
-    <p>Policy <strong>{policy_number}</strong> for <strong>{insured_name}</strong> is <strong style="color: #ff4444;">{status}</strong>.</p>
-    <div style="background-color: #fff3cd; padding: 15px; border-radius: 5px; margin: 20px 0; border-left: 4px solid #ffc107;">
-        <p style="margin: 0;"><strong>Renewal Date:</strong> {renewal_date}</p>
-    </div>
-    <p>Please contact the client immediately to process this renewal.</p>
-    <p>
-        <a href="https://yourapp.com/my-policies"
-           style="background-color: #ff4444; color: white; padding: 10px 20px;
-                  text-decoration: none; border-radius: 5px; display: inline-block;">
-            View Policy
-        </a>
-    </p>
-    <p>Best regards,<br>Your Agency Team</p>
-</body>
-</html>
-        """
-
-        return send_email_notification(agent_email, subject, body, html_body, agent_id, supabase)
+        return _queue_template_email(
+            CRITICAL_RENEWAL_TEMPLATE, agent_id, agent_email, prefs, supabase,
+            dedupe_key=f"critical_renewal:{agent_id}:{policy_number}:{renewal_date}:{days_until_renewal}",
+            subject_status=subject_status,
+            status=status,
+            policy_number=policy_number,
+            insured_name=insured_name,
+            renewal_date=renewal_date
+        )
 
     except Exception as e:
         print(f"Error sending critical renewal email: {e}")
@@ -2887,46 +3066,12 @@ def send_achievement_email(
         if not prefs.get('achievement_email', True):
             return False
 
-        subject = f"🏆 Achievement Unlocked: {badge_title}"
-        body = f"""
-Congratulations!
-
-You've earned a new achievement: {badge_title}
-
-{badge_description}
-
-Keep up the great work! Log in to see all your badges and achievements:
-https://yourapp.com/gamification
-
-Best regards,
-Your Agency Team
-        """
-
-        html_body = f"""
-<html>
-<body style="font-family: Arial, sans-serif;">
-    <div style="background-color: #28a745; color: white; padding: 15px; border-radius: 5px; margin-bottom: 20px;">
-        <h2 style="margin: 0;">🏆 Achievement Unlocked!</h2>
-    </div>
-    <p>Congratulations!</p>
-    <div style="background-color: #f0f8ff; padding: 20px; border-radius: 5px; margin: 20px 0; text-align: center;">
-        <h3 style="margin: 0; color: #1f77b4;">{badge_title}</h3>
-        <p style="margin: 10px 0 0 0; color: #666;">{badge_description}</p>
-    </div>
-    <p>Keep up the great work!</p>
-    <p>
-        <a href="https://yourapp.com/gamification"
-           style="background-color: #28a745; color: white; padding: 10px 20px;
-                  text-decoration: none; border-radius: 5px; display: inline-block;">
-            View All Achievements
-        </a>
-    </p>
-    <p>Best regards,<br>Your Agency Team</p>
-</body>
-</html>
-        """
-
-        return send_email_notification(agent_email, subject, body, html_body, agent_id, supabase)
+        return _queue_template_email(
+            ACHIEVEMENT_TEMPLATE, agent_id, agent_email, prefs, supabase,
+            dedupe_key=f"achievement:{agent_id}:{badge_title}",
+            badge_title=badge_title,
+            badge_description=badge_description
+        )
 
     except Exception as e:
         print(f"Error sending achievement email: {e}")
@@ -2952,7 +3097,6 @@ def send_weekly_digest_email(agent_id: str, agent_email: str, supabase: Client =
             return False
 
         # Get agent stats for the week
-        from datetime import datetime, timedelta
         today = datetime.now()
         week_start = today - timedelta(days=7)
 
@@ -2960,77 +3104,18 @@ def send_weekly_digest_email(agent_id: str, agent_email: str, supabase: Client =
         performance = get_agent_performance_metrics(agent_id, period='last_7_days', supabase=supabase)
         ranking = get_agent_ranking(agent_id, supabase=supabase)
 
-        total_commission = performance.get('total_commission', 0)
-        policies_written = performance.get('policies_written', 0)
-        rank = ranking.get('rank', 'N/A')
-        total_agents = ranking.get('total_agents', 0)
-
-        subject = f"Your Weekly Performance Summary - {today.strftime('%b %d, %Y')}"
-        body = f"""
-Weekly Performance Summary
-
-Week of {week_start.strftime('%b %d')} - {today.strftime('%b %d, %Y')}
-
-📊 Your Performance:
-- Total Commission: ${total_commission:,.2f}
-- Policies Written: {policies_written}
-- Current Rank: #{rank} out of {total_agents} agents
-
-🏆 Keep up the great work!
-
-Log in to view detailed reports:
-https://yourapp.com/my-dashboard
-
-Best regards,
-Your Agency Team
-        """
-
-        html_body = f"""
-<html>
-<body style="font-family: Arial, sans-serif;">
-    <h2>Weekly Performance Summary</h2>
-    <p style="color: #666;">Week of {week_start.strftime('%b %d')} - {today.strftime('%b %d, %Y')}</p>
-
-    <div style="background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin: 20px 0;">
-        <h3 style="margin-top: 0;">📊 Your Performance</h3>
-        <table style="width: 100%; border-collapse: collapse;">
-            <tr>
-                <td style="padding: 10px 0;"><strong>Total Commission:</strong></td>
-                <td style="padding: 10px 0; text-align: right; color: #28a745; font-size: 18px;">
-                    <strong>${total_commission:,.2f}</strong>
-                </td>
-            </tr>
-            <tr>
-                <td style="padding: 10px 0;"><strong>Policies Written:</strong></td>
-                <td style="padding: 10px 0; text-align: right; font-size: 18px;">
-                    <strong>{policies_written}</strong>
-                </td>
-            </tr>
-            <tr>
-                <td style="padding: 10px 0;"><strong>Current Rank:</strong></td>
-                <td style="padding: 10px 0; text-align: right; font-size: 18px;">
-                    <strong>#{rank} out of {total_agents} agents</strong>
-                </td>
-            </tr>
-        </table>
-    </div>
-
-    <p>🏆 Keep up the great work!</p>
-
-    <p>
-        <a href="https://yourapp.com/my-dashboard"
-           style="background-color: #1f77b4; color: white; padding: 10px 20px;
-                  text-decoration: none; border-radius: 5px; display: inline-block;">
-            View Detailed Reports
-        </a>
-    </p>
-
-    <p>Best regards,<br>Your Agency Team</p>
-</body>
-</html>
-        """
-
-        return send_email_notification(agent_email, subject, body, html_body, agent_id, supabase)
+        iso_year, iso_week, _ = today.isocalendar()
+
+        return _queue_template_email(
+            WEEKLY_DIGEST_TEMPLATE, agent_id, agent_email, prefs, supabase,
+            dedupe_key=f"weekly_digest:{agent_id}:{iso_year}-W{iso_week:02d}",
+            week_start=week_start.strftime('%b %d'),
+            week_end=today.strftime('%b %d, %Y'),
+            total_commission=performance.get('total_commission', 0),
+            policies_written=performance.get('policies_written', 0),
+            rank=ranking.get('rank', 'N/A'),
+            total_agents=ranking.get('total_agents', 0)
+        )
 
     except Exception as e:
         print(f"Error sending weekly digest email: {e}")
@@ -3053,7 +3138,8 @@ def get_renewal_predictions_for_agent(agent_id: str, days_ahead: int = 90, supab
     Returns:
         List of policies with renewal predictions
     """
-    from utils.ml_models import RenewalPredictor
+    from utils.ml_models import categorize_renewal_risk_array, normalize_ledger_columns
+    from utils.model_registry import get_renewal_predictor
 
     try:
         if not supabase:
@@ -3069,32 +3155,28 @@ def get_renewal_predictions_for_agent(agent_id: str, days_ahead: int = 90, supab
 
         # Convert to DataFrame
         policies_df = pd.DataFrame(result.data)
+        days_until = (pd.to_datetime(policies_df['expiration_date']) - datetime.now()).dt.days
+        premium = (
+            pd.to_numeric(policies_df['premium'], errors='coerce').fillna(0)
+            if 'premium' in policies_df.columns else pd.Series(0, index=policies_df.index)
+        )
 
-        # Initialize predictor (would load trained model in production)
-        predictor = RenewalPredictor()
+        # Warm, process-wide model (loaded once per worker, hot-swapped on publish)
+        predictor = get_renewal_predictor()
 
-        # For now, generate predictions based on heuristics
-        # In production, would use trained ML model
-        predictions = []
-        for _, policy in policies_df.iterrows():
-            days_until = (pd.to_datetime(policy['expiration_date']) - datetime.now()).days
-
-            # Heuristic-based probability (would use ML model in production)
-            if policy.get('premium', 0) > 2000:
-                base_prob = 0.85
-            elif policy.get('premium', 0) > 1000:
-                base_prob = 0.75
-            else:
-                base_prob = 0.65
-
-            # Adjust for time
-            if days_until < 15:
-                base_prob -= 0.10
-            elif days_until < 30:
-                base_prob -= 0.05
+        if predictor is not None:
+            renewal_prob = predictor.score_batch(normalize_ledger_columns(policies_df))
+        else:
+            # No published model yet - heuristic probability from premium and timing
+            base_prob = np.select([premium > 2000, premium > 1000], [0.85, 0.75], default=0.65)
+            base_prob = base_prob - np.select([days_until < 15, days_until < 30], [0.10, 0.05], default=0.0)
+            renewal_prob = np.clip(base_prob, 0, 1)
 
-            renewal_prob = max(0, min(1, base_prob))
+        renewal_prob = np.round(renewal_prob, 3)
+        risks = categorize_renewal_risk_array(renewal_prob)
 
+        predictions = []
+        for i, policy in enumerate(policies_df.to_dict('records')):
             predictions.append({
                 'policy_id': policy['id'],
                 'policy_number': policy.get('policy_number', 'N/A'),
@@ -3103,10 +3185,10 @@ def get_renewal_predictions_for_agent(agent_id: str, days_ahead: int = 90, supab
                 'carrier': policy.get('carrier', 'Unknown'),
                 'premium': policy.get('premium', 0),
                 'expiration_date': policy['expiration_date'],
-                'days_until_renewal': days_until,
-                'renewal_probability': round(renewal_prob, 3),
-                'renewal_risk': _categorize_renewal_risk(renewal_prob),
-                'recommendation': _generate_renewal_recommendation(renewal_prob, days_until)
+                'days_until_renewal': int(days_until.iloc[i]),
+                'renewal_probability': float(renewal_prob[i]),
+                'renewal_risk': str(risks[i]),
+                'recommendation': _generate_renewal_recommendation(renewal_prob[i], days_until.iloc[i])
             })
 
         return predictions
@@ -3214,23 +3296,15 @@ def get_all_clients_clv(agency_id: str, supabase=None) -> List[Dict]:
 
         policies_df = pd.DataFrame(result.data)
 
-        # Group by client and calculate CLV
+        # Calculate CLV for every client in one columnar pass
         calculator = CLVCalculator()
-        clv_results = []
-
-        for client_name, client_policies in policies_df.groupby('insured_name'):
-            try:
-                clv_data = calculator.calculate_clv(client_policies)
-                clv_data['client_name'] = client_name
-                clv_results.append(clv_data)
-            except Exception as e:
-                print(f"Error calculating CLV for {client_name}: {e}")
-                continue
+        clv_df = calculator.calculate_clv_for_all_clients(policies_df)
+        clv_df = clv_df.rename(columns={'client_id': 'client_name'})
 
         # Sort by CLV descending
-        clv_results.sort(key=lambda x: x['clv'], reverse=True)
+        clv_df = clv_df.sort_values('clv', ascending=False, kind='stable')
 
-        return clv_results
+        return clv_df.to_dict('records')
 
     except Exception as e:
         print(f"Error getting all clients CLV: {e}")
@@ -0,0 +1,283 @@
+"""
+Bulk Renewal
+Renews many pending policies in one action from the Pending Policy Renewals
+page.
+
+    1. duplicate_for_renewal: new term dates for every selected policy at
+       once (new Effective Date = old X-DATE, new X-DATE = + Policy Term
+       months), computed per distinct term length instead of per row
+    2. reserve_transaction_ids: all new Transaction IDs generated locally and
+       checked against the policies table with one in_() query per batch
+    3. bulk_renew_policies: policies and renewal_history rows are written
+       with batched inserts; the caller refreshes the cached ledger once
+
+The single-policy renewal form on the same page uses the same cleared
+fields and term calculation.
+"""
+
+import datetime
+import json
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from utils.editor_changes import SAVE_BATCH_SIZE, fetch_existing_ids, to_json_value
+
+# Policy Term (months) used when a policy has none
+DEFAULT_TERM_MONTHS = 6
+
+# Amounts and notes that belong to the old term - re-entered on the renewal
+RENEWAL_CLEARED_FIELDS = [
+    'Premium Sold', 'Commissionable Premium', 'Commission %',
+    'Commission $', 'Producer Commission %', 'Producer Commission $',
+    'Override %', 'Override Commission', 'Commission Already Earned',
+    'Commission Already Received', 'Balance Owed', 'Renewal/Bonus Percentage',
+    'Renewal Amount', 'Not Paid/Paid', 'Agent Paid Amount (STMT)',
+    'Agency Comm Received (STMT)', 'NOTES'
+]
+
+# Grid, bookkeeping and database-generated columns never copied to the renewal
+DUPLICATE_EXCLUDED_FIELDS = [
+    'Edit', 'Select', 'Status', 'created_at', 'updated_at', '_id',
+    'reconciliation_status', 'reconciliation_id', 'reconciled_at', 'is_reconciliation_entry'
+]
+
+# Renewal helper columns (from get_pending_renewals / duplicate_for_renewal)
+RENEWAL_HELPER_COLUMNS = ['expiration_date', 'Days Until Expiration', 'new_effective_date', 'new_expiration_date']
+
+# Rounds of collision checks before falling back to timestamp-based IDs
+MAX_RESERVE_ROUNDS = 5
+
+
+def renewal_term_end(new_effective: pd.Series, policy_terms: Optional[pd.Series],
+                     default_months: int = DEFAULT_TERM_MONTHS) -> pd.Series:
+    """New X-DATE: new_effective + Policy Term months (default_months when missing or 0)."""
+    months = pd.Series(default_months, index=new_effective.index)
+    if policy_terms is not None:
+        terms = pd.to_numeric(policy_terms, errors='coerce').fillna(0).astype(int)
+        months = terms.where(terms != 0, default_months)
+    new_expiration = pd.Series(pd.NaT, index=new_effective.index, dtype='datetime64[ns]')
+    # DateOffset(months=n) needs a scalar n - one vectorized add per distinct term length
+    for term_months in months.unique():
+        mask = months == term_months
+        shifted = new_effective[mask] + pd.DateOffset(months=int(term_months))
+        new_expiration[mask] = shifted.astype('datetime64[ns]')
+    return new_expiration
+
+
+def duplicate_for_renewal(
+    df: pd.DataFrame,
+    effective_col: str = 'Effective Date',
+    x_date_col: str = 'X-DATE',
+    type_col: str = 'Transaction Type',
+    policy_term_col: str = 'Policy Term'
+) -> pd.DataFrame:
+    """
+    Copies of the given pending renewals with next-term dates and type RWL.
+
+    df must have an expiration_date column (the current term's X-DATE). Adds
+    new_effective_date / new_expiration_date helper columns and writes the
+    new dates as YYYY-MM-DD strings.
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    renewed_df = df.copy()
+    renewed_df['new_effective_date'] = pd.to_datetime(renewed_df['expiration_date'], errors='coerce')
+    renewed_df['new_expiration_date'] = renewal_term_end(
+        renewed_df['new_effective_date'],
+        renewed_df[policy_term_col] if policy_term_col in renewed_df.columns else None
+    )
+
+    renewed_df[effective_col] = renewed_df['new_effective_date'].dt.strftime('%Y-%m-%d')
+    renewed_df[x_date_col] = renewed_df['new_expiration_date'].dt.strftime('%Y-%m-%d')
+    renewed_df[type_col] = "RWL"
+    return renewed_df
+
+
+def reserve_transaction_ids(
+    supabase,
+    count: int,
+    generate_id: Callable[[], str],
+    id_col: str = 'Transaction ID',
+    table: str = 'policies',
+    batch_size: int = SAVE_BATCH_SIZE
+) -> List[str]:
+    """
+    count Transaction IDs that are unique among themselves and not yet used
+    in the table. Candidates are checked in bulk; only collisions are
+    regenerated and re-checked.
+    """
+    reserved: List[str] = []
+    taken = set()
+    for _ in range(MAX_RESERVE_ROUNDS):
+        needed = count - len(reserved)
+        if needed <= 0:
+            break
+        candidates = []
+        for _ in range(needed * 10):
+            candidate = generate_id()
+            if candidate not in taken:
+                taken.add(candidate)
+                candidates.append(candidate)
+                if len(candidates) == needed:
+                    break
+        if not candidates:
+            break
+        try:
+            existing = fetch_existing_ids(supabase, id_col, candidates, table=table, batch_size=batch_size)
+        except Exception as e:
+            print(f"Warning: Could not check for duplicate Transaction IDs: {e}")
+            existing = set()
+        reserved.extend(c for c in candidates if c not in existing)
+
+    # Same fallback as generate_unique_transaction_id, numbered per renewal
+    timestamp = datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')[:17]
+    while len(reserved) < count:
+        reserved.append(f"TXN{timestamp}{len(reserved):04d}")
+    return reserved
+
+
+def prepare_renewal_rows(
+    renewed_df: pd.DataFrame,
+    transaction_ids: List[str],
+    id_col: str = 'Transaction ID',
+    agent_comm_rate: float = None
+) -> pd.DataFrame:
+    """
+    New RWL transactions from duplicate_for_renewal output: fresh IDs, Prior
+    Policy Number chained to the renewed policy, old-term amounts cleared.
+    """
+    excluded = DUPLICATE_EXCLUDED_FIELDS + RENEWAL_HELPER_COLUMNS
+    rows = renewed_df.drop(columns=[c for c in excluded if c in renewed_df.columns])
+    rows[id_col] = transaction_ids
+    if 'Policy Number' in rows.columns:
+        rows['Prior Policy Number'] = rows['Policy Number']
+    for field in RENEWAL_CLEARED_FIELDS:
+        if field in rows.columns:
+            rows[field] = None
+    if agent_comm_rate is not None and 'Agent Comm %' in rows.columns:
+        rows['Agent Comm %'] = agent_comm_rate
+    return rows
+
+
+def renewal_history_rows(
+    originals: pd.DataFrame,
+    renewals: pd.DataFrame,
+    id_col: str = 'Transaction ID',
+    renewed_by: str = 'User'
+) -> List[Dict]:
+    """One renewal_history row per renewal, tagged with a shared bulk_renewal_id."""
+    renewal_timestamp = datetime.datetime.now().isoformat()
+    bulk_id = str(uuid.uuid4())
+    history = []
+    for original_id, new_id, original_policy, new_policy in zip(
+        originals[id_col], renewals[id_col],
+        originals.get('Policy Number', pd.Series('', index=originals.index)),
+        renewals.get('Policy Number', pd.Series('', index=renewals.index))
+    ):
+        history.append({
+            "renewal_timestamp": renewal_timestamp,
+            "renewed_by": renewed_by,
+            "original_transaction_id": original_id,
+            "new_transaction_id": new_id,
+            "details": json.dumps({
+                "count": 1,
+                "renewed_ids": [new_id],
+                "original_policy_number": to_json_value(original_policy) or '',
+                "new_policy_number": to_json_value(new_policy) or '',
+                "policy_chain": True,
+                "bulk_renewal_id": bulk_id,
+                "bulk_count": len(renewals)
+            })
+        })
+    return history
+
+
+def _insert_batches(supabase, table: str, rows: List[Dict], batch_size: int, stats: Dict) -> List[Dict]:
+    """Insert rows in batches; returns the rows that were written."""
+    written = []
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        try:
+            supabase.table(table).insert(chunk).execute()
+            written.extend(chunk)
+        except Exception as e:
+            stats['errors'].append(f"Error inserting {len(chunk)} rows into {table}: {e}")
+        stats['round_trips'] += 1
+    return written
+
+
+def bulk_renew_policies(
+    supabase,
+    pending: pd.DataFrame,
+    generate_id: Callable[[], str],
+    columns: Optional[Dict[str, str]] = None,
+    prepare_insert: Callable[[Dict], Dict] = None,
+    agent_comm_rate: float = None,
+    renewed_by: str = 'User',
+    batch_size: int = SAVE_BATCH_SIZE
+) -> Dict:
+    """
+    Renew every row of pending (rows from get_pending_renewals).
+
+    Args:
+        supabase: Supabase client
+        pending: Selected pending renewals (with expiration_date)
+        generate_id: Transaction ID generator (commission_app.generate_transaction_id)
+        columns: Mapped names for 'Effective Date', 'X-DATE', 'Transaction Type',
+            'Policy Term' and 'Transaction ID' (defaults to the field names)
+        prepare_insert: Per-row hook applied before insert (clean UI fields,
+            add ownership fields)
+        agent_comm_rate: Agent Comm % for the renewals (the user's renewal rate)
+        renewed_by: renewal_history.renewed_by
+        batch_size: Max rows per insert request
+
+    Returns:
+        dict with renewed, history_rows, transaction_ids, renewed_indexes
+        (index labels of pending that were renewed), round_trips and errors
+    """
+    columns = columns or {}
+    id_col = columns.get('Transaction ID', 'Transaction ID')
+    stats = {'renewed': 0, 'history_rows': 0, 'transaction_ids': [], 'renewed_indexes': [],
+             'round_trips': 0, 'errors': []}
+    if pending.empty:
+        return stats
+
+    renewed_df = duplicate_for_renewal(
+        pending,
+        effective_col=columns.get('Effective Date', 'Effective Date'),
+        x_date_col=columns.get('X-DATE', 'X-DATE'),
+        type_col=columns.get('Transaction Type', 'Transaction Type'),
+        policy_term_col=columns.get('Policy Term', 'Policy Term')
+    )
+    missing_dates = renewed_df['new_effective_date'].isna()
+    for original_id in pending.loc[missing_dates.to_numpy(), id_col] if id_col in pending.columns else []:
+        stats['errors'].append(f"Skipped {original_id}: no X-DATE to renew from")
+    renewed_df = renewed_df[~missing_dates]
+    if renewed_df.empty:
+        return stats
+
+    transaction_ids = reserve_transaction_ids(supabase, len(renewed_df), generate_id, id_col, batch_size=batch_size)
+    stats['round_trips'] += -(-len(renewed_df) // batch_size)
+    rows = prepare_renewal_rows(renewed_df, transaction_ids, id_col, agent_comm_rate)
+
+    payloads = []
+    for record in rows.to_dict('records'):
+        payload = prepare_insert(record) if prepare_insert else record
+        payloads.append({col: to_json_value(value) for col, value in payload.items()})
+    written = _insert_batches(supabase, 'policies', payloads, batch_size, stats)
+    written_ids = {row[id_col] for row in written}
+
+    renewed_mask = rows[id_col].isin(written_ids).to_numpy()
+    originals = pending.loc[renewed_df.index[renewed_mask]]
+    renewals = rows[renewed_mask]
+    stats['renewed'] = len(renewals)
+    stats['transaction_ids'] = renewals[id_col].tolist()
+    stats['renewed_indexes'] = originals.index.tolist()
+
+    if len(renewals):
+        history = renewal_history_rows(originals, renewals, id_col, renewed_by)
+        stats['history_rows'] = len(_insert_batches(supabase, 'renewal_history', history, batch_size, stats))
+    return stats
@@ -0,0 +1,264 @@
+"""
+Editor Change Tracking
+Diff-based saving for st.data_editor grids backed by the policies table.
+
+Instead of writing every visible row on Save, the edited frame is compared
+with the frame that was loaded into the editor, keyed by Transaction ID:
+
+    - only rows with at least one changed cell are written, and only the
+      changed cells are sent
+    - existence of candidate new rows is checked with one in_() query
+    - updates are sent as batched upserts, one per distinct set of changed
+      columns (PostgREST fills columns missing from a row with NULL/DEFAULT,
+      so rows with different changed columns must not share a request)
+
+Used by the Edit Policy Transactions page in commission_app.py.
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+# Columns that only exist in the editor grid
+EDITOR_UI_COLUMNS = ('Select', '_id')
+
+# Max rows per in_() check / upsert / insert request
+SAVE_BATCH_SIZE = 500
+
+
+def _is_blank(value) -> bool:
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return value.strip() == ''
+    try:
+        return bool(pd.isna(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def to_json_value(value):
+    """Convert NaN/NaT to None and NumPy / pandas scalars to plain Python values."""
+    if _is_blank(value) and not isinstance(value, str):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def diff_editor_frames(
+    original: pd.DataFrame,
+    edited: pd.DataFrame,
+    id_col: str,
+    ignore_columns: Iterable[str] = EDITOR_UI_COLUMNS
+) -> Dict:
+    """
+    Compare an edited grid with the frame it was loaded from.
+
+    Args:
+        original: Frame shown in the editor when the data was loaded
+        edited: Frame returned by st.data_editor
+        id_col: Row key column (Transaction ID)
+        ignore_columns: UI-only columns that are never saved
+
+    Returns:
+        dict with:
+            updates: [{id_col: id, changed_col: new_value, ...}, ...]
+            new_rows: full row dicts whose id is blank or not in original
+            changed_cells: number of changed cells across updates
+            unchanged_rows: rows skipped because nothing changed
+    """
+    ignore = set(ignore_columns) | {id_col}
+    columns = [c for c in edited.columns if c not in ignore]
+    original = original if original is not None else pd.DataFrame(columns=edited.columns)
+
+    edited_ids = edited[id_col] if id_col in edited.columns else pd.Series(None, index=edited.index, dtype=object)
+    blank_id = edited_ids.map(_is_blank)
+    edited_keys = edited_ids.astype(str)
+
+    if id_col in original.columns:
+        base = original[~original[id_col].map(_is_blank)].copy()
+        base.index = base[id_col].astype(str)
+        base = base[~base.index.duplicated(keep='last')]
+    else:
+        base = pd.DataFrame(columns=original.columns)
+
+    known = ~blank_id & edited_keys.isin(base.index)
+    new_rows = [
+        {col: row[col] for col in edited.columns if col not in set(ignore_columns)}
+        for _, row in edited[~known].iterrows()
+    ]
+
+    current = edited[known].copy()
+    current.index = edited_keys[known]
+    current = current[~current.index.duplicated(keep='last')]
+
+    shared = [c for c in columns if c in base.columns]
+    before = base.loc[current.index, shared].astype(object)
+    after = current[shared].astype(object)
+
+    same = (before == after) | (before.isna() & after.isna())
+    # A column that did not exist before counts as changed when it holds a value
+    added = [c for c in columns if c not in base.columns]
+
+    changed_mask = ~same
+    updates = []
+    changed_cells = 0
+    for key, row_mask in changed_mask.iterrows():
+        changed_cols = [c for c in shared if row_mask[c]]
+        changed_cols += [c for c in added if not _is_blank(current.at[key, c])]
+        if not changed_cols:
+            continue
+        update = {id_col: current.at[key, id_col]}
+        for col in changed_cols:
+            update[col] = current.at[key, col]
+        updates.append(update)
+        changed_cells += len(changed_cols)
+
+    return {
+        'updates': updates,
+        'new_rows': new_rows,
+        'changed_cells': changed_cells,
+        'unchanged_rows': len(current) - len(updates),
+    }
+
+
+def _scope_query(query, user_id: str = None, user_email: str = None):
+    if user_id:
+        return query.eq('user_id', user_id)
+    if user_email:
+        return query.eq('user_email', user_email)
+    return query
+
+
+def fetch_existing_ids(
+    supabase,
+    id_col: str,
+    ids: Iterable,
+    user_id: str = None,
+    user_email: str = None,
+    table: str = 'policies',
+    batch_size: int = SAVE_BATCH_SIZE
+) -> Set[str]:
+    """Return which of `ids` already exist for this user (one in_() query per batch)."""
+    ids = list(dict.fromkeys(str(i) for i in ids if not _is_blank(i)))
+    existing = set()
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        query = supabase.table(table).select(f'"{id_col}"').in_(f'"{id_col}"', chunk)
+        result = _scope_query(query, user_id, user_email).execute()
+        existing.update(str(row[id_col]) for row in (result.data or []))
+    return existing
+
+
+def save_editor_changes(
+    supabase,
+    changes: Dict,
+    id_col: str,
+    user_id: str = None,
+    user_email: str = None,
+    clean_value: Callable = None,
+    prepare_insert: Callable[[Dict], Optional[Dict]] = None,
+    table: str = 'policies',
+    batch_size: int = SAVE_BATCH_SIZE
+) -> Dict:
+    """
+    Write the output of diff_editor_frames.
+
+    Args:
+        supabase: Supabase client
+        changes: Result of diff_editor_frames
+        id_col: Row key column
+        user_id / user_email: Owner scope for the existence check and written rows
+        clean_value: Optional per-value cleaner applied before writing
+        prepare_insert: Builds the insert payload for a new row (assign IDs,
+            add ownership fields); return None to skip the row
+        table: Target table
+        batch_size: Max rows per request
+
+    Returns:
+        dict with updated_rows, inserted_rows, skipped_rows, changed_cells,
+        round_trips and errors
+    """
+    clean = clean_value or (lambda value: value)
+    stats = {
+        'updated_rows': 0,
+        'inserted_rows': 0,
+        'skipped_rows': 0,
+        'changed_cells': changes.get('changed_cells', 0),
+        'round_trips': 0,
+        'errors': [],
+    }
+    owner = {}
+    if user_id:
+        owner['user_id'] = user_id
+    if user_email:
+        owner['user_email'] = user_email
+
+    # One existence check for every row that may need a write
+    candidate_ids = [u[id_col] for u in changes['updates']]
+    candidate_ids += [r.get(id_col) for r in changes['new_rows']]
+    existing_ids = set()
+    if any(not _is_blank(i) for i in candidate_ids):
+        existing_ids = fetch_existing_ids(supabase, id_col, candidate_ids, user_id, user_email, table, batch_size)
+        stats['round_trips'] += -(-len({str(i) for i in candidate_ids if not _is_blank(i)}) // batch_size)
+
+    # Updates: group rows by the set of changed columns
+    groups = {}
+    for update in changes['updates']:
+        if str(update[id_col]) not in existing_ids:
+            stats['skipped_rows'] += 1
+            continue
+        payload = {col: to_json_value(clean(value)) for col, value in update.items() if col != id_col}
+        payload[id_col] = to_json_value(update[id_col])
+        payload.update(owner)
+        groups.setdefault(tuple(sorted(payload)), []).append(payload)
+
+    for rows in groups.values():
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            try:
+                supabase.table(table).upsert(chunk, on_conflict=f'"{id_col}"').execute()
+                stats['round_trips'] += 1
+                stats['updated_rows'] += len(chunk)
+            except Exception as e:
+                # Databases without the Transaction ID unique constraint reject
+                # ON CONFLICT - fall back to one update per changed row
+                print(f"Batched upsert failed ({e}); updating {len(chunk)} rows individually")
+                stats['round_trips'] += 1
+                for payload in chunk:
+                    values = {col: value for col, value in payload.items() if col != id_col and col not in owner}
+                    query = supabase.table(table).update(values).eq(f'"{id_col}"', payload[id_col])
+                    try:
+                        _scope_query(query, user_id, user_email).execute()
+                        stats['round_trips'] += 1
+                        stats['updated_rows'] += 1
+                    except Exception as update_error:
+                        stats['errors'].append(f"Error updating record {payload[id_col]}: {update_error}")
+
+    # Inserts: new rows whose ID is not already in the table
+    inserts = []
+    for row in changes['new_rows']:
+        if not _is_blank(row.get(id_col)) and str(row[id_col]) in existing_ids:
+            print(f"WARNING: Skipping duplicate insert - Transaction ID {row[id_col]} already exists")
+            stats['skipped_rows'] += 1
+            continue
+        payload = prepare_insert(dict(row)) if prepare_insert else dict(row)
+        if payload is None:
+            stats['skipped_rows'] += 1
+            continue
+        inserts.append({col: to_json_value(clean(value)) for col, value in payload.items()})
+
+    for start in range(0, len(inserts), batch_size):
+        chunk = inserts[start:start + batch_size]
+        try:
+            supabase.table(table).insert(chunk).execute()
+            stats['round_trips'] += 1
+            stats['inserted_rows'] += len(chunk)
+        except Exception as e:
+            stats['errors'].append(f"Error inserting {len(chunk)} new records: {e}")
+
+    return stats
@@ -0,0 +1,399 @@
+"""
+Email Outbox
+Persistent queue and batched delivery worker for notification / digest emails.
+Phase 2, Sprint 4: Email Notifications
+
+Senders enqueue messages (email_utils.queue_email, or the send_*_email
+helpers in utils.agent_data_helpers) and return immediately. A worker
+(scripts/run_email_outbox_worker.py) drains the queue:
+
+    - every worker thread keeps ONE SMTP / SendGrid session for the whole run
+    - all threads share a token-bucket rate limit (messages per second)
+    - transient failures are retried with exponential backoff; permanent
+      rejections and messages out of attempts are marked 'failed'
+    - each run returns throughput metrics
+
+The queue is a local SQLite database (EMAIL_OUTBOX_PATH, default
+email_outbox.db) so enqueueing needs no network round trip and survives
+restarts. Messages left in 'sending' by a crashed worker are reclaimed
+after LEASE_SECONDS.
+"""
+
+import os
+import sqlite3
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_OUTBOX_PATH = os.environ.get('EMAIL_OUTBOX_PATH', 'email_outbox.db')
+
+STATUS_QUEUED = 'queued'
+STATUS_SENDING = 'sending'
+STATUS_SENT = 'sent'
+STATUS_FAILED = 'failed'
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_CAP_SECONDS = 3600
+LEASE_SECONDS = 300
+CLAIM_BATCH_SIZE = 200
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    to_email TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    html_body TEXT NOT NULL,
+    text_body TEXT,
+    template TEXT,
+    dedupe_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    sent_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox (status, next_attempt_at);
+"""
+
+
+class PermanentEmailError(Exception):
+    """Delivery failed in a way retrying will not fix (bad recipient, rejected content)."""
+
+
+# =============================================================================
+# Templates
+# =============================================================================
+
+_formatter = string.Formatter()
+
+
+@lru_cache(maxsize=256)
+def _compile(source: str) -> tuple:
+    """Parse a str.format template once; later renders only substitute fields."""
+    return tuple(_formatter.parse(source))
+
+
+def _render(source: str, context: Dict) -> str:
+    parts = []
+    for literal, field, spec, conversion in _compile(source):
+        parts.append(literal)
+        if field is not None:
+            value, _ = _formatter.get_field(field, (), context)
+            value = _formatter.convert_field(value, conversion)
+            parts.append(_formatter.format_field(value, spec or ''))
+    return ''.join(parts)
+
+
+class EmailTemplate:
+    """
+    A named subject / text / HTML triple using str.format placeholders.
+
+    Templates are parsed once per process and cached, so rendering the same
+    template for hundreds of agents only performs field substitution.
+    """
+
+    def __init__(self, name: str, subject: str, text_body: str, html_body: str):
+        self.name = name
+        self.subject = subject
+        self.text_body = text_body
+        self.html_body = html_body
+
+    def render(self, **context) -> Dict[str, str]:
+        """Return {'subject', 'text_body', 'html_body'} for the given context."""
+        return {
+            'subject': _render(self.subject, context),
+            'text_body': _render(self.text_body, context),
+            'html_body': _render(self.html_body, context),
+        }
+
+
+# =============================================================================
+# Queue
+# =============================================================================
+
+class EmailOutbox:
+    """SQLite-backed outbox. Safe to share between threads in one process."""
+
+    def __init__(self, path: str = None):
+        """Open (and create if needed) the outbox database."""
+        self.path = path or DEFAULT_OUTBOX_PATH
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        if self.path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(_SCHEMA)
+
+    def enqueue(self, to_email: str, subject: str, html_body: str, text_body: str = None,
+                template: str = None, dedupe_key: str = None) -> Optional[int]:
+        """
+        Queue one message.
+
+        Returns:
+            Message id, or None if a message with the same dedupe_key exists
+        """
+        ids = self.enqueue_many([{
+            'to_email': to_email, 'subject': subject, 'html_body': html_body,
+            'text_body': text_body, 'template': template, 'dedupe_key': dedupe_key,
+        }])
+        return ids[0]
+
+    def enqueue_many(self, messages: List[Dict]) -> List[Optional[int]]:
+        """Queue several messages in one transaction (ids in input order, None for duplicates)."""
+        now = time.time()
+        created_at = datetime.utcnow().isoformat()
+        ids = []
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                for m in messages:
+                    cursor = self._conn.execute(
+                        """INSERT OR IGNORE INTO email_outbox
+                           (to_email, subject, html_body, text_body, template, dedupe_key,
+                            status, next_attempt_at, created_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                        (m['to_email'], m['subject'], m['html_body'], m.get('text_body'),
+                         m.get('template'), m.get('dedupe_key'), STATUS_QUEUED, now, created_at))
+                    ids.append(cursor.lastrowid if cursor.rowcount else None)
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return ids
+
+    def claim_batch(self, limit: int = CLAIM_BATCH_SIZE, now: float = None) -> List[Dict]:
+        """
+        Atomically move up to `limit` due messages to 'sending' and return them.
+
+        Due means queued with next_attempt_at <= now, or stuck in 'sending'
+        longer than LEASE_SECONDS.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    """SELECT * FROM email_outbox
+                       WHERE (status = ? AND next_attempt_at <= ?)
+                          OR (status = ? AND claimed_at <= ?)
+                       ORDER BY next_attempt_at, id
+                       LIMIT ?""",
+                    (STATUS_QUEUED, now, STATUS_SENDING, now - LEASE_SECONDS, limit)).fetchall()
+                if rows:
+                    self._conn.executemany(
+                        'UPDATE email_outbox SET status = ?, claimed_at = ? WHERE id = ?',
+                        [(STATUS_SENDING, now, row['id']) for row in rows])
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [dict(row) for row in rows]
+
+    def mark_sent(self, message_ids: List[int]):
+        """Record successful delivery."""
+        if not message_ids:
+            return
+        sent_at = datetime.utcnow().isoformat()
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE email_outbox SET status = ?, sent_at = ?, attempts = attempts + 1, last_error = NULL WHERE id = ?',
+                [(STATUS_SENT, sent_at, message_id) for message_id in message_ids])
+
+    def mark_retry(self, message_id: int, error: str, next_attempt_at: float):
+        """Put a message back in the queue for a later attempt."""
+        with self._lock:
+            self._conn.execute(
+                """UPDATE email_outbox
+                   SET status = ?, attempts = attempts + 1, last_error = ?, next_attempt_at = ?, claimed_at = NULL
+                   WHERE id = ?""",
+                (STATUS_QUEUED, error, next_attempt_at, message_id))
+
+    def mark_failed(self, message_id: int, error: str):
+        """Give up on a message."""
+        with self._lock:
+            self._conn.execute(
+                'UPDATE email_outbox SET status = ?, attempts = attempts + 1, last_error = ?, claimed_at = NULL WHERE id = ?',
+                (STATUS_FAILED, error, message_id))
+
+    def get(self, message_id: int) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM email_outbox WHERE id = ?', (message_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of messages per status."""
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM email_outbox GROUP BY status').fetchall()
+        counts = {STATUS_QUEUED: 0, STATUS_SENDING: 0, STATUS_SENT: 0, STATUS_FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_email_outbox(path: str = None) -> EmailOutbox:
+    """Process-wide outbox for the given path (default: EMAIL_OUTBOX_PATH)."""
+    path = path or DEFAULT_OUTBOX_PATH
+    with _outboxes_lock:
+        if path not in _outboxes:
+            _outboxes[path] = EmailOutbox(path)
+        return _outboxes[path]
+
+
+# =============================================================================
+# Worker
+# =============================================================================
+
+class RateLimiter:
+    """Token bucket shared by all worker threads. rate=None disables limiting."""
+
+    def __init__(self, rate: float = None, burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one message may be sent."""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                # Tolerance so float drift in the refill never stalls on a 1e-16 deficit
+                if self.tokens >= 1 - 1e-9:
+                    self.tokens = max(0.0, self.tokens - 1)
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+def backoff_delay(attempts: int, base: float = BACKOFF_BASE_SECONDS, cap: float = BACKOFF_CAP_SECONDS) -> float:
+    """Seconds to wait before attempt number attempts + 1 (exponential, capped)."""
+    return min(cap, base * (2 ** max(0, attempts - 1)))
+
+
+class OutboxWorker:
+    """
+    Delivers queued messages with a fixed pool of sender threads.
+
+    Args:
+        outbox: EmailOutbox to drain
+        transport_factory: Callable returning a transport with send(to, subject, html, text)
+            and close(); called once per thread per run (default: email_utils.get_email_transport)
+        concurrency: Number of sender threads / open sessions
+        rate_per_second: Global send rate limit (None = unlimited)
+        max_attempts: Attempts before a message is marked failed
+        backoff_base: First retry delay in seconds (doubles per attempt)
+    """
+
+    def __init__(self, outbox: EmailOutbox, transport_factory: Callable = None, concurrency: int = 4,
+                 rate_per_second: float = None, max_attempts: int = MAX_ATTEMPTS,
+                 backoff_base: float = BACKOFF_BASE_SECONDS, batch_size: int = CLAIM_BATCH_SIZE):
+        if transport_factory is None:
+            from email_utils import get_email_transport
+            transport_factory = get_email_transport
+
+        self.outbox = outbox
+        self.transport_factory = transport_factory
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = RateLimiter(rate_per_second, burst=self.concurrency)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.batch_size = batch_size
+
+    def run_once(self, max_messages: int = None) -> Dict:
+        """
+        Send every message that is currently due, then return.
+
+        Returns:
+            dict with sent, retried, failed, connections_opened,
+            elapsed_seconds and messages_per_second
+        """
+        stats = {'sent': 0, 'retried': 0, 'failed': 0, 'connections_opened': 0}
+        stats_lock = threading.Lock()
+        local = threading.local()
+        transports = []
+        sent_ids = []
+
+        def get_transport():
+            transport = getattr(local, 'transport', None)
+            if transport is None:
+                transport = self.transport_factory()
+                if transport is None:
+                    raise RuntimeError("Email configuration missing. Set SENDGRID_API_KEY or SMTP credentials.")
+                local.transport = transport
+                with stats_lock:
+                    transports.append(transport)
+            return transport
+
+        def deliver(message):
+            self.rate_limiter.acquire()
+            try:
+                get_transport().send(message['to_email'], message['subject'],
+                                     message['html_body'], message['text_body'])
+            except PermanentEmailError as e:
+                self.outbox.mark_failed(message['id'], str(e))
+                outcome = 'failed'
+            except Exception as e:
+                # Drop a possibly broken session; the next message reconnects
+                local.transport = None
+                attempts = message['attempts'] + 1
+                if attempts >= self.max_attempts:
+                    self.outbox.mark_failed(message['id'], str(e))
+                    outcome = 'failed'
+                else:
+                    self.outbox.mark_retry(message['id'], str(e),
+                                           time.time() + backoff_delay(attempts, self.backoff_base))
+                    outcome = 'retried'
+            else:
+                outcome = 'sent'
+            with stats_lock:
+                stats[outcome] += 1
+                if outcome == 'sent':
+                    sent_ids.append(message['id'])
+
+        start = time.perf_counter()
+        processed = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while max_messages is None or processed < max_messages:
+                limit = self.batch_size if max_messages is None else min(self.batch_size, max_messages - processed)
+                batch = self.outbox.claim_batch(limit)
+                if not batch:
+                    break
+                list(pool.map(deliver, batch))
+                processed += len(batch)
+                with stats_lock:
+                    self.outbox.mark_sent(sent_ids)
+                    sent_ids.clear()
+
+        for transport in transports:
+            stats['connections_opened'] += getattr(transport, 'connections_opened', 1)
+            try:
+                transport.close()
+            except Exception as e:
+                print(f"Error closing email transport: {e}")
+
+        elapsed = time.perf_counter() - start
+        stats['elapsed_seconds'] = round(elapsed, 4)
+        stats['messages_per_second'] = round(stats['sent'] / elapsed, 2) if elapsed > 0 else 0.0
+        return stats
@@ -0,0 +1,310 @@
+"""
+Excel Export Engine
+Shared streaming writer for all .xlsx downloads (reports, PRL, multi-sheet exports).
+
+Workbooks are written with xlsxwriter in constant_memory mode: each row is
+flushed to a temp file as soon as the next row starts, so memory stays flat
+no matter how many rows are exported. Because rows must be written in
+order, all formatting is decided up front:
+
+    - number formats (currency, dates) are set once per column with
+      set_column(); cells written without a format inherit them
+    - column widths are estimated from a sample of rows instead of a
+      full scan of every cell
+    - row highlighting (subtotal / STMT / VOID rows in the PRL export)
+      uses a small set of pre-built formats, one per style and column kind
+
+Rows are produced by a generator that converts the DataFrame chunk by
+chunk to plain Python lists, and each column is written with a typed
+writer chosen from its dtype (no per-cell type sniffing). Missing values
+are left blank.
+"""
+
+import io
+import itertools
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+CURRENCY_NUM_FORMAT = '"$"#,##0.00'
+DATE_NUM_FORMAT = 'yyyy-mm-dd'
+
+# Header styles used across the app
+HEADER_STYLES = {
+    'blue': {'bold': True, 'font_color': '#FFFFFF', 'bg_color': '#366092', 'align': 'center', 'valign': 'vcenter'},
+    'green': {'bold': True, 'bg_color': '#D7E4BC', 'border': 1},
+}
+
+# Row highlight styles (PRL detailed view)
+ROW_STYLES = {
+    'subtotal': {'bg_color': '#4a4a4a', 'font_color': 'white', 'bold': True},
+    'stmt': {'bg_color': '#e6f3ff'},
+    'void': {'bg_color': '#ffe6e6'},
+}
+
+DEFAULT_MIN_WIDTH = 10
+DEFAULT_MAX_WIDTH = 30
+WIDTH_SAMPLE_SIZE = 1000
+ROW_CHUNK_SIZE = 5000
+
+
+def _to_cell(value):
+    """Plain Python value for xlsxwriter, or None for a blank cell."""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return None if value != value or value in (np.inf, -np.inf) else value
+    if isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, np.generic):
+        return _to_cell(value.item())
+    if isinstance(value, pd.Timestamp):
+        return None if pd.isna(value) else value.to_pydatetime()
+    if value is pd.NaT or value is pd.NA:
+        return None
+    return value
+
+
+def iter_dataframe_rows(df: pd.DataFrame, chunk_size: int = ROW_CHUNK_SIZE) -> Iterator[tuple]:
+    """Yield the rows of df as tuples of plain Python values, converting one chunk at a time."""
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        for row in chunk.itertuples(index=False, name=None):
+            yield tuple(_to_cell(v) for v in row)
+
+
+def coerce_currency_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert formatted currency strings ("$1,234.56", "-$12.00") to numbers.
+
+    Subtotal rows in the PRL carry pre-formatted strings; exporting them as
+    numbers keeps them summable in Excel.
+    """
+    df = df.copy()
+    for col in df.columns:
+        if not (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])):
+            continue
+        try:
+            mask = df[col].str.match(r'^-?\$', na=False)
+        except AttributeError:
+            continue  # no string values in this column
+        if not mask.any():
+            continue
+        numbers = pd.to_numeric(df[col].where(mask).str.replace(r'[$,]', '', regex=True), errors='coerce')
+        converted = mask & numbers.notna()
+        values = df[col].astype(object)
+        values[converted] = numbers[converted]
+        df[col] = values
+    return df
+
+
+def estimate_column_widths(
+    columns: Sequence[str],
+    sample_rows: Sequence[tuple],
+    min_width: int = DEFAULT_MIN_WIDTH,
+    max_width: int = DEFAULT_MAX_WIDTH
+) -> List[int]:
+    """Column widths from the header and a sample of rows (max length + 2, clamped)."""
+    widths = []
+    for i, name in enumerate(columns):
+        longest = len(str(name))
+        for row in sample_rows:
+            value = row[i]
+            if value is not None:
+                longest = max(longest, len(str(value)))
+        widths.append(max(min(longest + 2, max_width), min_width))
+    return widths
+
+
+def _sample_dataframe(df: pd.DataFrame, sample_size: int) -> List[tuple]:
+    if len(df) <= sample_size:
+        sample = df
+    else:
+        # Head plus an even spread through the rest of the frame
+        positions = np.unique(np.concatenate([
+            np.arange(min(100, sample_size)),
+            np.linspace(0, len(df) - 1, sample_size - min(100, sample_size)).astype(int),
+        ]))
+        sample = df.iloc[positions]
+    return list(iter_dataframe_rows(sample))
+
+
+def _column_kind(series: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(series):
+        return 'bool'
+    if pd.api.types.is_numeric_dtype(series):
+        return 'number'
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return 'datetime'
+    if pd.api.types.is_string_dtype(series) and not pd.api.types.is_object_dtype(series):
+        return 'string'
+    return 'object'
+
+
+def _column_values(series: pd.Series, kind: str) -> list:
+    """Chunk of one column as a plain list; missing values become None."""
+    if kind == 'number':
+        return series.astype(float).tolist()  # NaN is skipped by the number writer
+    if kind in ('datetime', 'string'):
+        return series.astype(object).where(series.notna(), None).tolist()
+    return series.tolist()
+
+
+def iter_dataframe_chunks(df: pd.DataFrame, kinds: Sequence[str], chunk_size: int = ROW_CHUNK_SIZE) -> Iterator[list]:
+    """Yield df in chunks of rows, each chunk as a list of per-column value lists."""
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        yield [_column_values(chunk.iloc[:, i], kind) for i, kind in enumerate(kinds)]
+
+
+def _cell_writers(worksheet, kinds: Sequence[str]) -> list:
+    """One typed writer per column - skips xlsxwriter's per-cell type sniffing."""
+    def number(row, col, value, fmt=None):
+        if value == value and value not in (np.inf, -np.inf):
+            worksheet.write_number(row, col, value, fmt)
+        elif fmt is not None:
+            worksheet.write_blank(row, col, None, fmt)
+
+    def datetime_(row, col, value, fmt=None):
+        if value is not None:
+            worksheet.write_datetime(row, col, value, fmt)
+        elif fmt is not None:
+            worksheet.write_blank(row, col, None, fmt)
+
+    def string(row, col, value, fmt=None):
+        if value is not None and value != '':
+            worksheet.write_string(row, col, value, fmt)
+        elif fmt is not None:
+            worksheet.write_blank(row, col, None, fmt)
+
+    def boolean(row, col, value, fmt=None):
+        worksheet.write_boolean(row, col, bool(value), fmt)
+
+    def generic(row, col, value, fmt=None):
+        value = _to_cell(value)
+        if value is not None and value != '':
+            worksheet.write(row, col, value, fmt)
+        elif fmt is not None:
+            worksheet.write_blank(row, col, None, fmt)
+
+    by_kind = {'number': number, 'datetime': datetime_, 'string': string, 'bool': boolean, 'object': generic}
+    return [by_kind[kind] for kind in kinds]
+
+
+def _write_sheet(workbook, formats: Dict, sheet: Dict, sample_size: int) -> int:
+    worksheet = workbook.add_worksheet(sheet['name'][:31])
+
+    data = sheet.get('data')
+    if data is not None:
+        columns = list(data.columns)
+        value_kinds = [_column_kind(data.iloc[:, i]) for i in range(len(columns))]
+        sample = _sample_dataframe(data, sample_size)
+        date_columns = {c for c, kind in zip(columns, value_kinds) if kind == 'datetime'}
+    else:
+        columns = list(sheet['columns'])
+        value_kinds = ['object'] * len(columns)
+        rows = iter(sheet['rows'])
+        sample = list(itertools.islice(rows, sample_size))
+        rows = itertools.chain(sample, rows)
+        date_columns = set(sheet.get('date_columns', ()))
+
+    currency_columns = set(sheet.get('currency_columns', ())) & set(columns)
+    widths = sheet.get('widths')
+    if widths is None:
+        widths = estimate_column_widths(columns, sample, sheet.get('min_width', DEFAULT_MIN_WIDTH),
+                                        sheet.get('max_width', DEFAULT_MAX_WIDTH))
+    elif isinstance(widths, dict):
+        default = widths.get('*', 15)
+        widths = [widths.get(c, default) for c in columns]
+
+    # Column kinds decide both the column-level format and row-style variants
+    kinds = ['currency' if c in currency_columns else 'date' if c in date_columns else None for c in columns]
+    for i, (width, kind) in enumerate(zip(widths, kinds)):
+        worksheet.set_column(i, i, width, formats[(None, kind)] if kind else None)
+
+    header_format = formats[('header', sheet.get('header_style', 'blue'))]
+    worksheet.write_row(0, 0, columns, header_format)
+
+    row_styles = sheet.get('row_styles')
+    style_iter = iter(row_styles) if row_styles is not None else itertools.repeat(None)
+    styled_formats = {style: [formats[(style, kind)] for kind in kinds] for style in ROW_STYLES}
+    plain_formats = [None] * len(columns)
+    writers = list(enumerate(_cell_writers(worksheet, value_kinds)))
+
+    if data is not None:
+        rows = (row for chunk in iter_dataframe_chunks(data, value_kinds) for row in zip(*chunk))
+
+    row_num = 0
+    for row_num, (values, style) in enumerate(zip(rows, style_iter), 1):
+        cell_formats = styled_formats[style] if style else plain_formats
+        for col_num, write in writers:
+            write(row_num, col_num, values[col_num], cell_formats[col_num])
+
+    if sheet.get('freeze_header'):
+        worksheet.freeze_panes(1, 0)
+    return row_num
+
+
+def write_excel_workbook(sheets: List[Dict], output=None, sample_size: int = WIDTH_SAMPLE_SIZE) -> io.BytesIO:
+    """
+    Write sheets to an .xlsx workbook using constant memory.
+
+    Each sheet is a dict with:
+        name: Sheet name (truncated to Excel's 31 characters)
+        data: DataFrame to export, or
+        columns + rows: header list and an iterable/generator of row tuples
+        currency_columns: Columns formatted as currency
+        date_columns: Date columns when streaming rows (detected from dtype for DataFrames)
+        widths: List of widths, {column: width, '*': default}, or None to estimate from a sample
+        min_width / max_width: Clamp for estimated widths
+        header_style: Key of HEADER_STYLES (default 'blue')
+        row_styles: Optional iterable aligned with the rows: None or a key of ROW_STYLES
+
+    Args:
+        sheets: Sheet definitions, written in order
+        output: File path or binary buffer (default: new BytesIO)
+        sample_size: Rows sampled for width estimation
+
+    Returns:
+        The output buffer, rewound to the start
+    """
+    output = io.BytesIO() if output is None else output
+    workbook = xlsxwriter.Workbook(output, {
+        'constant_memory': True,
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+        'strings_to_numbers': False,
+    })
+
+    formats = {}
+    for name, props in HEADER_STYLES.items():
+        formats[('header', name)] = workbook.add_format(props)
+    kind_props = {None: {}, 'currency': {'num_format': CURRENCY_NUM_FORMAT}, 'date': {'num_format': DATE_NUM_FORMAT}}
+    for kind, props in kind_props.items():
+        formats[(None, kind)] = workbook.add_format(props) if props else None
+        for style, style_props in ROW_STYLES.items():
+            formats[(style, kind)] = workbook.add_format({**style_props, **props})
+
+    try:
+        for sheet in sheets:
+            _write_sheet(workbook, formats, sheet, sample_size)
+    finally:
+        workbook.close()
+
+    if hasattr(output, 'seek'):
+        output.seek(0)
+    return output
+
+
+def prl_row_styles(df: pd.DataFrame) -> List[Optional[str]]:
+    """Row highlight per PRL row: subtotal ('Group' == '='), then -STMT- / -VOID- transactions."""
+    styles = pd.Series([None] * len(df), index=df.index, dtype=object)
+    is_subtotal = df['Group'].eq('=') if 'Group' in df.columns else pd.Series(False, index=df.index)
+    if 'Transaction ID' in df.columns:
+        ids = df['Transaction ID'].astype(str)
+        styles[ids.str.contains('-VOID-', regex=False) & ~is_subtotal] = 'void'
+        styles[ids.str.contains('-STMT-', regex=False) & ~is_subtotal] = 'stmt'
+    styles[is_subtotal] = 'subtotal'
+    return styles.tolist()
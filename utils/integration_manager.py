@@ -7,6 +7,7 @@ Branch: agency-platform
 Task: 3.2 - Integration Management
 """
 
+import asyncio
 import streamlit as st
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
@@ -221,24 +222,40 @@ def update_sync_settings(
         return False, f"Error updating sync settings: {str(e)}"
 
 
-def trigger_manual_sync(agency_id: str, integration_name: str) -> Tuple[bool, str]:
+def trigger_manual_sync(
+    agency_id: str,
+    integration_name: str,
+    user_email: Optional[str] = None,
+    full: bool = False,
+    user_id: Optional[str] = None
+) -> Tuple[bool, str]:
     """
-    Trigger a manual sync for an integration.
+    Run a sync for an integration now.
+
+    Integrations with a sync connector (EZLynx, HubSpot) pull changes since
+    the last successful sync into policies; see
+    api_platform/integrations/sync_engine.py. Others are only marked as
+    in progress.
 
     Args:
         agency_id: Agency ID
         integration_name: Name of the integration
+        user_email: Owner of the synced policies (defaults to the signed-in user)
+        full: Ignore the last sync's watermark and pull everything
+        user_id: Owner's users.id, written on the synced policies
+            (defaults to the signed-in user's)
 
     Returns:
         Tuple of (success, message)
     """
     try:
-        # TODO: Implement actual sync trigger
-        # For now, just update last_sync timestamp
-
         supabase = get_supabase_client()
 
-        result = supabase.table('agency_integrations')\
+        integration = get_integration_by_name(agency_id, integration_name)
+        if not integration:
+            return False, f"{integration_name} is not connected"
+
+        supabase.table('agency_integrations')\
             .update({
                 'last_sync': datetime.now().isoformat(),
                 'last_sync_status': 'in_progress'
@@ -247,10 +264,41 @@ def trigger_manual_sync(agency_id: str, integration_name: str) -> Tuple[bool, st
             .eq('integration_name', integration_name)\
             .execute()
 
-        if result.data:
+        # Imported here: aiohttp is only needed when a sync actually runs
+        from api_platform.integrations.sync_engine import INTEGRATIONS, run_sync
+
+        if integration_name not in INTEGRATIONS:
             return True, f"Sync initiated for {integration_name}"
-        else:
-            return False, "Failed to trigger sync"
+
+        credentials = integration.get('credentials') or {}
+        if isinstance(credentials, str):
+            credentials = json.loads(credentials)
+        config = {**(integration.get('sync_settings') or {}), **credentials}
+        # Lowercased like get_normalized_user_email(): synced rows are keyed by (user_email, external_id)
+        user_email = (user_email or st.session_state.get('user_email') or '').lower()
+        if not user_email:
+            return False, "Sign in to sync policies"
+
+        success, stats = asyncio.run(run_sync(
+            integration_name, user_email, config, agency_id=agency_id, full=full, supabase=supabase,
+            user_id=user_id or st.session_state.get('user_id')
+        ))
+
+        supabase.table('agency_integrations')\
+            .update({
+                'last_sync': datetime.now().isoformat(),
+                'last_sync_status': 'success' if success else 'failed'
+            })\
+            .eq('agency_id', agency_id)\
+            .eq('integration_name', integration_name)\
+            .execute()
+
+        if success:
+            return True, (
+                f"Synced {stats['rows_upserted']:,} policies from {integration_name} "
+                f"({stats['rows_per_second'] or 0:,.0f} rows/s)"
+            )
+        return False, f"Sync failed: {stats.get('error')}"
 
     except Exception as e:
         return False, f"Error triggering sync: {str(e)}"
@@ -28,6 +28,52 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 # Task 3.1: Renewal Prediction Model
 # =============================================================================
 
+RENEWAL_FEATURE_COLUMNS = [
+    'days_until_renewal',
+    'policy_age_years',
+    'premium_amount',
+    'policy_type_encoded',
+    'carrier_encoded',
+    'agent_relationship_strength',
+    'has_claims',
+    'claims_count',
+    'payment_score',
+    'late_payments_count',
+    'renewal_month',
+    'renewal_quarter',
+    'premium_increased'
+]
+
+RENEWAL_RISK_THRESHOLDS = [0.8, 0.6, 0.4, 0.2]
+RENEWAL_RISK_LABELS = ['Very Low Risk', 'Low Risk', 'Medium Risk', 'High Risk']
+RENEWAL_RECOMMENDATIONS = [
+    "Low risk - maintain regular contact",
+    "Schedule renewal review call",
+    "Proactive outreach needed - review coverage and pricing",
+    "High risk - urgent intervention required, consider retention offer"
+]
+
+
+def categorize_renewal_risk_array(probabilities) -> np.ndarray:
+    """Array version of RenewalPredictor._categorize_renewal_risk()."""
+    probabilities = np.asarray(probabilities, dtype=float)
+    return np.select(
+        [probabilities >= t for t in RENEWAL_RISK_THRESHOLDS],
+        RENEWAL_RISK_LABELS,
+        default='Critical Risk'
+    )
+
+
+def renewal_recommendation_array(probabilities) -> np.ndarray:
+    """Array version of RenewalPredictor._generate_renewal_recommendation()."""
+    probabilities = np.asarray(probabilities, dtype=float)
+    return np.select(
+        [probabilities >= t for t in RENEWAL_RISK_THRESHOLDS],
+        RENEWAL_RECOMMENDATIONS,
+        default="Critical risk - immediate contact, escalate to senior agent"
+    )
+
+
 class RenewalPredictor:
     """
     Predicts the likelihood of a policy renewing.
@@ -55,49 +101,51 @@ class RenewalPredictor:
         self.label_encoders = {}
         self.feature_importance = None
         self.is_trained = False
+        self.model_version = None
 
         if model_path and os.path.exists(model_path):
             self.load_model(model_path)
 
-    def prepare_features(self, policy_data: pd.DataFrame) -> pd.DataFrame:
+    def prepare_features(self, policy_data: pd.DataFrame, fit_encoders: bool = False,
+                         as_of: datetime = None) -> pd.DataFrame:
         """
         Prepare features for the renewal prediction model.
 
+        Label encoders are fitted once (during training, or on first use of an
+        untrained predictor) and reused afterwards; categories that were not
+        seen during fitting are encoded as -1 instead of raising.
+
         Args:
             policy_data: DataFrame with policy information
+            fit_encoders: Refit the label encoders on this data (training only)
+            as_of: Reference date for relative features (default: now). A row-level
+                'as_of_date' column, when present, takes precedence.
 
         Returns:
             DataFrame with engineered features
         """
         df = policy_data.copy()
 
+        reference = pd.Timestamp(as_of or datetime.now())
+        if 'as_of_date' in df.columns:
+            reference = pd.to_datetime(df['as_of_date'], errors='coerce').fillna(reference)
+
+        expiration = pd.to_datetime(df['expiration_date'], errors='coerce')
+        effective = pd.to_datetime(df['effective_date'], errors='coerce')
+
         # Feature: Days until renewal
-        df['days_until_renewal'] = (pd.to_datetime(df['expiration_date']) - datetime.now()).dt.days
+        df['days_until_renewal'] = (expiration - reference).dt.days.fillna(0)
 
         # Feature: Policy age (tenure)
-        df['policy_age_days'] = (datetime.now() - pd.to_datetime(df['effective_date'])).dt.days
+        df['policy_age_days'] = (reference - effective).dt.days.fillna(0)
         df['policy_age_years'] = df['policy_age_days'] / 365.25
 
         # Feature: Premium amount (standardized)
         df['premium_amount'] = pd.to_numeric(df['premium'], errors='coerce').fillna(0)
 
-        # Feature: Policy type (encode)
-        if 'policy_type' in df.columns:
-            if 'policy_type' not in self.label_encoders:
-                self.label_encoders['policy_type'] = LabelEncoder()
-                self.label_encoders['policy_type'].fit(df['policy_type'].fillna('Unknown'))
-            df['policy_type_encoded'] = self.label_encoders['policy_type'].transform(df['policy_type'].fillna('Unknown'))
-        else:
-            df['policy_type_encoded'] = 0
-
-        # Feature: Carrier (encode)
-        if 'carrier' in df.columns:
-            if 'carrier' not in self.label_encoders:
-                self.label_encoders['carrier'] = LabelEncoder()
-                self.label_encoders['carrier'].fit(df['carrier'].fillna('Unknown'))
-            df['carrier_encoded'] = self.label_encoders['carrier'].transform(df['carrier'].fillna('Unknown'))
-        else:
-            df['carrier_encoded'] = 0
+        # Feature: Policy type and carrier (encode)
+        df['policy_type_encoded'] = self._encode_column(df, 'policy_type', fit_encoders)
+        df['carrier_encoded'] = self._encode_column(df, 'carrier', fit_encoders)
 
         # Feature: Agent relationship strength (number of policies with same agent)
         # This would come from a join with other policies - placeholder for now
@@ -112,30 +160,28 @@ class RenewalPredictor:
         df['late_payments_count'] = 0
 
         # Feature: Seasonality (month of renewal)
-        df['renewal_month'] = pd.to_datetime(df['expiration_date']).dt.month
-        df['renewal_quarter'] = pd.to_datetime(df['expiration_date']).dt.quarter
+        df['renewal_month'] = expiration.dt.month.fillna(0)
+        df['renewal_quarter'] = expiration.dt.quarter.fillna(0)
 
         # Feature: Premium change indicator (if available)
         df['premium_increased'] = 0  # 0 or 1
 
-        # Select features for model
-        feature_columns = [
-            'days_until_renewal',
-            'policy_age_years',
-            'premium_amount',
-            'policy_type_encoded',
-            'carrier_encoded',
-            'agent_relationship_strength',
-            'has_claims',
-            'claims_count',
-            'payment_score',
-            'late_payments_count',
-            'renewal_month',
-            'renewal_quarter',
-            'premium_increased'
-        ]
+        return df[RENEWAL_FEATURE_COLUMNS]
+
+    def _encode_column(self, df: pd.DataFrame, column: str, fit: bool) -> np.ndarray:
+        """Encode a categorical column with its persisted LabelEncoder."""
+        if column not in df.columns:
+            return np.zeros(len(df), dtype=int)
+
+        values = df[column].fillna('Unknown').astype(str)
+
+        if fit or column not in self.label_encoders:
+            self.label_encoders[column] = LabelEncoder()
+            self.label_encoders[column].fit(values)
 
-        return df[feature_columns]
+        # Index lookup instead of LabelEncoder.transform so unseen labels map to -1
+        classes = pd.Index(self.label_encoders[column].classes_)
+        return classes.get_indexer(values)
 
     def train(self, training_data: pd.DataFrame, target_column: str = 'renewed') -> Dict:
         """
@@ -148,8 +194,8 @@ class RenewalPredictor:
         Returns:
             Dictionary with training metrics
         """
-        # Prepare features
-        X = self.prepare_features(training_data)
+        # Prepare features (encoders are fitted here and persisted with the model)
+        X = self.prepare_features(training_data, fit_encoders=True)
         y = training_data[target_column]
 
         # Split data
@@ -164,6 +210,7 @@ class RenewalPredictor:
         # Train model
         self.model.fit(X_train_scaled, y_train)
         self.is_trained = True
+        self.model_version = datetime.now().strftime('renewal-%Y%m%d%H%M%S')
 
         # Get feature importance
         self.feature_importance = pd.DataFrame({
@@ -182,7 +229,8 @@ class RenewalPredictor:
             'f1_score': f1_score(y_test, y_pred),
             'roc_auc': roc_auc_score(y_test, y_pred_proba),
             'train_size': len(X_train),
-            'test_size': len(X_test)
+            'test_size': len(X_test),
+            'model_version': self.model_version
         }
 
         return metrics
@@ -197,30 +245,46 @@ class RenewalPredictor:
         Returns:
             DataFrame with renewal probabilities and risk categories
         """
-        if not self.is_trained:
-            raise ValueError("Model must be trained before making predictions")
-
-        # Prepare features
-        X = self.prepare_features(policy_data)
-        X_scaled = self.scaler.transform(X)
-
-        # Predict
-        probabilities = self.model.predict_proba(X_scaled)[:, 1]
-        predictions = self.model.predict(X_scaled)
+        probabilities = self.score_batch(policy_data)
 
         # Create results DataFrame
         results = policy_data.copy()
         results['renewal_probability'] = probabilities
-        results['renewal_prediction'] = predictions
+        results['renewal_prediction'] = (probabilities > 0.5).astype(int)
 
-        # Categorize risk
-        results['renewal_risk'] = results['renewal_probability'].apply(self._categorize_renewal_risk)
-
-        # Add recommendations
-        results['recommendation'] = results.apply(self._generate_renewal_recommendation, axis=1)
+        # Categorize risk and add recommendations
+        results['renewal_risk'] = categorize_renewal_risk_array(probabilities)
+        results['recommendation'] = renewal_recommendation_array(probabilities)
 
         return results
 
+    def score_batch(self, policy_data: pd.DataFrame, as_of: datetime = None) -> np.ndarray:
+        """
+        Vectorized renewal probabilities for a batch of policies.
+
+        Args:
+            policy_data: DataFrame with policy information
+            as_of: Reference date for relative features (default: now)
+
+        Returns:
+            Array of renewal probabilities, one per row
+        """
+        if not self.is_trained:
+            raise ValueError("Model must be trained before making predictions")
+
+        if len(policy_data) == 0:
+            return np.empty(0, dtype=float)
+
+        X = self.prepare_features(policy_data, as_of=as_of)
+        X_scaled = self.scaler.transform(X)
+
+        proba = self.model.predict_proba(X_scaled)
+        # A model trained on a single class only exposes one probability column
+        positive = list(self.model.classes_).index(1) if 1 in self.model.classes_ else None
+        if positive is None:
+            return np.zeros(len(policy_data), dtype=float)
+        return proba[:, positive]
+
     def _categorize_renewal_risk(self, probability: float) -> str:
         """Categorize renewal probability into risk levels."""
         if probability >= 0.8:
@@ -256,8 +320,12 @@ class RenewalPredictor:
             'scaler': self.scaler,
             'label_encoders': self.label_encoders,
             'feature_importance': self.feature_importance,
-            'is_trained': self.is_trained
+            'is_trained': self.is_trained,
+            'model_version': self.model_version
         }
+        model_dir = os.path.dirname(model_path)
+        if model_dir:
+            os.makedirs(model_dir, exist_ok=True)
         with open(model_path, 'wb') as f:
             pickle.dump(model_data, f)
 
@@ -271,6 +339,7 @@ class RenewalPredictor:
         self.label_encoders = model_data['label_encoders']
         self.feature_importance = model_data['feature_importance']
         self.is_trained = model_data['is_trained']
+        self.model_version = model_data.get('model_version')
 
 
 # =============================================================================
@@ -347,8 +416,12 @@ class CLVCalculator:
         if len(policies) == 0:
             return self.default_retention_rate
 
+        # No renewal history recorded - fall back to the default rate
+        if 'renewed' not in policies.columns:
+            return self.default_retention_rate
+
         # Count renewed vs not renewed policies
-        renewed_count = policies[policies.get('renewed', False) == True].shape[0]
+        renewed_count = policies[policies['renewed'] == True].shape[0]
         total_eligible = policies.shape[0]
 
         if total_eligible == 0:
@@ -396,25 +469,116 @@ class CLVCalculator:
         else:
             return 'Bronze'
 
-    def calculate_clv_for_all_clients(self, policies_df: pd.DataFrame) -> pd.DataFrame:
+    def calculate_clv_for_all_clients(self, policies_df: pd.DataFrame, **kwargs) -> pd.DataFrame:
         """
         Calculate CLV for all clients in the database.
 
+        Columnar equivalent of calling calculate_clv() once per client: every
+        intermediate quantity comes from a single groupby-agg and the present
+        value is computed with NumPy across all clients at once.
+
         Args:
             policies_df: DataFrame with all policies
+            **kwargs: Optional parameters (acquisition_cost, retention_rate, lifespan_years)
 
         Returns:
             DataFrame with CLV for each client
         """
-        results = []
+        columns = [
+            'client_id', 'clv', 'clv_present_value', 'avg_annual_premium',
+            'retention_rate', 'lifespan_years', 'acquisition_cost', 'tier',
+            'total_policies', 'calculation_date'
+        ]
+        if policies_df is None or len(policies_df) == 0:
+            return pd.DataFrame(columns=columns)
 
-        # Group by client
-        for client_id, client_policies in policies_df.groupby('insured_name'):
-            clv_data = self.calculate_clv(client_policies)
-            clv_data['client_id'] = client_id
-            results.append(clv_data)
+        acquisition_cost = kwargs.get('acquisition_cost', self.default_acquisition_cost)
+        now = datetime.now()
+
+        # Single pass: per-client premium total, renewals, policy count, oldest date
+        has_renewed = 'renewed' in policies_df.columns
+        frame = pd.DataFrame({
+            'client_id': policies_df['insured_name'].to_numpy(),
+            'premium': pd.to_numeric(policies_df['premium'], errors='coerce').fillna(0).to_numpy(),
+            'effective_date': pd.to_datetime(policies_df['effective_date'], errors='coerce').to_numpy(),
+            'renewed': (policies_df['renewed'] == True).to_numpy() if has_renewed else False
+        })
 
-        return pd.DataFrame(results)
+        grouped = frame.groupby('client_id', sort=True).agg(
+            avg_annual_premium=('premium', 'sum'),
+            renewed_count=('renewed', 'sum'),
+            total_policies=('premium', 'size'),
+            oldest_date=('effective_date', 'min')
+        )
+        n_clients = len(grouped)
+
+        avg_annual_premium = grouped['avg_annual_premium'].to_numpy(dtype=float)
+        total_policies = grouped['total_policies'].to_numpy()
+
+        if 'retention_rate' in kwargs:
+            retention_rate = np.full(n_clients, float(kwargs['retention_rate']))
+        elif has_renewed:
+            retention_rate = grouped['renewed_count'].to_numpy(dtype=float) / total_policies
+        else:
+            retention_rate = np.full(n_clients, self.default_retention_rate)
+
+        if 'lifespan_years' in kwargs:
+            lifespan_years = np.full(n_clients, float(kwargs['lifespan_years']))
+        else:
+            years_active = (now - grouped['oldest_date']).dt.days.to_numpy(dtype=float) / 365.25
+            # New clients (< 1 year) and clients without dates use the default
+            lifespan_years = np.where(
+                np.isnan(years_active) | (years_active < 1),
+                self.default_lifespan_years,
+                years_active
+            )
+
+        clv = (avg_annual_premium * retention_rate * lifespan_years) - acquisition_cost
+        present_value = self._calculate_present_value_vectorized(
+            avg_annual_premium, retention_rate, lifespan_years, acquisition_cost, 0.10
+        )
+
+        tier = np.select(
+            [clv >= 10000, clv >= 5000, clv >= 2000],
+            ['Platinum', 'Gold', 'Silver'],
+            default='Bronze'
+        )
+
+        return pd.DataFrame({
+            'client_id': grouped.index.to_numpy(),
+            'clv': np.round(clv, 2),
+            'clv_present_value': np.round(present_value, 2),
+            'avg_annual_premium': np.round(avg_annual_premium, 2),
+            'retention_rate': np.round(retention_rate, 3),
+            'lifespan_years': np.round(lifespan_years, 1),
+            'acquisition_cost': acquisition_cost,
+            'tier': tier,
+            'total_policies': total_policies,
+            'calculation_date': now.isoformat()
+        }, columns=columns)
+
+    def _calculate_present_value_vectorized(
+        self, annual_premium: np.ndarray, retention_rate: np.ndarray,
+        lifespan: np.ndarray, acquisition_cost: float, discount_rate: float
+    ) -> np.ndarray:
+        """
+        Array version of _calculate_present_value().
+
+        The yearly loop is a geometric series with ratio
+        q = retention_rate / (1 + discount_rate) over int(lifespan) years.
+        """
+        years = np.floor(lifespan)
+        q = retention_rate / (1 + discount_rate)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            series = np.where(
+                np.isclose(q, 1.0),
+                years,
+                q * (1 - np.power(q, years)) / (1 - q)
+            )
+        series = np.where(years >= 1, series, 0.0)
+
+        return annual_premium * series - acquisition_cost
 
 
 # =============================================================================
@@ -850,47 +1014,337 @@ class RecommendationEngine:
 # Utility Functions
 # =============================================================================
 
-def train_renewal_model_from_database(supabase, model_save_path: str = 'models/renewal_model.pkl'):
+# Ledger column names (policies table) -> column names used by the models
+LEDGER_TO_MODEL_COLUMNS = {
+    'Transaction ID': 'transaction_id',
+    'Transaction Type': 'transaction_type',
+    'Policy Number': 'policy_number',
+    'Prior Policy Number': 'prior_policy_number',
+    'Customer': 'insured_name',
+    'Carrier Name': 'carrier',
+    'Policy Type': 'policy_type',
+    'Premium Sold': 'premium',
+    'Effective Date': 'effective_date',
+    'X-DATE': 'expiration_date'
+}
+
+# Transactions that start a policy term (same set as Pending Policy Renewals)
+TERM_TRANSACTION_TYPES = ['NEW', 'RWL', 'REWRITE']
+CANCEL_TRANSACTION_TYPES = ['CAN', 'XCL']
+
+RENEWAL_SCORES_TABLE = 'renewal_scores'
+SCORING_CHUNK_SIZE = 1000  # PostgREST's max rows per request; larger pages come back short
+SCORE_WRITE_BATCH_SIZE = 500
+
+# Training snapshot: features are computed as of this many days before X-DATE,
+# which is when the renewal outcome is still unknown to the agent
+TRAINING_SNAPSHOT_DAYS = 60
+
+
+def normalize_ledger_columns(policies_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Map ledger column names to the model column names.
+
+    Columns that already exist under the model name are left untouched, so
+    frames that are already in model format pass through unchanged.
+    """
+    renames = {
+        ledger_col: model_col
+        for ledger_col, model_col in LEDGER_TO_MODEL_COLUMNS.items()
+        if ledger_col in policies_df.columns and model_col not in policies_df.columns
+    }
+    return policies_df.rename(columns=renames)
+
+
+def _term_rows(policies_df: pd.DataFrame) -> pd.DataFrame:
+    """Return the term-starting transactions (NEW/RWL/REWRITE), excluding reconciliation entries."""
+    df = policies_df
+    if 'transaction_type' in df.columns:
+        df = df[df['transaction_type'].isin(TERM_TRANSACTION_TYPES)]
+    if 'transaction_id' in df.columns:
+        df = df[~df['transaction_id'].astype(str).str.contains('-STMT-|-VOID-|-ADJ-', case=False, na=False)]
+    return df
+
+
+def build_renewal_training_data(policies_df: pd.DataFrame, as_of: datetime = None) -> pd.DataFrame:
+    """
+    Build labeled renewal outcomes from the policies ledger.
+
+    Every expired term (NEW/RWL/REWRITE row whose X-DATE is in the past) gets
+    renewed = 1 when either:
+    - another transaction names its Policy Number as Prior Policy Number, or
+    - a later term exists under the same Policy Number.
+    Expired terms with neither are labeled renewed = 0.
+
+    Args:
+        policies_df: Policies ledger (ledger or model column names)
+        as_of: Date outcomes are evaluated at (default: now)
+
+    Returns:
+        DataFrame of expired terms with a 'renewed' label and 'as_of_date' snapshot
+    """
+    df = normalize_ledger_columns(policies_df)
+    if df.empty or 'policy_number' not in df.columns:
+        return pd.DataFrame()
+
+    as_of = pd.Timestamp(as_of or datetime.now())
+
+    # Policy numbers that were carried forward via Prior Policy Number
+    renewed_numbers = set()
+    if 'prior_policy_number' in df.columns:
+        prior = df['prior_policy_number'].dropna().astype(str).str.strip()
+        renewed_numbers = set(prior[prior != ''])
+
+    terms = _term_rows(df).copy()
+    terms['effective_date'] = pd.to_datetime(terms['effective_date'], errors='coerce')
+    terms['expiration_date'] = pd.to_datetime(terms['expiration_date'], errors='coerce')
+    terms = terms.dropna(subset=['effective_date', 'expiration_date'])
+    terms = terms[terms['policy_number'].notna()]
+
+    if terms.empty:
+        return pd.DataFrame()
+
+    # A later term under the same number means this term renewed in place
+    latest_effective = terms.groupby('policy_number')['effective_date'].transform('max')
+    renewed_in_place = latest_effective > terms['effective_date']
+    renewed_by_chain = terms['policy_number'].astype(str).str.strip().isin(renewed_numbers)
+
+    terms['renewed'] = (renewed_in_place | renewed_by_chain).astype(int)
+
+    # Only terms whose outcome is known
+    training = terms[terms['expiration_date'] < as_of].copy()
+    training['as_of_date'] = training['expiration_date'] - pd.Timedelta(days=TRAINING_SNAPSHOT_DAYS)
+
+    return training.reset_index(drop=True)
+
+
+def iter_policy_chunks(supabase, agent_id: str = None, agency_id: str = None,
+                       user_id: str = None, transaction_types: List[str] = None,
+                       chunk_size: int = SCORING_CHUNK_SIZE):
+    """
+    Stream the policies table in pages ordered by Policy Number (then _id,
+    so rows with the same number keep their order from page to page).
+
+    Rows for the same Policy Number are never split across yielded chunks:
+    the trailing policy of each page is held back and prepended to the next.
+
+    Yields:
+        DataFrames with ledger column names
+    """
+    # A short page ends the scan, so never ask for more than the server returns
+    chunk_size = min(chunk_size, SCORING_CHUNK_SIZE)
+    carry = pd.DataFrame()
+    offset = 0
+
+    while True:
+        query = supabase.table('policies').select('*')
+        if agent_id:
+            query = query.eq('agent_id', agent_id)
+        if agency_id:
+            query = query.eq('agency_id', agency_id)
+        if user_id:
+            query = query.eq('user_id', user_id)
+        if transaction_types:
+            query = query.in_('"Transaction Type"', transaction_types)
+
+        result = query.order('"Policy Number"').order('_id').range(offset, offset + chunk_size - 1).execute()
+        rows = result.data or []
+        page = pd.DataFrame(rows)
+        chunk = pd.concat([carry, page], ignore_index=True) if not carry.empty else page
+
+        if len(rows) < chunk_size:
+            if not chunk.empty:
+                yield chunk
+            return
+
+        is_last_policy = chunk['Policy Number'] == chunk['Policy Number'].iloc[-1]
+        carry = chunk[is_last_policy]
+        if (~is_last_policy).any():
+            yield chunk[~is_last_policy].reset_index(drop=True)
+        offset += chunk_size
+
+
+def train_renewal_model_from_database(supabase, model_save_path: str = None,
+                                      agency_id: str = None, user_id: str = None,
+                                      min_training_samples: int = 50, registry=None):
     """
     Train the renewal prediction model using historical data from the database.
 
+    Labels come from the Prior Policy Number chain (see build_renewal_training_data).
+    The fitted label encoders and scaler are saved together with the model so
+    scoring never refits them. The trained model is published as a new version
+    in the model registry, which hot-swaps it into running workers.
+
     Args:
         supabase: Supabase client
-        model_save_path: Path to save the trained model
+        model_save_path: Optional extra path to save a standalone copy of the model
+        agency_id: Optional agency ID to restrict training data
+        user_id: Optional user ID to restrict training data
+        min_training_samples: Minimum labeled terms required to train
+        registry: ModelRegistry to publish to (default: MODEL_REGISTRY_DIR)
 
     Returns:
         Training metrics
     """
-    # Fetch historical policy data
-    # This would need actual database queries
-    # For now, return placeholder
+    chunks = []
+    for chunk in iter_policy_chunks(supabase, agency_id=agency_id, user_id=user_id):
+        chunks.append(chunk)
+
+    policies_df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    training_data = build_renewal_training_data(policies_df)
+
+    if len(training_data) < min_training_samples or training_data['renewed'].nunique() < 2:
+        return {
+            'status': 'Model training requires historical renewal data',
+            'recommendation': 'Collect 6-12 months of renewal outcomes before training',
+            'labeled_terms': len(training_data)
+        }
+
+    from utils.model_registry import ModelRegistry
 
     predictor = RenewalPredictor()
+    metrics = predictor.train(training_data)
+    metrics['labeled_terms'] = len(training_data)
 
-    # TODO: Implement actual database fetch
-    # training_data = fetch_historical_renewals(supabase)
-    # metrics = predictor.train(training_data)
-    # predictor.save_model(model_save_path)
+    registry = registry or ModelRegistry()
+    registry.publish_renewal_predictor(predictor, metrics)
+    if model_save_path:
+        predictor.save_model(model_save_path)
+
+    metrics['status'] = 'trained'
+    metrics['registry'] = registry.root
+    return metrics
 
-    return {
-        'status': 'Model training requires historical renewal data',
-        'recommendation': 'Collect 6-12 months of renewal outcomes before training'
-    }
 
+def _active_terms(chunk: pd.DataFrame, as_of: pd.Timestamp) -> pd.DataFrame:
+    """Latest unexpired term per policy, excluding renewed and cancelled policies."""
+    df = normalize_ledger_columns(chunk)
+    if df.empty or 'policy_number' not in df.columns:
+        return pd.DataFrame()
 
-def score_all_policies_for_renewal(supabase, agent_id: str = None) -> pd.DataFrame:
+    cancelled = set()
+    if 'transaction_type' in df.columns:
+        cancelled = set(df.loc[df['transaction_type'].isin(CANCEL_TRANSACTION_TYPES), 'policy_number'])
+
+    terms = _term_rows(df).copy()
+    terms['expiration_date'] = pd.to_datetime(terms['expiration_date'], errors='coerce')
+    terms = terms.sort_values(['policy_number', 'expiration_date'], ascending=[True, False])
+    terms = terms.drop_duplicates(subset='policy_number', keep='first')
+
+    active = terms['expiration_date'] >= as_of.normalize()
+    return terms[active & ~terms['policy_number'].isin(cancelled)]
+
+
+def score_all_policies_for_renewal(supabase, agent_id: str = None,
+                                   model_path: str = None,
+                                   agency_id: str = None, user_id: str = None,
+                                   chunk_size: int = SCORING_CHUNK_SIZE,
+                                   write_scores: bool = True) -> pd.DataFrame:
     """
     Score all active policies for renewal probability.
 
+    Policies are streamed in chunks, features are built with the encoders
+    persisted alongside the model, and each chunk is predicted in one
+    vectorized call. Scores are upserted into the renewal_scores table
+    tagged with the model version.
+
     Args:
         supabase: Supabase client
         agent_id: Optional agent ID to filter policies
+        model_path: Optional path of a standalone model (default: current registry version)
+        agency_id: Optional agency ID to filter policies
+        user_id: Optional user ID to filter policies
+        chunk_size: Rows fetched per page (at most SCORING_CHUNK_SIZE)
+        write_scores: Write results to renewal_scores (False for a dry run)
 
     Returns:
         DataFrame with renewal predictions
     """
-    # TODO: Implement actual database fetch and scoring
-    pass
+    if model_path:
+        predictor = RenewalPredictor(model_path)
+    else:
+        from utils.model_registry import get_renewal_predictor
+        predictor = get_renewal_predictor()
+
+    if predictor is None or not predictor.is_trained:
+        print("No trained renewal model available - run train_renewal_model_from_database first")
+        return pd.DataFrame()
+
+    as_of = pd.Timestamp(datetime.now())
+    scored_at = as_of.isoformat()
+    model_version = predictor.model_version or 'unversioned'
+
+    # Policy numbers renewed via Prior Policy Number may live in another chunk,
+    # so load that column up front (narrow query, paged past the row cap)
+    renewed_numbers = set()
+    prior_page_size = min(chunk_size, SCORING_CHUNK_SIZE)
+    offset = 0
+    while True:
+        prior_query = supabase.table('policies').select('"Prior Policy Number"')
+        if agent_id:
+            prior_query = prior_query.eq('agent_id', agent_id)
+        if agency_id:
+            prior_query = prior_query.eq('agency_id', agency_id)
+        if user_id:
+            prior_query = prior_query.eq('user_id', user_id)
+        page = prior_query.order('_id').range(offset, offset + prior_page_size - 1).execute().data or []
+        for row in page:
+            prior = str(row.get('Prior Policy Number') or '').strip()
+            if prior:
+                renewed_numbers.add(prior)
+        if len(page) < prior_page_size:
+            break
+        offset += prior_page_size
+
+    results = []
+    for chunk in iter_policy_chunks(supabase, agent_id=agent_id, agency_id=agency_id,
+                                    user_id=user_id, chunk_size=chunk_size):
+        active = _active_terms(chunk, as_of)
+        if active.empty:
+            continue
+
+        active = active[~active['policy_number'].astype(str).str.strip().isin(renewed_numbers)]
+        if active.empty:
+            continue
+
+        probabilities = predictor.score_batch(active, as_of=as_of)
+
+        scores = pd.DataFrame({
+            'transaction_id': _optional_column(active, 'transaction_id'),
+            'policy_number': active['policy_number'].to_numpy(),
+            'insured_name': _optional_column(active, 'insured_name'),
+            'agent_id': _optional_column(active, 'agent_id'),
+            'agency_id': _optional_column(active, 'agency_id'),
+            'user_id': _optional_column(active, 'user_id'),
+            'expiration_date': active['expiration_date'].dt.strftime('%Y-%m-%d').to_numpy(),
+            'renewal_probability': np.round(probabilities, 4),
+            'renewal_risk': categorize_renewal_risk_array(probabilities),
+            'model_version': model_version,
+            'scored_at': scored_at
+        })
+
+        if write_scores:
+            _write_renewal_scores(supabase, scores)
+        results.append(scores)
+
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+
+def _optional_column(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Column values as an array, or all-None when the column is absent."""
+    if column in df.columns:
+        return df[column].to_numpy()
+    return np.full(len(df), None, dtype=object)
+
+
+def _write_renewal_scores(supabase, scores: pd.DataFrame):
+    """Upsert renewal scores in batches keyed by (transaction_id, model_version)."""
+    records = scores.astype(object).where(scores.notna(), None).to_dict('records')
+    for start in range(0, len(records), SCORE_WRITE_BATCH_SIZE):
+        batch = records[start:start + SCORE_WRITE_BATCH_SIZE]
+        supabase.table(RENEWAL_SCORES_TABLE).upsert(
+            batch, on_conflict='transaction_id,model_version'
+        ).execute()
 
 
 def calculate_clv_for_all_clients(supabase, agency_id: str) -> pd.DataFrame:
@@ -904,8 +1358,9 @@ def calculate_clv_for_all_clients(supabase, agency_id: str) -> pd.DataFrame:
     Returns:
         DataFrame with CLV for all clients
     """
-    # TODO: Implement actual calculation
-    pass
+    result = supabase.table('policies').select('*').eq('agency_id', agency_id).execute()
+
+    return CLVCalculator().calculate_clv_for_all_clients(pd.DataFrame(result.data or []))
 
 
 if __name__ == "__main__":
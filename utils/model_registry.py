@@ -0,0 +1,228 @@
+"""
+Model Registry
+Versioned on-disk artifacts and warm, process-level loading for ML models.
+Sprint 3, Phase 3: AI & Predictive Analytics
+
+Layout under the registry root (default: models/registry, override with
+the MODEL_REGISTRY_DIR environment variable):
+
+    renewal/
+        LATEST                          <- name of the current version
+        renewal-20260101120000/
+            artifacts.joblib            <- model, scaler, label encoders
+            manifest.json               <- version, created_at, metrics
+
+Artifacts are written uncompressed with joblib so NumPy arrays inside the
+model are memory-mapped on load (mmap_mode='r'): every worker process that
+loads the same version shares the pages through the OS cache instead of
+deserializing its own copy.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import joblib
+
+DEFAULT_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR', 'models/registry')
+RENEWAL_MODEL_NAME = 'renewal'
+ARTIFACT_FILE = 'artifacts.joblib'
+MANIFEST_FILE = 'manifest.json'
+LATEST_FILE = 'LATEST'
+
+# How often (seconds) the warm loader re-checks the LATEST pointer
+VERSION_CHECK_INTERVAL = 30
+
+
+class ModelRegistry:
+    """
+    Stores versioned model artifacts and tracks the current version per model.
+
+    Publishing writes the artifacts into a new version directory first and
+    then atomically replaces the LATEST pointer, so readers never see a
+    half-written version.
+    """
+
+    def __init__(self, root: str = None):
+        """Initialize the registry at the given root directory."""
+        self.root = root or DEFAULT_REGISTRY_DIR
+
+    def _model_dir(self, model_name: str) -> str:
+        return os.path.join(self.root, model_name)
+
+    def _latest_path(self, model_name: str) -> str:
+        return os.path.join(self._model_dir(model_name), LATEST_FILE)
+
+    def publish_renewal_predictor(self, predictor, metrics: Dict = None) -> str:
+        """
+        Save a trained RenewalPredictor as a new version and make it current.
+
+        Args:
+            predictor: Trained RenewalPredictor
+            metrics: Optional training metrics stored in the manifest
+
+        Returns:
+            The published model version
+        """
+        if not predictor.is_trained:
+            raise ValueError("Only trained models can be published")
+
+        version = predictor.model_version or datetime.now().strftime('renewal-%Y%m%d%H%M%S')
+        version_dir = os.path.join(self._model_dir(RENEWAL_MODEL_NAME), version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        joblib.dump({
+            'model': predictor.model,
+            'scaler': predictor.scaler,
+            'label_encoders': predictor.label_encoders,
+            'feature_importance': predictor.feature_importance,
+        }, os.path.join(version_dir, ARTIFACT_FILE))
+
+        manifest = {
+            'model_name': RENEWAL_MODEL_NAME,
+            'version': version,
+            'created_at': datetime.now().isoformat(),
+            'metrics': {k: v for k, v in (metrics or {}).items() if isinstance(v, (int, float, str))},
+        }
+        with open(os.path.join(version_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Atomic pointer swap - this is what hot-swaps running workers
+        latest_path = self._latest_path(RENEWAL_MODEL_NAME)
+        tmp_path = f"{latest_path}.tmp.{os.getpid()}"
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, latest_path)
+
+        return version
+
+    def latest_version(self, model_name: str = RENEWAL_MODEL_NAME) -> Optional[str]:
+        """Return the current version name, or None if nothing is published."""
+        try:
+            with open(self._latest_path(model_name)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def latest_version_stamp(self, model_name: str = RENEWAL_MODEL_NAME) -> Optional[tuple]:
+        """
+        Cheap change detector for the LATEST pointer.
+
+        The pointer is replaced (not rewritten) on publish, so the inode changes
+        even when two publishes land within the filesystem's mtime resolution.
+        """
+        try:
+            stat = os.stat(self._latest_path(model_name))
+            return (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+
+    def list_versions(self, model_name: str = RENEWAL_MODEL_NAME) -> List[Dict]:
+        """Return manifests of all published versions, newest first."""
+        model_dir = self._model_dir(model_name)
+        if not os.path.isdir(model_dir):
+            return []
+
+        manifests = []
+        for entry in os.listdir(model_dir):
+            manifest_path = os.path.join(model_dir, entry, MANIFEST_FILE)
+            if os.path.exists(manifest_path):
+                with open(manifest_path) as f:
+                    manifests.append(json.load(f))
+
+        return sorted(manifests, key=lambda m: m.get('created_at', ''), reverse=True)
+
+    def load_renewal_predictor(self, version: str = None, mmap: bool = True):
+        """
+        Load a RenewalPredictor from the registry.
+
+        Args:
+            version: Version to load (default: current)
+            mmap: Memory-map NumPy arrays instead of reading them into memory
+
+        Returns:
+            Trained RenewalPredictor, or None if no version is published
+        """
+        from utils.ml_models import RenewalPredictor
+
+        version = version or self.latest_version(RENEWAL_MODEL_NAME)
+        if not version:
+            return None
+
+        artifact_path = os.path.join(self._model_dir(RENEWAL_MODEL_NAME), version, ARTIFACT_FILE)
+        artifacts = joblib.load(artifact_path, mmap_mode='r' if mmap else None)
+
+        predictor = RenewalPredictor()
+        predictor.model = artifacts['model']
+        predictor.scaler = artifacts['scaler']
+        predictor.label_encoders = artifacts['label_encoders']
+        predictor.feature_importance = artifacts['feature_importance']
+        predictor.is_trained = True
+        predictor.model_version = version
+
+        return predictor
+
+
+# =============================================================================
+# Warm, process-level predictor
+# =============================================================================
+
+_warm_lock = threading.Lock()
+_warm_predictors = {}  # registry root -> {'predictor', 'version', 'stamp', 'checked_at'}
+
+
+def get_renewal_predictor(registry_dir: str = None, check_interval: float = VERSION_CHECK_INTERVAL):
+    """
+    Return the process-wide RenewalPredictor, loading it at most once per version.
+
+    The LATEST pointer is re-checked at most every check_interval seconds;
+    when a new version has been published the new model is loaded and
+    swapped in. Callers holding the previous predictor keep using it
+    safely until they are done.
+
+    Args:
+        registry_dir: Registry root (default: MODEL_REGISTRY_DIR or models/registry)
+        check_interval: Seconds between LATEST pointer checks (0 = every call)
+
+    Returns:
+        Trained RenewalPredictor, or None if no model has been published
+    """
+    registry = ModelRegistry(registry_dir)
+    now = time.monotonic()
+
+    entry = _warm_predictors.get(registry.root)
+    if entry and now - entry['checked_at'] < check_interval:
+        return entry['predictor']
+
+    with _warm_lock:
+        entry = _warm_predictors.get(registry.root)
+        if entry and now - entry['checked_at'] < check_interval:
+            return entry['predictor']
+
+        stamp = registry.latest_version_stamp()
+        if entry and entry['stamp'] == stamp:
+            entry['checked_at'] = now
+            return entry['predictor']
+
+        version = registry.latest_version()
+        if entry and version and entry['version'] == version:
+            entry.update(stamp=stamp, checked_at=now)
+            return entry['predictor']
+
+        predictor = registry.load_renewal_predictor(version) if version else None
+        _warm_predictors[registry.root] = {
+            'predictor': predictor,
+            'version': version,
+            'stamp': stamp,
+            'checked_at': now,
+        }
+        return predictor
+
+
+def reset_warm_predictors():
+    """Drop all warm predictors (next call reloads from disk)."""
+    with _warm_lock:
+        _warm_predictors.clear()
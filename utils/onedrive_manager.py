@@ -12,6 +12,12 @@ If this feature doesn't work out, simply:
 2. Remove the "📁 Documents" page from commission_app.py
 3. Drop the policy_documents table
 
+Uploads go through one pooled requests.Session. Files over Graph's 4 MB
+simple-upload limit use a resumable upload session, sent in fixed-size
+chunks read from disk one at a time. upload_documents() uploads several
+files at once, reads PDF metadata (first METADATA_PAGES pages only) in a
+process pool and indexes the results with one insert per batch.
+
 Dependencies:
 - msal: Microsoft Authentication Library (pip install msal)
 - pypdf: PDF text extraction (pip install pypdf)
@@ -20,6 +26,10 @@ Dependencies:
 
 import os
 import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 import json
@@ -41,6 +51,22 @@ except ImportError:
     print("Warning: pypdf not installed. Run: pip install pypdf")
 
 import requests
+from requests.adapters import HTTPAdapter
+
+GRAPH_URL = "https://graph.microsoft.com/v1.0"
+
+# Graph accepts simple uploads up to 4 MB; upload session chunks must be
+# multiples of 320 KiB (and at most 60 MiB)
+SIMPLE_UPLOAD_MAX_BYTES = 4 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 10 * 320 * 1024  # 3.125 MiB
+UPLOAD_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+REQUEST_TIMEOUT = 60
+
+UPLOAD_WORKERS = 4  # documents uploaded at once
+METADATA_PROCESSES = 2
+METADATA_PAGES = 3  # policy number, insured and dates are on the first pages
+INDEX_BATCH_SIZE = 500
 
 
 class OneDriveDocumentManager:
@@ -96,6 +122,15 @@ class OneDriveDocumentManager:
 
         self.access_token = None
         self.token_expires_at = None
+        self._auth_lock = threading.Lock()
+
+        # One connection pool shared by every request and upload thread
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=2, pool_maxsize=UPLOAD_WORKERS * 2))
+        self.chunk_size = UPLOAD_CHUNK_SIZE
+        self.simple_upload_max_bytes = SIMPLE_UPLOAD_MAX_BYTES
+        self.retry_delay = 1.0
+        self.metadata_pages = METADATA_PAGES
 
         # Check if credentials are configured
         if not all([self.tenant_id, self.client_id, self.client_secret]):
@@ -155,15 +190,16 @@ class OneDriveDocumentManager:
 
     def _ensure_authenticated(self):
         """Ensure we have a valid access token."""
-        if not self.access_token or (self.token_expires_at and
-                                     datetime.now().timestamp() >= self.token_expires_at - 300):
-            # Token expired or about to expire (5 min buffer)
-            if not self.authenticate():
-                raise Exception("Failed to authenticate with Microsoft Graph API")
+        with self._auth_lock:  # upload threads share one token
+            if not self.access_token or (self.token_expires_at and
+                                         datetime.now().timestamp() >= self.token_expires_at - 300):
+                # Token expired or about to expire (5 min buffer)
+                if not self.authenticate():
+                    raise Exception("Failed to authenticate with Microsoft Graph API")
 
     def upload_document(self, file_path: str, client_name: str,
                        policy_number: str, carrier: str,
-                       doc_type: str) -> Dict:
+                       doc_type: str, metadata: Dict = None) -> Dict:
         """
         Upload a document to OneDrive with automatic organization.
 
@@ -173,6 +209,7 @@ class OneDriveDocumentManager:
             policy_number: Policy number
             carrier: Insurance carrier name
             doc_type: Document type (declaration, endorsement, correspondence, etc.)
+            metadata: Already extracted PDF metadata (extracted here if None)
 
         Returns:
             Dictionary with OneDrive file info:
@@ -190,9 +227,10 @@ class OneDriveDocumentManager:
         self._ensure_authenticated()
 
         # Extract metadata from PDF if it's a PDF
-        metadata = {}
-        if file_path.lower().endswith('.pdf'):
-            metadata = self.extract_pdf_metadata(file_path)
+        if metadata is None:
+            metadata = {}
+            if file_path.lower().endswith('.pdf'):
+                metadata = self.extract_pdf_metadata(file_path)
 
         # Build folder path
         folder_path = self._build_folder_path(client_name, policy_number, carrier, doc_type)
@@ -203,34 +241,179 @@ class OneDriveDocumentManager:
         # Full OneDrive path
         full_path = f"{folder_path}/{filename}"
 
-        # Upload to OneDrive
-        upload_url = f"https://graph.microsoft.com/v1.0/me/drive/root:/{full_path}:/content"
-
-        headers = {
-            "Authorization": f"Bearer {self.access_token}",
-            "Content-Type": "application/octet-stream"
+        file_info = self._upload_file(full_path, file_path)
+
+        return {
+            'id': file_info.get('id'),
+            'name': file_info.get('name'),
+            'webUrl': file_info.get('webUrl'),
+            'downloadUrl': file_info.get('@microsoft.graph.downloadUrl'),
+            'folder_path': folder_path,
+            'size': file_info.get('size'),
+            'created': file_info.get('createdDateTime'),
+            'doc_type': doc_type,
+            'metadata': metadata
         }
 
-        with open(file_path, 'rb') as f:
-            file_content = f.read()
-            response = requests.put(upload_url, headers=headers, data=file_content)
+    def upload_documents(self, documents: List[Dict], max_workers: int = UPLOAD_WORKERS,
+                         metadata_processes: int = METADATA_PROCESSES, supabase=None,
+                         agency_id: str = None, uploaded_by_user_id: str = None) -> List[Dict]:
+        """
+        Upload several documents concurrently.
 
-        if response.status_code in [200, 201]:
-            file_info = response.json()
+        PDF metadata is extracted in a process pool while uploads run in
+        threads; each upload waits only for its own file's metadata (the
+        filename uses the effective date). With a Supabase client, the
+        uploaded documents are indexed in batches afterwards.
+
+        Args:
+            documents: upload_document() arguments per file (file_path, client_name,
+                policy_number, carrier, doc_type)
+            max_workers: Documents uploaded at the same time
+            metadata_processes: Processes reading PDF metadata
+            supabase: Supabase client to index into policy_documents (optional)
+            agency_id: Agency ID for the index
+            uploaded_by_user_id: User ID for the index
+
+        Returns:
+            One result per document, in order: upload_document()'s dictionary,
+            or {'file_path', 'error'} for a document that failed
+        """
+        self._ensure_authenticated()
 
-            return {
-                'id': file_info.get('id'),
-                'name': file_info.get('name'),
-                'webUrl': file_info.get('webUrl'),
-                'downloadUrl': file_info.get('@microsoft.graph.downloadUrl'),
-                'folder_path': folder_path,
-                'size': file_info.get('size'),
-                'created': file_info.get('createdDateTime'),
-                'metadata': metadata
-            }
-        else:
+        pdf_paths = {d['file_path'] for d in documents if d['file_path'].lower().endswith('.pdf')}
+        use_pool = PYPDF_AVAILABLE and metadata_processes > 0 and len(pdf_paths) > 1
+        with (ProcessPoolExecutor(max_workers=metadata_processes) if use_pool else nullcontext()) as pool:
+            metadata_futures = {}
+            if pool is not None:
+                metadata_futures = {path: pool.submit(read_pdf_metadata, path, self.metadata_pages)
+                                    for path in pdf_paths}
+
+            def upload(document: Dict) -> Dict:
+                try:
+                    future = metadata_futures.get(document['file_path'])
+                    return self.upload_document(**document, metadata=future.result() if future else None)
+                except Exception as e:
+                    print(f"Error uploading {document.get('file_path')}: {e}")
+                    return {'file_path': document.get('file_path'), 'error': str(e)}
+
+            with ThreadPoolExecutor(max_workers=max_workers) as uploads:
+                results = list(uploads.map(upload, documents))
+
+        if supabase is not None:
+            index_documents_in_database(supabase, [r for r in results if 'error' not in r],
+                                        agency_id, uploaded_by_user_id)
+        return results
+
+    def _upload_file(self, full_path: str, file_path: str) -> Dict:
+        """Upload a local file to a OneDrive path; returns Graph's driveItem."""
+        size = os.path.getsize(file_path)
+
+        if size <= self.simple_upload_max_bytes:
+            # Small file: one request to the simple-upload endpoint
+            with open(file_path, 'rb') as f:
+                file_content = f.read()
+            response = self._request(
+                'PUT', f"{GRAPH_URL}/me/drive/root:/{full_path}:/content",
+                headers={"Content-Type": "application/octet-stream"}, data=file_content
+            )
+            if response.status_code in [200, 201]:
+                return response.json()
             raise Exception(f"Upload failed: {response.status_code} - {response.text}")
 
+        response = self._request(
+            'POST', f"{GRAPH_URL}/me/drive/root:/{full_path}:/createUploadSession",
+            json={"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+        )
+        if response.status_code != 200:
+            raise Exception(f"Upload session failed: {response.status_code} - {response.text}")
+        return self._upload_chunks(response.json()['uploadUrl'], file_path, size)
+
+    def _upload_chunks(self, upload_url: str, file_path: str, size: int) -> Dict:
+        """
+        Send a file to an upload session chunk by chunk.
+
+        Only one chunk is in memory at a time. After a failed chunk the
+        session is asked which bytes it still expects, so the upload resumes
+        instead of restarting; the session is cancelled if it can't go on.
+        """
+        offset = 0
+        attempt = 0
+        with open(file_path, 'rb') as f:
+            while True:
+                f.seek(offset)
+                chunk = f.read(self.chunk_size)
+                # The upload URL is pre-authenticated: no Authorization header
+                headers = {
+                    "Content-Length": str(len(chunk)),
+                    "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}"
+                }
+                try:
+                    response = self.session.put(upload_url, headers=headers, data=chunk, timeout=REQUEST_TIMEOUT)
+                except requests.RequestException as e:
+                    response, error = None, str(e)
+                else:
+                    error = f"{response.status_code} - {response.text}"
+
+                if response is not None and response.status_code in [200, 201]:
+                    return response.json()
+                if response is not None and response.status_code == 202:
+                    attempt = 0
+                    offset = self._next_expected_offset(response.json(), offset + len(chunk))
+                    continue
+                if (response is None or response.status_code in RETRY_STATUSES) and attempt < UPLOAD_RETRIES:
+                    attempt += 1
+                    time.sleep(self._backoff(attempt, response))
+                    offset = self._upload_session_offset(upload_url, offset)
+                    continue
+
+                try:
+                    self.session.delete(upload_url, timeout=REQUEST_TIMEOUT)
+                except requests.RequestException:
+                    pass
+                raise Exception(f"Upload failed at byte {offset}: {error}")
+
+    def _upload_session_offset(self, upload_url: str, default: int) -> int:
+        """First byte the upload session still expects."""
+        try:
+            response = self.session.get(upload_url, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return self._next_expected_offset(response.json(), default)
+        except requests.RequestException:
+            pass
+        return default
+
+    @staticmethod
+    def _next_expected_offset(status: Dict, default: int) -> int:
+        ranges = status.get('nextExpectedRanges') or []
+        if ranges:
+            return int(str(ranges[0]).split('-')[0])
+        return default
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        """Seconds to wait before retry `attempt` (Retry-After if Graph sent one)."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.retry_delay * (2 ** (attempt - 1))
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Authenticated Graph request on the pooled session, retried on throttling and server errors."""
+        self._ensure_authenticated()
+        headers = {"Authorization": f"Bearer {self.access_token}", **kwargs.pop('headers', {})}
+        attempt = 0
+        while True:
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=REQUEST_TIMEOUT, **kwargs)
+            except requests.RequestException:
+                if attempt >= UPLOAD_RETRIES:
+                    raise
+                response = None
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt >= UPLOAD_RETRIES):
+                return response
+            attempt += 1
+            time.sleep(self._backoff(attempt, response))
+
     def extract_pdf_metadata(self, file_path: str) -> Dict:
         """
         Extract metadata from a PDF file.
@@ -241,48 +424,18 @@ class OneDriveDocumentManager:
         - Dates (effective, expiration)
         - Carrier name (if mentioned)
 
+        Only the first metadata_pages pages are read; see read_pdf_metadata().
+
         Args:
             file_path: Path to PDF file
 
         Returns:
             Dictionary with extracted metadata
         """
-        if not PYPDF_AVAILABLE:
-            return {'error': 'pypdf not installed'}
-
-        try:
-            reader = PdfReader(file_path)
-
-            # Extract text from all pages
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-
-            # Extract policy number
-            policy_number = self._extract_policy_number(text)
-
-            # Extract client name
-            client_name = self._extract_client_name(text)
-
-            # Extract dates
-            dates = self._extract_dates(text)
+        return read_pdf_metadata(file_path, self.metadata_pages)
 
-            # Extract carrier (look for common carrier names)
-            carrier = self._extract_carrier(text)
-
-            return {
-                'policy_number': policy_number,
-                'client_name': client_name,
-                'effective_date': dates.get('effective'),
-                'expiration_date': dates.get('expiration'),
-                'carrier': carrier,
-                'text_preview': text[:500] if text else None  # First 500 chars
-            }
-
-        except Exception as e:
-            return {'error': str(e)}
-
-    def _extract_policy_number(self, text: str) -> Optional[str]:
+    @staticmethod
+    def _extract_policy_number(text: str) -> Optional[str]:
         """Extract policy number from text using various patterns."""
         patterns = [
             r'Policy\s*(?:Number|#|No\.?)?\s*[:\-]?\s*([A-Z0-9]{6,20})',
@@ -299,7 +452,8 @@ class OneDriveDocumentManager:
 
         return None
 
-    def _extract_client_name(self, text: str) -> Optional[str]:
+    @staticmethod
+    def _extract_client_name(text: str) -> Optional[str]:
         """Extract client/insured name from text."""
         patterns = [
             r'(?:Named\s+)?Insured[:\s]+([A-Z][a-z]+(?:\s+[A-Z][a-z]+){1,3})',
@@ -314,7 +468,8 @@ class OneDriveDocumentManager:
 
         return None
 
-    def _extract_dates(self, text: str) -> Dict[str, Optional[str]]:
+    @staticmethod
+    def _extract_dates(text: str) -> Dict[str, Optional[str]]:
         """Extract effective and expiration dates."""
         dates = {'effective': None, 'expiration': None}
 
@@ -344,7 +499,8 @@ class OneDriveDocumentManager:
 
         return dates
 
-    def _extract_carrier(self, text: str) -> Optional[str]:
+    @staticmethod
+    def _extract_carrier(text: str) -> Optional[str]:
         """Extract carrier name from text."""
         # Common carriers
         carriers = [
@@ -471,13 +627,13 @@ class OneDriveDocumentManager:
         """
         self._ensure_authenticated()
 
-        url = f"https://graph.microsoft.com/v1.0/me/drive/items/{file_id}"
+        url = f"{GRAPH_URL}/me/drive/items/{file_id}"
 
         headers = {
             "Authorization": f"Bearer {self.access_token}"
         }
 
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
 
         if response.status_code == 200:
             file_info = response.json()
@@ -498,7 +654,7 @@ class OneDriveDocumentManager:
         """
         self._ensure_authenticated()
 
-        url = f"https://graph.microsoft.com/v1.0/me/drive/items/{file_id}/createLink"
+        url = f"{GRAPH_URL}/me/drive/items/{file_id}/createLink"
 
         headers = {
             "Authorization": f"Bearer {self.access_token}",
@@ -510,7 +666,7 @@ class OneDriveDocumentManager:
             "scope": "organization"  # Only people in the organization can access
         }
 
-        response = requests.post(url, headers=headers, json=data)
+        response = self.session.post(url, headers=headers, json=data, timeout=REQUEST_TIMEOUT)
 
         if response.status_code == 200:
             result = response.json()
@@ -519,10 +675,71 @@ class OneDriveDocumentManager:
         return None
 
 
+def read_pdf_metadata(file_path: str, max_pages: int = METADATA_PAGES) -> Dict:
+    """
+    Extract policy metadata from the first max_pages pages of a PDF.
+
+    A module-level function so upload_documents() can run it in a process
+    pool; OneDriveDocumentManager.extract_pdf_metadata() calls it too.
+
+    Args:
+        file_path: Path to PDF file
+        max_pages: Pages to read (declarations carry the policy details up front)
+
+    Returns:
+        Dictionary with extracted metadata
+    """
+    if not PYPDF_AVAILABLE:
+        return {'error': 'pypdf not installed'}
+
+    try:
+        reader = PdfReader(file_path)
+
+        # Extract text from the first pages only
+        text = ""
+        for page in reader.pages[:max_pages]:
+            text += (page.extract_text() or "") + "\n"
+
+        dates = OneDriveDocumentManager._extract_dates(text)
+
+        return {
+            'policy_number': OneDriveDocumentManager._extract_policy_number(text),
+            'client_name': OneDriveDocumentManager._extract_client_name(text),
+            'effective_date': dates.get('effective'),
+            'expiration_date': dates.get('expiration'),
+            'carrier': OneDriveDocumentManager._extract_carrier(text),
+            'text_preview': text[:500] if text else None  # First 500 chars
+        }
+
+    except Exception as e:
+        return {'error': str(e)}
+
+
 # =============================================================================
 # Database Integration Functions
 # =============================================================================
 
+def _document_record(document_info: Dict, agency_id: str, uploaded_by_user_id: str) -> Dict:
+    """policy_documents row for an upload_document() result."""
+    metadata = document_info.get('metadata') or {}
+
+    return {
+        'agency_id': agency_id,
+        'onedrive_file_id': document_info['id'],
+        'onedrive_path': document_info['folder_path'] + '/' + document_info['name'],
+        'onedrive_web_url': document_info['webUrl'],
+        'onedrive_download_url': document_info.get('downloadUrl'),
+        'client_name': metadata.get('client_name'),
+        'policy_number': metadata.get('policy_number'),
+        'carrier': metadata.get('carrier'),
+        'document_type': document_info.get('doc_type'),
+        'document_date': metadata.get('effective_date'),
+        'extracted_text': metadata.get('text_preview'),
+        'file_size_bytes': document_info.get('size'),
+        'uploaded_by_user_id': uploaded_by_user_id
+    }
+
+
 def index_document_in_database(supabase, document_info: Dict,
                                agency_id: str, uploaded_by_user_id: str) -> bool:
     """
@@ -537,32 +754,34 @@ def index_document_in_database(supabase, document_info: Dict,
     Returns:
         True if successful
     """
-    try:
-        metadata = document_info.get('metadata', {})
-
-        record = {
-            'agency_id': agency_id,
-            'onedrive_file_id': document_info['id'],
-            'onedrive_path': document_info['folder_path'] + '/' + document_info['name'],
-            'onedrive_web_url': document_info['webUrl'],
-            'onedrive_download_url': document_info.get('downloadUrl'),
-            'client_name': metadata.get('client_name'),
-            'policy_number': metadata.get('policy_number'),
-            'carrier': metadata.get('carrier'),
-            'document_type': document_info.get('doc_type'),
-            'document_date': metadata.get('effective_date'),
-            'extracted_text': metadata.get('text_preview'),
-            'file_size_bytes': document_info.get('size'),
-            'uploaded_by_user_id': uploaded_by_user_id
-        }
+    return index_documents_in_database(supabase, [document_info], agency_id, uploaded_by_user_id) == 1
 
-        result = supabase.table('policy_documents').insert(record).execute()
 
-        return bool(result.data)
+def index_documents_in_database(supabase, documents: List[Dict], agency_id: str,
+                                uploaded_by_user_id: str, batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """
+    Store references for many uploaded documents, one insert per batch.
 
-    except Exception as e:
-        print(f"Error indexing document: {e}")
-        return False
+    Args:
+        supabase: Supabase client
+        documents: Document infos from upload_document()
+        agency_id: Agency ID
+        uploaded_by_user_id: User ID who uploaded the documents
+        batch_size: Rows per insert
+
+    Returns:
+        Number of documents indexed
+    """
+    indexed = 0
+    for start in range(0, len(documents), batch_size):
+        try:
+            records = [_document_record(d, agency_id, uploaded_by_user_id)
+                       for d in documents[start:start + batch_size]]
+            result = supabase.table('policy_documents').insert(records).execute()
+            indexed += len(result.data) if result.data else 0
+        except Exception as e:
+            print(f"Error indexing documents: {e}")
+    return indexed
 
 
 def search_documents_in_database(supabase, agency_id: str,
@@ -8,6 +8,8 @@ import streamlit as st
 from functools import wraps
 import time
 
+from utils.render_profiler import span
+
 # =============================================================================
 # STREAMLIT CACHING CONFIGURATION
 # =============================================================================
@@ -21,6 +23,7 @@ CACHE_TTL = {
     'commission_statements': 300,  # 5 minutes
     'renewal_pipeline': 180,  # 3 minutes
     'agency_stats': 600,  # 10 minutes
+    'user_settings': 300,  # 5 minutes
 }
 
 # Query optimization settings
@@ -48,7 +51,9 @@ def performance_monitor(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         start_time = time.time()
-        result = func(*args, **kwargs)
+        # Also a span of the render profile when one is running (utils.render_profiler)
+        with span(func.__name__):
+            result = func(*args, **kwargs)
         end_time = time.time()
         execution_time = end_time - start_time
 
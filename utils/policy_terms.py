@@ -0,0 +1,223 @@
+"""
+Policy Term Index
+Assigns every ledger transaction to the policy term it belongs to.
+
+A term is defined by a NEW / RWL / REWRITE transaction with both an
+Effective Date and an X-DATE. Every other transaction of the same policy
+belongs to the latest term that started on or before its Effective Date,
+provided it falls before that term's X-DATE:
+
+    - the term-defining transaction belongs to its own term
+    - END, STMT / VOID reconciliation entries and other transactions:
+      term effective date <= effective date < term X-DATE
+    - CAN dated exactly on a term's X-DATE goes to the expiring term
+    - transactions outside every term are orphans (term ID None)
+    - policies without any term-defining transaction are grouped as
+      "<policy> - All Transactions"
+
+The assignment is a sorted interval join per policy (pandas.merge_asof),
+so PRL month filters, detailed-view grouping, subtotals and the ledger
+term filter become plain masks / groupbys on the term ID instead of
+nested per-policy loops.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+TERM_DEFINING_TYPES = ('NEW', 'RWL', 'REWRITE')
+RECONCILIATION_MARKERS = ('-STMT-', '-VOID-')
+
+TERM_COL = '_term_group'
+TERM_DATES_COL = '_term_dates'
+
+
+def is_reconciliation_id(transaction_ids: pd.Series) -> pd.Series:
+    """True for -STMT- / -VOID- reconciliation entries."""
+    ids = transaction_ids.astype(str)
+    mask = pd.Series(False, index=ids.index)
+    for marker in RECONCILIATION_MARKERS:
+        mask |= ids.str.contains(marker, regex=False)
+    return mask
+
+
+def _dates(data: pd.DataFrame, col: str) -> pd.Series:
+    if col not in data.columns:
+        return pd.Series(pd.NaT, index=data.index, dtype='datetime64[ns]')
+    return pd.to_datetime(data[col], errors='coerce').astype('datetime64[ns]')
+
+
+def _month_keys(dates: pd.Series) -> pd.Series:
+    """year * 100 + month (-1 for missing dates) - much cheaper than strftime."""
+    return (dates.dt.year * 100 + dates.dt.month).fillna(-1).astype(int)
+
+
+def _has_policy(policies: pd.Series) -> pd.Series:
+    """False for a blank or missing Policy Number."""
+    return policies.notna() & (policies != '')
+
+
+class PolicyTermIndex:
+    """
+    Term ID for every row of a ledger DataFrame.
+
+    Attributes:
+        terms: One row per term - term_id, policy, term_number,
+            effective_date, x_date, start_month (year * 100 + month) and term_dates
+        term_ids: Series aligned with the data's index (None for orphans)
+        term_dates: Series aligned with the data's index ('' when unknown)
+    """
+
+    def __init__(
+        self,
+        data: pd.DataFrame,
+        policy_col: str = 'Policy Number',
+        effective_col: str = 'Effective Date',
+        x_date_col: str = 'X-DATE',
+        type_col: str = 'Transaction Type',
+        id_col: str = 'Transaction ID'
+    ):
+        self.policy_col = policy_col
+        index = data.index
+        policies = data[policy_col].astype(str).str.strip() if policy_col in data.columns \
+            else pd.Series('', index=index)
+        self._policies = policies
+        types = data[type_col].astype(str).str.upper().str.strip() if type_col in data.columns \
+            else pd.Series('', index=index)
+
+        tx = pd.DataFrame({
+            '_pos': np.arange(len(data)),
+            'policy': policies.to_numpy(),
+            'eff': _dates(data, effective_col).to_numpy(),
+            'x': _dates(data, x_date_col).to_numpy(),
+            'type': types.to_numpy(),
+        })
+        tx['recon'] = is_reconciliation_id(data[id_col]).to_numpy() if id_col in data.columns else False
+        # Reconciliation entries copy the transaction type but never define a term
+        tx['defining'] = tx['type'].isin(TERM_DEFINING_TYPES) & ~tx['recon']
+        self._defining_type = pd.Series(tx['defining'].to_numpy(), index=index)
+        self._effective_month = pd.Series(_month_keys(tx['eff']).to_numpy(), index=index)
+
+        self.terms = self._build_terms(tx)
+        term_ids = self._assign(tx)
+
+        # Policies that never define a term keep all their rows in one group
+        if type_col in data.columns and x_date_col in data.columns:
+            untermed = ~tx['policy'].isin(self.terms['policy'])
+        else:
+            untermed = pd.Series(True, index=tx.index)
+        term_ids = term_ids.where(~untermed, tx['policy'] + ' - All Transactions')
+        # Rows without a Policy Number belong to no policy (orphans)
+        term_ids = term_ids.where(_has_policy(tx['policy']), None)
+
+        self.term_ids = pd.Series(term_ids.to_numpy(), index=index, dtype=object)
+        self.term_ids[self.term_ids.isna()] = None
+        dates = self.terms.set_index('term_id')['term_dates']
+        self.term_dates = pd.Series(self.term_ids.map(dates).fillna('').to_numpy(), index=index, dtype=object)
+
+    @staticmethod
+    def _build_terms(tx: pd.DataFrame) -> pd.DataFrame:
+        terms = tx[tx['defining'] & tx['eff'].notna() & tx['x'].notna() & _has_policy(tx['policy'])]
+        terms = terms.drop_duplicates(subset=['policy', 'eff', 'x'])
+        terms = terms.sort_values(['policy', 'eff', 'x'], kind='mergesort')
+        terms = pd.DataFrame({
+            'policy': terms['policy'].to_numpy(),
+            'effective_date': terms['eff'].to_numpy(),
+            'x_date': terms['x'].to_numpy(),
+        })
+        terms['term_number'] = (terms.groupby('policy').cumcount() + 1).astype(int)
+        terms['term_id'] = terms['policy'] + ' - Term ' + terms['term_number'].astype(str)
+        terms['start_month'] = _month_keys(terms['effective_date'])
+        terms['term_dates'] = (terms['effective_date'].dt.strftime('%m/%d/%Y') + ' to '
+                               + terms['x_date'].dt.strftime('%m/%d/%Y'))
+        return terms[['term_id', 'policy', 'term_number', 'effective_date', 'x_date', 'start_month', 'term_dates']]
+
+    def _assign(self, tx: pd.DataFrame) -> pd.Series:
+        term_ids = pd.Series(None, index=tx.index, dtype=object)
+        if self.terms.empty:
+            return term_ids
+
+        right = self.terms[['policy', 'effective_date', 'x_date', 'term_id']].sort_values('effective_date')
+        dated = tx[tx['eff'].notna()].sort_values('eff')
+
+        # Latest term that started on or before the transaction
+        joined = pd.merge_asof(dated, right, left_on='eff', right_on='effective_date', by='policy',
+                               direction='backward')
+        inside = joined['term_id'].notna() & (joined['eff'] < joined['x_date'])
+        term_ids.iloc[joined.loc[inside, '_pos'].to_numpy()] = joined.loc[inside, 'term_id'].to_numpy()
+
+        # CAN on the X-DATE of the previous term belongs to the expiring term
+        cancels = dated[(dated['type'] == 'CAN') & ~dated['recon']]
+        if not cancels.empty:
+            prior = pd.merge_asof(cancels, right, left_on='eff', right_on='effective_date', by='policy',
+                                  direction='backward', allow_exact_matches=False)
+            expiring = prior['term_id'].notna() & (prior['eff'] == prior['x_date'])
+            term_ids.iloc[prior.loc[expiring, '_pos'].to_numpy()] = prior.loc[expiring, 'term_id'].to_numpy()
+
+        # Term-defining rows always belong to their own term
+        defining = tx[tx['defining'] & tx['eff'].notna() & tx['x'].notna()]
+        own = defining.merge(right, left_on=['policy', 'eff', 'x'], right_on=['policy', 'effective_date', 'x_date'])
+        term_ids.iloc[own['_pos'].to_numpy()] = own['term_id'].to_numpy()
+        return term_ids
+
+    def annotate(self, data: pd.DataFrame, term_col: str = TERM_COL, dates_col: str = TERM_DATES_COL) -> pd.DataFrame:
+        """Copy of data (indexed like the indexed frame, or a subset of it) with term ID and term date columns."""
+        data = data.copy()
+        data[term_col] = self.term_ids.reindex(data.index).fillna('')
+        data[dates_col] = self.term_dates.reindex(data.index).fillna('')
+        return data
+
+    def month_mask(self, year_month: str) -> pd.Series:
+        """
+        Rows belonging to terms that started in year_month ('YYYY-MM').
+
+        Term-defining transactions are only included when they are themselves
+        effective in that month (including ones without an X-DATE).
+        """
+        month_key = _month_keys(pd.Series([pd.to_datetime(year_month + '-01')])).iloc[0]
+        starting = set(self.terms.loc[self.terms['start_month'] == month_key, 'term_id'])
+        in_month = self._effective_month == month_key
+        return (self.term_ids.isin(starting) & ~self._defining_type) | (self._defining_type & in_month)
+
+    def terms_for_x_date(self, x_date, policy: str = None) -> pd.DataFrame:
+        """Terms ending on x_date, optionally for one policy."""
+        x_date = pd.to_datetime(x_date, errors='coerce')
+        terms = self.terms[self.terms['x_date'] == x_date]
+        if policy is not None:
+            terms = terms[terms['policy'] == str(policy).strip()]
+        return terms
+
+    def ordered_term_ids(self, data: Optional[pd.DataFrame] = None) -> List[str]:
+        """
+        Term IDs present in data (default: all rows), in display order:
+        policies in order of first appearance, then terms by number.
+        """
+        term_ids = self.term_ids if data is None else self.term_ids.reindex(data.index)
+        policies = self._policies if data is None else self._policies.reindex(data.index)
+        present = pd.DataFrame({'term_id': term_ids, 'policy': policies}).dropna()
+        if present.empty:
+            return []
+        policy_rank = {p: i for i, p in enumerate(present['policy'].unique())}
+        numbers = self.terms.set_index('term_id')['term_number']
+        present = present.drop_duplicates('term_id')
+        present['_policy_rank'] = present['policy'].map(policy_rank)
+        present['_term_number'] = present['term_id'].map(numbers).fillna(0)
+        return present.sort_values(['_policy_rank', '_term_number'], kind='mergesort')['term_id'].tolist()
+
+
+def term_subtotals(
+    data: pd.DataFrame,
+    columns: Sequence[str],
+    term_col: str = TERM_COL
+) -> pd.DataFrame:
+    """Per-term row counts and numeric sums (non-numeric / blank values count as 0)."""
+    grouped = data[data[term_col].astype(bool)] if term_col in data.columns else data.iloc[0:0]
+    totals: Dict[str, pd.Series] = {'count': grouped.groupby(term_col).size()}
+    for col in columns:
+        if col in grouped.columns:
+            values = pd.to_numeric(grouped[col], errors='coerce').fillna(0)
+            totals[col] = values.groupby(grouped[term_col]).sum()
+        else:
+            totals[col] = pd.Series(0.0, index=totals['count'].index)
+    return pd.DataFrame(totals)
@@ -0,0 +1,286 @@
+"""
+PRL Aggregation Cache
+"Aggregated by Policy" view of Policy Revenue Ledger Reports: one row per
+policy with summed monetary columns.
+
+The aggregated frame is kept per user (in session state) together with a
+data version and a fingerprint of every policy's transactions. On each
+rerun:
+
+    - nothing written since the last check (policies write version, bumped
+      by invalidate_aggregated_policies() from clear_policies_cache after
+      every save), same shape and checked less than REVALIDATE_SECONDS
+      ago: the cached frame is returned without hashing any rows
+      (pagination, review checkboxes, filters)
+    - same column mapping and data version: the cached frame is returned
+      as-is
+    - some policies changed / were added / removed: only those policy
+      groups are re-aggregated and spliced into the cached frame
+    - column mapping or available columns changed: full recompute
+
+Fingerprints hash only the columns that feed the aggregation, combined
+with each row's position inside its policy (the 'first' aggregations
+depend on row order). Rows are hashed when the write version changes, and
+at least every REVALIDATE_SECONDS to pick up writes made outside this
+process (API, CRM sync).
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+POLICY_COL = 'Policy Number'
+
+# Longest time a cached frame is trusted on the write version alone
+REVALIDATE_SECONDS = 60.0
+
+# Same for all transactions of a policy - take the first
+DESCRIPTIVE_FIELDS = [
+    "Customer", "Policy Type", "Carrier Name", "MGA Name", "Effective Date",
+    "Policy Origination Date", "X-DATE", "Client ID", "Transaction Type",
+    "Prior Policy Number", "Transaction ID", "NOTES", "Policy Term",
+    "Policy Checklist Complete", "STMT DATE",
+]
+
+# Summed across all transactions of a policy
+MONETARY_FIELDS = [
+    "Agent Estimated Comm $", "Agent Paid Amount (STMT)",
+    "Agency Estimated Comm/Revenue (CRM)", "Premium Sold", "Policy Gross Comm %",
+    "Broker Fee", "Broker Fee Agent Comm", "Total Agent Comm",
+    "Policy Taxes & Fees", "Commissionable Premium",
+]
+
+# Should be consistent per policy - take the first
+PERCENTAGE_FIELDS = ["Agent Comm %", "Policy Gross Comm %"]
+
+
+def resolve_aggregation_plan(columns, get_mapped_column: Callable[[str], Optional[str]]) -> Dict[str, str]:
+    """
+    Build the groupby aggregation dict ({column: 'first' | 'sum'}) for the
+    columns present in the data, resolving each field through the user's
+    column mapping.
+    """
+    columns = set(columns)
+    plan = {}
+
+    def target(field_name):
+        mapped_col = get_mapped_column(field_name)
+        if mapped_col and mapped_col in columns:
+            return mapped_col
+        return field_name if field_name in columns else None
+
+    for field_name in DESCRIPTIVE_FIELDS:
+        target_col = target(field_name)
+        if target_col:
+            plan[target_col] = 'first'
+    for field_name in MONETARY_FIELDS:
+        target_col = target(field_name)
+        if target_col:
+            plan[target_col] = 'sum'
+    for field in PERCENTAGE_FIELDS:
+        if field in columns and field not in plan:
+            plan[field] = 'first'
+    plan.pop(POLICY_COL, None)
+    return plan
+
+
+def _prepare(data: pd.DataFrame, plan: Dict[str, str]) -> pd.DataFrame:
+    """Plan columns with stripped policy numbers and numeric monetary columns."""
+    frame = data[[POLICY_COL] + list(plan)].copy()
+    frame[POLICY_COL] = frame[POLICY_COL].astype(str).str.strip()
+    for col, how in plan.items():
+        if how == 'sum':
+            frame[col] = pd.to_numeric(frame[col], errors='coerce').fillna(0)
+    return frame
+
+
+def _sort(aggregated: pd.DataFrame) -> pd.DataFrame:
+    if 'Customer' in aggregated.columns:
+        return aggregated.sort_values(['Customer', POLICY_COL], ascending=[True, True]).reset_index(drop=True)
+    return aggregated.reset_index(drop=True)
+
+
+def _by_policy(aggregated: pd.DataFrame) -> pd.DataFrame:
+    return aggregated.set_index(aggregated[POLICY_COL].to_numpy())
+
+
+def aggregate_policies(data: pd.DataFrame, plan: Dict[str, str]) -> pd.DataFrame:
+    """One row per policy, sorted by Customer then Policy Number."""
+    if data.empty or POLICY_COL not in data.columns:
+        return data.copy()
+    aggregated = _prepare(data, plan).groupby(POLICY_COL, as_index=False).agg(plan)
+    return _sort(aggregated)
+
+
+def _row_hashes(data: pd.DataFrame, plan: Dict[str, str]) -> np.ndarray:
+    frame = data[[POLICY_COL] + list(plan)]
+    try:
+        return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    except TypeError:
+        # Unhashable cell values (lists / dicts from JSON columns)
+        return pd.util.hash_pandas_object(frame.astype(str), index=False).to_numpy()
+
+
+def _combine(row_hashes: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Order-sensitive mix of row hashes (uint64 arithmetic wraps)."""
+    with np.errstate(over='ignore'):
+        return row_hashes * (positions.astype(np.uint64) * np.uint64(2) + np.uint64(1))
+
+
+def data_version(data: pd.DataFrame, plan: Dict[str, str], row_hashes: np.ndarray = None) -> int:
+    """Single fingerprint of everything the aggregation reads."""
+    if row_hashes is None:
+        row_hashes = _row_hashes(data, plan)
+    with np.errstate(over='ignore'):
+        return int(_combine(row_hashes, np.arange(len(row_hashes))).sum(dtype=np.uint64))
+
+
+def policy_fingerprints(data: pd.DataFrame, plan: Dict[str, str], row_hashes: np.ndarray = None) -> pd.Series:
+    """uint64 fingerprint per policy over the aggregated columns and row order."""
+    if row_hashes is None:
+        row_hashes = _row_hashes(data, plan)
+    policies = data[POLICY_COL].astype(str).str.strip()
+    positions = policies.groupby(policies).cumcount().to_numpy()
+    return pd.Series(_combine(row_hashes, positions), index=policies.to_numpy()).groupby(level=0).sum()
+
+
+_write_version = 0
+_write_version_lock = threading.Lock()
+
+
+def policies_write_version() -> int:
+    """Counter bumped by invalidate_aggregated_policies()."""
+    return _write_version
+
+
+def invalidate_aggregated_policies():
+    """Call after writing policies so the next get() hashes the data again."""
+    global _write_version
+    with _write_version_lock:
+        _write_version += 1
+
+
+class AggregatedPolicyCache:
+    """
+    Aggregated PRL frame for one user, recomputed only for policies whose
+    transactions changed.
+
+    Attributes:
+        last_stats: {'mode': 'hit' | 'incremental' | 'full', 'recomputed_policies': int}
+    """
+
+    def __init__(self):
+        self._plan_source = None
+        self._plan: Dict[str, str] = {}
+        self._plan_key = None
+        self._version = None
+        self._fingerprints: Optional[pd.Series] = None
+        self._rows: Optional[pd.DataFrame] = None  # indexed by policy
+        self._frame: Optional[pd.DataFrame] = None  # sorted, ready to display
+        self._quick_key = None
+        self._verified_at = 0.0
+        self.last_stats = {'mode': None, 'recomputed_policies': 0}
+
+    def plan_for(self, columns, get_mapped_column: Callable[[str], Optional[str]], mapping_version=None) -> Dict[str, str]:
+        """Aggregation plan, re-resolved only when the mapping version or columns change."""
+        source = (mapping_version, tuple(columns))
+        if source != self._plan_source:
+            self._plan = resolve_aggregation_plan(columns, get_mapped_column)
+            self._plan_source = source
+        return self._plan
+
+    def get(self, data: pd.DataFrame, plan: Dict[str, str], mapping_version=None,
+            write_version=None) -> pd.DataFrame:
+        """
+        Aggregated frame for data (a copy - callers add columns to it).
+
+        With a write_version (see policies_write_version), a rerun with the
+        same version, plan and data shape within REVALIDATE_SECONDS of the
+        last check skips hashing the rows.
+        """
+        if data.empty or POLICY_COL not in data.columns:
+            self.last_stats = {'mode': 'full', 'recomputed_policies': 0}
+            return data.copy()
+
+        plan_key = (mapping_version, tuple(plan.items()))
+        quick_key = None
+        if write_version is not None:
+            quick_key = (write_version, plan_key, data.shape, tuple(data.columns))
+            if (quick_key == self._quick_key and self._rows is not None
+                    and time.monotonic() - self._verified_at < REVALIDATE_SECONDS):
+                self.last_stats = {'mode': 'hit', 'recomputed_policies': 0}
+                return self._frame.copy()
+        self._quick_key = quick_key
+        self._verified_at = time.monotonic()
+
+        row_hashes = _row_hashes(data, plan)
+        version = data_version(data, plan, row_hashes)
+
+        if plan_key == self._plan_key and version == self._version and self._rows is not None:
+            self.last_stats = {'mode': 'hit', 'recomputed_policies': 0}
+            return self._frame.copy()
+
+        fingerprints = policy_fingerprints(data, plan, row_hashes)
+        self._version = version
+
+        if plan_key != self._plan_key or self._rows is None:
+            self._rows = _by_policy(aggregate_policies(data, plan))
+            self._frame = _sort(self._rows)
+            self._plan_key = plan_key
+            self._fingerprints = fingerprints
+            self.last_stats = {'mode': 'full', 'recomputed_policies': len(fingerprints)}
+            return self._frame.copy()
+
+        common = fingerprints.index.intersection(self._fingerprints.index)
+        edited = common[self._fingerprints[common].to_numpy() != fingerprints[common].to_numpy()]
+        changed = fingerprints.index.difference(self._fingerprints.index).union(edited)
+        removed = self._fingerprints.index.difference(fingerprints.index)
+
+        if len(changed) == 0 and len(removed) == 0:
+            # Only row order across policies changed
+            self._fingerprints = fingerprints
+            self.last_stats = {'mode': 'hit', 'recomputed_policies': 0}
+            return self._frame.copy()
+
+        policies = data[POLICY_COL].astype(str).str.strip()
+        updated = _by_policy(aggregate_policies(data[policies.isin(changed).to_numpy()], plan))
+        kept = self._rows.drop(index=changed.union(removed), errors='ignore')
+        self._rows = pd.concat([kept, updated]) if len(kept) else updated
+        self._frame = _sort(self._rows)
+        self._fingerprints = fingerprints
+        self.last_stats = {'mode': 'incremental', 'recomputed_policies': len(changed)}
+        return self._frame.copy()
+
+    def clear(self):
+        """Drop the cached frame (next get() recomputes everything)."""
+        self._quick_key = None
+        self._plan_key = None
+        self._version = None
+        self._fingerprints = None
+        self._rows = None
+        self._frame = None
+
+
+def get_aggregated_policies(
+    session_state,
+    cache_key: str,
+    data: pd.DataFrame,
+    get_mapped_column: Callable[[str], Optional[str]],
+    mapping_version=None
+) -> pd.DataFrame:
+    """
+    Cached aggregated view for the user owning cache_key.
+
+    The aggregation plan is also cached per (mapping version, columns), so
+    get_mapped_column is only consulted when the mapping or schema changes.
+    """
+    cache = session_state.get(cache_key)
+    if not isinstance(cache, AggregatedPolicyCache):
+        cache = AggregatedPolicyCache()
+        session_state[cache_key] = cache
+
+    plan = cache.plan_for(data.columns, get_mapped_column, mapping_version)
+    return cache.get(data, plan, mapping_version, write_version=policies_write_version())
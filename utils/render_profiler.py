@@ -0,0 +1,267 @@
+"""
+Render Profiler
+Opt-in timing of Streamlit reruns: one sample per rerun with the page's
+total time, the blocks inside it (data load, transforms, st.data_editor
+renders, export builds) as nested spans, and the Supabase requests and
+response bytes made while each span ran.
+
+Enabled with AMS_RENDER_PROFILE=1, or per session from the Admin Panel
+('Profile page renders'). When off, begin_page() and every span are no-ops.
+
+    begin_page(page, st.session_state)      # after the page is selected
+    with span('build pending renewals', 'transform'):
+        ...
+    @profiled('data load')                  # or on a function
+    def load_policies_data(): ...
+    end_page()                              # end of the script run
+
+Samples are kept per page in session state (the last HISTORY_SIZE renders
+of each page) for the debug panel, and appended to the JSONL file named by
+AMS_RENDER_PROFILE_LOG when set, for offline analysis.
+
+Supabase requests are counted by hooking httpx.Client.send (supabase-py's
+transport) and matching Supabase API paths. Only requests made on the
+script thread are attributed - work handed to a thread pool shows up as
+time in the span that waited for it, without its requests.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, MutableMapping, Optional
+
+HISTORY_SIZE = 20
+STATE_ENABLED = 'render_profiler_enabled'
+STATE_HISTORY = 'render_profile_history'
+
+SUPABASE_PATHS = ('/rest/v1', '/auth/v1', '/storage/v1', '/functions/v1')
+
+_local = threading.local()
+_hook_lock = threading.Lock()
+_hook_installed = False
+
+
+def enabled(state: Optional[MutableMapping] = None) -> bool:
+    if os.getenv('AMS_RENDER_PROFILE') == '1':
+        return True
+    return bool(state is not None and state.get(STATE_ENABLED))
+
+
+class RenderProfile:
+    """Spans and Supabase traffic of one rerun of one page."""
+
+    def __init__(self, page: str):
+        self.page = page
+        self.started_at = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._open: List[int] = []
+        self.open_span(page, 'page')
+
+    def open_span(self, name: str, category: str) -> int:
+        index = len(self.spans)
+        self.spans.append({
+            'name': name,
+            'category': category,
+            'parent': self._open[-1] if self._open else None,
+            'depth': len(self._open),
+            'start_ms': (time.perf_counter() - self.started_at) * 1000,
+            'ms': None,
+            'supabase_calls': 0,
+            'supabase_bytes': 0,
+        })
+        self._open.append(index)
+        return index
+
+    def close_span(self, index: int) -> None:
+        span_ = self.spans[index]
+        span_['ms'] = (time.perf_counter() - self.started_at) * 1000 - span_['start_ms']
+        # Spans left open by an exception in a child close with it
+        while self._open and self._open.pop() != index:
+            pass
+
+    def record_request(self, response_bytes: int) -> None:
+        # Counted on the innermost open span and every span around it
+        index = self._open[-1] if self._open else 0
+        while index is not None:
+            self.spans[index]['supabase_calls'] += 1
+            self.spans[index]['supabase_bytes'] += response_bytes
+            index = self.spans[index]['parent']
+
+    def finish(self, completed: bool = True) -> Dict[str, Any]:
+        while self._open:
+            self.close_span(self._open[-1])
+        page_span = self.spans[0]
+        for span_ in self.spans:
+            span_['start_ms'] = round(span_['start_ms'], 2)
+            span_['ms'] = round(span_['ms'], 2)
+        return {
+            'page': self.page,
+            'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'completed': completed,
+            'total_ms': page_span['ms'],
+            'supabase_calls': page_span['supabase_calls'],
+            'supabase_bytes': page_span['supabase_bytes'],
+            'spans': self.spans,
+        }
+
+
+def current() -> Optional[RenderProfile]:
+    return getattr(_local, 'profile', None)
+
+
+class span:
+    """Time a block of the current rerun; a no-op when no profile is running."""
+
+    def __init__(self, name: str, category: str = 'other'):
+        self.name = name
+        self.category = category
+        self._profile = None
+        self._index = None
+
+    def __enter__(self):
+        self._profile = current()
+        if self._profile is not None:
+            self._index = self._profile.open_span(self.name, self.category)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile is not None:
+            self._profile.close_span(self._index)
+        return False
+
+
+def profiled(category: str = 'other', name: Optional[str] = None):
+    """Decorator: time every call of a function as a span."""
+    def decorator(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current() is None:
+                return func(*args, **kwargs)
+            with span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _response_bytes(response) -> int:
+    try:
+        return len(response.content)
+    except Exception:
+        # Streamed response that hasn't been read
+        try:
+            return int(response.headers.get('content-length', 0))
+        except (TypeError, ValueError):
+            return 0
+
+
+def install_http_hook() -> bool:
+    """Count Supabase requests made through httpx on the profiled thread (installed once)."""
+    global _hook_installed
+    with _hook_lock:
+        if _hook_installed:
+            return True
+        try:
+            import httpx
+        except ImportError:
+            return False
+        original_send = httpx.Client.send
+
+        @functools.wraps(original_send)
+        def send(client, request, *args, **kwargs):
+            response = original_send(client, request, *args, **kwargs)
+            profile = current()
+            if profile is not None and request.url.path.startswith(SUPABASE_PATHS):
+                profile.record_request(_response_bytes(response))
+            return response
+
+        httpx.Client.send = send
+        _hook_installed = True
+        return True
+
+
+def begin_page(page: str, state: Optional[MutableMapping] = None) -> Optional[RenderProfile]:
+    """Start this rerun's sample for page (ends any sample left running on this thread)."""
+    if current() is not None:
+        end_page(completed=False)
+    if not enabled(state):
+        return None
+    install_http_hook()
+    _local.profile = RenderProfile(page)
+    _local.state = state
+    return _local.profile
+
+
+def end_page(completed: bool = True) -> Optional[Dict[str, Any]]:
+    """Finish this rerun's sample: keep it in the page's history and the JSONL log."""
+    profile = current()
+    if profile is None:
+        return None
+    state = getattr(_local, 'state', None)
+    _local.profile = None
+    _local.state = None
+
+    sample = profile.finish(completed)
+    if state is not None:
+        history = state.get(STATE_HISTORY)
+        if history is None:
+            history = state[STATE_HISTORY] = {}
+        page_history = history.get(profile.page)
+        if page_history is None:
+            page_history = history[profile.page] = deque(maxlen=HISTORY_SIZE)
+        page_history.append(sample)
+
+    log_path = os.getenv('AMS_RENDER_PROFILE_LOG')
+    if log_path:
+        try:
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(sample) + '\n')
+        except OSError as e:
+            print(f"Error writing render profile to {log_path}: {e}")
+    return sample
+
+
+def page_history(state: MutableMapping, page: str) -> List[Dict[str, Any]]:
+    return list((state.get(STATE_HISTORY) or {}).get(page, ()))
+
+
+def summarize_history(state: MutableMapping) -> List[Dict[str, Any]]:
+    """One row per profiled page: renders, mean / p95 / max time, Supabase traffic."""
+    rows = []
+    for page, samples in (state.get(STATE_HISTORY) or {}).items():
+        if not samples:
+            continue
+        times = sorted(sample['total_ms'] for sample in samples)
+        rows.append({
+            'Page': page,
+            'Renders': len(times),
+            'Mean ms': round(sum(times) / len(times), 1),
+            'p95 ms': times[min(len(times) - 1, int(0.95 * len(times)))],
+            'Max ms': times[-1],
+            'Supabase calls / render': round(sum(s['supabase_calls'] for s in samples) / len(times), 1),
+            'KB / render': round(sum(s['supabase_bytes'] for s in samples) / len(times) / 1024, 1),
+        })
+    return sorted(rows, key=lambda row: row['Mean ms'], reverse=True)
+
+
+def flame_rows(sample: Dict[str, Any]) -> Dict[str, list]:
+    """Sample spans as icicle-chart columns (ids, labels, parents, values in ms)."""
+    spans = sample['spans']
+    ids = [str(index) for index in range(len(spans))]
+    # A parent is never smaller than its children (rounding could make it so)
+    values = [s['ms'] for s in spans]
+    for index in range(len(spans) - 1, 0, -1):
+        parent = spans[index]['parent']
+        children = sum(values[i] for i, s in enumerate(spans) if s['parent'] == parent)
+        values[parent] = max(values[parent], children)
+    return {
+        'ids': ids,
+        'labels': [f"{s['name']} ({s['ms']:.0f} ms)" for s in spans],
+        'parents': ['' if s['parent'] is None else ids[s['parent']] for s in spans],
+        'values': values,
+        'categories': [s['category'] for s in spans],
+    }
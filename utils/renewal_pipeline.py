@@ -0,0 +1,290 @@
+"""
+Renewal Pipeline Engine
+Shared renewal logic for the Pending Policy Renewals page and the agent
+portal renewal pipeline / calendar.
+
+The expensive part - finding the latest term of every policy and dropping
+renewed and cancelled policies - only depends on the ledger, so it is
+computed once into a "latest term per policy" table and cached. Windows
+(days ahead, past due) and urgency buckets are cheap masks over that table.
+
+    - terms: NEW / RWL / REWRITE transactions (NBD accepted for older agent
+      rows), excluding -STMT- / -VOID- / -ADJ- reconciliation entries
+    - latest term: the term with the latest expiration date (X-DATE; when
+      the data has no X-DATE column, Effective Date + 1 year)
+    - renewed: policy numbers that appear as another policy's Prior Policy Number
+    - cancelled: policies with a CAN / XCL that is not followed by a later REI
+
+Cached tables are keyed by scope (one per user / agent) and invalidated by
+a change in the data's content hash, by invalidate_renewal_pipeline()
+(called after every policy write), or - for scopes loaded from the
+database - by a TTL.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+TERM_TRANSACTION_TYPES = ('NEW', 'RWL', 'REWRITE', 'NBD')
+CANCEL_TRANSACTION_TYPES = ('CAN', 'XCL')
+REINSTATE_TRANSACTION_TYPES = ('REI',)
+RECONCILIATION_PATTERN = '-STMT-|-VOID-|-ADJ-'
+
+LEDGER_COLUMNS = {
+    'policy': 'Policy Number',
+    'type': 'Transaction Type',
+    'id': 'Transaction ID',
+    'effective': 'Effective Date',
+    'x_date': 'X-DATE',
+    'prior': 'Prior Policy Number',
+}
+
+EXPIRATION_COL = 'expiration_date'
+DAYS_COL = 'Days Until Expiration'
+
+# Upper bound (days until expiration) of each urgency level, checked in order
+URGENCY_LEVELS = (('past_due', -1), ('critical', 7), ('high', 30), ('medium', 60))
+DUE_WINDOWS = (7, 30, 60, 90)
+
+# Same as CACHE_TTL['renewal_pipeline'] in utils/performance_config
+DEFAULT_TTL_SECONDS = 180
+
+
+def _strip(values: pd.Series) -> pd.Series:
+    return values.astype(str).str.strip()
+
+
+def resolve_columns(get_mapped_column: Optional[Callable[[str], Optional[str]]] = None) -> Dict[str, str]:
+    """Ledger column names, resolved once through the user's column mapping."""
+    if get_mapped_column is None:
+        return dict(LEDGER_COLUMNS)
+    columns = {}
+    for key, field_name in LEDGER_COLUMNS.items():
+        columns[key] = get_mapped_column(field_name) or field_name
+    # The policy number column is never remapped
+    columns['policy'] = LEDGER_COLUMNS['policy']
+    return columns
+
+
+def build_latest_terms(df: pd.DataFrame, columns: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+    """
+    Latest term per policy, excluding renewed and cancelled policies.
+
+    Returns the original rows (index labels preserved) plus an
+    expiration_date column, sorted by policy number. The frame's attrs
+    hold the row counts of each stage ('stats').
+    """
+    columns = columns or LEDGER_COLUMNS
+    policy_col, type_col, id_col = columns['policy'], columns['type'], columns['id']
+    stats = {'term_rows': 0, 'policies': 0, 'renewed_excluded': 0, 'cancelled_excluded': 0, 'latest_terms': 0}
+
+    if df.empty or policy_col not in df.columns or type_col not in df.columns:
+        empty = df.iloc[0:0].copy()
+        empty[EXPIRATION_COL] = pd.Series(dtype='datetime64[ns]')
+        empty.attrs['stats'] = stats
+        return empty
+
+    types = _strip(df[type_col]).str.upper()
+    recon = pd.Series(False, index=df.index)
+    if id_col in df.columns:
+        recon = df[id_col].astype(str).str.contains(RECONCILIATION_PATTERN, case=False, na=False)
+    policies = _strip(df[policy_col])
+
+    terms = df[types.isin(TERM_TRANSACTION_TYPES) & ~recon].copy()
+    stats['term_rows'] = len(terms)
+    if columns['x_date'] in df.columns:
+        expiration = pd.to_datetime(terms[columns['x_date']], errors='coerce')
+    elif columns['effective'] in df.columns:
+        expiration = pd.to_datetime(terms[columns['effective']], errors='coerce') + pd.DateOffset(years=1)
+    else:
+        expiration = pd.Series(pd.NaT, index=terms.index)
+    terms[EXPIRATION_COL] = expiration.astype('datetime64[ns]')
+
+    # One sort for the whole ledger; the first row per policy is its latest term
+    terms['_policy'] = policies[terms.index]
+    terms = terms.sort_values(['_policy', EXPIRATION_COL], ascending=[True, False], kind='mergesort')
+    latest = terms.drop_duplicates(subset='_policy', keep='first')
+    stats['policies'] = len(latest)
+
+    # Renewed: referenced as another policy's prior policy
+    renewed = set()
+    if columns['prior'] in df.columns:
+        prior = df[columns['prior']]
+        renewed = set(_strip(prior[prior.notna()])) - {''}
+    is_renewed = latest['_policy'].isin(renewed)
+    stats['renewed_excluded'] = int(is_renewed.sum())
+
+    # Cancelled: last CAN / XCL later than the last reinstatement
+    events = pd.DataFrame({
+        'policy': policies,
+        'date': pd.to_datetime(df[columns['effective']], errors='coerce') if columns['effective'] in df.columns
+        else pd.NaT,
+    })[~recon]
+    event_types = types[~recon]
+    last_cancel = events[event_types.isin(CANCEL_TRANSACTION_TYPES)].groupby('policy')['date'].max()
+    cancelled_any = set(events.loc[event_types.isin(CANCEL_TRANSACTION_TYPES), 'policy'])
+    last_reinstate = events[event_types.isin(REINSTATE_TRANSACTION_TYPES)].groupby('policy')['date'].max()
+    reinstated = last_reinstate.reindex(last_cancel.index)
+    reinstated = set(last_cancel.index[(reinstated > last_cancel).to_numpy()])
+    is_cancelled = latest['_policy'].isin(cancelled_any - reinstated) & ~is_renewed
+    stats['cancelled_excluded'] = int(is_cancelled.sum())
+
+    latest = latest[~is_renewed & ~is_cancelled].drop(columns='_policy')
+    stats['latest_terms'] = len(latest)
+    latest.attrs['stats'] = stats
+    return latest
+
+
+def data_version(df: pd.DataFrame, columns: Optional[Dict[str, str]] = None) -> int:
+    """Content hash of the columns the latest-term table reads."""
+    columns = columns or LEDGER_COLUMNS
+    used = [col for col in dict.fromkeys(columns.values()) if col in df.columns]
+    frame = df[used]
+    try:
+        hashes = pd.util.hash_pandas_object(frame, index=True).to_numpy()
+    except TypeError:
+        hashes = pd.util.hash_pandas_object(frame.astype(str), index=True).to_numpy()
+    with np.errstate(over='ignore'):
+        weights = np.arange(len(hashes), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        return int((hashes * weights).sum(dtype=np.uint64)) ^ len(used)
+
+
+def urgency_levels(days: pd.Series) -> pd.Series:
+    """past_due / critical (<= 7) / high (<= 30) / medium (<= 60) / low, vectorized."""
+    conditions = [days <= upper for _, upper in URGENCY_LEVELS]
+    levels = np.select(conditions, [name for name, _ in URGENCY_LEVELS], default='low')
+    return pd.Series(levels, index=days.index)
+
+
+def bucket_counts(days: pd.Series) -> Dict[str, int]:
+    """Past due count, due_N_days counts (0..N days) and counts per urgency level."""
+    days = days.dropna()
+    counts = {'total': int(len(days)), 'past_due': int((days < 0).sum())}
+    for window in DUE_WINDOWS:
+        counts[f'due_{window}_days'] = int(days.between(0, window).sum())
+    by_level = urgency_levels(days).value_counts()
+    counts['by_urgency'] = {name: int(by_level.get(name, 0)) for name, _ in URGENCY_LEVELS}
+    counts['by_urgency']['low'] = int(by_level.get('low', 0))
+    return counts
+
+
+class RenewalPipeline:
+    """
+    Latest-term table of one ledger plus the cheap per-request views.
+
+    Attributes:
+        latest_terms: Output of build_latest_terms
+        version: Data version the table was built from
+        stats: Stage row counts from build_latest_terms
+    """
+
+    def __init__(self, latest_terms: pd.DataFrame, version=None):
+        self.latest_terms = latest_terms
+        self.version = version
+        self.stats = dict(latest_terms.attrs.get('stats', {}))
+
+    @classmethod
+    def from_ledger(cls, df: pd.DataFrame, columns: Optional[Dict[str, str]] = None, version=None):
+        return cls(build_latest_terms(df, columns), version)
+
+    def pending(self, days_ahead: int = 365, include_past_due: bool = True, today=None) -> pd.DataFrame:
+        """
+        Renewals expiring within days_ahead (and past due ones, optionally),
+        with Days Until Expiration, most overdue first. Policies without an
+        expiration date are never pending.
+        """
+        today = pd.Timestamp(today or pd.Timestamp.now()).normalize()
+        pending = self.latest_terms.copy()
+        pending[DAYS_COL] = (pending[EXPIRATION_COL] - today).dt.days
+        window = pending[DAYS_COL] <= days_ahead
+        if not include_past_due:
+            window &= pending[DAYS_COL] >= 0
+        return pending[window].sort_values(DAYS_COL, kind='mergesort')
+
+    def summary(self, pending: pd.DataFrame, premium_col: str = None, commission_col: str = None) -> Dict[str, Any]:
+        """Bucketed counts and at-risk totals for a pending() frame."""
+        summary = bucket_counts(pending[DAYS_COL]) if DAYS_COL in pending.columns else bucket_counts(pd.Series(dtype=float))
+        for key, col in (('premium_at_risk', premium_col), ('commission_at_risk', commission_col)):
+            if col and col in pending.columns:
+                summary[key] = float(pd.to_numeric(pending[col], errors='coerce').fillna(0).sum())
+            else:
+                summary[key] = 0.0
+        return summary
+
+
+class RenewalPipelineCache:
+    """
+    RenewalPipeline per scope (user email, agent ID, ...).
+
+    get() rebuilds when the data's content hash changes; get_or_load() is for
+    callers that would have to query the database just to compute the hash
+    and instead trust the cached table until it expires or is invalidated.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._generation = 0
+        self.stats = {'hits': 0, 'builds': 0, 'invalidations': 0}
+
+    def _fresh(self, entry: Optional[Dict[str, Any]], ttl_seconds: Optional[float]) -> bool:
+        if not entry or entry['generation'] != self._generation:
+            return False
+        return ttl_seconds is None or time.time() - entry['built_at'] < ttl_seconds
+
+    def _store(self, scope: str, pipeline: RenewalPipeline, generation: int) -> RenewalPipeline:
+        with self._lock:
+            self.stats['builds'] += 1
+            self._entries[scope] = {'pipeline': pipeline, 'generation': generation, 'built_at': time.time()}
+        return pipeline
+
+    def get(self, scope: str, df: pd.DataFrame, columns: Optional[Dict[str, str]] = None) -> RenewalPipeline:
+        """Pipeline for df, reused while the renewal-relevant columns are unchanged."""
+        generation = self._generation
+        version = data_version(df, columns)
+        entry = self._entries.get(scope)
+        if self._fresh(entry, None) and entry['pipeline'].version == version:
+            self.stats['hits'] += 1
+            return entry['pipeline']
+        return self._store(scope, RenewalPipeline.from_ledger(df, columns, version), generation)
+
+    def get_or_load(
+        self,
+        scope: str,
+        load: Callable[[], pd.DataFrame],
+        columns: Optional[Dict[str, str]] = None,
+        ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS
+    ) -> RenewalPipeline:
+        """Cached pipeline for scope, loading the ledger only on a miss."""
+        generation = self._generation
+        entry = self._entries.get(scope)
+        if self._fresh(entry, ttl_seconds):
+            self.stats['hits'] += 1
+            return entry['pipeline']
+        return self._store(scope, RenewalPipeline.from_ledger(load(), columns), generation)
+
+    def invalidate(self, scope: str = None):
+        """Drop one scope, or every scope (tables being built right now are discarded too)."""
+        with self._lock:
+            self.stats['invalidations'] += 1
+            if scope is None:
+                self._generation += 1
+                self._entries.clear()
+            else:
+                self._entries.pop(scope, None)
+
+
+_pipeline_cache = RenewalPipelineCache()
+
+
+def get_renewal_pipeline_cache() -> RenewalPipelineCache:
+    """Process-wide renewal pipeline cache."""
+    return _pipeline_cache
+
+
+def invalidate_renewal_pipeline(scope: str = None):
+    """Call after writing policies so the next read rebuilds the latest-term table."""
+    _pipeline_cache.invalidate(scope)
@@ -0,0 +1,225 @@
+"""
+Result Cache
+Bounded, tenant-aware memoization for expensive data helpers (CLV, churn
+risk, AI recommendations, ...), shared by the whole server process.
+
+    - keys: function + its bound arguments with defaults applied, leaving out
+      client objects (supabase=...), so calls with and without a client, or
+      with different client instances, share one entry
+    - bounded: least recently used entries are evicted past max_entries or
+      max_bytes; every entry also expires after its function's TTL
+    - single flight: concurrent identical calls run the function once, the
+      other callers wait for that result
+    - tags: entries are tagged with their agency_id / agent_id arguments, so
+      a write for one agency drops only that agency's results
+      (invalidate_agency_results)
+    - stats: hits, misses, coalesced waits, evictions, expirations,
+      invalidations, entries and estimated size
+"""
+
+import functools
+import inspect
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Arguments that never change a result: database clients
+IGNORED_ARGS = ('supabase', 'client')
+# Arguments whose values become invalidation tags
+TAG_ARGS = ('agency_id', 'agent_id')
+
+
+def estimate_size(value) -> int:
+    """Approximate memory held by a cached result, in bytes."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+class _Flight:
+    """A call in progress that identical calls wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class ResultCache:
+    """LRU + TTL cache of function results, with single-flight loading and tag invalidation."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Tuple, Dict[str, Any]]' = OrderedDict()
+        self._flights: Dict[Tuple, _Flight] = {}
+        self._size_bytes = 0
+        self._generation = 0
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0,
+                      'expirations': 0, 'invalidations': 0}
+
+    def _drop(self, key: Tuple) -> None:
+        entry = self._entries.pop(key)
+        self._size_bytes -= entry['size']
+
+    def _lookup(self, key: Tuple):
+        """Fresh cached entry or None. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() >= entry['expires_at']:
+            self._drop(key)
+            self.stats['expirations'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: Tuple, value, ttl_seconds: float, tags: Iterable[Tuple[str, Any]]) -> None:
+        """Caller holds the lock."""
+        if key in self._entries:
+            self._drop(key)
+        size = estimate_size(value)
+        self._entries[key] = {'value': value, 'expires_at': time.time() + ttl_seconds,
+                              'tags': frozenset(tags), 'size': size, 'stored_at': time.time()}
+        self._size_bytes += size
+        while self._entries and (len(self._entries) > self.max_entries or self._size_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            if oldest == key and len(self._entries) == 1:
+                break  # Keep the newest result even when it alone exceeds max_bytes
+            self._drop(oldest)
+            self.stats['evictions'] += 1
+
+    def get_or_call(self, key: Tuple, call: Callable[[], Any], ttl_seconds: float,
+                    tags: Iterable[Tuple[str, Any]] = ()):
+        """Cached result for key, calling call() once across concurrent callers on a miss."""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None:
+                self.stats['hits'] += 1
+                return entry['value']
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+                generation = self._generation
+                self.stats['misses'] += 1
+            else:
+                leader = False
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = call()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                # Results computed while an invalidation ran may be stale - hand them out, don't keep them
+                if flight.error is None and generation == self._generation:
+                    self._store(key, flight.result, ttl_seconds, tags)
+            flight.done.set()
+        return flight.result
+
+    def cached(self, ttl_seconds: float = 300, ignore: Iterable[str] = IGNORED_ARGS,
+               tag_args: Iterable[str] = TAG_ARGS):
+        """Decorator: memoize a function's results in this cache."""
+        ignore = frozenset(ignore)
+        tag_args = tuple(tag_args)
+
+        def decorator(func):
+            signature = inspect.signature(func)
+            name = f"{func.__module__}.{func.__qualname__}"
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                try:
+                    bound = signature.bind(*args, **kwargs)
+                except TypeError:
+                    return func(*args, **kwargs)  # Let the function raise its own argument error
+                bound.apply_defaults()
+                arguments = bound.arguments
+                try:
+                    key = (name,) + tuple(sorted((arg, value) for arg, value in arguments.items()
+                                                 if arg not in ignore))
+                    hash(key)
+                except TypeError:
+                    key = (name, repr(sorted((arg, value) for arg, value in arguments.items() if arg not in ignore)))
+                tags = [(arg, arguments[arg]) for arg in tag_args if arguments.get(arg) is not None]
+                return self.get_or_call(key, lambda: func(*args, **kwargs), ttl_seconds, tags)
+
+            wrapper.cache = self
+            return wrapper
+        return decorator
+
+    def invalidate(self, **tags) -> int:
+        """Drop entries tagged with any of the given values (e.g. agency_id=...), or all without tags."""
+        with self._lock:
+            self.stats['invalidations'] += 1
+            self._generation += 1
+            if not tags:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._size_bytes = 0
+                return dropped
+            wanted = {(arg, value) for arg, value in tags.items() if value is not None}
+            keys = [key for key, entry in self._entries.items() if entry['tags'] & wanted]
+            for key in keys:
+                self._drop(key)
+            return len(keys)
+
+    def clear(self) -> None:
+        self.invalidate()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'size_bytes': self._size_bytes,
+                'in_flight': len(self._flights),
+                'oldest_entry': min((e['stored_at'] for e in self._entries.values()), default=None),
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_result_cache = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    """Process-wide result cache."""
+    return _result_cache
+
+
+def invalidate_agency_results(agency_id: str = None, agent_id: str = None, agent_ids: Iterable[str] = ()) -> int:
+    """
+    Call after writing an agency's policies so its cached results are
+    recomputed. Pass the agents whose policies were written too: results
+    cached by agent_id alone (recommendations, analytics) carry no agency tag.
+    """
+    agents = {agent for agent in (agent_id, *agent_ids) if agent}
+    dropped = _result_cache.invalidate(agency_id=agency_id) if agency_id is not None else 0
+    for agent in agents:
+        dropped += _result_cache.invalidate(agent_id=agent)
+    return dropped
@@ -0,0 +1,220 @@
+"""
+Per-Tenant Settings Store
+Shared cache for the user_*_db settings singletons (column mappings,
+preferences, policy / transaction types, PRL templates, agent rates, ...).
+
+The singletons live for the whole Streamlit server process and used to keep
+one user's settings at a time, so every request from a different user threw
+the previous user's settings away and re-queried the settings tables. This
+store keeps the settings of many users at once:
+
+    - keyed by tenant (user_id, or the lowercased email for users without one)
+      and settings name (the table name)
+    - bounded: least recently used tenants are evicted past max_tenants
+    - entries expire after ttl_seconds so edits made from another server
+      process are picked up
+    - invalidate() after every save / update / delete
+    - prefetch_user_settings() loads every settings table of a user in one
+      parallel batch at login; the singletons then build their values from
+      the prefetched rows instead of querying one table at a time
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+# Same as CACHE_TTL['user_settings'] in utils/performance_config
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_TENANTS = 500
+
+# Settings tables read by the user_*_db singletons, all filtered by user_id / user_email
+SETTINGS_TABLES = (
+    'user_column_mappings',
+    'user_preferences',
+    'user_policy_types',
+    'user_policy_type_mappings',
+    'user_transaction_type_mappings',
+    'user_transaction_types',
+    'user_prl_templates',
+    'user_default_agent_rates',
+    'user_reconciliation_mappings',
+)
+
+
+def settings_tenant(user_id=None, user_email: Optional[str] = None) -> Optional[str]:
+    """Cache key for a user: the user_id, or the lowercased email for users without one."""
+    if user_id:
+        return str(user_id)
+    if user_email:
+        return f"email:{user_email.lower()}"
+    return None
+
+
+class SettingsStore:
+    """
+    LRU of tenants, each holding named settings values with their load time.
+
+    Prefetched rows are kept per tenant until a singleton consumes them
+    through fetch_rows(); they expire with the same TTL as values.
+    """
+
+    def __init__(self, max_tenants: int = DEFAULT_MAX_TENANTS, ttl_seconds: Optional[float] = DEFAULT_TTL_SECONDS):
+        self.max_tenants = max_tenants
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._tenants: 'OrderedDict[str, Dict[str, Dict[str, Any]]]' = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0,
+                      'invalidations': 0, 'prefetches': 0, 'prefetch_hits': 0}
+
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry['loaded_at'] >= self.ttl_seconds
+
+    def _tenant(self, tenant: str) -> Dict[str, Dict[str, Any]]:
+        """Tenant slot, created and marked most recently used. Caller holds the lock."""
+        slot = self._tenants.get(tenant)
+        if slot is None:
+            slot = self._tenants[tenant] = {'values': {}, 'rows': {}}
+            while len(self._tenants) > self.max_tenants:
+                self._tenants.popitem(last=False)
+                self.stats['evictions'] += 1
+        else:
+            self._tenants.move_to_end(tenant)
+        return slot
+
+    def get(self, tenant: Optional[str], name: str, default=None):
+        """Cached value, or default when missing or expired."""
+        if tenant is None:
+            return default
+        with self._lock:
+            slot = self._tenants.get(tenant)
+            entry = slot['values'].get(name) if slot else None
+            if entry is None:
+                self.stats['misses'] += 1
+                return default
+            if self._expired(entry):
+                del slot['values'][name]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return default
+            self._tenants.move_to_end(tenant)
+            self.stats['hits'] += 1
+            return entry['value']
+
+    def put(self, tenant: Optional[str], name: str, value) -> None:
+        if tenant is None:
+            return
+        with self._lock:
+            self._tenant(tenant)['values'][name] = {'value': value, 'loaded_at': time.time()}
+
+    def put_rows(self, tenant: Optional[str], table: str, rows: List[Dict[str, Any]]) -> None:
+        """Keep prefetched rows of a settings table until fetch_rows() asks for them."""
+        if tenant is None:
+            return
+        with self._lock:
+            self.stats['prefetches'] += 1
+            self._tenant(tenant)['rows'][table] = {'value': rows, 'loaded_at': time.time()}
+
+    def take_rows(self, tenant: Optional[str], table: str):
+        """Prefetched rows of table (consumed), or None when there are none or they expired."""
+        if tenant is None:
+            return None
+        with self._lock:
+            slot = self._tenants.get(tenant)
+            entry = slot['rows'].pop(table, None) if slot else None
+            if entry is None or self._expired(entry):
+                return None
+            self.stats['prefetch_hits'] += 1
+            return entry['value']
+
+    def invalidate(self, tenant: Optional[str] = None, name: Optional[str] = None) -> None:
+        """Drop one value of a tenant, a whole tenant, or everything (tenant=None)."""
+        with self._lock:
+            self.stats['invalidations'] += 1
+            if tenant is None:
+                self._tenants.clear()
+                return
+            slot = self._tenants.get(tenant)
+            if slot is None:
+                return
+            if name is None:
+                del self._tenants[tenant]
+            else:
+                slot['values'].pop(name, None)
+                slot['rows'].pop(name, None)
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __contains__(self, tenant) -> bool:
+        return tenant in self._tenants
+
+
+_settings_store = SettingsStore()
+
+
+def get_settings_store() -> SettingsStore:
+    """Process-wide settings store shared by the user_*_db singletons."""
+    return _settings_store
+
+
+def _query_rows(supabase, table: str, user_id=None, user_email: Optional[str] = None, columns: str = '*'):
+    query = supabase.table(table).select(columns)
+    if user_id:
+        query = query.eq('user_id', user_id)
+    else:
+        query = query.eq('user_email', user_email.lower())
+    return query.execute().data or []
+
+
+def fetch_rows(supabase, table: str, user_id=None, user_email: Optional[str] = None, columns: str = '*') -> List[Dict[str, Any]]:
+    """
+    Settings rows of a user: the rows prefetched at login when available,
+    otherwise a query filtered by user_id (or user_email). Query errors are
+    raised so callers keep their own error handling.
+    """
+    rows = _settings_store.take_rows(settings_tenant(user_id, user_email), table)
+    if rows is not None:
+        return rows
+    return _query_rows(supabase, table, user_id, user_email, columns)
+
+
+def prefetch_user_settings(supabase, user_id=None, user_email: Optional[str] = None,
+                           tables: Iterable[str] = SETTINGS_TABLES, max_workers: int = 4) -> int:
+    """
+    Load every settings table of a user in one parallel batch (called at login).
+
+    Cached values of the user are dropped so they are rebuilt from the fresh
+    rows. Returns the number of tables prefetched; tables that fail to load
+    are skipped and queried on first use instead.
+    """
+    tenant = settings_tenant(user_id, user_email)
+    if tenant is None:
+        return 0
+    tables = list(tables)
+    _settings_store.invalidate(tenant)
+
+    def load(table):
+        try:
+            return table, _query_rows(supabase, table, user_id, user_email)
+        except Exception as e:
+            print(f"Error prefetching {table}: {e}")
+            return table, None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tables)))) as pool:
+        results = list(pool.map(load, tables))
+
+    loaded = 0
+    for table, rows in results:
+        if rows is not None:
+            _settings_store.put_rows(tenant, table, rows)
+            loaded += 1
+    return loaded
+
+
+def invalidate_user_settings(user_id=None, user_email: Optional[str] = None, name: Optional[str] = None) -> None:
+    """Call after saving a user's settings so the next read reloads them."""
+    tenant = settings_tenant(user_id, user_email)
+    if tenant is not None:
+        _settings_store.invalidate(tenant, name)
@@ -0,0 +1,172 @@
+"""
+Startup Profiler
+Cold-start profile of the app: every module imported while the first page
+renders, as a tree with cumulative and self time, plus the time from the
+start of the script to the end of its first run (time to first render).
+
+Off unless AMS_PROFILE_STARTUP=1. Only the first script run in a server
+process is profiled - later runs find their modules already imported.
+
+    AMS_PROFILE_STARTUP=1 streamlit run commission_app.py
+
+Settings (environment):
+    AMS_PROFILE_STARTUP_MIN_MS   hide imports faster than this (default 20)
+    AMS_PROFILE_STARTUP_LOG      append each profile as one JSON line to this
+                                 file, to track cold start across releases
+
+This module must stay import-light (standard library only): it is the first
+import in commission_app.py, so every module the app's imports load for the
+first time is measured. `streamlit run` imports streamlit (and its server
+stack) before the script starts, so that cost is not in the profile.
+"""
+
+import builtins
+import json
+import os
+import sys
+import threading
+import time
+from importlib.util import resolve_name
+from typing import Dict, List, Optional
+
+_original_import = builtins.__import__
+_lock = threading.Lock()
+_local = threading.local()
+
+_state = {'started_at': None, 'finished': False, 'checkpoints': []}
+_roots: List['ImportNode'] = []
+
+
+def enabled() -> bool:
+    return os.getenv('AMS_PROFILE_STARTUP') == '1'
+
+
+class ImportNode:
+    """One module's first import and the imports it triggered."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.children: List['ImportNode'] = []
+
+    @property
+    def self_seconds(self) -> float:
+        return max(self.seconds - sum(child.seconds for child in self.children), 0.0)
+
+    def to_dict(self, min_seconds: float = 0.0) -> Dict:
+        return {
+            'name': self.name,
+            'ms': round(self.seconds * 1000, 1),
+            'self_ms': round(self.self_seconds * 1000, 1),
+            'children': [child.to_dict(min_seconds) for child in self.children if child.seconds >= min_seconds],
+        }
+
+
+def _absolute_name(name: str, globals_, level: int) -> Optional[str]:
+    if level == 0:
+        return name
+    try:
+        return resolve_name('.' * level + name, (globals_ or {}).get('__package__'))
+    except (ImportError, ValueError):
+        return None
+
+
+def _profiled_import(name, globals=None, locals=None, fromlist=(), level=0):
+    module_name = _absolute_name(name, globals, level)
+    if module_name is None or module_name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    node = ImportNode(module_name)
+    stack.append(node)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        node.seconds = time.perf_counter() - start
+        stack.pop()
+        if stack:
+            stack[-1].children.append(node)
+        else:
+            with _lock:
+                _roots.append(node)
+
+
+def start() -> None:
+    """Begin profiling; call first thing in the app script."""
+    if not enabled() or _state['started_at'] is not None:
+        return
+    _state['started_at'] = time.perf_counter()
+    builtins.__import__ = _profiled_import
+
+
+def checkpoint(label: str) -> None:
+    """Record how far into the first run the script is (e.g. 'imports done')."""
+    if _state['started_at'] is None or _state['finished']:
+        return
+    _state['checkpoints'].append((label, time.perf_counter() - _state['started_at']))
+
+
+def _tree_lines(nodes: List[ImportNode], min_seconds: float, depth: int = 0) -> List[str]:
+    lines = []
+    for node in sorted(nodes, key=lambda n: n.seconds, reverse=True):
+        if node.seconds < min_seconds:
+            continue
+        lines.append(f"{node.seconds * 1000:9.1f} {node.self_seconds * 1000:9.1f}  {'  ' * depth}{node.name}")
+        lines.extend(_tree_lines(node.children, min_seconds, depth + 1))
+    return lines
+
+
+def report(min_ms: Optional[float] = None) -> Optional[Dict]:
+    """Profile so far as a dict, or None when profiling never started."""
+    if _state['started_at'] is None:
+        return None
+    if min_ms is None:
+        min_ms = float(os.getenv('AMS_PROFILE_STARTUP_MIN_MS', '20'))
+    with _lock:
+        roots = list(_roots)
+    return {
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'time_to_first_render_s': round(time.perf_counter() - _state['started_at'], 3),
+        'import_s': round(sum(node.seconds for node in roots), 3),
+        'modules_imported': sum(1 for _ in _walk(roots)),
+        'checkpoints': {label: round(seconds, 3) for label, seconds in _state['checkpoints']},
+        'imports': [node.to_dict(min_ms / 1000) for node in roots if node.seconds >= min_ms / 1000],
+    }
+
+
+def _walk(nodes: List[ImportNode]):
+    for node in nodes:
+        yield node
+        yield from _walk(node.children)
+
+
+def first_render_done() -> None:
+    """End of the first script run: stop profiling and print the import tree."""
+    if _state['started_at'] is None or _state['finished']:
+        return
+    builtins.__import__ = _original_import
+    profile = report()
+    _state['finished'] = True
+
+    min_ms = float(os.getenv('AMS_PROFILE_STARTUP_MIN_MS', '20'))
+    with _lock:
+        roots = list(_roots)
+    print(f"[startup] import tree (imports of {min_ms:g} ms or more):")
+    print(f"[startup] {'total ms':>9} {'self ms':>9}  module")
+    for line in _tree_lines(roots, min_ms / 1000):
+        print(f"[startup] {line}")
+    for label, seconds in profile['checkpoints'].items():
+        print(f"[startup] {label}: {seconds:.2f}s")
+    print(f"[startup] {profile['modules_imported']} modules imported in {profile['import_s']:.2f}s; "
+          f"time to first render: {profile['time_to_first_render_s']:.2f}s")
+
+    log_path = os.getenv('AMS_PROFILE_STARTUP_LOG')
+    if log_path:
+        try:
+            with open(log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(profile) + '\n')
+        except OSError as e:
+            print(f"Error writing startup profile to {log_path}: {e}")
@@ -0,0 +1,212 @@
+"""
+Parsed Statement Cache
+Uploaded commission statements (CSV / Excel) parsed once and kept on local
+disk, keyed by the file's SHA-256 and the sheet that was read. The files
+hold client commission data, so they live in an app-owned directory
+(cache/statements next to the app, mode 0700) rather than the shared temp
+directory.
+
+Streamlit reruns the Reconciliation page on every interaction and users
+re-upload the same statement while trying mappings, so parsing a large
+workbook again each time dominated the import step. Parsed frames are
+stored as Parquet only; columns Parquet can't represent (mixed types in
+one object column) are stored as text and headers as strings, and
+load_statement returns that same frame on a miss so hits and misses match.
+The least recently used files are evicted once the directory grows past
+max_bytes, and files not used for max_age_seconds are deleted (read as a
+miss until then), so client data doesn't sit on disk indefinitely.
+
+Excel files are read with the fastest engine available: calamine
+(python-calamine, in requirements.txt; skipped when not installed) then
+openpyxl, with xlrd for old .xls files.
+"""
+
+import hashlib
+import io
+import os
+import re
+import threading
+import time
+from typing import List, Optional, Union
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.getenv(
+    'STATEMENT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'statements')
+)
+DEFAULT_MAX_BYTES = int(os.getenv('STATEMENT_CACHE_MAX_MB', '512')) * 1024 * 1024
+DEFAULT_MAX_AGE_SECONDS = float(os.getenv('STATEMENT_CACHE_MAX_AGE_DAYS', '7')) * 24 * 60 * 60
+DIRECTORY_MODE = 0o700
+
+EXTENSION = 'parquet'
+
+
+def file_digest(data: bytes) -> str:
+    """SHA-256 of an uploaded file's bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def excel_engines(filename: str = '') -> List[str]:
+    """Excel engines to try, fastest first."""
+    engines = []
+    try:
+        import python_calamine  # noqa: F401
+        engines.append('calamine')
+    except ImportError:
+        pass
+    engines.append('openpyxl')
+    if filename.lower().endswith('.xls'):
+        engines.append('xlrd')
+    return engines
+
+
+def parquet_safe(df: pd.DataFrame) -> pd.DataFrame:
+    """Frame Parquet can store: string headers, object columns as text (missing values kept)."""
+    df = df.copy()
+    df.columns = [str(col) for col in df.columns]
+    for col in df.columns[df.dtypes == object]:
+        values = df[col]
+        df[col] = values.astype(str).where(values.notna(), None)
+    return df
+
+
+def read_statement_bytes(data: bytes, filename: str, sheet: Union[int, str] = 0) -> pd.DataFrame:
+    """Parse an uploaded statement; raises the last engine's error if none can read it."""
+    if filename.lower().endswith('.csv'):
+        return pd.read_csv(io.BytesIO(data), on_bad_lines='warn')
+
+    last_error = None
+    for engine in excel_engines(filename):
+        try:
+            return pd.read_excel(io.BytesIO(data), sheet_name=sheet, engine=engine)
+        except ImportError as e:
+            last_error = e
+        except Exception as e:
+            print(f"Warning: {engine} could not read {filename}: {e}")
+            last_error = e
+    raise last_error
+
+
+class StatementCache:
+    """Parsed statements on disk, bounded by total size (least recently used evicted first)
+    and by time since last use (max_age_seconds; None keeps files until evicted for size)."""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_seconds: Optional[float] = DEFAULT_MAX_AGE_SECONDS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+
+    @staticmethod
+    def key(digest: str, sheet: Union[int, str, None] = 0) -> str:
+        sheet_part = re.sub(r'[^A-Za-z0-9_-]', '_', str(sheet))
+        return f"{digest}_{sheet_part}"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.{EXTENSION}")
+
+    def get(self, key: str) -> Optional[pd.DataFrame]:
+        path = self._path(key)
+        if os.path.exists(path) and self._expired(os.path.getmtime(path)):
+            self._remove(path)
+            self.stats['evictions'] += 1
+        elif os.path.exists(path):
+            try:
+                df = pd.read_parquet(path)
+                os.utime(path)  # Mark as recently used
+                self.stats['hits'] += 1
+                return df
+            except Exception as e:
+                print(f"Error reading cached statement {path}: {e}")
+                self._remove(path)
+        self.stats['misses'] += 1
+        return None
+
+    def put(self, key: str, df: pd.DataFrame) -> Optional[str]:
+        """Store a parsed frame (see parquet_safe); returns its path, or None when it could not be written."""
+        try:
+            os.makedirs(self.directory, mode=DIRECTORY_MODE, exist_ok=True)
+        except OSError as e:
+            print(f"Error creating statement cache directory: {e}")
+            return None
+
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            parquet_safe(df).to_parquet(tmp_path, index=True)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error caching statement {key}: {e}")
+            self._remove(tmp_path)
+            return None
+        self.stats['writes'] += 1
+        self._evict()
+        return path
+
+    def clear(self):
+        for entry in self._entries():
+            self._remove(entry.path)
+
+    def size_bytes(self) -> int:
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        try:
+            return [entry for entry in os.scandir(self.directory)
+                    if entry.is_file() and entry.name.endswith(f".{EXTENSION}")]
+        except FileNotFoundError:
+            return []
+
+    def _expired(self, mtime: float) -> bool:
+        return self.max_age_seconds is not None and time.time() - mtime > self.max_age_seconds
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in sorted(self._entries(), key=lambda entry: entry.stat().st_mtime):
+                if self._expired(entry.stat().st_mtime):
+                    self._remove(entry.path)
+                    self.stats['evictions'] += 1
+                else:
+                    entries.append(entry)
+            total = sum(entry.stat().st_size for entry in entries)
+            # The newest file is kept even when it alone exceeds the limit
+            for entry in entries[:-1]:
+                if total <= self.max_bytes:
+                    break
+                total -= entry.stat().st_size
+                self._remove(entry.path)
+                self.stats['evictions'] += 1
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_statement_cache = None
+
+
+def get_statement_cache() -> StatementCache:
+    """Process-wide parsed statement cache."""
+    global _statement_cache
+    if _statement_cache is None:
+        _statement_cache = StatementCache()
+    return _statement_cache
+
+
+def load_statement(data: bytes, filename: str, sheet: Union[int, str] = 0,
+                   cache: Optional[StatementCache] = None) -> pd.DataFrame:
+    """Parsed statement for an upload, from the cache when the same file was parsed before."""
+    cache = cache or get_statement_cache()
+    key = cache.key(file_digest(data), 'csv' if filename.lower().endswith('.csv') else sheet)
+    df = cache.get(key)
+    if df is None:
+        df = parquet_safe(read_statement_bytes(data, filename, sheet))
+        cache.put(key, df)
+    return df
@@ -0,0 +1,484 @@
+"""
+Synthetic Ledger Generator
+Seedable, NumPy-vectorized agency books for benchmarks and load tests.
+
+generate_book() returns a full policies-table ledger plus the carrier
+statements that produced its reconciliation entries:
+
+    - policies: NEW terms renewed as RWL (6-month auto, 12-month other
+      lines) until the policy lapses, END endorsements inside terms, CAN
+      cancellations with pro-rata negative premium
+    - reconciliation: -STMT- entries for paid transactions (one import
+      batch per carrier per statement month), -VOID- reversals of some of
+      them and -ADJ- adjustment entries
+    - statements: one line per paid transaction with the carrier's
+      amounts; the most recent statement month is left unreconciled in
+      the ledger, and a few lines match no policy at all
+      (expected_transaction_id is the ground-truth match)
+
+Everything is generated per column, so 1M-row books take seconds.
+Same seed and arguments -> identical book. write_book() / load_book()
+store books as Parquet (needs pyarrow) or CSV; benchmarks/generate_datasets.py
+is the command-line front end.
+"""
+
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_AS_OF = '2025-12-31'
+DEFAULT_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'data')
+
+# policies table columns, in the order the app displays them
+LEDGER_COLUMNS = [
+    'Client ID', 'Transaction ID', 'Customer', 'Carrier Name', 'MGA Name', 'Policy Type',
+    'Policy Number', 'Prior Policy Number', 'Transaction Type', 'Policy Term',
+    'Policy Origination Date', 'Effective Date', 'X-DATE', 'Premium Sold', 'Policy Taxes & Fees',
+    'Commissionable Premium', 'Policy Gross Comm %', 'Agency Estimated Comm/Revenue (CRM)',
+    'Agent Comm %', 'Agent Estimated Comm $', 'Broker Fee', 'Broker Fee Agent Comm', 'Total Agent Comm',
+    'Agency Comm Received (STMT)', 'Agent Paid Amount (STMT)', 'STMT DATE',
+    'Policy Checklist Complete', 'FULL OR MONTHLY PMTS', 'NOTES',
+    'reconciliation_status', 'reconciliation_id', 'is_reconciliation_entry', 'user_email'
+]
+
+# Carrier statement columns (headers as carriers send them - mapped on import)
+STATEMENT_COLUMNS = [
+    'Carrier', 'Statement Date', 'Insured Name', 'Policy Number', 'Transaction Type', 'Eff Date',
+    'Premium', 'Comm Rate', 'Gross Comm', 'Agent Payment', 'expected_transaction_id'
+]
+
+CARRIERS = ['Progressive', 'State Farm', 'Allstate', 'GEICO', 'Liberty Mutual', 'Travelers',
+            'Nationwide', 'Citizens', 'Universal Property', 'Hartford']
+CARRIER_GROSS_COMM = np.array([10.0, 12.0, 12.0, 8.0, 14.0, 15.0, 13.0, 10.0, 15.0, 16.0])
+
+# Policy type: (share of book, policy number prefix, term months, premium lognormal mean, taxes rate)
+POLICY_TYPES = {
+    'AUTO': (0.45, 'PA', 6, 6.9, 0.00),
+    'HOME': (0.25, 'HO', 12, 7.7, 0.03),
+    'RENTERS': (0.08, 'RN', 12, 5.2, 0.00),
+    'UMBRELLA': (0.07, 'UM', 12, 5.8, 0.00),
+    'COMMERCIAL': (0.10, 'CP', 12, 8.3, 0.05),
+    'LIFE': (0.05, 'LF', 12, 6.8, 0.00),
+}
+MGA_NAMES = ['', 'Burns & Wilcox', 'RT Specialty', 'AmWINS']
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah',
+               'Carlos', 'Karen', 'Daniel', 'Lisa', 'Matthew', 'Nancy', 'Anthony', 'Sandra', 'Mark', 'Ashley',
+               'Luis', 'Emily', 'Steven', 'Maria', 'Andrew', 'Michelle', 'Kevin', 'Amanda', 'Brian', 'Melissa']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez',
+              'Martinez', 'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore',
+              'Jackson', 'Martin', 'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez',
+              'Lewis', 'Robinson', 'Walker', 'Young', 'Allen', 'King', 'Wright', 'Scott', 'Torres', 'Nguyen']
+BUSINESS_WORDS = ['Apex', 'Summit', 'Pinnacle', 'Horizon', 'Vanguard', 'Matrix', 'Synergy', 'Quantum',
+                  'Stellar', 'Orion', 'Coastal', 'Gulf', 'Harbor', 'Sunshine', 'Keystone', 'Evergreen']
+BUSINESS_NOUNS = ['Roofing', 'Builders', 'Logistics', 'Dental', 'Landscaping', 'Holdings', 'Marine',
+                  'Plumbing', 'Realty', 'Consulting', 'Auto Repair', 'Cafe', 'Electric', 'Flooring']
+BUSINESS_SUFFIXES = ['LLC', 'Inc', 'Corp']
+
+_LETTERS = np.frombuffer(b'ABCDEFGHIJKLMNOPQRSTUVWXYZ', dtype=np.uint8)
+_DIGITS = np.frombuffer(b'0123456789', dtype=np.uint8)
+_ALNUM = np.concatenate([_LETTERS, _DIGITS])
+_ALPHABETS = {'L': _LETTERS, 'D': _DIGITS, 'A': _ALNUM}
+
+# Large prime - multiplying by it permutes any code space whose size it does not divide
+_SCRAMBLE = 2_654_435_761
+
+
+def _codes(index: np.ndarray, spec: str, rng: np.random.Generator) -> np.ndarray:
+    """
+    Unique pseudo-random codes for 0..n-1: spec is one character class per
+    position (L letter, D digit, A either), e.g. 'LLLDDDA' for Transaction IDs.
+    """
+    space = int(np.prod([len(_ALPHABETS[c]) for c in spec], dtype=object))
+    if len(index) and int(index.max()) >= space:
+        raise ValueError(f"{len(index):,} codes do not fit in a {spec} code space")
+    offset = int(rng.integers(0, space))
+    values = (index.astype(object) * _SCRAMBLE + offset) % space
+    values = values.astype(np.int64)
+    out = np.empty((len(index), len(spec)), dtype=np.uint8)
+    for position in range(len(spec) - 1, -1, -1):
+        alphabet = _ALPHABETS[spec[position]]
+        out[:, position] = alphabet[values % len(alphabet)]
+        values //= len(alphabet)
+    return out.view(f'S{len(spec)}').ravel().astype(str)
+
+
+def _dates(months: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """datetime64[D] from months since 1970 and day of month (1-28)."""
+    return months.astype('datetime64[M]').astype('datetime64[D]') + (days - 1).astype('timedelta64[D]')
+
+
+def _iso(dates: np.ndarray) -> np.ndarray:
+    return np.datetime_as_string(dates.astype('datetime64[D]'), unit='D')
+
+
+def _compact(dates: np.ndarray) -> np.ndarray:
+    """YYYYMMDD strings (reconciliation ID suffix)."""
+    chars = _iso(dates).astype('U10').view('U1').reshape(-1, 10)
+    return chars[:, [0, 1, 2, 3, 5, 6, 8, 9]].copy().view('U8').ravel().astype(object)
+
+
+def _month_end(dates: np.ndarray) -> np.ndarray:
+    return (dates.astype('datetime64[M]') + 1).astype('datetime64[D]') - np.timedelta64(1, 'D')
+
+
+def _customer_names(rng: np.random.Generator, n_clients: int, business_share: float) -> np.ndarray:
+    personal = np.char.add(np.char.add(np.array(FIRST_NAMES)[rng.integers(0, len(FIRST_NAMES), n_clients)], ' '),
+                           np.array(LAST_NAMES)[rng.integers(0, len(LAST_NAMES), n_clients)])
+    business = np.char.add(
+        np.char.add(np.array(BUSINESS_WORDS)[rng.integers(0, len(BUSINESS_WORDS), n_clients)], ' '),
+        np.char.add(np.char.add(np.array(BUSINESS_NOUNS)[rng.integers(0, len(BUSINESS_NOUNS), n_clients)], ' '),
+                    np.array(BUSINESS_SUFFIXES)[rng.integers(0, len(BUSINESS_SUFFIXES), n_clients)])
+    )
+    return np.where(rng.random(n_clients) < business_share, business, personal).astype(object)
+
+
+def _build_policies(rng: np.random.Generator, n_policies: int, as_of: np.datetime64, years: int,
+                    policies_per_client: float, retention: float) -> Dict[str, np.ndarray]:
+    """One entry per policy: client, carrier, type, origination and how many terms it ran."""
+    type_names = list(POLICY_TYPES)
+    shares = np.array([POLICY_TYPES[t][0] for t in type_names])
+    type_idx = rng.choice(len(type_names), n_policies, p=shares / shares.sum())
+    term_months = np.array([POLICY_TYPES[t][2] for t in type_names])[type_idx]
+
+    n_clients = max(1, int(n_policies / policies_per_client))
+    client_idx = np.concatenate([np.arange(min(n_clients, n_policies)),
+                                 rng.integers(0, n_clients, max(n_policies - n_clients, 0))])
+
+    # Originations spread over the history window, a few effective up to 2 months ahead
+    as_of_month = as_of.astype('datetime64[M]').astype(np.int64)
+    orig_month = as_of_month - rng.integers(-2, years * 12, n_policies)
+    orig_day = rng.integers(1, 29, n_policies)
+
+    # Terms started on or before as_of, and how many the customer kept renewing
+    elapsed = np.maximum(as_of_month - orig_month, 0)
+    possible_terms = elapsed // term_months + 1
+    lifetime_terms = rng.geometric(1 - retention, n_policies)
+    n_terms = np.minimum(lifetime_terms, possible_terms)
+    lapsed = lifetime_terms < possible_terms
+
+    carrier_idx = rng.integers(0, len(CARRIERS), n_policies)
+    is_commercial = type_idx == type_names.index('COMMERCIAL')
+    mga_idx = np.where(is_commercial & (rng.random(n_policies) < 0.4), rng.integers(1, len(MGA_NAMES), n_policies), 0)
+
+    return {
+        'client_idx': client_idx, 'type_idx': type_idx, 'term_months': term_months,
+        'carrier_idx': carrier_idx, 'mga_idx': mga_idx,
+        'orig_month': orig_month, 'orig_day': orig_day, 'n_terms': n_terms,
+        'lapsed': lapsed, 'cancelled': lapsed & (rng.random(n_policies) < 0.4),
+        'gross_pct': np.round(CARRIER_GROSS_COMM[carrier_idx] + rng.choice([-2.0, 0.0, 0.0, 2.0], n_policies), 1),
+        'base_premium': rng.lognormal(np.array([POLICY_TYPES[t][3] for t in type_names])[type_idx], 0.45),
+        'monthly_pay': rng.random(n_policies) < 0.3,
+        'n_clients': n_clients,
+    }
+
+
+def _build_originals(rng: np.random.Generator, p: Dict[str, np.ndarray], endorsement_rate: float) -> Dict[str, np.ndarray]:
+    """NEW/RWL term rows, END rows inside terms and CAN rows for cancelled policies."""
+    n_terms = p['n_terms']
+    policy = np.repeat(np.arange(len(n_terms)), n_terms)
+    term_no = np.arange(len(policy)) - np.repeat(np.cumsum(n_terms) - n_terms, n_terms)
+    term_months = p['term_months'][policy]
+    start_month = p['orig_month'][policy] + term_no * term_months
+    day = p['orig_day'][policy]
+    effective = _dates(start_month, day)
+    x_date = _dates(start_month + term_months, day)
+    premium = np.round(p['base_premium'][policy] * 1.04 ** term_no * rng.uniform(0.95, 1.08, len(policy)), 2)
+    term_type = np.where(term_no == 0, 'NEW', 'RWL').astype(object)
+    agent_pct = np.where(term_no == 0, 50.0, 25.0)
+
+    # Endorsements: dated inside their term, premium change of either sign
+    n_end = rng.poisson(endorsement_rate, len(policy))
+    end_term = np.repeat(np.arange(len(policy)), n_end)
+    term_days = (x_date - effective).astype(np.int64)
+    end_effective = effective[end_term] + (rng.random(len(end_term)) * term_days[end_term]).astype('timedelta64[D]')
+    end_premium = np.round(premium[end_term] * rng.normal(0.0, 0.12, len(end_term)), 2)
+
+    # Cancellations: the last term of cancelled policies, pro-rata unearned premium
+    last_term = np.cumsum(n_terms) - 1
+    can_term = last_term[p['cancelled']]
+    used = rng.uniform(0.1, 0.9, len(can_term))
+    can_effective = effective[can_term] + (used * term_days[can_term]).astype('timedelta64[D]')
+    can_premium = -np.round(premium[can_term] * (1 - used), 2)
+
+    # Lapsed but not cancelled policies simply stop renewing - nothing to write
+    source_term = np.concatenate([np.arange(len(policy)), end_term, can_term])
+    return {
+        'policy': policy[source_term],
+        'term': source_term,
+        'type': np.concatenate([term_type, np.full(len(end_term), 'END', dtype=object),
+                                np.full(len(can_term), 'CAN', dtype=object)]),
+        'effective': np.concatenate([effective, end_effective, can_effective]),
+        'x_date': x_date[source_term],
+        'premium': np.concatenate([premium, end_premium, can_premium]),
+        'agent_pct': agent_pct[source_term],
+    }
+
+
+def _ledger_frame(o: Dict[str, np.ndarray], p: Dict[str, np.ndarray], names: Dict[str, np.ndarray]) -> pd.DataFrame:
+    type_names = list(POLICY_TYPES)
+    policy = o['policy']
+    premium = o['premium']
+    tax_rate = np.array([POLICY_TYPES[t][4] for t in type_names])[p['type_idx'][policy]]
+    taxes = np.round(premium * tax_rate, 2)
+    commissionable = np.round(premium - taxes, 2)
+    gross_pct = p['gross_pct'][policy]
+    agency_comm = np.round(commissionable * gross_pct / 100, 2)
+    agent_comm = np.round(agency_comm * o['agent_pct'] / 100, 2)
+    broker_fee = np.where((o['type'] == 'NEW') & (p['mga_idx'][policy] > 0), 50.0, 0.0)
+    broker_fee_agent = broker_fee * 0.5
+
+    return pd.DataFrame({
+        'Client ID': names['client_id'][p['client_idx'][policy]],
+        'Customer': names['customer'][p['client_idx'][policy]],
+        'Carrier Name': np.array(CARRIERS, dtype=object)[p['carrier_idx'][policy]],
+        'MGA Name': np.array(MGA_NAMES, dtype=object)[p['mga_idx'][policy]],
+        'Policy Type': np.array(type_names, dtype=object)[p['type_idx'][policy]],
+        'Policy Number': names['policy_number'][policy],
+        'Transaction Type': o['type'],
+        'Policy Term': p['term_months'][policy],
+        'Policy Origination Date': _iso(_dates(p['orig_month'], p['orig_day']))[policy],
+        'Effective Date': _iso(o['effective']),
+        'X-DATE': _iso(o['x_date']),
+        'Premium Sold': premium,
+        'Policy Taxes & Fees': taxes,
+        'Commissionable Premium': commissionable,
+        'Policy Gross Comm %': gross_pct,
+        'Agency Estimated Comm/Revenue (CRM)': agency_comm,
+        'Agent Comm %': o['agent_pct'],
+        'Agent Estimated Comm $': agent_comm,
+        'Broker Fee': broker_fee,
+        'Broker Fee Agent Comm': broker_fee_agent,
+        'Total Agent Comm': np.round(agent_comm + broker_fee_agent, 2),
+        'Policy Checklist Complete': np.where(o['type'] == 'NEW', 'Yes', ''),
+        'FULL OR MONTHLY PMTS': np.where(p['monthly_pay'][policy], 'MONTHLY', 'FULL'),
+    })
+
+
+def generate_book(
+    n_rows: int,
+    seed: int = 42,
+    as_of: str = DEFAULT_AS_OF,
+    years: int = 5,
+    policies_per_client: float = 1.6,
+    retention: float = 0.85,
+    endorsement_rate: float = 0.25,
+    paid_share: float = 0.92,
+    void_share: float = 0.02,
+    adjustment_share: float = 0.01,
+    unmatched_statement_share: float = 0.02,
+    user_email: Optional[str] = None
+) -> Dict[str, pd.DataFrame]:
+    """
+    Generate a synthetic agency book.
+
+    Args:
+        n_rows: Exact number of ledger rows (policies table)
+        seed: Random seed - same seed and arguments give the same book
+        as_of: "Today" for the book; nothing is dated after it except
+            policies written up to two months ahead
+        years: History window for policy originations
+        policies_per_client: Average policies per Client ID
+        retention: Probability a term is renewed
+        endorsement_rate: Average END transactions per term
+        paid_share: Share of due transactions the carrier has paid
+        void_share: Share of -STMT- entries later voided
+        adjustment_share: Share of transactions with an -ADJ- entry
+        unmatched_statement_share: Statement lines that match no policy
+        user_email: Owner written to user_email (None leaves it empty)
+
+    Returns:
+        dict with 'policies' (ledger, LEDGER_COLUMNS) and 'statements'
+        (carrier statement lines, STATEMENT_COLUMNS)
+    """
+    if n_rows <= 0:
+        return {'policies': pd.DataFrame(columns=LEDGER_COLUMNS),
+                'statements': pd.DataFrame(columns=STATEMENT_COLUMNS)}
+
+    # Rows per policy depend on the draws - size the book, top up if short
+    n_policies = max(n_rows // 6, 10)
+    while True:
+        book = _generate(n_policies, seed, np.datetime64(as_of, 'D'), years, policies_per_client, retention,
+                         endorsement_rate, paid_share, void_share, adjustment_share, unmatched_statement_share)
+        if len(book['policies']) >= n_rows:
+            break
+        n_policies = int(n_policies * n_rows / max(len(book['policies']), 1) * 1.1) + 10
+
+    ledger = book['policies'].iloc[:n_rows].reset_index(drop=True)
+    ledger['user_email'] = user_email
+    statements = book['statements']
+    expected = statements['expected_transaction_id']
+    statements = statements[expected.isna() | expected.isin(ledger['Transaction ID'])].reset_index(drop=True)
+    return {'policies': ledger[LEDGER_COLUMNS], 'statements': statements[STATEMENT_COLUMNS]}
+
+
+def generate_ledger(n_rows: int, seed: int = 42, **kwargs) -> pd.DataFrame:
+    """Just the policies ledger of generate_book()."""
+    return generate_book(n_rows, seed, **kwargs)['policies']
+
+
+def _generate(n_policies, seed, as_of, years, policies_per_client, retention, endorsement_rate,
+              paid_share, void_share, adjustment_share, unmatched_share) -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    p = _build_policies(rng, n_policies, as_of, years, policies_per_client, retention)
+    o = _build_originals(rng, p, endorsement_rate)
+
+    type_prefix = np.array([POLICY_TYPES[t][1] for t in POLICY_TYPES], dtype=object)
+    names = {
+        'customer': _customer_names(rng, p['n_clients'], business_share=0.15),
+        'client_id': _codes(np.arange(p['n_clients']), 'LLLDDD', rng).astype(object),
+        'policy_number': type_prefix[p['type_idx']] + _codes(np.arange(n_policies), 'DDDDDDDDD', rng).astype(object),
+    }
+    originals = _ledger_frame(o, p, names)
+    originals['Prior Policy Number'] = np.where(originals['Transaction Type'] == 'RWL',
+                                                originals['Policy Number'], None)
+    n_orig = len(originals)
+
+    # Carrier payments: due transactions get paid on the month-end statement 20-50 days later
+    statement_date = _month_end(o['effective'] + rng.integers(20, 51, n_orig).astype('timedelta64[D]'))
+    paid = (statement_date <= as_of) & (rng.random(n_orig) < paid_share)
+    ratio = np.where(rng.random(n_orig) < 0.92, 1.0, np.round(rng.uniform(0.5, 1.1, n_orig), 3))
+    agency_paid = np.round(originals['Agency Estimated Comm/Revenue (CRM)'].to_numpy() * ratio, 2)
+    agent_paid = np.round(originals['Total Agent Comm'].to_numpy() * ratio, 2)
+
+    # The latest statement month is still open - on the statements, not yet in the ledger
+    open_month = as_of.astype('datetime64[M]')
+    if _month_end(np.array([as_of]))[0] != as_of:
+        open_month = open_month - 1
+    reconciled = paid & (statement_date.astype('datetime64[M]') < open_month)
+    stmt_rows = np.flatnonzero(reconciled)
+    void_rows = stmt_rows[rng.random(len(stmt_rows)) < void_share]
+    adj_rows = np.flatnonzero(rng.random(n_orig) < adjustment_share)
+
+    # Every ledger row gets a unique 7-character base ID
+    n_recon = len(stmt_rows) + len(void_rows) + len(adj_rows)
+    base_ids = _codes(np.arange(n_orig + n_recon), 'LLLDDDA', rng).astype(object)
+    originals['Transaction ID'] = base_ids[:n_orig]
+    orig_ids = base_ids[:n_orig]
+    stmt_base = base_ids[n_orig:n_orig + len(stmt_rows)]
+    adj_base = base_ids[n_orig + len(stmt_rows) + len(void_rows):]
+    stmt_base_by_row = pd.Series(stmt_base, index=stmt_rows)
+
+    carrier_code = np.char.upper(np.array([c.replace(' ', '')[:4] for c in CARRIERS]))
+    batch_id = (np.char.add('IMPORT-', carrier_code[p['carrier_idx'][o['policy']]]).astype(object)
+                + '-' + _compact(statement_date))
+    stmt_date_compact = _compact(statement_date)
+
+    identity = ['Client ID', 'Customer', 'Carrier Name', 'MGA Name', 'Policy Type', 'Policy Number',
+                'Transaction Type', 'Policy Term', 'Policy Origination Date', 'Effective Date', 'X-DATE']
+
+    stmt = originals.loc[stmt_rows, identity].reset_index(drop=True)
+    stmt['Transaction ID'] = stmt_base + '-STMT-' + stmt_date_compact[stmt_rows]
+    stmt['Agency Comm Received (STMT)'] = agency_paid[stmt_rows]
+    stmt['Agent Paid Amount (STMT)'] = agent_paid[stmt_rows]
+    stmt['Agent Comm %'] = originals['Agent Comm %'].to_numpy()[stmt_rows]
+    stmt['STMT DATE'] = _iso(statement_date[stmt_rows])
+    stmt['reconciliation_status'] = 'reconciled'
+    stmt['reconciliation_id'] = batch_id[stmt_rows]
+    stmt['NOTES'] = 'Import batch ' + batch_id[stmt_rows] + ' | Matched to: ' + orig_ids[stmt_rows]
+
+    # VOIDs reuse the STMT base ID and reverse its amounts on a later statement
+    void_date = _month_end(statement_date[void_rows] + np.timedelta64(31, 'D'))
+    void = originals.loc[void_rows, identity].reset_index(drop=True)
+    void['Transaction ID'] = (stmt_base_by_row.loc[void_rows].to_numpy() + '-VOID-'
+                              + _compact(void_date))
+    void['Agency Comm Received (STMT)'] = -agency_paid[void_rows]
+    void['Agent Paid Amount (STMT)'] = -agent_paid[void_rows]
+    void['STMT DATE'] = _iso(void_date)
+    void['reconciliation_status'] = 'void'
+    void['reconciliation_id'] = 'VOID-' + batch_id[void_rows]
+    void['NOTES'] = 'VOID: statement line reversed by carrier'
+
+    adj_date = np.minimum(o['effective'][adj_rows] + rng.integers(30, 120, len(adj_rows)).astype('timedelta64[D]'), as_of)
+    adj = originals.loc[adj_rows, ['Client ID', 'Customer', 'Policy Type', 'Policy Number',
+                                   'Effective Date', 'X-DATE']].reset_index(drop=True)
+    adj['Transaction ID'] = adj_base + '-ADJ-' + _compact(adj_date)
+    adj['Transaction Type'] = 'ADJUSTMENT'
+    adj['Premium Sold'] = 0.0
+    adj['Agent Estimated Comm $'] = np.round(rng.normal(0, 25, len(adj_rows)), 2)
+    adj['Agency Comm Received (STMT)'] = 0.0
+    adj['Agent Paid Amount (STMT)'] = 0.0
+    adj['STMT DATE'] = _iso(adj_date)
+    adj['reconciliation_status'] = 'adjustment'
+    adj['reconciliation_id'] = 'ADJ-' + orig_ids[adj_rows]
+    adj['NOTES'] = 'ADJUSTMENT for ' + orig_ids[adj_rows] + ': commission correction'
+
+    recon = pd.concat([stmt, void, adj], ignore_index=True)
+    recon['is_reconciliation_entry'] = True
+    originals['is_reconciliation_entry'] = False
+    ledger = pd.concat([originals, recon], ignore_index=True)
+
+    # Policy-major order (each policy's transactions, then its reconciliation
+    # entries, by date) so trimming to n_rows keeps whole policy histories
+    row_policy = np.concatenate([o['policy'], o['policy'][stmt_rows], o['policy'][void_rows], o['policy'][adj_rows]])
+    row_kind = np.concatenate([np.zeros(n_orig, dtype=np.int8), np.ones(n_recon, dtype=np.int8)])
+    row_date = np.concatenate([o['effective'], statement_date[stmt_rows], void_date, adj_date]).astype(np.int64)
+    ledger = ledger.iloc[np.lexsort((row_date, row_kind, row_policy))]
+    for col in LEDGER_COLUMNS:
+        if col not in ledger.columns:
+            ledger[col] = None
+
+    # Carrier statements: every paid line plus some the agency has no policy for
+    paid_rows = np.flatnonzero(paid)
+    statements = pd.DataFrame({
+        'Carrier': originals['Carrier Name'].to_numpy()[paid_rows],
+        'Statement Date': _iso(statement_date[paid_rows]),
+        'Insured Name': originals['Customer'].to_numpy()[paid_rows],
+        'Policy Number': originals['Policy Number'].to_numpy()[paid_rows],
+        'Transaction Type': originals['Transaction Type'].to_numpy()[paid_rows],
+        'Eff Date': originals['Effective Date'].to_numpy()[paid_rows],
+        'Premium': originals['Premium Sold'].to_numpy()[paid_rows],
+        'Comm Rate': originals['Policy Gross Comm %'].to_numpy()[paid_rows],
+        'Gross Comm': agency_paid[paid_rows],
+        'Agent Payment': agent_paid[paid_rows],
+        'expected_transaction_id': orig_ids[paid_rows],
+    })
+    n_unmatched = int(len(paid_rows) * unmatched_share)
+    if n_unmatched:
+        donors = rng.choice(paid_rows, n_unmatched)
+        unmatched = statements.iloc[rng.integers(0, len(paid_rows), n_unmatched)].copy()
+        unmatched['Insured Name'] = _customer_names(rng, n_unmatched, business_share=0.15)
+        unmatched['Policy Number'] = 'ZZ' + _codes(np.arange(n_unmatched), 'DDDDDDDDD', rng).astype(object)
+        unmatched['Premium'] = np.round(originals['Premium Sold'].to_numpy()[donors] * 0.9, 2)
+        unmatched['expected_transaction_id'] = None
+        statements = pd.concat([statements, unmatched], ignore_index=True)
+    statements = statements.sort_values(['Statement Date', 'Carrier'], kind='stable', ignore_index=True)
+
+    return {'policies': ledger, 'statements': statements}
+
+
+def _path(directory: str, name: str, n_rows: int, seed: int, fmt: str) -> str:
+    return os.path.join(directory, f"{name}_{n_rows}_seed{seed}.{fmt}")
+
+
+def write_book(book: Dict[str, pd.DataFrame], n_rows: int, seed: int = 42,
+               directory: str = DEFAULT_DATA_DIR, fmt: str = 'parquet') -> List[str]:
+    """Write each frame of a book as <name>_<rows>_seed<seed>.<fmt> (parquet or csv)."""
+    if fmt not in ('parquet', 'csv'):
+        raise ValueError(f"Unsupported format: {fmt}")
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, frame in book.items():
+        path = _path(directory, name, n_rows, seed, fmt)
+        if fmt == 'parquet':
+            frame.to_parquet(path, index=False)
+        else:
+            frame.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def load_book(n_rows: int, seed: int = 42, directory: str = DEFAULT_DATA_DIR,
+              fmt: str = 'parquet') -> Dict[str, pd.DataFrame]:
+    """Book from directory (written by write_book), generated and written first if missing."""
+    names = ('policies', 'statements')
+    paths = {name: _path(directory, name, n_rows, seed, fmt) for name in names}
+    if not all(os.path.exists(path) for path in paths.values()):
+        write_book(generate_book(n_rows, seed), n_rows, seed, directory, fmt)
+    if fmt == 'parquet':
+        return {name: pd.read_parquet(path) for name, path in paths.items()}
+    return {name: pd.read_csv(path, dtype={'Client ID': str, 'Transaction ID': str, 'Policy Number': str})
+            for name, path in paths.items()}
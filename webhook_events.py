@@ -0,0 +1,462 @@
+"""
+Stripe webhook event queue for webhook_server.py.
+
+The /stripe-webhook endpoint only verifies the signature, stores the raw
+event and answers 200. Everything slow - Stripe API lookups, user lookups,
+Supabase writes, emails - runs in a background worker pool:
+
+    - idempotency: events are stored in stripe_webhook_events keyed by the
+      Stripe event ID (INSERT ... ON CONFLICT DO NOTHING), so Stripe retries
+      of an event that was already accepted are acknowledged without being
+      processed again
+    - ordering: each customer's events go to the same worker queue and are
+      processed one at a time in the order they arrived
+    - recovery: events left pending or processing by a restart, and failed
+      events still due a retry, are queued again at startup (oldest first)
+    - failures: a failed event is retried a few times in place (keeping its
+      customer's order); after that it is marked failed with a
+      next_attempt_at, and a periodic sweep queues it again with
+      exponential backoff. Stripe already has its 200, so it will not
+      redeliver. After MAX_TOTAL_ATTEMPTS the event is marked abandoned.
+      While a customer has a failed event, their later events are held
+      (left pending) until it succeeds or is abandoned
+
+Set WEBHOOK_WORKERS=0 to process events inline (local debugging).
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+EVENTS_TABLE = 'stripe_webhook_events'
+
+STATUS_PENDING = 'pending'
+STATUS_PROCESSING = 'processing'
+STATUS_PROCESSED = 'processed'
+STATUS_FAILED = 'failed'
+STATUS_ABANDONED = 'abandoned'
+
+DEFAULT_WORKERS = int(os.environ.get('WEBHOOK_WORKERS', '4'))
+MAX_ATTEMPTS = 3
+MAX_TOTAL_ATTEMPTS = 15
+RETRY_DELAY_SECONDS = 1.0
+RETRY_BACKOFF_SECONDS = 60.0
+MAX_RETRY_BACKOFF_SECONDS = 3600.0
+SWEEP_INTERVAL_SECONDS = 30.0
+RECOVERY_BATCH_SIZE = 500
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _parse_time(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    parsed = datetime.fromisoformat(str(value))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def event_customer_key(event: Dict) -> str:
+    """Ordering key: the Stripe customer, else the customer email, else the event itself."""
+    obj = (event.get('data') or {}).get('object') or {}
+    customer = obj.get('customer')
+    if isinstance(customer, dict):
+        customer = customer.get('id')
+    if customer:
+        return str(customer)
+    email = (obj.get('customer_details') or {}).get('email') or obj.get('customer_email')
+    if email:
+        return str(email).lower()
+    return str(event.get('id') or '')
+
+
+class WebhookEventStore:
+    """Raw Stripe events in the stripe_webhook_events table (see migrations/)."""
+
+    def __init__(self, supabase, table: str = EVENTS_TABLE):
+        self.supabase = supabase
+        self.table = table
+
+    def record(self, event: Dict) -> bool:
+        """Store a newly received event. Returns False if the event ID is already stored."""
+        row = {
+            'event_id': event['id'],
+            'event_type': event.get('type'),
+            'customer_key': event_customer_key(event),
+            'payload': event,
+            'status': STATUS_PENDING,
+            'attempts': 0,
+            'received_at': _now(),
+            'next_attempt_at': None,
+        }
+        result = self.supabase.table(self.table).upsert(
+            row, on_conflict='event_id', ignore_duplicates=True
+        ).execute()
+        return bool(result.data)
+
+    def get(self, event_id: str) -> Optional[Dict]:
+        result = self.supabase.table(self.table).select('*').eq('event_id', event_id).execute()
+        return result.data[0] if result.data else None
+
+    def _update(self, event_id: str, values: Dict):
+        self.supabase.table(self.table).update(values).eq('event_id', event_id).execute()
+
+    def mark_pending(self, event_id: str):
+        self._update(event_id, {'status': STATUS_PENDING})
+
+    def mark_processing(self, event_id: str, attempts: int):
+        self._update(event_id, {'status': STATUS_PROCESSING, 'attempts': attempts})
+
+    def mark_processed(self, event_id: str, result: Dict = None):
+        self._update(event_id, {'status': STATUS_PROCESSED, 'processed_at': _now(),
+                                'result': result, 'last_error': None})
+
+    def mark_failed(self, event_id: str, error: str, next_attempt_at: str = None):
+        self._update(event_id, {'status': STATUS_FAILED, 'last_error': error[:2000],
+                                'next_attempt_at': next_attempt_at})
+
+    def mark_abandoned(self, event_id: str, error: str):
+        self._update(event_id, {'status': STATUS_ABANDONED, 'last_error': error[:2000],
+                                'next_attempt_at': None})
+
+    def unfinished_events(self, limit: int = RECOVERY_BATCH_SIZE) -> List[Dict]:
+        """Pending / processing events, oldest first."""
+        result = (
+            self.supabase.table(self.table).select('*')
+            .in_('status', [STATUS_PENDING, STATUS_PROCESSING])
+            .order('received_at')
+            .limit(limit)
+            .execute()
+        )
+        return [row['payload'] for row in (result.data or [])]
+
+    def failed_events(self, max_attempts: int, due_by: str = None,
+                      limit: int = RECOVERY_BATCH_SIZE) -> List[Dict]:
+        """Failed events with fewer than max_attempts attempts (due by due_by, if given), oldest first."""
+        query = (
+            self.supabase.table(self.table).select('*')
+            .eq('status', STATUS_FAILED)
+            .lt('attempts', max_attempts)
+        )
+        if due_by:
+            query = query.lte('next_attempt_at', due_by)
+        result = query.order('received_at').limit(limit).execute()
+        return result.data or []
+
+
+class InMemoryEventStore:
+    """Same interface as WebhookEventStore, kept in process memory (no database configured, tests, replay)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows: Dict[str, Dict] = {}
+
+    def record(self, event: Dict) -> bool:
+        with self._lock:
+            if event['id'] in self.rows:
+                return False
+            self.rows[event['id']] = {
+                'event_id': event['id'], 'event_type': event.get('type'),
+                'customer_key': event_customer_key(event), 'payload': event,
+                'status': STATUS_PENDING, 'attempts': 0, 'received_at': _now(),
+                'next_attempt_at': None, 'sequence': len(self.rows),
+            }
+            return True
+
+    def get(self, event_id: str) -> Optional[Dict]:
+        return self.rows.get(event_id)
+
+    def _update(self, event_id: str, values: Dict):
+        with self._lock:
+            self.rows[event_id].update(values)
+
+    def mark_pending(self, event_id: str):
+        self._update(event_id, {'status': STATUS_PENDING})
+
+    def mark_processing(self, event_id: str, attempts: int):
+        self._update(event_id, {'status': STATUS_PROCESSING, 'attempts': attempts})
+
+    def mark_processed(self, event_id: str, result: Dict = None):
+        self._update(event_id, {'status': STATUS_PROCESSED, 'processed_at': _now(),
+                                'result': result, 'last_error': None})
+
+    def mark_failed(self, event_id: str, error: str, next_attempt_at: str = None):
+        self._update(event_id, {'status': STATUS_FAILED, 'last_error': error[:2000],
+                                'next_attempt_at': next_attempt_at})
+
+    def mark_abandoned(self, event_id: str, error: str):
+        self._update(event_id, {'status': STATUS_ABANDONED, 'last_error': error[:2000],
+                                'next_attempt_at': None})
+
+    def unfinished_events(self, limit: int = RECOVERY_BATCH_SIZE) -> List[Dict]:
+        with self._lock:
+            rows = [r for r in self.rows.values() if r['status'] in (STATUS_PENDING, STATUS_PROCESSING)]
+        rows.sort(key=lambda r: r['sequence'])
+        return [r['payload'] for r in rows[:limit]]
+
+    def failed_events(self, max_attempts: int, due_by: str = None,
+                      limit: int = RECOVERY_BATCH_SIZE) -> List[Dict]:
+        with self._lock:
+            rows = [dict(r) for r in self.rows.values()
+                    if r['status'] == STATUS_FAILED and r['attempts'] < max_attempts
+                    and (due_by is None or (r['next_attempt_at'] or '') <= due_by)]
+        rows.sort(key=lambda r: r['sequence'])
+        return rows[:limit]
+
+
+class OrderedEventWorkerPool:
+    """
+    Worker threads with one FIFO queue each. Events are routed by
+    event_customer_key, so a customer's events never run concurrently or
+    out of arrival order, while different customers proceed in parallel.
+
+    A customer whose event failed is blocked: their later events are held
+    in memory (still pending in the store) and run, in order, once the
+    failed event succeeds on a sweep retry or is abandoned.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[Dict], Dict],
+        store=None,
+        workers: int = DEFAULT_WORKERS,
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_delay: float = RETRY_DELAY_SECONDS,
+        max_total_attempts: int = MAX_TOTAL_ATTEMPTS,
+        retry_backoff: float = RETRY_BACKOFF_SECONDS,
+        sweep_interval: float = SWEEP_INTERVAL_SECONDS
+    ):
+        self.handler = handler
+        self.store = store
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_total_attempts = max_total_attempts
+        self.retry_backoff = retry_backoff
+        self.sweep_interval = sweep_interval
+        self._queues = [queue.Queue() for _ in range(max(workers, 0))]
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._state_lock = threading.Lock()
+        self._blocked: Dict[str, str] = {}  # customer key -> ID of the failed event holding it
+        self._held: Dict[str, List[Dict]] = {}  # customer key -> later events, in arrival order
+        self._scheduled = set()  # failed event IDs queued for another attempt
+        self._stats_lock = threading.Lock()
+        self.stats = {'processed': 0, 'failed': 0, 'retries': 0, 'held': 0, 'abandoned': 0}
+
+    def start(self):
+        """Start the worker threads and the retry sweep (no-op when inline or already started)."""
+        if self._threads or not self.workers:
+            return self
+        self._stopping.clear()
+        for index, work_queue in enumerate(self._queues):
+            thread = threading.Thread(target=self._run, args=(work_queue,), daemon=True,
+                                      name=f"stripe-webhook-worker-{index}")
+            thread.start()
+            self._threads.append(thread)
+        if self.store and self.sweep_interval:
+            thread = threading.Thread(target=self._sweep_loop, daemon=True, name="stripe-webhook-sweep")
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def partition(self, event: Dict) -> int:
+        if not self.workers:
+            return 0
+        return zlib.crc32(event_customer_key(event).encode('utf-8')) % self.workers
+
+    def submit(self, event: Dict, attempts: int = 0, not_before: str = None):
+        """
+        Queue an event (processed immediately when the pool is inline).
+
+        attempts: attempts already made (failed events being retried);
+        not_before: for a recovered failed event that is not due yet - its
+        customer is blocked and the sweep queues it when it is due.
+        """
+        if not self.workers:
+            self._handle(event, attempts, not_before)
+            return
+        self._queues[self.partition(event)].put((event, attempts, not_before))
+
+    def retry(self, event: Dict, attempts: int = 0) -> bool:
+        """Queue a failed event for another attempt, unless it is already queued."""
+        with self._state_lock:
+            if event.get('id') in self._scheduled:
+                return False
+            self._scheduled.add(event.get('id'))
+        self.submit(event, attempts)
+        return True
+
+    def sweep(self) -> int:
+        """Queue failed events that are due another attempt. Returns how many were queued."""
+        if not self.store:
+            return 0
+        rows = self.store.failed_events(self.max_total_attempts, due_by=_now())
+        return sum(1 for row in rows if self.retry(row['payload'], row.get('attempts') or 0))
+
+    def join(self):
+        """Block until every queued event has been handled."""
+        for work_queue in self._queues:
+            work_queue.join()
+
+    def stop(self, timeout: float = 5.0):
+        """Let queued events finish, then stop the threads."""
+        self._stopping.set()
+        for work_queue in self._queues:
+            work_queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self, work_queue: queue.Queue):
+        while True:
+            item = work_queue.get()
+            try:
+                if item is None:
+                    return
+                self._handle(*item)
+            finally:
+                work_queue.task_done()
+
+    def _sweep_loop(self):
+        while not self._stopping.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Webhook retry sweep failed: {e}")
+
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _handle(self, event: Dict, attempts: int = 0, not_before: str = None):
+        """Process an event in its customer's order, holding it while the customer is blocked."""
+        key = event_customer_key(event)
+        event_id = event.get('id')
+        with self._state_lock:
+            self._scheduled.discard(event_id)
+            blocker = self._blocked.get(key)
+            if blocker is not None and blocker != event_id:
+                self._held.setdefault(key, []).append(event)
+                self._count('held')
+                return
+            due = _parse_time(not_before)
+            if due and due > datetime.now(timezone.utc):
+                self._blocked[key] = event_id
+                return
+
+        while self._process(event, attempts):
+            # Done or abandoned: run the customer's held events in order
+            with self._state_lock:
+                if self._blocked.get(key) == event_id:
+                    del self._blocked[key]
+                held = self._held.get(key)
+                if not held:
+                    self._held.pop(key, None)
+                    return
+                event, attempts = held.pop(0), 0
+                event_id = event.get('id')
+
+        with self._state_lock:
+            self._blocked[key] = event_id
+
+    def _process(self, event: Dict, attempts: int = 0) -> bool:
+        """
+        Run the handler, retrying in place. Returns False when the event
+        failed and will be retried by the sweep, True when it was processed
+        or abandoned after max_total_attempts.
+        """
+        event_id = event.get('id')
+        last_attempt = min(attempts + self.max_attempts, max(self.max_total_attempts, attempts + 1))
+        for attempt in range(attempts + 1, last_attempt + 1):
+            try:
+                if self.store and event_id:
+                    self.store.mark_processing(event_id, attempt)
+                result = self.handler(event)
+                if self.store and event_id:
+                    self.store.mark_processed(event_id, result)
+                self._count('processed')
+                return True
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                if attempt < last_attempt:
+                    self._count('retries')
+                    time.sleep(self.retry_delay * (attempt - attempts))
+
+        try:
+            if last_attempt >= self.max_total_attempts:
+                print(f"Webhook event {event_id} abandoned after {last_attempt} attempts: {error}")
+                self._count('abandoned')
+                if self.store and event_id:
+                    self.store.mark_abandoned(event_id, error)
+                return True
+            rounds = -(-last_attempt // self.max_attempts)
+            delay = min(self.retry_backoff * 2 ** (rounds - 1), MAX_RETRY_BACKOFF_SECONDS)
+            next_attempt_at = datetime.fromtimestamp(time.time() + delay, timezone.utc).isoformat()
+            print(f"Webhook event {event_id} failed after {last_attempt} attempts, "
+                  f"retrying after {next_attempt_at}: {error}")
+            self._count('failed')
+            if self.store and event_id:
+                self.store.mark_failed(event_id, error, next_attempt_at)
+        except Exception as store_error:
+            print(f"Could not mark webhook event {event_id} failed: {store_error}")
+        return False
+
+
+class WebhookDispatcher:
+    """Store-then-queue front door used by the Flask endpoint."""
+
+    def __init__(self, store, pool: OrderedEventWorkerPool):
+        self.store = store
+        self.pool = pool
+
+    def accept(self, event: Dict) -> str:
+        """
+        Persist and queue a verified event.
+
+        Returns 'queued' for new events, 'requeued' for a redelivery of an
+        event that failed or was abandoned (retried at once), and
+        'duplicate' for one already processed or in progress. Raises if the
+        event cannot be stored, so Stripe retries.
+        """
+        if self.store.record(event):
+            self.pool.submit(event)
+            return 'queued'
+        stored = self.store.get(event['id']) or {}
+        if stored.get('status') in (STATUS_FAILED, STATUS_ABANDONED):
+            # An abandoned event resent by hand gets a fresh set of attempts
+            attempts = (stored.get('attempts') or 0) if stored['status'] == STATUS_FAILED else 0
+            self.store.mark_pending(event['id'])
+            self.pool.retry(stored.get('payload') or event, attempts)
+            return 'requeued'
+        return 'duplicate'
+
+    def recover(self, limit: int = RECOVERY_BATCH_SIZE) -> int:
+        """
+        Queue events left by a previous process: failed events still due a
+        retry (their customers stay blocked until the sweep retries them),
+        then pending / processing ones. A customer's failed event always
+        precedes their unfinished ones, so their order is kept.
+        """
+        failed = self.store.failed_events(self.pool.max_total_attempts, limit=limit)
+        for row in failed:
+            self.pool.submit(row['payload'], row.get('attempts') or 0, row.get('next_attempt_at'))
+        events = self.store.unfinished_events(limit)
+        for event in events:
+            self.pool.submit(event)
+        return len(failed) + len(events)
+
+
+def parse_event_payload(payload) -> Dict:
+    """Raw request body -> event dict (the payload stored for replay)."""
+    if isinstance(payload, bytes):
+        payload = payload.decode('utf-8')
+    return json.loads(payload)
@@ -5,8 +5,17 @@ from flask import Flask, request, jsonify
 from supabase import create_client, Client
 from datetime import datetime, timedelta, timezone
 import sys
+import threading
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from email_utils import send_welcome_email
+from webhook_events import (
+    DEFAULT_WORKERS,
+    InMemoryEventStore,
+    OrderedEventWorkerPool,
+    WebhookDispatcher,
+    WebhookEventStore,
+    parse_event_payload,
+)
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -123,47 +132,18 @@ def _get_subscription_status_from_stripe(subscription_id, session):
     return status
 
 
-@app.route('/stripe-webhook', methods=['POST'])
-def stripe_webhook():
-    """Handle Stripe webhook events."""
-    app.logger.info("="*50)
-    app.logger.info("WEBHOOK TRIGGERED - Version 1.1")
-    app.logger.info("="*50)
-    
-    payload = request.data
-    sig_header = request.headers.get('Stripe-Signature')
-    
-    # Log webhook received
-    print(f"\n{'='*50}")
-    print(f"Webhook received at {datetime.now()}")
-    print(f"Signature header present: {'Yes' if sig_header else 'No'}")
-    
-    # Check if webhook secret is configured
-    if not webhook_secret:
-        print("WARNING: STRIPE_WEBHOOK_SECRET not configured!")
-        # For testing, parse without verification
-        try:
-            event = json.loads(payload)
-        except Exception as e:
-            print(f"Failed to parse payload: {e}")
-            return jsonify({'error': 'Invalid JSON'}), 400
-    else:
-        try:
-            # Verify webhook signature
-            event = stripe.Webhook.construct_event(
-                payload, sig_header, webhook_secret
-            )
-        except ValueError as e:
-            print(f"Invalid payload: {e}")
-            return jsonify({'error': 'Invalid payload'}), 400
-        except stripe.error.SignatureVerificationError as e:
-            print(f"Invalid signature: {e}")
-            return jsonify({'error': 'Invalid signature'}), 400
-    
-    # Log event type
-    print(f"Event type: {event['type']}")
-    print(f"Event ID: {event.get('id', 'Unknown')}")
-    
+def process_stripe_event(event):
+    """
+    Apply one verified Stripe event to the users table (and send the related
+    emails). Runs on the webhook worker pool, not in the request.
+
+    Returns a summary dict stored with the event. Raises when the database
+    write fails so the worker retries the event.
+    """
+    # Per-event detail stays at debug level; failed and abandoned events are
+    # printed by the dispatcher (webhook_events.py)
+    app.logger.debug(f"Processing Stripe event {event.get('id', 'Unknown')} ({event.get('type')})")
+
     # Initialize debug info
     debug_info = {
         'status': 'success',
@@ -181,13 +161,10 @@ def stripe_webhook():
             customer_email = session.get('customer_details', {}).get('email')
             subscription_id = session.get('subscription')
             
-            app.logger.info(f"Payment successful:")
-            app.logger.info(f"  Customer ID: {stripe_customer_id}")
-            app.logger.info(f"  Email: {customer_email}")
-            app.logger.info(f"  Subscription ID: {subscription_id}")
+            app.logger.debug(f"Payment successful: Customer {stripe_customer_id}, Email: {customer_email}, "
+                             f"Subscription: {subscription_id}")
         except Exception as e:
-            app.logger.error(f"Error processing session: {e}")
-            return jsonify({'error': str(e)}), 500
+            raise ValueError(f"Error processing session: {e}")
         
         # Determine the real subscription status AND price ID from Stripe so we
         # can resolve the correct tier instead of always writing 'legacy'.
@@ -342,11 +319,10 @@ def stripe_webhook():
                         # Don't fail the webhook if email fails
                     
             except Exception as e:
-                error_msg = f"Database error: {str(e)}"
-                print(error_msg)
-                app.logger.error(error_msg)
+                # Raise so the worker retries the event (the users write did not happen)
                 db_result['success'] = False
                 db_result['error'] = str(e)
+                raise RuntimeError(f"Database error: {e}") from e
         
         # Add database result to response
         debug_info['db_operation'] = db_result
@@ -369,6 +345,7 @@ def stripe_webhook():
                 }).eq('stripe_customer_id', customer_id).execute()
             except Exception as e:
                 print(f"Database error: {e}")
+                raise
     
     # Handle subscription deleted
     elif event['type'] == 'customer.subscription.deleted':
@@ -387,6 +364,7 @@ def stripe_webhook():
                 }).eq('stripe_customer_id', customer_id).execute()
             except Exception as e:
                 print(f"Database error: {e}")
+                raise
     
     # Handle payment failed
     elif event['type'] == 'invoice.payment_failed':
@@ -409,6 +387,7 @@ def stripe_webhook():
                 print(f"Marked customer {customer_id} as past_due")
             except Exception as e:
                 print(f"Database error updating past_due status: {e}")
+                raise
 
     # Handle payment succeeded — recover past_due users to active
     elif event['type'] == 'invoice.payment_succeeded':
@@ -436,19 +415,97 @@ def stripe_webhook():
                     print(f"Restored customer {customer_id} to active after successful payment")
                 except Exception as e:
                     print(f"Database error restoring active status: {e}")
+                    raise
     
     # Add additional info for checkout events
     if event['type'] == 'checkout.session.completed':
         debug_info['checkout_processed'] = True
-        # Safely check if variables exist
-        if 'customer_email' in locals():
-            debug_info['customer_email'] = customer_email
-        if 'supabase' in locals():
-            debug_info['supabase_connected'] = supabase is not None
-        if 'db_result' in locals():
-            debug_info['db_operation'] = db_result
-    
-    return jsonify(debug_info), 200
+        debug_info['customer_email'] = customer_email
+        debug_info['supabase_connected'] = supabase is not None
+
+    return debug_info
+
+
+_webhook_dispatcher = None
+_webhook_dispatcher_lock = threading.Lock()
+
+
+def start_webhook_dispatcher():
+    """
+    Create the event store + ordered worker pool (with its retry sweep) and
+    queue the events a previous process left unfinished or failed. Called
+    when the app loads, so failed events are retried without waiting for
+    the next webhook.
+    """
+    global _webhook_dispatcher
+    with _webhook_dispatcher_lock:
+        if _webhook_dispatcher is None:
+            supabase = get_supabase_client()
+            if supabase:
+                store = WebhookEventStore(supabase)
+            else:
+                print("Warning: Supabase not configured - webhook events are only kept in memory")
+                store = InMemoryEventStore()
+            pool = OrderedEventWorkerPool(process_stripe_event, store, workers=DEFAULT_WORKERS).start()
+            _webhook_dispatcher = WebhookDispatcher(store, pool)
+            try:
+                recovered = _webhook_dispatcher.recover()
+                if recovered:
+                    print(f"Re-queued {recovered} unfinished or failed webhook events")
+            except Exception as e:
+                print(f"Could not recover unfinished webhook events: {e}")
+        return _webhook_dispatcher
+
+
+def get_webhook_dispatcher():
+    """The dispatcher started at app load (started here if that failed)."""
+    return _webhook_dispatcher or start_webhook_dispatcher()
+
+
+@app.route('/stripe-webhook', methods=['POST'])
+def stripe_webhook():
+    """
+    Verify and store a Stripe event, then acknowledge it right away.
+    Processing happens on the worker pool (see webhook_events.py).
+    """
+    payload = request.data
+    sig_header = request.headers.get('Stripe-Signature')
+
+    # Check if webhook secret is configured
+    if not webhook_secret:
+        print("WARNING: STRIPE_WEBHOOK_SECRET not configured!")
+    else:
+        try:
+            # Verify webhook signature
+            stripe.Webhook.construct_event(payload, sig_header, webhook_secret)
+        except ValueError as e:
+            print(f"Invalid payload: {e}")
+            return jsonify({'error': 'Invalid payload'}), 400
+        except stripe.error.SignatureVerificationError as e:
+            print(f"Invalid signature: {e}")
+            return jsonify({'error': 'Invalid signature'}), 400
+
+    # Store the raw JSON (plain dicts) rather than the StripeObject
+    try:
+        event = parse_event_payload(payload)
+    except Exception as e:
+        print(f"Failed to parse payload: {e}")
+        return jsonify({'error': 'Invalid JSON'}), 400
+    if not event.get('id') or not event.get('type'):
+        return jsonify({'error': 'Invalid payload'}), 400
+
+    try:
+        outcome = get_webhook_dispatcher().accept(event)
+    except Exception as e:
+        # Not stored - a non-2xx makes Stripe deliver the event again
+        print(f"Could not store webhook event {event['id']}: {e}")
+        return jsonify({'error': 'Could not store event'}), 500
+
+    return jsonify({
+        'status': outcome,
+        'event_id': event['id'],
+        'event_received': event['type'],
+    }), 200
 
 @app.route('/test', methods=['GET', 'POST'])
 def test_endpoint():
@@ -463,6 +520,13 @@ def test_endpoint():
         'timestamp': datetime.now().isoformat()
     })
 
+# gunicorn imports this module in each worker: start processing (and
+# retrying) stored events right away
+try:
+    start_webhook_dispatcher()
+except Exception as e:
+    print(f"Could not start webhook event processing: {e}")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 10000))
     print(f"Webhook server starting on port {port}")